@@ -0,0 +1,60 @@
+# compare CompressResponseMiddleware (sync only) against compress_response_middleware (sync and async)
+
+FILE="./compression.md"
+CONNECTIONS=${CONNECTIONS:-200}
+THREADS=${THREADS:-20}
+WORKERS=${WORKERS:-$THREADS}
+PORT=8000
+HOST="http://localhost:$PORT"
+TIMEOUT=10
+SLEEP_TIME=3
+
+# breathecode.middlewares must be importable by the benchmark project
+export PYTHONPATH="$PYTHONPATH:$(realpath ../..)"
+export ENV=production
+
+# wrk is used if it is installed, http_load.py prints a similar report
+function load {
+    if command -v wrk > /dev/null; then
+        wrk -t "$THREADS" -c "$CONNECTIONS" -d10s -H "Accept-Encoding: $1" "$2"
+    else
+        python http_load.py -c "$CONNECTIONS" -d 10 -H "Accept-Encoding: $1" "$2"
+    fi
+}
+
+function bench {
+    for ENCODING in zstd gzip; do
+        echo "" >> "$FILE"
+        echo "### $ENCODING" >> "$FILE"
+        echo "#### Sync" >> "$FILE"
+        echo "" >> "$FILE"
+        echo "\`\`\`bash" >> "$FILE"
+        load "$ENCODING" "$HOST/myapp/sync/compression" >> "$FILE"
+        echo "\`\`\`" >> "$FILE"
+        echo "" >> "$FILE"
+
+        echo "#### Async" >> "$FILE"
+        echo "" >> "$FILE"
+        echo "\`\`\`bash" >> "$FILE"
+        load "$ENCODING" "$HOST/myapp/async/compression" >> "$FILE"
+        echo "\`\`\`" >> "$FILE"
+        echo "" >> "$FILE"
+
+        sleep $SLEEP_TIME
+    done
+}
+
+echo "# Compression middleware" > $FILE
+echo "" >> $FILE
+echo "$CONNECTIONS connections, $WORKERS workers, $(nproc) CPUs, load generated by $(command -v wrk > /dev/null && echo wrk || echo http_load.py)" >> $FILE
+
+for MIDDLEWARE in class function; do
+    COMPRESSION_MIDDLEWARE=$MIDDLEWARE gunicorn mysite.asgi --bind "localhost:$PORT" --timeout $TIMEOUT --workers $WORKERS --worker-class uvicorn.workers.UvicornWorker & SERVER_PID=$!
+    echo "starting server..."
+    sleep $SLEEP_TIME
+    echo "" >> $FILE
+    echo "## ASGI Gunicorn Uvicorn, $MIDDLEWARE middleware" >> $FILE
+    bench
+    kill $SERVER_PID
+    wait $SERVER_PID
+done
@@ -0,0 +1,90 @@
+"""
+Minimal HTTP load generator with an output like wrk's, for the machines where wrk is not installed.
+
+python http_load.py -c 200 -d 10 -H "Accept-Encoding: zstd" http://localhost:8000/myapp/sync/compression
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+
+
+async def worker(session: aiohttp.ClientSession, url: str, headers: dict[str, str], deadline: float,
+                 latencies: list[float], stats: dict[str, int]):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+
+        try:
+            async with session.get(url, headers=headers, auto_decompress=False) as response:
+                body = await response.read()
+
+        except aiohttp.ClientError:
+            stats['errors'] += 1
+            continue
+
+        latencies.append(time.perf_counter() - start)
+        stats['bytes'] += len(body)
+
+        if response.status >= 400:
+            stats['non_2xx'] += 1
+
+
+def format_size(size: float) -> str:
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024:
+            return f'{size:.2f}{unit}'
+
+        size /= 1024
+
+    return f'{size:.2f}TB'
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-c', '--connections', type=int, default=200)
+    parser.add_argument('-d', '--duration', type=int, default=10)
+    parser.add_argument('-H', '--header', action='append', default=[])
+    parser.add_argument('url')
+    args = parser.parse_args()
+
+    headers = dict(x.split(': ', 1) for x in args.header)
+    latencies = []
+    stats = {'bytes': 0, 'errors': 0, 'non_2xx': 0}
+
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started_at = time.perf_counter()
+        deadline = started_at + args.duration
+
+        await asyncio.gather(
+            *[worker(session, args.url, headers, deadline, latencies, stats) for _ in range(args.connections)])
+
+        elapsed = time.perf_counter() - started_at
+
+    print(f'Running {args.duration}s test @ {args.url}')
+    print(f'  {args.connections} connections')
+
+    if latencies:
+        latencies.sort()
+        print(f'  Latency avg {statistics.mean(latencies) * 1000:.2f}ms, '
+              f'stdev {statistics.pstdev(latencies) * 1000:.2f}ms, '
+              f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f}ms, '
+              f'max {latencies[-1] * 1000:.2f}ms')
+
+    print(f'  {len(latencies)} requests in {elapsed:.2f}s, {format_size(stats["bytes"])} read')
+
+    if stats['errors']:
+        print(f'  Socket errors: {stats["errors"]}')
+
+    if stats['non_2xx']:
+        print(f'  Non-2xx or 3xx responses: {stats["non_2xx"]}')
+
+    print(f'Requests/sec: {len(latencies) / elapsed:10.2f}')
+    print(f'Transfer/sec: {format_size(stats["bytes"] / elapsed):>10}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
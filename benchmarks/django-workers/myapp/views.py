@@ -1,4 +1,6 @@
 import asyncio
+import functools
+import json
 import time
 from typing import Optional
 
@@ -15,8 +17,11 @@ from .models import MyModel
 
 aserialize = sync_to_async(serialize)
 
-res = requests.get('https://jsonplaceholder.typicode.com/posts')
-stored = res.content
+
+@functools.cache
+def get_stored() -> bytes:
+    # it is fetched on the first request, so the views that do not use it can be benchmarked offline
+    return requests.get('https://jsonplaceholder.typicode.com/posts').content
 
 
 async def async_range(count):
@@ -173,15 +178,36 @@ async def async_aiohttp_view(request: HttpRequest):
 
 
 def brotli_view(request: HttpRequest):
-    encoded = brotli.compress(stored)
+    encoded = brotli.compress(get_stored())
     return HttpResponse(encoded)
 
 
 async def async_brotli_view(request: HttpRequest):
-    encoded = brotli.compress(stored)
+    encoded = brotli.compress(get_stored())
     return HttpResponse(encoded)
 
 
+def get_post(n: int) -> dict:
+    return {
+        'userId': n // 10 + 1,
+        'id': n + 1,
+        'title': f'post {n + 1} sunt aut facere repellat provident occaecati excepturi optio reprehenderit',
+        'body': f'body of the post {n + 1}\n' + 'quia et suscipit recusandae consequuntur expedita et cum ' * 2,
+    }
+
+
+# 1000 posts like the ones of jsonplaceholder, about 270KB, big enough to be compressed off the event loop
+large_stored = json.dumps([get_post(n) for n in range(1000)]).encode('utf-8')
+
+
+def compression_view(request: HttpRequest):
+    return HttpResponse(large_stored, content_type='application/json')
+
+
+async def async_compression_view(request: HttpRequest):
+    return HttpResponse(large_stored, content_type='application/json')
+
+
 def fake_cache_hit_view(request: HttpRequest):
     # latency issue
     time.sleep(0.02)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +49,15 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# compare the compression middlewares of breathecode, see compression.sh
+COMPRESSION_MIDDLEWARES = {
+    'class': 'breathecode.middlewares.CompressResponseMiddleware',
+    'function': 'breathecode.middlewares.compress_response_middleware',
+}
+
+if middleware := COMPRESSION_MIDDLEWARES.get(os.getenv('COMPRESSION_MIDDLEWARE', '')):
+    MIDDLEWARE += [middleware]
+
 ROOT_URLCONF = 'mysite.urls'
 
 TEMPLATES = [
@@ -0,0 +1,132 @@
+"""
+Compare the transfer of the masked media with the sync proxy, the async pooled proxy and the disk cache.
+
+By default it downloads a file served locally, pass `--url` to download an object of the bucket instead, run it
+from the root of the project:
+
+    python benchmarks/http/proxy.py --size 1048576 --requests 200 --concurrency 20
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer as timer
+
+import aiohttp
+import requests
+from aiohttp import web
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from breathecode.media.proxy import CHUNK_SIZE, DiskCache, _read_file  # noqa: E402
+
+
+def serve(size: int) -> str:
+    payload = os.urandom(size)
+
+    async def handler(request):
+        return web.Response(body=payload, content_type='application/octet-stream')
+
+    app = web.Application()
+    app.router.add_get('/file', handler)
+
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return f'http://127.0.0.1:{port}/file'
+
+
+def sync_proxy(url: str, times: int, concurrency: int) -> int:
+    """It is the previous implementation, a worker is busy during each transfer and each one opens a connection."""
+
+    def download(_):
+        response = requests.get(url, stream=True)
+        return sum(len(x) for x in response.raw.stream(CHUNK_SIZE))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return sum(executor.map(download, range(times)))
+
+
+async def async_proxy(url: str, times: int, concurrency: int) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=30)
+
+    async with aiohttp.ClientSession(connector=connector, auto_decompress=False) as session:
+
+        async def download():
+            async with semaphore:
+                response = await session.get(url)
+                total = 0
+
+                try:
+                    async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                        total += len(chunk)
+
+                finally:
+                    response.release()
+
+                return total
+
+        return sum(await asyncio.gather(*[download() for _ in range(times)]))
+
+
+async def disk_cache(url: str, times: int, concurrency: int) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    with tempfile.TemporaryDirectory() as path:
+        cache = DiskCache(path, max_size=1024 * 1024 * 1024, max_object_size=1024 * 1024 * 1024)
+
+        temp_path = os.path.join(path, 'file.tmp')
+        with open(temp_path, 'wb') as f:
+            f.write(requests.get(url).content)
+
+        cache.store(url, temp_path, {'Content-Length': str(os.path.getsize(temp_path))})
+
+        async def read():
+            async with semaphore:
+                f, headers = await asyncio.to_thread(cache.get, url)
+                return sum([len(x) async for x in _read_file(f, 0, int(headers['Content-Length']))])
+
+        return sum(await asyncio.gather(*[read() for _ in range(times)]))
+
+
+def measure(name: str, times: int, fn) -> None:
+    start = timer()
+    total = fn()
+    elapsed = timer() - start
+
+    print(f'- {name}: {elapsed:.2f} seconds, {times / elapsed:.1f} requests/s, '
+          f'{total / elapsed / 1024 / 1024:.1f} MB/s')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--url', default=None)
+    parser.add_argument('--size', type=int, default=1024 * 1024)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    args = parser.parse_args()
+
+    url = args.url or serve(args.size)
+    times, concurrency = args.requests, args.concurrency
+
+    print(f'{times} downloads of {url} with a concurrency of {concurrency}')
+    print()
+
+    measure('Sync proxy (requests, a connection per request)', times, lambda: sync_proxy(url, times, concurrency))
+    measure('Async proxy (pooled aiohttp session)', times, lambda: asyncio.run(async_proxy(url, times, concurrency)))
+    measure('Disk cache', times, lambda: asyncio.run(disk_cache(url, times, concurrency)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Compare the per row computation of the bill amounts against the set based one.
+
+It creates a throwaway test database using `DATABASE_URL`, run it from the root of the project:
+
+    python benchmarks/provisioning/bill_amounts.py --events 100000
+"""
+
+import argparse
+import logging
+import os
+import sys
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'breathecode.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_databases, teardown_databases  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from breathecode.admissions.models import Academy  # noqa: E402
+from breathecode.payments.models import Currency  # noqa: E402
+from breathecode.provisioning import actions  # noqa: E402
+from breathecode.provisioning.models import (  # noqa: E402
+    ProvisioningBill, ProvisioningConsumptionEvent, ProvisioningConsumptionKind, ProvisioningPrice,
+    ProvisioningUserConsumption, ProvisioningVendor,
+)
+
+BATCH_SIZE = 5000
+
+
+def create_bill(events: int, users: int) -> ProvisioningBill:
+    # the validations of the academy are not relevant here
+    academy, = Academy.objects.bulk_create([Academy(slug='bench', name='Bench')])
+    currency = Currency.objects.create(code='USD', name='US Dollar', decimals=2)
+    vendor = ProvisioningVendor.objects.create(name='Codespaces')
+    kind = ProvisioningConsumptionKind.objects.create(product_name='Codespaces Linux', sku='compute.4core')
+    bill = ProvisioningBill.objects.create(academy=academy, vendor=vendor, hash='bench', status='PENDING')
+
+    prices = ProvisioningPrice.objects.bulk_create([
+        ProvisioningPrice(currency=currency, unit_type='hour', price_per_unit=0.18 * (n + 1), multiplier=1.5)
+        for n in range(10)
+    ])
+
+    consumptions = ProvisioningUserConsumption.objects.bulk_create([
+        ProvisioningUserConsumption(username=f'user-{n}',
+                                    hash='bench',
+                                    kind=kind,
+                                    status='PERSISTED',
+                                    processed_at=timezone.now()) for n in range(users)
+    ],
+                                                                   batch_size=BATCH_SIZE)
+
+    ProvisioningUserConsumption.bills.through.objects.bulk_create([
+        ProvisioningUserConsumption.bills.through(provisioninguserconsumption_id=x.id, provisioningbill_id=bill.id)
+        for x in consumptions
+    ],
+                                                                  batch_size=BATCH_SIZE)
+
+    now = timezone.now()
+    for start in range(0, events, BATCH_SIZE):
+        rows = range(start, min(start + BATCH_SIZE, events))
+        items = ProvisioningConsumptionEvent.objects.bulk_create([
+            ProvisioningConsumptionEvent(registered_at=now,
+                                         csv_row=n,
+                                         vendor=vendor,
+                                         quantity=(n % 7) + 0.5,
+                                         price=prices[n % len(prices)],
+                                         repository_url='https://github.com/4GeeksAcademy/bench',
+                                         task_associated_slug='bench') for n in rows
+        ])
+
+        ProvisioningUserConsumption.events.through.objects.bulk_create([
+            ProvisioningUserConsumption.events.through(
+                provisioninguserconsumption_id=consumptions[n % users].id,
+                provisioningconsumptionevent_id=item.id) for n, item in zip(rows, items)
+        ])
+
+    return bill
+
+
+def per_row(bill: ProvisioningBill) -> float:
+    """The implementation that `calculate_bill_amounts` used before."""
+
+    amount = 0
+    for activity in ProvisioningUserConsumption.objects.filter(bills=bill, status='PERSISTED'):
+        consumption_amount = 0
+        consumption_quantity = 0
+        for item in activity.events.all():
+            consumption_amount += item.price.get_price(item.quantity)
+            consumption_quantity += item.quantity
+
+        activity.amount = consumption_amount
+        activity.quantity = consumption_quantity
+        activity.save()
+
+        amount += consumption_amount
+
+    return amount
+
+
+def set_based(bill: ProvisioningBill) -> float:
+    return actions.calculate_consumption_amounts(bill)
+
+
+def run(name: str, fn, bill: ProvisioningBill) -> None:
+    ProvisioningUserConsumption.objects.update(amount=0, quantity=0)
+
+    queries = 0
+
+    def count(execute, *args):
+        nonlocal queries
+        queries += 1
+        return execute(*args)
+
+    with connection.execute_wrapper(count):
+        t1 = timer()
+        amount = fn(bill)
+        t2 = timer()
+
+    print(f'{name}: {t2 - t1:.2f} seconds, {queries} queries, amount {amount:.2f}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=1000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    settings.DATABASES['default'].setdefault('TEST', {})['MIGRATE'] = False
+    old_config = setup_databases(verbosity=0, interactive=False)
+
+    try:
+        bill = create_bill(args.events, args.users)
+        print(f'Bill with {args.events} events and {args.users} consumptions ({connection.vendor})')
+        print('')
+
+        run('Set based', set_based, bill)
+        run('Per row', per_row, bill)
+
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
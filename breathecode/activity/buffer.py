@@ -0,0 +1,177 @@
+"""
+Append-only buffer of the activities waiting to be uploaded to BigQuery.
+
+Each activity is encoded on its own and appended to a Redis stream, so adding one does not take a lock or rewrite
+the rows buffered before. The uploaders read it through a consumer group in bounded batches and acknowledge each
+batch after it was uploaded, the batches that were not acknowledged are read again, so every row is uploaded at
+least once.
+"""
+
+import pickle
+from typing import Any
+
+import zstandard
+from django.core.cache import cache
+
+from breathecode.utils.redis import Lock
+
+__all__ = [
+    'push_activity', 'count_activities', 'read_activities', 'ack_activities', 'release_consumer',
+    'migrate_legacy_activities'
+]
+
+IS_DJANGO_REDIS = hasattr(cache, 'delete_pattern')
+
+ACTIVITY_STREAM_KEY = 'activity:stream'
+ACTIVITY_GROUP = 'activity-uploaders'
+
+# the batches read by an uploader that did not acknowledge them in this time are taken by the next one
+ACTIVITY_CLAIM_IDLE_TIME = 10 * 60 * 1000
+
+Row = dict[str, Any]
+
+
+def _get_redis():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection('default')
+
+
+def _get_pending_key(consumer: str) -> str:
+    return f'{ACTIVITY_STREAM_KEY}:pending:{consumer}'
+
+
+def _ensure_group(client) -> None:
+    from redis.exceptions import ResponseError
+
+    try:
+        client.xgroup_create(ACTIVITY_STREAM_KEY, ACTIVITY_GROUP, id='0', mkstream=True)
+
+    except ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+
+def push_activity(row: Row) -> None:
+    """Append an activity to the buffer."""
+
+    data = pickle.dumps(row)
+
+    if IS_DJANGO_REDIS:
+        _get_redis().xadd(ACTIVITY_STREAM_KEY, {'row': data})
+        return
+
+    with Lock(None, f'lock:{ACTIVITY_STREAM_KEY}', timeout=30, blocking_timeout=30):
+        rows = cache.get(ACTIVITY_STREAM_KEY) or []
+        rows.append(data)
+        cache.set(ACTIVITY_STREAM_KEY, rows, timeout=None)
+
+
+def count_activities() -> int:
+    """Count the activities waiting to be uploaded."""
+
+    if IS_DJANGO_REDIS:
+        return _get_redis().xlen(ACTIVITY_STREAM_KEY)
+
+    return len(cache.get(ACTIVITY_STREAM_KEY) or [])
+
+
+def read_activities(consumer: str, count: int) -> list[tuple[str, Row]]:
+    """
+    Read a batch of activities for the consumer.
+
+    The batch that the consumer read and did not acknowledge is returned again, then the abandoned batches of other
+    consumers, then the new activities.
+    """
+
+    if IS_DJANGO_REDIS:
+        client = _get_redis()
+        _ensure_group(client)
+
+        response = client.xreadgroup(ACTIVITY_GROUP, consumer, {ACTIVITY_STREAM_KEY: '0'}, count=count)
+        entries = response[0][1] if response else []
+
+        if not entries:
+            entries = client.xautoclaim(ACTIVITY_STREAM_KEY,
+                                        ACTIVITY_GROUP,
+                                        consumer,
+                                        ACTIVITY_CLAIM_IDLE_TIME,
+                                        count=count)[1]
+
+        if not entries:
+            response = client.xreadgroup(ACTIVITY_GROUP, consumer, {ACTIVITY_STREAM_KEY: '>'}, count=count)
+            entries = response[0][1] if response else []
+
+        # the pending entries that were deleted from the stream come without fields
+        if deleted := [id for id, fields in entries if not fields]:
+            client.xack(ACTIVITY_STREAM_KEY, ACTIVITY_GROUP, *deleted)
+
+        return [(id.decode('utf-8'), pickle.loads(fields[b'row'])) for id, fields in entries if fields]
+
+    with Lock(None, f'lock:{ACTIVITY_STREAM_KEY}', timeout=30, blocking_timeout=30):
+        pending_key = _get_pending_key(consumer)
+        batch = cache.get(pending_key)
+
+        if batch is None:
+            rows = cache.get(ACTIVITY_STREAM_KEY) or []
+            batch = [(f'{consumer}-{i}', x) for i, x in enumerate(rows[:count])]
+
+            cache.set(ACTIVITY_STREAM_KEY, rows[count:], timeout=None)
+            cache.set(pending_key, batch, timeout=None)
+
+    return [(id, pickle.loads(data)) for id, data in batch]
+
+
+def ack_activities(consumer: str, ids: list[str]) -> None:
+    """Mark the activities as uploaded and remove them from the buffer."""
+
+    if not ids:
+        return
+
+    if IS_DJANGO_REDIS:
+        pipeline = _get_redis().pipeline(transaction=True)
+        pipeline.xack(ACTIVITY_STREAM_KEY, ACTIVITY_GROUP, *ids)
+        pipeline.xdel(ACTIVITY_STREAM_KEY, *ids)
+        pipeline.execute()
+        return
+
+    with Lock(None, f'lock:{ACTIVITY_STREAM_KEY}', timeout=30, blocking_timeout=30):
+        pending_key = _get_pending_key(consumer)
+        batch = [x for x in cache.get(pending_key) or [] if x[0] not in ids]
+
+        if batch:
+            cache.set(pending_key, batch, timeout=None)
+
+        else:
+            cache.delete(pending_key)
+
+
+def release_consumer(consumer: str) -> None:
+    """Remove the consumer from the group, it must be called after it acknowledged all its batches."""
+
+    if IS_DJANGO_REDIS:
+        _get_redis().xgroup_delconsumer(ACTIVITY_STREAM_KEY, ACTIVITY_GROUP, consumer)
+
+
+def migrate_legacy_activities(workers: int, task_manager_id: int) -> int:
+    """Move the activities of the previous per worker buffers to the stream, it returns the amount moved."""
+
+    keys = [f'activity:worker-{worker}' for worker in range(workers + 1)]
+    keys.append(f'activity:backup:{task_manager_id}')
+
+    client = _get_redis() if IS_DJANGO_REDIS else None
+
+    moved = 0
+    for key in keys:
+        with Lock(client, f'lock:{key}', timeout=30, blocking_timeout=30):
+            data = cache.get(key)
+            if not data:
+                continue
+
+            cache.delete(key)
+
+        for row in pickle.loads(zstandard.decompress(data)):
+            push_activity(row)
+            moved += 1
+
+    return moved
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from breathecode.activity import tasks
+
+
+class Command(BaseCommand):
+    help = 'Build the daily rollups of the activities used by the reports'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Build again every day of the activity table',
+        )
+
+    def handle(self, *args, **options):
+        tasks.build_activity_rollups.delay(full=options['full'])
+
+        self.stdout.write(self.style.SUCCESS('Done!'))
@@ -0,0 +1,150 @@
+"""
+Recent activities of each user, kept in Redis to serve the first pages of the listing without a BigQuery job.
+
+Each user has a sorted set of its last activities scored by their timestamp. It is complete since the time it was
+created or, once it is full, since its oldest activity, so a page can be served from it only if the page ends after
+that time.
+"""
+
+import pickle
+from datetime import datetime
+from typing import Any, Optional
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from breathecode.utils.attr_dict import AttrDict
+from breathecode.utils.redis import Lock
+
+__all__ = ['push_recent_activity', 'get_recent_activities']
+
+IS_DJANGO_REDIS = hasattr(cache, 'delete_pattern')
+
+RECENT_ACTIVITIES_SIZE = 200
+RECENT_ACTIVITIES_TTL = 7 * 24 * 60 * 60
+
+Row = dict[str, Any]
+
+
+def _get_redis():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection('default')
+
+
+def _get_keys(user_id: int) -> tuple[str, str]:
+    key = f'activity:recent:{user_id}'
+    return key, f'{key}:since'
+
+
+def _get_score(row: Row) -> float:
+    return datetime.fromisoformat(row['timestamp']).timestamp()
+
+
+def push_recent_activity(row: Row) -> None:
+    """Add the activity to the recent activities of its user, the oldest ones are dropped."""
+
+    key, since_key = _get_keys(row['user_id'])
+    score = _get_score(row)
+    now = timezone.now().timestamp()
+
+    if IS_DJANGO_REDIS:
+        pipeline = _get_redis().pipeline(transaction=True)
+        pipeline.set(since_key, now, nx=True, ex=RECENT_ACTIVITIES_TTL)
+        pipeline.zadd(key, {pickle.dumps(row): score})
+        pipeline.zremrangebyrank(key, 0, -RECENT_ACTIVITIES_SIZE - 1)
+        pipeline.expire(key, RECENT_ACTIVITIES_TTL)
+        pipeline.expire(since_key, RECENT_ACTIVITIES_TTL)
+        pipeline.execute()
+        return
+
+    with Lock(None, f'lock:{key}', timeout=30, blocking_timeout=30):
+        if cache.get(since_key) is None:
+            cache.set(since_key, now, timeout=RECENT_ACTIVITIES_TTL)
+
+        rows = cache.get(key) or []
+        rows.append((score, row))
+        rows.sort(key=lambda x: x[0])
+
+        cache.set(key, rows[-RECENT_ACTIVITIES_SIZE:], timeout=RECENT_ACTIVITIES_TTL)
+
+
+def get_recent_activities(user_id: int) -> tuple[list[Row], Optional[float]]:
+    """
+    Get the recent activities of the user, from the newest to the oldest.
+
+    It also returns the timestamp since which they are complete, None if there are not recent activities.
+    """
+
+    key, since_key = _get_keys(user_id)
+
+    if IS_DJANGO_REDIS:
+        pipeline = _get_redis().pipeline(transaction=True)
+        pipeline.zrevrange(key, 0, -1, withscores=True)
+        pipeline.get(since_key)
+        entries, since = pipeline.execute()
+
+        entries = [(score, pickle.loads(data)) for data, score in entries]
+
+    else:
+        entries = (cache.get(key) or [])[::-1]
+        since = cache.get(since_key)
+
+    if since is None:
+        return [], None
+
+    since = float(since)
+
+    # the activities older than the ones dropped could be missing
+    if len(entries) >= RECENT_ACTIVITIES_SIZE:
+        since = max(since, entries[-1][0])
+
+    return [row for _, row in entries], since
+
+
+def get_recent_page(user_id: int,
+                    academy_id: int,
+                    limit: int,
+                    start: datetime,
+                    end: Optional[datetime] = None,
+                    kind: Optional[str] = None,
+                    after: Optional[tuple[datetime, str]] = None) -> Optional[list[Row]]:
+    """
+    Get a page of the listing from the recent activities.
+
+    It has up to `limit + 1` activities to know if there is a next page, and it returns None if the recent
+    activities could miss some activity of the page.
+    """
+
+    rows, since = get_recent_activities(user_id)
+    if since is None:
+        return None
+
+    start = start.timestamp()
+    covered = start >= since
+
+    # the listing is sorted by timestamp and id, the scores only sort it by timestamp
+    entries = sorted([(datetime.fromisoformat(x['timestamp']), x['id'], x) for x in rows], reverse=True)
+
+    matches = []
+    for timestamp, id, row in entries:
+        if timestamp.timestamp() < max(start, since):
+            break
+
+        if after and (timestamp, id) >= after:
+            continue
+
+        if end and timestamp > end:
+            continue
+
+        if row['meta'].get('academy') != academy_id or (kind and row['kind'] != kind):
+            continue
+
+        # the serializer reads them like the rows of BigQuery
+        matches.append(AttrDict(**row))
+
+        # the activities missing are older than all the ones of the page
+        if len(matches) > limit:
+            return matches
+
+    return matches if covered else None
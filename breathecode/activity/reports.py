@@ -0,0 +1,218 @@
+"""
+Cached reports of the activities stored in BigQuery.
+
+The results are cached by a fingerprint of the normalized query, a stale result is served while a task computes it
+again. The reports that only count the activities grouped by academy, kind or user are answered from the daily
+rollup table, which is much smaller than the activity table.
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import timedelta
+from typing import Any, Optional
+
+from django.core.cache import cache
+from django.utils import timezone
+from google.cloud import bigquery
+
+from breathecode.services.google_cloud.big_query import BigQuery
+
+__all__ = ['get_report_spec', 'get_report', 'compute_report', 'build_rollups']
+
+ROLLUP_TABLE = 'activity_daily'
+ROLLUP_KEY = 'activity:rollup'
+
+# the reports go back to the activity table if the rollup was not built for this time
+ROLLUP_TTL = 48 * 60 * 60
+
+# columns of the activity table that exist in the rollup
+ROLLUP_COLUMNS = {
+    'kind': 'kind',
+    'user_id': 'user_id',
+    'meta.academy': 'academy',
+}
+
+# the columns that are never null, so their count is the amount of activities
+ROLLUP_COUNTABLE = ['id', 'kind', 'user_id']
+
+FILTER_SUFFIXES = ['__gte', '__lte', '__like', '__gt', '__lt']
+
+Spec = dict[str, Any]
+
+
+def get_cache_ttl() -> int:
+    return int(os.getenv('ACTIVITY_REPORT_CACHE_TTL', str(5 * 60)))
+
+
+def get_stale_ttl() -> int:
+    return int(os.getenv('ACTIVITY_REPORT_STALE_TTL', str(60 * 60)))
+
+
+def get_rollup_days() -> int:
+    return int(os.getenv('ACTIVITY_ROLLUP_DAYS', '2'))
+
+
+def get_report_spec(params: dict[str, str]) -> Spec:
+    """Normalize the report requested, two requests of the same report get the same spec."""
+
+    query = json.loads(params.get('query', '{}'))
+    spec = {}
+
+    for key in ['fields', 'by', 'order']:
+        if (value := params.get(key, None)) is not None:
+            spec[key] = value.split(',')
+
+    if (limit := params.get('limit', None)) is not None:
+        spec['limit'] = limit
+
+    if 'filter' in query:
+        spec['filter'] = dict(sorted(query['filter'].items()))
+
+    if 'grouping_function' in query:
+        spec['grouping_function'] = query['grouping_function']
+
+    return spec
+
+
+def _get_fingerprint(spec: Spec) -> str:
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _get_rollup_column(name: str) -> Optional[str]:
+    return ROLLUP_COLUMNS.get(name.replace('__', '.'))
+
+
+def _get_rollup_filter(filters: dict[str, Any]) -> Optional[dict[str, Any]]:
+    result = {}
+
+    for key, value in filters.items():
+        suffix = next((x for x in FILTER_SUFFIXES if key.endswith(x)), '')
+        column = _get_rollup_column(key[:len(key) - len(suffix)])
+
+        if column is None:
+            return None
+
+        result[column + suffix] = value
+
+    return result
+
+
+def get_rollup_spec(spec: Spec) -> Optional[Spec]:
+    """Translate the report to the rollup table, it returns None if the rollup cannot answer it."""
+
+    # the key is only set after the whole history was built, and it expires before a day could be missing
+    if cache.get(ROLLUP_KEY) is None:
+        return None
+
+    grouping_function = spec.get('grouping_function', {})
+    counts = grouping_function.get('count', [])
+
+    if set(grouping_function) - {'count'} or set(counts) - set(ROLLUP_COUNTABLE):
+        return None
+
+    fields = [_get_rollup_column(x) for x in spec.get('fields', [])]
+    by = [_get_rollup_column(x) for x in spec.get('by', [])]
+    aliases = [f'count__{x}' for x in counts]
+    order = [x if x in aliases else _get_rollup_column(x) for x in spec.get('order', [])]
+    filters = _get_rollup_filter(spec.get('filter', {}))
+
+    if None in fields or None in by or None in order or filters is None:
+        return None
+
+    # the rollup has a row per day, academy, kind and user, just the counts and the groups match the activities
+    if not counts and not (fields and set(fields) <= set(by)):
+        return None
+
+    rollup = {'fields': [*fields, *[f'SUM(count) AS {x}' for x in aliases]]}
+
+    if by:
+        rollup['by'] = by
+
+    if order:
+        rollup['order'] = order
+
+    if filters:
+        rollup['filter'] = filters
+
+    if 'limit' in spec:
+        rollup['limit'] = spec['limit']
+
+    return rollup
+
+
+def compute_report(spec: Spec) -> list[dict[str, Any]]:
+    """Run the report in BigQuery and cache its result."""
+
+    rollup = get_rollup_spec(spec)
+
+    if rollup:
+        result = BigQuery.table(ROLLUP_TABLE).json_query(rollup)
+
+    else:
+        result = BigQuery.table('activity').json_query(spec)
+
+    rows = [dict(x.items()) for x in result]
+
+    entry = {'rows': rows, 'expires_at': time.time() + get_cache_ttl()}
+    cache.set(f'activity:report:{_get_fingerprint(spec)}', entry, timeout=get_cache_ttl() + get_stale_ttl())
+
+    return rows
+
+
+def get_report(spec: Spec) -> list[dict[str, Any]]:
+    """Get the report from the cache, a stale result is returned while it is computed again in background."""
+
+    from breathecode.activity import tasks
+
+    key = f'activity:report:{_get_fingerprint(spec)}'
+    entry = cache.get(key)
+
+    if entry is None:
+        return compute_report(spec)
+
+    # a stale report is refreshed once, a concurrent request could schedule it again, which is harmless
+    if entry['expires_at'] < time.time() and cache.get(f'{key}:refreshing') is None:
+        cache.set(f'{key}:refreshing', True, timeout=get_cache_ttl())
+        tasks.refresh_activity_report.delay(spec)
+
+    return entry['rows']
+
+
+def build_rollups(full: bool = False) -> None:
+    """
+    Compute again the daily counts of the last days, the previous days do not change.
+
+    The whole history is built when `full` is set or the rollup was not built for `ROLLUP_TTL`, so the rollup always
+    covers every day of the activity table before the reports are answered from it.
+    """
+
+    client, project_id, dataset = BigQuery.client()
+
+    activity = f'`{project_id}.{dataset}.activity`'
+    rollup = f'`{project_id}.{dataset}.{ROLLUP_TABLE}`'
+
+    sql = f"""
+        CREATE TABLE IF NOT EXISTS {rollup} (
+            day DATE, academy INT64, kind STRING, user_id INT64, count INT64
+        ) PARTITION BY day;
+
+        DELETE FROM {rollup} WHERE @since IS NULL OR day >= @since;
+
+        INSERT INTO {rollup} (day, academy, kind, user_id, count)
+        SELECT DATE(timestamp) AS day, meta.academy AS academy, kind, user_id, COUNT(*) AS count
+        FROM {activity}
+        WHERE @since IS NULL OR timestamp >= TIMESTAMP(@since)
+        GROUP BY day, academy, kind, user_id;
+    """
+
+    since = None
+    if full is False and cache.get(ROLLUP_KEY) is not None:
+        since = (timezone.now() - timedelta(days=get_rollup_days() - 1)).date()
+
+    job_config = bigquery.QueryJobConfig(query_parameters=[bigquery.ScalarQueryParameter('since', 'DATE', since)])
+
+    client.query(sql, job_config=job_config).result()
+
+    cache.set(ROLLUP_KEY, {'updated_at': timezone.now()}, timeout=ROLLUP_TTL)
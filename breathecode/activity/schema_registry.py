@@ -0,0 +1,105 @@
+"""
+Registry of the BigQuery schemas of the activities.
+
+The schema of an activity only changes with the types of its meta fields, so it is registered once by a fingerprint
+of them and the buffered activities only carry its id instead of a list of `SchemaField`.
+"""
+
+import hashlib
+import json
+import re
+from datetime import date, datetime
+from typing import Any, Optional
+
+from django.core.cache import cache
+from google.cloud import bigquery
+
+from breathecode.utils.local_cache import LocalCache
+
+__all__ = ['get_field_type', 'get_meta_fields', 'register_schema', 'get_schema']
+
+ISO_STRING_PATTERN = re.compile(
+    r'^\d{4}-(0[1-9]|1[0-2])-([12]\d|0[1-9]|3[01])T([01]\d|2[0-3]):([0-5]\d):([0-5]\d)\.\d{6}(Z|\+\d{2}:\d{2})?$')
+
+MetaFields = list[tuple[str, str]]
+
+schemas = LocalCache(maxsize=1024, timeout=60 * 60)
+
+
+def _get_key(schema_id: str) -> str:
+    return f'activity:schema:{schema_id}'
+
+
+def get_field_type(value: Any) -> str:
+    t = bigquery.enums.SqlTypeNames.STRING
+
+    # keep it adobe than the date conditional
+    if isinstance(value, datetime) or (isinstance(value, str) and ISO_STRING_PATTERN.match(value)):
+        t = bigquery.enums.SqlTypeNames.TIMESTAMP
+    elif isinstance(value, date):
+        t = bigquery.enums.SqlTypeNames.DATE
+    elif isinstance(value, str):
+        pass
+    elif isinstance(value, bool):
+        t = bigquery.enums.SqlTypeNames.BOOL
+    elif isinstance(value, int):
+        t = bigquery.enums.SqlTypeNames.INT64
+    elif isinstance(value, float):
+        t = bigquery.enums.SqlTypeNames.FLOAT64
+
+    return t.value
+
+
+def get_meta_fields(meta: dict[str, Any]) -> MetaFields:
+    return [(key, get_field_type(meta[key])) for key in meta]
+
+
+def _build_schema(meta_fields: MetaFields) -> list[bigquery.SchemaField]:
+    # the fields are created on each call because merging the schemas modifies them
+    return [
+        bigquery.SchemaField('user_id', bigquery.enums.SqlTypeNames.INT64, 'NULLABLE'),
+        bigquery.SchemaField('kind', bigquery.enums.SqlTypeNames.STRING, 'NULLABLE'),
+        bigquery.SchemaField('timestamp', bigquery.enums.SqlTypeNames.TIMESTAMP, 'NULLABLE'),
+        bigquery.SchemaField('related',
+                             bigquery.enums.SqlTypeNames.STRUCT,
+                             'NULLABLE',
+                             fields=[
+                                 bigquery.SchemaField('type', bigquery.enums.SqlTypeNames.STRING, 'NULLABLE'),
+                                 bigquery.SchemaField('id', bigquery.enums.SqlTypeNames.INT64, 'NULLABLE'),
+                                 bigquery.SchemaField('slug', bigquery.enums.SqlTypeNames.STRING, 'NULLABLE'),
+                             ]),
+        bigquery.SchemaField('meta',
+                             bigquery.enums.SqlTypeNames.STRUCT,
+                             'NULLABLE',
+                             fields=[bigquery.SchemaField(key, t) for key, t in meta_fields]),
+    ]
+
+
+def register_schema(meta_fields: MetaFields) -> str:
+    """Register the schema of the meta fields, it returns its id."""
+
+    schema_id = hashlib.sha1(json.dumps(meta_fields).encode('utf-8')).hexdigest()[:16]
+
+    if schemas.get(schema_id) is None:
+        cache.set(_get_key(schema_id), meta_fields, timeout=None)
+        schemas.set(schema_id, meta_fields)
+
+    return schema_id
+
+
+def get_schema(schema_id: str, meta: Optional[dict[str, Any]] = None) -> Optional[list[bigquery.SchemaField]]:
+    """Get the schema registered, it is inferred from the meta provided if the registry lost it."""
+
+    meta_fields = schemas.get(schema_id)
+
+    if meta_fields is None:
+        meta_fields = cache.get(_get_key(schema_id))
+
+    if meta_fields is None and meta is not None:
+        meta_fields = get_meta_fields(meta)
+
+    if meta_fields is None:
+        return None
+
+    schemas.set(schema_id, meta_fields)
+    return _build_schema(meta_fields)
@@ -1,29 +1,23 @@
 import functools
 import logging
 import os
-import pickle
-import re
 import uuid
-from datetime import date, datetime, timedelta
+from datetime import timedelta
 from typing import Optional
 
-import zstandard
 from celery import shared_task
 from django.core.cache import cache
 from django.utils import timezone
-from django_redis import get_redis_connection
 from google.cloud import bigquery
-from redis.exceptions import LockError
-from task_manager.core.exceptions import AbortTask, RetryTask
+from task_manager.core.exceptions import AbortTask
 from task_manager.django.decorators import task
 
-from breathecode.activity import actions
+from breathecode.activity import actions, buffer, recent, reports, schema_registry
 from breathecode.admissions.models import Cohort, CohortUser
 from breathecode.admissions.utils.cohort_log import CohortDayLog
-from breathecode.services.google_cloud.big_query import BigQuery
+from breathecode.services.google_cloud.big_query import BigQuery, LoadJobError
 from breathecode.utils import NDB
 from breathecode.utils.decorators import TaskPriority
-from breathecode.utils.redis import Lock
 
 from .models import StudentActivity
 
@@ -37,15 +31,19 @@ def get_activity_sampling_rate():
     return 60
 
 
-IS_DJANGO_REDIS = hasattr(cache, 'delete_pattern')
+@functools.lru_cache(maxsize=1)
+def get_activity_upload_interval():
+    return int(os.getenv('ACTIVITY_UPLOAD_INTERVAL', str(5 * 60)))
+
+
+# each run uploads up to this amount of rows in a single load job, the rest is left to the next run of the task
+ACTIVITY_MAX_ROWS = 10000
+ACTIVITY_LAST_UPLOAD_KEY = 'activity:last-upload'
 
 API_URL = os.getenv('API_URL', '')
 
 logger = logging.getLogger(__name__)
 
-ISO_STRING_PATTERN = re.compile(
-    r'^\d{4}-(0[1-9]|1[0-2])-([12]\d|0[1-9]|3[01])T([01]\d|2[0-3]):([0-5]\d):([0-5]\d)\.\d{6}(Z|\+\d{2}:\d{2})?$')
-
 
 @shared_task(bind=True, priority=TaskPriority.ACADEMY.value)
 def get_attendancy_log(self, cohort_id: int):
@@ -163,38 +161,26 @@ def get_attendancy_log_per_cohort_user(cohort_user_id: int):
     logger.info('History log saved')
 
 
-@task(bind=True, priority=TaskPriority.ACADEMY.value)
-def upload_activities(self, task_manager_id: int, **_):
-
-    def extract_data():
-        nonlocal worker, res
-
-        client = None
-        if IS_DJANGO_REDIS:
-            client = get_redis_connection('default')
-
-        while True:
-            try:
-                with Lock(client, f'lock:activity:worker-{worker}', timeout=30, blocking_timeout=30):
-                    worker_key = f'activity:worker-{worker}'
-                    data = cache.get(worker_key)
-                    cache.delete(worker_key)
+def get_activity_schemas(activities: list[dict]) -> list[list[bigquery.SchemaField]]:
+    """Get the schemas of a batch of activities, each registered schema is built once."""
 
-                    if data:
-                        data = zstandard.decompress(data)
-                        data = pickle.loads(data)
+    schemas = []
+    schema_ids = set()
 
-                        res += data
+    for activity in activities:
+        # the activities buffered before the schema registry carry their whole schema
+        if 'schema' in activity:
+            schemas.append(activity['schema'])
 
-            except LockError:
-                raise RetryTask('Could not acquire lock for activity, operation timed out.')
+        elif activity['schema_id'] not in schema_ids:
+            schema_ids.add(activity['schema_id'])
+            schemas.append(schema_registry.get_schema(activity['schema_id'], activity['data']['meta']))
 
-            # this will keeping working even if the worker amount changes
-            if worker >= workers and data is None:
-                break
+    return schemas
 
-            worker += 1
 
+@task(bind=True, priority=TaskPriority.ACADEMY.value)
+def upload_activities(self, task_manager_id: int, **_):
     utc_now = timezone.now()
     limit = utc_now - timedelta(seconds=get_activity_sampling_rate())
 
@@ -205,58 +191,50 @@ def upload_activities(self, task_manager_id: int, **_):
                             task_name=self.task_manager.task_name,
                             created_at__lt=limit).exclude(id=task_manager_id).delete()
 
-    workers = actions.get_workers_amount()
-    res = []
-    worker = 0
-
-    has_not_backup = self.task_manager.status == 'PENDING' and self.task_manager.attempts == 1
-    backup_key = f'activity:backup:{task_manager_id}'
-
-    if has_not_backup:
-        extract_data()
+    buffer.migrate_legacy_activities(actions.get_workers_amount(), task_manager_id)
 
-    else:
-        backup_key = f'activity:backup:{task_manager_id}'
-        data = cache.get(backup_key)
+    # BigQuery allows 1500 load jobs per table and day, so the activities are loaded every few minutes, unless there
+    # are enough of them to fill a load job
+    last_upload = cache.get(ACTIVITY_LAST_UPLOAD_KEY)
+    if (last_upload and last_upload > utc_now - timedelta(seconds=get_activity_upload_interval())
+            and 0 < buffer.count_activities() < ACTIVITY_MAX_ROWS):
+        raise AbortTask('The activities were uploaded recently')
 
-        if data:
-            data = zstandard.decompress(data)
-            data = pickle.loads(data)
-
-            res = data
-
-        else:
-            has_not_backup = True
-            extract_data()
-
-    if not res:
-        # has backup
-        if not has_not_backup:
-            cache.delete(backup_key)
+    # a retry of this task reads the batch that it could not upload before
+    consumer = f'upload-activities-{task_manager_id}'
+    batch = buffer.read_activities(consumer, ACTIVITY_MAX_ROWS)
 
+    if not batch:
+        buffer.release_consumer(consumer)
         raise AbortTask('No data to upload')
 
+    res = [x for _, x in batch]
+
     table = BigQuery.table('activity')
     schema = table.schema()
 
     rows = [x['data'] for x in res]
-    new_schema = BigQuery.join_schemas(*[x['schema'] for x in res])
+    new_schema = BigQuery.join_schemas(*get_activity_schemas(res))
 
     diff = BigQuery.schema_difference(schema, new_schema)
 
+    if diff:
+        schema = BigQuery.merge_schema(diff, schema)
+        table.update_schema(schema)
+
     try:
-        if diff:
-            merged_schema = BigQuery.merge_schema(diff, schema)
-            table.update_schema(merged_schema)
+        table.bulk_insert(rows, load_job=True)
 
-        table.bulk_insert(rows)
+    # the rows that were loaded are not uploaded again by the retry
+    except LoadJobError as e:
+        failed_rows = set(e.failed_rows)
+        buffer.ack_activities(consumer, [id for i, (id, _) in enumerate(batch) if i not in failed_rows])
+        raise
 
-    except Exception as e:
-        data = pickle.dumps(res)
-        data = zstandard.compress(data)
+    buffer.ack_activities(consumer, [id for id, _ in batch])
+    buffer.release_consumer(consumer)
 
-        cache.set(backup_key, data)
-        raise e
+    cache.set(ACTIVITY_LAST_UPLOAD_KEY, utc_now, timeout=get_activity_upload_interval())
 
 
 @task(priority=TaskPriority.BACKGROUND.value)
@@ -280,92 +258,38 @@ def add_activity(user_id: int,
     if not related_type and (related_id or related_slug):
         raise AbortTask('If related_type is not provided, both related_id and related_slug must also be absent.')
 
-    client = None
-    if IS_DJANGO_REDIS:
-        client = get_redis_connection('default')
+    meta = actions.get_activity_meta(kind, related_type, related_id, related_slug)
+
+    # the schema only depends on the types of the meta fields, so the activity just carries its id
+    res = {
+        'schema_id': schema_registry.register_schema(schema_registry.get_meta_fields(meta)),
+        'data': {
+            'id': uuid.uuid4().hex,
+            'user_id': user_id,
+            'kind': kind,
+            'timestamp': timestamp,
+            'related': {
+                'type': related_type,
+                'id': related_id,
+                'slug': related_slug,
+            },
+            'meta': meta,
+        },
+    }
+
+    buffer.push_activity(res)
+    recent.push_recent_activity(res['data'])
 
-    worker = actions.get_current_worker_number()
 
-    try:
-        with Lock(client, f'lock:activity:worker-{worker}', timeout=30, blocking_timeout=30):
-            worker_storage_key = f'activity:worker-{worker}'
-            data = cache.get(worker_storage_key)
-
-            if data:
-                data = zstandard.decompress(data)
-                data = pickle.loads(data)
-
-            else:
-                data = []
-
-            res = {
-                'schema': [
-                    bigquery.SchemaField('user_id', bigquery.enums.SqlTypeNames.INT64, 'NULLABLE'),
-                    bigquery.SchemaField('kind', bigquery.enums.SqlTypeNames.STRING, 'NULLABLE'),
-                    bigquery.SchemaField('timestamp', bigquery.enums.SqlTypeNames.TIMESTAMP, 'NULLABLE'),
-                    bigquery.SchemaField('related',
-                                         bigquery.enums.SqlTypeNames.STRUCT,
-                                         'NULLABLE',
-                                         fields=[
-                                             bigquery.SchemaField('type', bigquery.enums.SqlTypeNames.STRING,
-                                                                  'NULLABLE'),
-                                             bigquery.SchemaField('id', bigquery.enums.SqlTypeNames.INT64, 'NULLABLE'),
-                                             bigquery.SchemaField('slug', bigquery.enums.SqlTypeNames.STRING,
-                                                                  'NULLABLE'),
-                                         ]),
-                ],
-                'data': {
-                    'id': uuid.uuid4().hex,
-                    'user_id': user_id,
-                    'kind': kind,
-                    'timestamp': timestamp,
-                    'related': {
-                        'type': related_type,
-                        'id': related_id,
-                        'slug': related_slug,
-                    },
-                    'meta': {},
-                },
-            }
-
-            fields = []
-
-            meta = actions.get_activity_meta(kind, related_type, related_id, related_slug)
-
-            for key in meta:
-                t = bigquery.enums.SqlTypeNames.STRING
-
-                # keep it adobe than the date conditional
-                if isinstance(meta[key], datetime) or (isinstance(meta[key], str)
-                                                       and ISO_STRING_PATTERN.match(meta[key])):
-                    t = bigquery.enums.SqlTypeNames.TIMESTAMP
-                elif isinstance(meta[key], date):
-                    t = bigquery.enums.SqlTypeNames.DATE
-                elif isinstance(meta[key], str):
-                    pass
-                elif isinstance(meta[key], bool):
-                    t = bigquery.enums.SqlTypeNames.BOOL
-                elif isinstance(meta[key], int):
-                    t = bigquery.enums.SqlTypeNames.INT64
-                elif isinstance(meta[key], float):
-                    t = bigquery.enums.SqlTypeNames.FLOAT64
-
-                # res['data'].append(serialize_field(key, meta[key], t))
-                # res.append(serialize_field(key, meta[key], t, struct='meta'))
-
-                fields.append(bigquery.SchemaField(key, t))
-                res['data']['meta'][key] = meta[key]
-
-            meta_field = bigquery.SchemaField('meta', bigquery.enums.SqlTypeNames.STRUCT, 'NULLABLE', fields=fields)
-            # meta_field = bigquery.SchemaField('meta', 'STRUCT', 'NULLABLE', fields=fields)
-            res['schema'].append(meta_field)
-            # res['schema']['meta'] = meta_field
-
-            data.append(res)
-            data = pickle.dumps(data)
-            data = zstandard.compress(data)
-
-            cache.set(worker_storage_key, data)
-
-    except LockError:
-        raise RetryTask('Could not acquire lock for activity, operation timed out.')
+@task(priority=TaskPriority.ACADEMY.value)
+def refresh_activity_report(spec: dict, **_):
+    logger.info('Executing refresh_activity_report')
+
+    reports.compute_report(spec)
+
+
+@task(priority=TaskPriority.BACKGROUND.value)
+def build_activity_rollups(full: bool = False, **_):
+    logger.info('Executing build_activity_rollups')
+
+    reports.build_rollups(full=full)
@@ -6,12 +6,11 @@ from typing import Optional
 from unittest.mock import MagicMock, call
 
 import pytest
-import zstandard
 from django.core.cache import cache
 from django.utils import timezone
 from google.cloud import bigquery
 
-from breathecode.activity import actions
+from breathecode.activity import actions, schema_registry
 from breathecode.activity.management.commands.upload_activities import Command
 from breathecode.activity.tasks import add_activity
 from breathecode.tests.mixins.breathecode_mixin.breathecode import Breathecode
@@ -78,13 +77,18 @@ def set_activity_meta(monkeypatch):
 
 
 @pytest.fixture
-def decompress_and_parse():
+def get_buffered_activities():
 
-    def wrapper(data: str):
-        data = zstandard.decompress(data)
-        data = pickle.loads(data)
+    def wrapper():
+        rows = [pickle.loads(x) for x in cache.get('activity:stream') or []]
 
-        return data
+        # the activities only carry the id of their schema, it is resolved from the shared registry
+        schema_registry.schemas.clear()
+
+        for x in rows:
+            assert set(x) == {'schema_id', 'data'}
+
+        return [{'data': x['data'], 'schema': schema_registry.get_schema(x['schema_id'])} for x in rows]
 
     yield wrapper
 
@@ -122,7 +126,7 @@ def test_type_and_no_id_or_slug(bc: Breathecode):
     ]
     assert actions.get_activity_meta.call_args_list == []
 
-    assert cache.get('activity:worker-0') is None
+    assert cache.get('activity:stream') is None
 
 
 def test_type_with_id_and_slug(bc: Breathecode):
@@ -148,10 +152,10 @@ def test_type_with_id_and_slug(bc: Breathecode):
     ]
     assert actions.get_activity_meta.call_args_list == []
 
-    assert cache.get('activity:worker-0') is None
+    assert cache.get('activity:stream') is None
 
 
-def test_adding_the_resource_with_id_and_no_meta(bc: Breathecode, decompress_and_parse):
+def test_adding_the_resource_with_id_and_no_meta(bc: Breathecode, get_buffered_activities):
     kind = bc.fake.slug()
 
     logging.Logger.info.call_args_list = []
@@ -175,7 +179,7 @@ def test_adding_the_resource_with_id_and_no_meta(bc: Breathecode, decompress_and
 
     assert actions.get_activity_meta.call_args_list == [call(kind, 'auth.User', 1, None)]
 
-    assert decompress_and_parse(cache.get('activity:worker-0')) == [
+    assert get_buffered_activities() == [
         {
             'data': {
                 'id': 'c5d8cbc54a894dd0983caae1b8507091',
@@ -207,7 +211,7 @@ def test_adding_the_resource_with_id_and_no_meta(bc: Breathecode, decompress_and
     ]
 
 
-def test_adding_the_resource_with_slug_and_no_meta(bc: Breathecode, decompress_and_parse):
+def test_adding_the_resource_with_slug_and_no_meta(bc: Breathecode, get_buffered_activities):
     kind = bc.fake.slug()
 
     logging.Logger.info.call_args_list = []
@@ -233,7 +237,7 @@ def test_adding_the_resource_with_slug_and_no_meta(bc: Breathecode, decompress_a
 
     assert actions.get_activity_meta.call_args_list == [call(kind, 'auth.User', None, related_slug)]
 
-    assert decompress_and_parse(cache.get('activity:worker-0')) == [
+    assert get_buffered_activities() == [
         {
             'data': {
                 'id': 'c5d8cbc54a894dd0983caae1b8507091',
@@ -265,7 +269,7 @@ def test_adding_the_resource_with_slug_and_no_meta(bc: Breathecode, decompress_a
     ]
 
 
-def test_adding_the_resource_with_meta(bc: Breathecode, set_activity_meta, decompress_and_parse):
+def test_adding_the_resource_with_meta(bc: Breathecode, set_activity_meta, get_buffered_activities):
     kind = bc.fake.slug()
 
     meta = {
@@ -299,7 +303,7 @@ def test_adding_the_resource_with_meta(bc: Breathecode, set_activity_meta, decom
     assert logging.Logger.info.call_args_list == [call(f'Executing add_activity related to {kind}')]
     assert logging.Logger.error.call_args_list == []
 
-    assert decompress_and_parse(cache.get('activity:worker-0')) == [
+    assert get_buffered_activities() == [
         {
             'data': {
                 'id': 'c5d8cbc54a894dd0983caae1b8507091',
@@ -365,11 +369,11 @@ def test_adding_the_resource_with_meta__it_fails(bc: Breathecode, set_activity_m
     assert logging.Logger.info.call_args_list == [call(f'Executing add_activity related to {kind}')]
     assert logging.Logger.error.call_args_list == [call(exc, exc_info=True)]
 
-    assert cache.get('activity:worker-0') is None
+    assert cache.get('activity:stream') is None
 
 
 def test_adding_the_resource_with_meta__called_two_times(bc: Breathecode, monkeypatch, set_activity_meta,
-                                                         decompress_and_parse):
+                                                         get_buffered_activities):
     kind = bc.fake.slug()
 
     meta = {
@@ -421,7 +425,7 @@ def test_adding_the_resource_with_meta__called_two_times(bc: Breathecode, monkey
     ]
     assert logging.Logger.error.call_args_list == []
 
-    assert decompress_and_parse(cache.get('activity:worker-0')) == [
+    assert get_buffered_activities() == [
         {
             'data': {
                 'id': 'c5d8cbc54a894dd0983caae1b8507091',
@@ -454,9 +458,6 @@ def test_adding_the_resource_with_meta__called_two_times(bc: Breathecode, monkey
                     fields=[bigquery.SchemaField(x, bigquery.enums.SqlTypeNames.STRING, 'NULLABLE') for x in meta]),
             ],
         },
-    ]
-
-    assert decompress_and_parse(cache.get('activity:worker-1')) == [
         {
             'data': {
                 'id': 'c5d8cbc54a894dd0983caae1b8507092',
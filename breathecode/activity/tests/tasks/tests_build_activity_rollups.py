@@ -0,0 +1,144 @@
+"""
+Test build_activity_rollups
+"""
+import re
+import sqlite3
+from datetime import timedelta
+from unittest.mock import MagicMock, call
+
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+
+from breathecode.activity import reports
+from breathecode.activity.tasks import build_activity_rollups
+
+UTC_NOW = timezone.now()
+
+
+@pytest.fixture(autouse=True)
+def apply_patch(db, monkeypatch):
+    client_mock = MagicMock()
+
+    monkeypatch.setattr('logging.Logger.info', MagicMock())
+    monkeypatch.setattr('logging.Logger.error', MagicMock())
+    monkeypatch.setattr('django.utils.timezone.now', lambda: UTC_NOW)
+    monkeypatch.setattr('breathecode.services.google_cloud.big_query.BigQuery.client',
+                        MagicMock(return_value=(client_mock, 'project', 'dataset')))
+
+    yield client_mock
+
+
+def test_the_whole_history_is_built_the_first_time(apply_patch):
+    client_mock = apply_patch
+
+    build_activity_rollups.delay()
+
+    assert len(client_mock.query.call_args_list) == 1
+
+    sql = client_mock.query.call_args[0][0]
+    job_config = client_mock.query.call_args[1]['job_config']
+
+    assert 'CREATE TABLE IF NOT EXISTS `project.dataset.activity_daily`' in sql
+    assert 'DELETE FROM `project.dataset.activity_daily` WHERE @since IS NULL OR day >= @since' in sql
+    assert 'FROM `project.dataset.activity`' in sql
+
+    assert [(x.name, x.type_, x.value) for x in job_config.query_parameters] == [
+        ('since', 'DATE', None),
+    ]
+    assert client_mock.query.return_value.result.call_args_list == [call()]
+
+    assert cache.get('activity:rollup') == {'updated_at': UTC_NOW}
+
+
+def test_the_last_days_are_built_again(apply_patch):
+    client_mock = apply_patch
+    cache.set('activity:rollup', {'updated_at': UTC_NOW - timedelta(days=1)})
+
+    build_activity_rollups.delay()
+
+    job_config = client_mock.query.call_args[1]['job_config']
+
+    assert [(x.name, x.type_, x.value) for x in job_config.query_parameters] == [
+        ('since', 'DATE', (UTC_NOW - timedelta(days=1)).date()),
+    ]
+    assert cache.get('activity:rollup') == {'updated_at': UTC_NOW}
+
+
+def test_the_whole_history_is_built_again_if_it_is_requested(apply_patch):
+    client_mock = apply_patch
+    cache.set('activity:rollup', {'updated_at': UTC_NOW - timedelta(days=1)})
+
+    build_activity_rollups.delay(full=True)
+
+    job_config = client_mock.query.call_args[1]['job_config']
+
+    assert [(x.name, x.type_, x.value) for x in job_config.query_parameters] == [
+        ('since', 'DATE', None),
+    ]
+
+
+def test_the_rollup_is_not_marked_as_built_if_it_fails(apply_patch):
+    client_mock = apply_patch
+    client_mock.query.return_value.result.side_effect = Exception('BigQuery is down')
+
+    build_activity_rollups.delay()
+
+    assert cache.get('activity:rollup') is None
+
+
+class SQLiteClient:
+    """Run the queries sent to BigQuery in SQLite, the tables are in the same dataset."""
+
+    def __init__(self):
+        self.connection = sqlite3.connect(':memory:')
+        self.connection.execute('CREATE TABLE activity (id TEXT, academy INTEGER, kind TEXT, user_id INTEGER, '
+                                'timestamp TEXT)')
+        self.connection.execute('CREATE TABLE activity_daily (day TEXT, academy INTEGER, kind TEXT, '
+                                'user_id INTEGER, count INTEGER)')
+
+    def query(self, sql, job_config):
+        params = {x.name: str(x.value) if x.value is not None else None for x in job_config.query_parameters}
+        sql = sql.replace('`project.dataset.', '').replace('`', '').replace('meta.academy', 'academy')
+        sql = sql.replace('TIMESTAMP(@since)', '@since')
+
+        rows = []
+        for statement in [x for x in sql.split(';') if x.strip() and 'CREATE TABLE' not in x]:
+            statement = re.sub(r'@(\w+)', r':\1', statement)
+            cursor = self.connection.execute(statement, {k: v for k, v in params.items() if f':{k}' in statement})
+            if cursor.description:
+                rows = [dict(zip([x[0] for x in cursor.description], row)) for row in cursor.fetchall()]
+
+        return MagicMock(result=MagicMock(return_value=rows))
+
+
+def test_the_counts_are_the_same_in_the_rollup(monkeypatch):
+    client = SQLiteClient()
+    monkeypatch.setattr('breathecode.services.google_cloud.big_query.BigQuery.client',
+                        MagicMock(return_value=(client, 'project', 'dataset')))
+
+    for n in range(30):
+        timestamp = UTC_NOW - timedelta(days=n % 10, minutes=n)
+        client.connection.execute('INSERT INTO activity VALUES (?, ?, ?, ?, ?)',
+                                  (str(n), n % 2 + 1, f'kind-{n % 3}', n % 5 + 1, timestamp.isoformat()))
+
+    spec = {
+        'fields': ['kind'],
+        'by': ['kind'],
+        'order': ['kind'],
+        'filter': {
+            'meta__academy': 1
+        },
+        'grouping_function': {
+            'count': ['kind']
+        },
+    }
+
+    rows = reports.compute_report(spec)
+    cache.clear()
+
+    build_activity_rollups.delay()
+    assert reports.get_rollup_spec(spec) is not None
+
+    assert reports.compute_report(spec) == rows
+    assert sum(x['count__kind'] for x in rows) == 15
@@ -1,6 +1,7 @@
 """
 Test /answer
 """
+import json
 import pickle
 import random
 from unittest.mock import MagicMock, call
@@ -9,6 +10,7 @@ import pytest
 import zstandard as zstd
 from django.core.cache import cache
 from django.utils import timezone
+from google.api_core.exceptions import Forbidden
 from google.cloud import bigquery
 from google.cloud.bigquery.client import DatasetReference
 from google.cloud.bigquery.table import TableReference
@@ -54,7 +56,7 @@ def apply_patch(db, monkeypatch):
     ])
 
     m4 = MagicMock()
-    m5 = MagicMock(return_value=[])
+    m5 = MagicMock()
 
     monkeypatch.setattr('logging.Logger.info', m1)
     monkeypatch.setattr('logging.Logger.error', m2)
@@ -62,7 +64,7 @@ def apply_patch(db, monkeypatch):
     monkeypatch.setattr('django.utils.timezone.now', lambda: UTC_NOW)
     monkeypatch.setattr('google.cloud.bigquery.Client.get_table', m3)
     monkeypatch.setattr('google.cloud.bigquery.Client.update_table', m4)
-    monkeypatch.setattr('google.cloud.bigquery.Client.insert_rows', m5)
+    monkeypatch.setattr('google.cloud.bigquery.Client.load_table_from_file', m5)
 
     monkeypatch.setattr('breathecode.services.google_cloud.credentials.resolve_credentials', lambda: None)
 
@@ -148,8 +150,21 @@ def both_schema_are_equal(a, b):
         assert a[i].kwargs == b[i].kwargs
 
 
+def get_loaded_rows(load_mock):
+    """Decode the newline delimited JSON sent in each load job."""
+
+    result = []
+    for args, kwargs in load_mock.call_args_list:
+        f, table = args
+        assert kwargs['job_config'].source_format == bigquery.SourceFormat.NEWLINE_DELIMITED_JSON
+
+        result.append((table, [json.loads(x) for x in f.getvalue().splitlines()]))
+
+    return result
+
+
 def test_no_data(bc: Breathecode, apply_patch):
-    info_mock, error_mock, get_table_mock, update_table_mock, insert_rows_mock = apply_patch
+    info_mock, error_mock, get_table_mock, update_table_mock, load_mock = apply_patch
 
     upload_activities.delay()
 
@@ -165,11 +180,11 @@ def test_no_data(bc: Breathecode, apply_patch):
 
     assert get_table_mock.call_args_list == []
     assert update_table_mock.call_args_list == []
-    assert insert_rows_mock.call_args_list == []
+    assert load_mock.call_args_list == []
 
 
 def test_with_data_in_both_workers(bc: Breathecode, fake, apply_patch, get_schema, get_data):
-    info_mock, error_mock, get_table_mock, update_table_mock, insert_rows_mock = apply_patch
+    info_mock, error_mock, get_table_mock, update_table_mock, load_mock = apply_patch
 
     attr1 = fake.slug()
     attr2 = fake.slug()
@@ -283,4 +298,204 @@ def test_with_data_in_both_workers(bc: Breathecode, fake, apply_patch, get_schem
                                      )),
             ]), ['schema'])
     ])
-    assert insert_rows_mock.call_args_list == [call(get_table_mock.return_value, [data1, data2, data3])]
+    assert get_loaded_rows(load_mock) == [(get_table_mock.return_value, [data1, data2, data3])]
+
+
+def test_with_data_in_the_buffer__uploaded_in_one_load_job(bc: Breathecode, monkeypatch, apply_patch, get_schema,
+                                                           get_data):
+    from breathecode.activity import buffer
+
+    info_mock, error_mock, get_table_mock, update_table_mock, load_mock = apply_patch
+    monkeypatch.setattr('breathecode.activity.tasks.ACTIVITY_MAX_ROWS', 2)
+
+    schema = get_schema([
+        bigquery.SchemaField('meta', bigquery.enums.SqlTypeNames.STRUCT, 'NULLABLE', fields=[]),
+    ])
+    data = [get_data() for _ in range(3)]
+
+    for x in data:
+        buffer.push_activity({'data': x, 'schema': schema})
+
+    upload_activities.delay()
+
+    assert error_mock.call_args_list == []
+    assert get_table_mock.call_args_list == [call('dataset.activity')]
+    assert get_loaded_rows(load_mock) == [
+        (get_table_mock.return_value, data[:2]),
+    ]
+
+    # the rest is uploaded by the next run
+    assert [x for _, x in buffer.read_activities('consumer', 10)] == [{'data': data[2], 'schema': schema}]
+
+
+def test_with_data_in_the_buffer__uploaded_recently(bc: Breathecode, apply_patch, get_schema, get_data):
+    from breathecode.activity import buffer
+
+    info_mock, error_mock, get_table_mock, update_table_mock, load_mock = apply_patch
+
+    schema = get_schema([
+        bigquery.SchemaField('meta', bigquery.enums.SqlTypeNames.STRUCT, 'NULLABLE', fields=[]),
+    ])
+    data = [get_data() for _ in range(2)]
+
+    buffer.push_activity({'data': data[0], 'schema': schema})
+    upload_activities.delay()
+
+    buffer.push_activity({'data': data[1], 'schema': schema})
+    upload_activities.delay()
+
+    # the second run waits for the next upload interval
+    assert error_mock.call_args_list == [call('The activities were uploaded recently', exc_info=True)]
+    assert get_loaded_rows(load_mock) == [(get_table_mock.return_value, data[:1])]
+
+    cache.delete('activity:last-upload')
+    upload_activities.delay()
+
+    assert get_loaded_rows(load_mock) == [
+        (get_table_mock.return_value, data[:1]),
+        (get_table_mock.return_value, data[1:]),
+    ]
+
+
+def test_with_data_in_the_buffer__the_batch_is_kept_if_it_fails(bc: Breathecode, apply_patch, get_schema, get_data):
+    from breathecode.activity import buffer
+
+    info_mock, error_mock, get_table_mock, update_table_mock, load_mock = apply_patch
+    load_mock.side_effect = Exception('BigQuery is down')
+
+    schema = get_schema([
+        bigquery.SchemaField('meta', bigquery.enums.SqlTypeNames.STRUCT, 'NULLABLE', fields=[]),
+    ])
+    data = get_data()
+
+    buffer.push_activity({'data': data, 'schema': schema})
+
+    upload_activities.delay()
+
+    task = bc.database.get('task_manager.TaskManager', 1, dict=False)
+
+    assert get_loaded_rows(load_mock) == [(get_table_mock.return_value, [data])]
+
+    # the retry of the task reads the batch that was not acknowledged
+    assert [x for _, x in buffer.read_activities(f'upload-activities-{task.id}', 10)] == [{
+        'data': data,
+        'schema': schema,
+    }]
+    assert buffer.read_activities('other-consumer', 10) == []
+
+
+def test_with_data_in_the_buffer__schemas_from_the_registry(bc: Breathecode, fake, monkeypatch, apply_patch, get_data):
+    from breathecode.activity import buffer, schema_registry
+
+    info_mock, error_mock, get_table_mock, update_table_mock, load_mock = apply_patch
+
+    attr = fake.slug().replace('-', '_')
+    data = [get_data({'meta': {attr: random.randint(1, 100)}}) for _ in range(3)]
+
+    schema_id = schema_registry.register_schema(schema_registry.get_meta_fields(data[0]['meta']))
+    for x in data:
+        buffer.push_activity({'data': x, 'schema_id': schema_id})
+
+    get_schema_mock = MagicMock(wraps=schema_registry.get_schema)
+    monkeypatch.setattr('breathecode.activity.schema_registry.get_schema', get_schema_mock)
+
+    upload_activities.delay()
+
+    assert error_mock.call_args_list == []
+
+    # the schema is built once for all the activities that share it
+    assert get_schema_mock.call_args_list == [call(schema_id, data[0]['meta'])]
+
+    schema = {x.name: x for x in update_table_mock.call_args_list[0].args[0].schema}
+    assert bigquery.SchemaField(attr, bigquery.enums.SqlTypeNames.INT64, 'NULLABLE') in schema['meta'].fields
+
+    assert get_loaded_rows(load_mock) == [(get_table_mock.return_value, data)]
+
+
+def test_with_data_in_the_buffer__the_load_jobs_are_split_by_size(bc: Breathecode, monkeypatch, apply_patch, get_schema,
+                                                                  get_data):
+    from breathecode.activity import buffer
+
+    info_mock, error_mock, get_table_mock, update_table_mock, load_mock = apply_patch
+
+    data = [get_data() for _ in range(3)]
+    size = sum(len(json.dumps(x, separators=(',', ':'))) + 1 for x in data[:2])
+
+    monkeypatch.setattr('breathecode.services.google_cloud.big_query.LOAD_JOB_CHUNK_SIZE', size)
+
+    schema = get_schema([
+        bigquery.SchemaField('meta', bigquery.enums.SqlTypeNames.STRUCT, 'NULLABLE', fields=[]),
+    ])
+    for x in data:
+        buffer.push_activity({'data': x, 'schema': schema})
+
+    upload_activities.delay()
+
+    assert error_mock.call_args_list == []
+    assert get_loaded_rows(load_mock) == [
+        (get_table_mock.return_value, data[:2]),
+        (get_table_mock.return_value, data[2:]),
+    ]
+
+
+def test_with_data_in_the_buffer__the_batch_is_kept_if_the_request_of_the_job_fails(bc: Breathecode, apply_patch,
+                                                                                    get_schema, get_data):
+    from breathecode.activity import buffer
+
+    info_mock, error_mock, get_table_mock, update_table_mock, load_mock = apply_patch
+    load_mock.return_value.result.side_effect = Forbidden('Access Denied')
+    load_mock.return_value.errors = None
+
+    schema = get_schema([
+        bigquery.SchemaField('meta', bigquery.enums.SqlTypeNames.STRUCT, 'NULLABLE', fields=[]),
+    ])
+    data = get_data()
+
+    buffer.push_activity({'data': data, 'schema': schema})
+
+    upload_activities.delay()
+
+    task = bc.database.get('task_manager.TaskManager', 1, dict=False)
+
+    assert get_loaded_rows(load_mock) == [(get_table_mock.return_value, [data])]
+    assert [x for _, x in buffer.read_activities(f'upload-activities-{task.id}', 10)] == [{
+        'data': data,
+        'schema': schema,
+    }]
+
+
+def test_with_data_in_the_buffer__only_the_rows_of_the_failed_jobs_are_kept(bc: Breathecode, monkeypatch, apply_patch,
+                                                                            get_schema, get_data):
+    from breathecode.activity import buffer
+
+    info_mock, error_mock, get_table_mock, update_table_mock, load_mock = apply_patch
+
+    failed_job = MagicMock(errors=None)
+    failed_job.result.side_effect = Forbidden('Access Denied')
+    load_mock.side_effect = [MagicMock(), failed_job]
+
+    data = [get_data() for _ in range(3)]
+    size = sum(len(json.dumps(x, separators=(',', ':'))) + 1 for x in data[:2])
+
+    monkeypatch.setattr('breathecode.services.google_cloud.big_query.LOAD_JOB_CHUNK_SIZE', size)
+
+    schema = get_schema([
+        bigquery.SchemaField('meta', bigquery.enums.SqlTypeNames.STRUCT, 'NULLABLE', fields=[]),
+    ])
+    for x in data:
+        buffer.push_activity({'data': x, 'schema': schema})
+
+    upload_activities.delay()
+
+    task = bc.database.get('task_manager.TaskManager', 1, dict=False)
+
+    assert get_loaded_rows(load_mock) == [
+        (get_table_mock.return_value, data[:2]),
+        (get_table_mock.return_value, data[2:]),
+    ]
+
+    # the retry only uploads the rows of the job that failed
+    assert [x for _, x in buffer.read_activities(f'upload-activities-{task.id}', 10)] == [{
+        'data': data[2],
+        'schema': schema,
+    }]
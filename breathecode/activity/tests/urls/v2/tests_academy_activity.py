@@ -1,7 +1,9 @@
 """
 Test /answer
 """
+import base64
 import random
+from datetime import datetime
 from unittest.mock import MagicMock, call, patch
 from uuid import uuid4
 
@@ -9,15 +11,17 @@ from django.urls.base import reverse_lazy
 from django.utils import timezone
 from rest_framework import status
 
+from breathecode.activity import recent
 from breathecode.services.google_cloud.big_query import BigQuery
 from breathecode.utils.attr_dict import AttrDict
+from breathecode.utils.keyset_pagination import encode_cursor
 
 from ...mixins import MediaTestCase
 
 UTC_NOW = timezone.now()
 
 
-def bigquery_client_mock(self, n=1, user_id=1, kind=None, date_start=None, date_end=None):
+def bigquery_client_mock(self, n=1, user_id=1, kind=None, date_start=None, date_end=None, cursor=False, page=None):
     rows_to_insert = [{
         'id': uuid4().hex,
         'user_id': user_id,
@@ -43,19 +47,21 @@ def bigquery_client_mock(self, n=1, user_id=1, kind=None, date_start=None, date_
 
     project_id = 'test'
     dataset = '4geeks'
+    cursor_condition = 'AND (timestamp < @after_timestamp OR (timestamp = @after_timestamp AND id < @after_id))'
 
     query = f"""
-            SELECT *
-            FROM `{project_id}.{dataset}.activity`
-            WHERE user_id = @user_id
-                AND meta.academy = @academy_id
-                {'AND kind = @kind' if kind else ''}
-                {'AND timestamp >= @date_start' if date_start else ''}
-                {'AND timestamp <= @date_end' if date_end else ''}
-            ORDER BY timestamp DESC
-            LIMIT @limit
-            OFFSET @offset
-        """
+                SELECT id, user_id, kind, related, meta, timestamp
+                FROM `{project_id}.{dataset}.activity`
+                WHERE user_id = @user_id
+                    AND meta.academy = @academy_id
+                    AND timestamp >= @date_start
+                    {'AND kind = @kind' if kind else ''}
+                    {'AND timestamp <= @date_end' if date_end else ''}
+                    {cursor_condition if cursor else ''}
+                ORDER BY timestamp DESC, id DESC
+                LIMIT @limit
+                {'OFFSET @offset' if page else ''}
+            """
 
     return (client_mock, result_mock, query, project_id, dataset, rows_to_insert)
 
@@ -119,3 +125,131 @@ class MediaTestSuite(MediaTestCase):
 
         self.assertEqual(json, expected)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @patch('django.utils.timezone.now', MagicMock(return_value=UTC_NOW))
+    def test_get_with_page(self):
+        model = self.bc.database.create(user=1, academy=1, profile_academy=1, capability='read_activity', role=1)
+
+        self.client.force_authenticate(model.user)
+        self.bc.request.set_headers(academy=1)
+
+        url = reverse_lazy('v2:activity:academy_activity') + '?page=2&limit=1'
+
+        val = bigquery_client_mock(self, n=1, user_id=1, page=2)
+        (client_mock, result_mock, query, project_id, dataset, expected) = val
+
+        with patch('breathecode.services.google_cloud.big_query.BigQuery.client') as mock:
+            mock.return_value = (client_mock, project_id, dataset)
+            response = self.client.get(url)
+            json = response.json()
+
+            assert client_mock.query.call_args[0][0] == query
+
+            params = client_mock.query.call_args[1]['job_config'].query_parameters
+            assert {x.name: x.value for x in params if x.name in ['limit', 'offset']} == {'limit': 1, 'offset': 1}
+
+        self.assertEqual(json, expected)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Link', response.headers)
+
+    @patch('django.utils.timezone.now', MagicMock(return_value=UTC_NOW))
+    def test_get_with_cursor(self):
+        model = self.bc.database.create(user=1, academy=1, profile_academy=1, capability='read_activity', role=1)
+
+        self.client.force_authenticate(model.user)
+        self.bc.request.set_headers(academy=1)
+
+        url = reverse_lazy('v2:activity:academy_activity') + '?limit=2'
+
+        val = bigquery_client_mock(self, n=3, user_id=1)
+        (client_mock, result_mock, query, project_id, dataset, expected) = val
+
+        with patch('breathecode.services.google_cloud.big_query.BigQuery.client') as mock:
+            mock.return_value = (client_mock, project_id, dataset)
+            response = self.client.get(url)
+            json = response.json()
+
+            assert client_mock.query.call_args[0][0] == query
+
+            # one more activity tells if there is a next page
+            params = client_mock.query.call_args[1]['job_config'].query_parameters
+            assert [x.value for x in params if x.name == 'limit'] == [3]
+
+        self.assertEqual(json, expected[:2])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        cursor = encode_cursor(['-timestamp', '-id'], expected[1], 'next')
+        assert expected[1]['timestamp'] in base64.urlsafe_b64decode(cursor + '==').decode()
+        self.assertEqual(response.headers['Link'], f'<http://testserver/v2/activity/academy/activity?cursor={cursor}'
+                         '&limit=2>; rel="next"')
+
+        val = bigquery_client_mock(self, n=1, user_id=1, cursor=True)
+        (client_mock, result_mock, query, project_id, dataset, expected2) = val
+
+        with patch('breathecode.services.google_cloud.big_query.BigQuery.client') as mock:
+            mock.return_value = (client_mock, project_id, dataset)
+            response = self.client.get(url + f'&cursor={cursor}')
+            json = response.json()
+
+            assert client_mock.query.call_args[0][0] == query
+
+            params = client_mock.query.call_args[1]['job_config'].query_parameters
+            assert {
+                x.name: x.value
+                for x in params if x.name.startswith('after_')
+            } == {
+                'after_timestamp': datetime.fromisoformat(expected[1]['timestamp']),
+                'after_id': expected[1]['id'],
+            }
+
+        self.assertEqual(json, expected2)
+        self.assertNotIn('Link', response.headers)
+
+    @patch('django.utils.timezone.now', MagicMock(return_value=UTC_NOW))
+    def test_get_from_the_recent_activities(self):
+        model = self.bc.database.create(user=1, academy=1, profile_academy=1, capability='read_activity', role=1)
+
+        self.client.force_authenticate(model.user)
+        self.bc.request.set_headers(academy=1)
+
+        rows = [{
+            'id': uuid4().hex,
+            'user_id': 1,
+            'kind': self.bc.fake.slug(),
+            'related': {
+                'type': None,
+                'id': None,
+                'slug': None,
+            },
+            'meta': {
+                'academy': academy,
+            },
+            'timestamp': (UTC_NOW + timezone.timedelta(seconds=i)).isoformat(),
+        } for i, academy in enumerate([1, 2, 1, 1])]
+
+        for row in rows:
+            recent.push_recent_activity(row)
+
+        url = reverse_lazy('v2:activity:academy_activity') + '?limit=1'
+
+        with patch('breathecode.services.google_cloud.big_query.BigQuery.client') as mock:
+            response = self.client.get(url)
+            self.bc.check.calls(BigQuery.client.call_args_list, [])
+
+        self.assertEqual(response.json(), [rows[3]])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        cursor = encode_cursor(['-timestamp', '-id'], rows[3], 'next')
+        self.assertIn(f'cursor={cursor}', response.headers['Link'])
+
+        # the activities of the user before the recent ones could be only in BigQuery
+        val = bigquery_client_mock(self, n=1, user_id=1, cursor=True)
+        (client_mock, result_mock, query, project_id, dataset, expected) = val
+
+        with patch('breathecode.services.google_cloud.big_query.BigQuery.client') as mock:
+            mock.return_value = (client_mock, project_id, dataset)
+            response = self.client.get(url + f'&cursor={cursor}&limit=2')
+
+            assert client_mock.query.call_args[0][0] == query
+
+        self.assertEqual(response.json(), expected)
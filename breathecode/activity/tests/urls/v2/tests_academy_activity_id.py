@@ -46,12 +46,12 @@ def bigquery_client_mock(self, user_id=1):
     dataset = '4geeks'
 
     query = f"""
-                SELECT *
+                SELECT id, user_id, kind, related, meta, timestamp
                 FROM `{project_id}.{dataset}.activity`
                 WHERE id = @activity_id
                     AND user_id = @user_id
                     AND meta.academy = @academy_id
-                ORDER BY id DESC
+                    AND timestamp >= @date_start
                 LIMIT 1
             """
 
@@ -88,3 +88,25 @@ class MediaTestSuite(MediaTestCase):
 
         self.assertEqual(json, expected)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_not_found(self):
+        model = self.bc.database.create(user=1, academy=1, profile_academy=1, capability='read_activity', role=1)
+
+        self.client.force_authenticate(model.user)
+        self.bc.request.set_headers(academy=1)
+
+        url = reverse_lazy('v2:activity:academy_activity_id', kwargs={'activity_id': '1234'})
+
+        val = bigquery_client_mock(self, user_id=1)
+        (client_mock, result_mock, query, project_id, dataset, expected) = val
+        result_mock.result.return_value = iter([])
+
+        with patch('breathecode.services.google_cloud.big_query.BigQuery.client') as mock:
+            mock.return_value = (client_mock, project_id, dataset)
+            response = self.client.get(url)
+            json = response.json()
+
+            assert client_mock.query.call_args[0][0] == query
+
+        self.assertEqual(json, {'detail': 'activity-not-found', 'status_code': 404})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -3,9 +3,11 @@ Test /report
 """
 import functools
 import random
+import time
 from unittest.mock import MagicMock, call, patch
 from uuid import uuid4
 
+from django.core.cache import cache
 from django.urls.base import reverse_lazy
 from django.utils import timezone
 from rest_framework import status
@@ -440,3 +442,135 @@ class MediaTestSuite(MediaTestCase):
 
         self.assertEqual(json, expected)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @patch('django.utils.timezone.now', MagicMock(return_value=UTC_NOW))
+    def test_get_all_fields__cached(self):
+        expected_query = 'SELECT * FROM `test.4geeks.activity` '
+        url = reverse_lazy('v2:activity:report')
+        model = self.bc.database.create(user=1, academy=1, profile_academy=1, capability='read_activity', role=1)
+
+        self.client.force_authenticate(model.user)
+        self.bc.request.set_headers(academy=1)
+
+        val = bigquery_client_mock(self)
+        (client_mock, result_mock, project_id, dataset, expected) = val
+
+        with patch('breathecode.services.google_cloud.big_query.BigQuery.client') as mock:
+            mock.return_value = (client_mock, project_id, dataset)
+            response1 = self.client.get(url)
+            response2 = self.client.get(url)
+
+            self.bc.check.calls(BigQuery.client.call_args_list, [call()])
+            self.assertEqual([x[0][0] for x in client_mock.query.call_args_list], [expected_query])
+            self.bc.check.calls(result_mock.result.call_args_list, [call()])
+
+        self.assertEqual(response1.json(), expected)
+        self.assertEqual(response2.json(), expected)
+        self.assertEqual(response2.status_code, status.HTTP_200_OK)
+
+    @patch('django.utils.timezone.now', MagicMock(return_value=UTC_NOW))
+    @patch('breathecode.activity.tasks.refresh_activity_report.delay', MagicMock())
+    def test_get_all_fields__stale(self):
+        from breathecode.activity import reports, tasks
+
+        url = reverse_lazy('v2:activity:report') + '?limit=5'
+        model = self.bc.database.create(user=1, academy=1, profile_academy=1, capability='read_activity', role=1)
+
+        self.client.force_authenticate(model.user)
+        self.bc.request.set_headers(academy=1)
+
+        val = bigquery_client_mock(self)
+        (client_mock, result_mock, project_id, dataset, expected) = val
+
+        with patch('breathecode.services.google_cloud.big_query.BigQuery.client') as mock:
+            mock.return_value = (client_mock, project_id, dataset)
+            self.client.get(url)
+
+            key = f'activity:report:{reports._get_fingerprint({"limit": "5"})}'
+            cache.set(key, {**cache.get(key), 'expires_at': time.time() - 1})
+
+            response1 = self.client.get(url)
+            response2 = self.client.get(url)
+
+            self.bc.check.calls(BigQuery.client.call_args_list, [call()])
+
+        # the stale result is served while it is refreshed once
+        self.assertEqual(response1.json(), expected)
+        self.assertEqual(response2.json(), expected)
+        self.bc.check.calls(tasks.refresh_activity_report.delay.call_args_list, [call({'limit': '5'})])
+
+    @patch('django.utils.timezone.now', MagicMock(return_value=UTC_NOW))
+    def test_get_count_group__from_the_rollup(self):
+        json_query = '{ "filter": { "meta__academy": 1 }, "grouping_function": { "count": ["kind"] } }'
+        expected_query = ('SELECT kind, SUM(count) AS count__kind FROM `test.4geeks.activity_daily` '
+                          'WHERE academy = @x__academy GROUP BY kind ORDER BY count__kind DESC')
+        url = reverse_lazy('v2:activity:report') + f'?query={json_query}&by=kind&fields=kind&order=count__kind'
+        model = self.bc.database.create(user=1, academy=1, profile_academy=1, capability='read_activity', role=1)
+
+        self.client.force_authenticate(model.user)
+        self.bc.request.set_headers(academy=1)
+
+        cache.set('activity:rollup', {'updated_at': UTC_NOW})
+
+        val = bigquery_client_mock_aggregation(self, n=2, aggregation={'count': 'kind'})
+        (client_mock, result_mock, project_id, dataset, expected) = val
+
+        with patch('breathecode.services.google_cloud.big_query.BigQuery.client') as mock:
+            mock.return_value = (client_mock, project_id, dataset)
+            response = self.client.get(url)
+            json = response.json()
+
+            self.bc.check.calls(BigQuery.client.call_args_list, [call()])
+            assert client_mock.query.call_args[0][0] == expected_query
+            self.bc.check.calls(result_mock.result.call_args_list, [call()])
+
+        self.assertEqual(json, expected)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @patch('django.utils.timezone.now', MagicMock(return_value=UTC_NOW))
+    def test_get_aggregation_sum__not_in_the_rollup(self):
+        json_query = '{ "grouping_function": { "sum": ["id"] } }'
+        expected_query = 'SELECT SUM(id) AS sum__id FROM `test.4geeks.activity` '
+        url = reverse_lazy('v2:activity:report') + f'?query={json_query}'
+        model = self.bc.database.create(user=1, academy=1, profile_academy=1, capability='read_activity', role=1)
+
+        self.client.force_authenticate(model.user)
+        self.bc.request.set_headers(academy=1)
+
+        cache.set('activity:rollup', {'updated_at': UTC_NOW})
+
+        val = bigquery_client_mock_aggregation(self, aggregation={'sum': 'id'})
+        (client_mock, result_mock, project_id, dataset, expected) = val
+
+        with patch('breathecode.services.google_cloud.big_query.BigQuery.client') as mock:
+            mock.return_value = (client_mock, project_id, dataset)
+            response = self.client.get(url)
+            json = response.json()
+
+            assert client_mock.query.call_args[0][0] == expected_query
+
+        self.assertEqual(json, expected)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @patch('django.utils.timezone.now', MagicMock(return_value=UTC_NOW))
+    def test_get_fields__not_in_the_rollup(self):
+        url = reverse_lazy('v2:activity:report') + '?fields=kind,user_id&limit=10'
+        model = self.bc.database.create(user=1, academy=1, profile_academy=1, capability='read_activity', role=1)
+
+        self.client.force_authenticate(model.user)
+        self.bc.request.set_headers(academy=1)
+
+        cache.set('activity:rollup', {'updated_at': UTC_NOW})
+
+        val = bigquery_client_mock(self)
+        (client_mock, result_mock, project_id, dataset, expected) = val
+
+        with patch('breathecode.services.google_cloud.big_query.BigQuery.client') as mock:
+            mock.return_value = (client_mock, project_id, dataset)
+            response = self.client.get(url)
+            json = response.json()
+
+            assert client_mock.query.call_args[0][0].startswith('SELECT kind, user_id FROM `test.4geeks.activity` ')
+
+        self.assertEqual(json, expected)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
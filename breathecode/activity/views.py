@@ -1,13 +1,17 @@
-import json
+import os
+from datetime import UTC, datetime, timedelta
 
 from django.contrib.auth.models import User
-from django.db.models import Avg, Count, Q, Sum
+from django.db.models import Q
+from django.utils import timezone
 from google.cloud import bigquery
 from google.cloud.ndb.query import OR
 from rest_framework import status
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 
+from breathecode.activity import recent, reports
 from breathecode.activity.models import StudentActivity
 from breathecode.activity.serializers import ActivitySerializer
 from breathecode.admissions.models import Cohort, CohortUser
@@ -15,6 +19,7 @@ from breathecode.authenticate.actions import get_user_language
 from breathecode.services.google_cloud.big_query import BigQuery
 from breathecode.utils import HeaderLimitOffsetPagination, capable_of, getLogger
 from breathecode.utils.i18n import translation
+from breathecode.utils.keyset_pagination import CURSOR_QUERY_PARAM, decode_cursor, encode_cursor
 from capyc.rest_framework.exceptions import ValidationException
 
 from .utils import (
@@ -35,6 +40,37 @@ from .utils import (
 
 logger = getLogger(__name__)
 
+ACTIVITY_COLUMNS = 'id, user_id, kind, related, meta, timestamp'
+ACTIVITY_ORDERING = ['-timestamp', '-id']
+AFTER_CURSOR_CONDITION = 'AND (timestamp < @after_timestamp OR (timestamp = @after_timestamp AND id < @after_id))'
+
+
+def get_activity_window_days() -> int:
+    return int(os.getenv('ACTIVITY_LISTING_WINDOW_DAYS', '90'))
+
+
+def get_recent_activity_page(user_id, academy_id, limit, date_start, date_end, kind, after):
+    """Get the page from the recent activities of the user, it returns None if BigQuery must be queried."""
+
+    try:
+        start = _parse_timestamp(date_start)
+        end = _parse_timestamp(date_end) if date_end else None
+        after = (_parse_timestamp(after[0]), after[1]) if after else None
+
+    except (ValueError, TypeError):
+        return None
+
+    return recent.get_recent_page(user_id, academy_id, limit, start, end=end, kind=kind, after=after)
+
+
+def _parse_timestamp(value: str) -> datetime:
+    result = datetime.fromisoformat(value)
+    if timezone.is_naive(result):
+        result = result.replace(tzinfo=UTC)
+
+    return result
+
+
 ACTIVITIES = {
     'breathecode_login': 'Every time it logs in',
     'online_platform_registration': 'First day using breathecode',
@@ -587,21 +623,28 @@ class V2AcademyActivityView(APIView):
     @capable_of('read_activity')
     def get(self, request, activity_id=None, academy_id=None):
         lang = get_user_language(request)
-        client, project_id, dataset = BigQuery.client()
+        academy_id = int(academy_id)
 
         user_id = request.GET.get('user_id', None)
         if user_id is None:
             user_id = request.user.id
 
+        # the activities are partitioned by timestamp, a bounded window only scans the partitions inside it
+        date_start = request.GET.get('date_start', None)
+        if date_start is None:
+            date_start = (timezone.now() - timedelta(days=get_activity_window_days())).isoformat()
+
         if activity_id:
+            client, project_id, dataset = BigQuery.client()
+
             # Define a query
             query = f"""
-                SELECT *
+                SELECT {ACTIVITY_COLUMNS}
                 FROM `{project_id}.{dataset}.activity`
                 WHERE id = @activity_id
                     AND user_id = @user_id
                     AND meta.academy = @academy_id
-                ORDER BY id DESC
+                    AND timestamp >= @date_start
                 LIMIT 1
             """
 
@@ -609,13 +652,14 @@ class V2AcademyActivityView(APIView):
                 bigquery.ScalarQueryParameter('activity_id', 'STRING', activity_id),
                 bigquery.ScalarQueryParameter('academy_id', 'INT64', academy_id),
                 bigquery.ScalarQueryParameter('user_id', 'INT64', user_id),
+                bigquery.ScalarQueryParameter('date_start', 'TIMESTAMP', date_start),
             ])
 
             # Run the query
             query_job = client.query(query, job_config=job_config)
             results = query_job.result()
 
-            result = next(results)
+            result = next(iter(results), None)
             if not result:
                 raise ValidationException(translation(lang,
                                                       en='activity not found',
@@ -627,99 +671,85 @@ class V2AcademyActivityView(APIView):
             return Response(serializer.data)
 
         limit = int(request.GET.get('limit', 100))
-        offset = (int(request.GET.get('page', 1)) - 1) * limit
+        page = request.GET.get('page', None)
         kind = request.GET.get('kind', None)
-        date_start = request.GET.get('date_start', None)
         date_end = request.GET.get('date_end', None)
 
-        query = f"""
-            SELECT *
-            FROM `{project_id}.{dataset}.activity`
-            WHERE user_id = @user_id
-                AND meta.academy = @academy_id
-                {'AND kind = @kind' if kind else ''}
-                {'AND timestamp >= @date_start' if date_start else ''}
-                {'AND timestamp <= @date_end' if date_end else ''}
-            ORDER BY timestamp DESC
-            LIMIT @limit
-            OFFSET @offset
-        """
+        # the page keeps working for the clients that still use it, the rest seek the cursor
+        after = None
+        if page is None and (cursor := request.GET.get(CURSOR_QUERY_PARAM, None)):
+            after, direction = decode_cursor(cursor, ACTIVITY_ORDERING)
+            if direction != 'next':
+                raise ValidationException('Invalid cursor', slug='invalid-cursor')
 
-        data = [
-            bigquery.ScalarQueryParameter('academy_id', 'INT64', int(academy_id)),
-            bigquery.ScalarQueryParameter('user_id', 'INT64', user_id),
-            bigquery.ScalarQueryParameter('limit', 'INT64', limit),
-            bigquery.ScalarQueryParameter('offset', 'INT64', offset),
-        ]
-
-        if kind:
-            data.append(bigquery.ScalarQueryParameter('kind', 'STRING', kind))
-
-        if date_start:
-            data.append(bigquery.ScalarQueryParameter('date_start', 'TIMESTAMP', date_start))
-
-        if date_end:
-            data.append(bigquery.ScalarQueryParameter('date_end', 'TIMESTAMP', date_end))
-
-        job_config = bigquery.QueryJobConfig(query_parameters=data)
+        results = None
+        if page is None:
+            results = get_recent_activity_page(user_id, academy_id, limit, date_start, date_end, kind, after)
 
-        # Run the query
-        query_job = client.query(query, job_config=job_config)
-        results = query_job.result()
+        if results is None:
+            client, project_id, dataset = BigQuery.client()
 
-        serializer = ActivitySerializer(results, many=True)
-        return Response(serializer.data)
+            query = f"""
+                SELECT {ACTIVITY_COLUMNS}
+                FROM `{project_id}.{dataset}.activity`
+                WHERE user_id = @user_id
+                    AND meta.academy = @academy_id
+                    AND timestamp >= @date_start
+                    {'AND kind = @kind' if kind else ''}
+                    {'AND timestamp <= @date_end' if date_end else ''}
+                    {AFTER_CURSOR_CONDITION if after else ''}
+                ORDER BY timestamp DESC, id DESC
+                LIMIT @limit
+                {'OFFSET @offset' if page else ''}
+            """
 
+            data = [
+                bigquery.ScalarQueryParameter('academy_id', 'INT64', academy_id),
+                bigquery.ScalarQueryParameter('user_id', 'INT64', user_id),
+                bigquery.ScalarQueryParameter('date_start', 'TIMESTAMP', date_start),
+            ]
 
-class V2AcademyActivityReportView(APIView):
+            if page:
+                data.append(bigquery.ScalarQueryParameter('limit', 'INT64', limit))
+                data.append(bigquery.ScalarQueryParameter('offset', 'INT64', (int(page) - 1) * limit))
 
-    @capable_of('read_activity')
-    def get(self, request, academy_id=None):
-        query = request.GET.get('query', '{}')
+            else:
+                # one more activity tells if there is a next page
+                data.append(bigquery.ScalarQueryParameter('limit', 'INT64', limit + 1))
 
-        query = json.loads(query)
-        result = BigQuery.table('activity')
+            if kind:
+                data.append(bigquery.ScalarQueryParameter('kind', 'STRING', kind))
 
-        fields = request.GET.get('fields', None)
-        if fields is not None:
-            result = result.select(*fields.split(','))
+            if date_end:
+                data.append(bigquery.ScalarQueryParameter('date_end', 'TIMESTAMP', date_end))
 
-        by = request.GET.get('by', None)
-        if by is not None:
-            result = result.group_by(*by.split(','))
+            if after:
+                data.append(bigquery.ScalarQueryParameter('after_timestamp', 'TIMESTAMP', after[0]))
+                data.append(bigquery.ScalarQueryParameter('after_id', 'STRING', after[1]))
 
-        order = request.GET.get('order', None)
-        if order is not None:
-            result = result.order_by(*order.split(','))
+            job_config = bigquery.QueryJobConfig(query_parameters=data)
 
-        limit = request.GET.get('limit', None)
-        if limit is not None:
-            result = result.limit_by(limit)
+            # Run the query
+            query_job = client.query(query, job_config=job_config)
+            results = list(query_job.result())
 
-        if 'filter' in query:
-            result = result.filter(**query['filter'])
+        headers = {}
+        if page is None and len(results) > limit:
+            results = results[:limit]
 
-        if 'grouping_function' in query:
-            grouping_function = query['grouping_function']
-            aggs = []
-            if 'sum' in grouping_function:
-                for value in grouping_function['sum']:
-                    aggs.append(Sum(value))
+            cursor = encode_cursor(ACTIVITY_ORDERING, results[-1], 'next')
+            next_url = replace_query_param(request.build_absolute_uri(), CURSOR_QUERY_PARAM, cursor)
+            headers['Link'] = f'<{next_url}>; rel="next"'
 
-            if 'count' in grouping_function:
-                for value in grouping_function['count']:
-                    aggs.append(Count(value))
+        serializer = ActivitySerializer(results, many=True)
+        return Response(serializer.data, headers=headers)
 
-            if 'avg' in grouping_function:
-                for value in grouping_function['avg']:
-                    aggs.append(Avg(value))
 
-            result = result.aggregate(*aggs)
-        else:
-            result = result.build()
+class V2AcademyActivityReportView(APIView):
 
-        data = []
-        for r in result:
-            data.append(dict(r.items()))
+    @capable_of('read_activity')
+    def get(self, request, academy_id=None):
+        spec = reports.get_report_spec(request.GET)
+        data = reports.get_report(spec)
 
         return Response(data)
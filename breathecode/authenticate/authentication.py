@@ -1,12 +1,146 @@
 # authentication.py
 
-from asgiref.sync import sync_to_async
+import functools
+import hashlib
+import os
+from datetime import datetime
+from typing import Any, Optional
+
+from django.core.cache import cache
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
+from breathecode.utils.local_cache import LocalCache
+
 HTTP_HEADER_ENCODING = 'iso-8859-1'
+ENABLE_LIST_OPTIONS = ['true', '1', 'yes', 'y']
+
+# the second tier of the token cache, it is shared by all the workers
+TOKEN_CACHE_KEY = 'auth:token:{}'
+
+local_token_cache = LocalCache(maxsize=int(os.getenv('LOCAL_TOKEN_CACHE_SIZE', '2048')),
+                               timeout=int(os.getenv('LOCAL_TOKEN_CACHE_SECONDS', '10')))
+
+
+@functools.lru_cache(maxsize=1)
+def is_token_cache_enabled():
+    return os.getenv('TOKEN_CACHE', '1').lower() in ENABLE_LIST_OPTIONS
+
+
+@functools.lru_cache(maxsize=1)
+def token_cache_timeout():
+    return int(os.getenv('TOKEN_CACHE_SECONDS', '300'))
+
+
+def hash_token(key: str) -> str:
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def serialize_token(token) -> dict[str, Any]:
+    """Get the fields required to rebuild the token and its user, the password is never cached."""
+
+    return {
+        'token': {x.attname: getattr(token, x.attname)
+                  for x in token._meta.concrete_fields},
+        'user': {
+            x.attname: getattr(token.user, x.attname)
+            for x in token.user._meta.concrete_fields if x.attname != 'password'
+        },
+    }
+
+
+def deserialize_token(data: dict[str, Any]):
+    from django.contrib.auth.models import User
+
+    from .models import Token
+
+    # the missing fields are deferred, so saving the user does not overwrite them
+    user = User.from_db('default', list(data['user'].keys()), list(data['user'].values()))
+    token = Token.from_db('default', list(data['token'].keys()), list(data['token'].values()))
+    token.user = user
+
+    return token
+
+
+def get_token_cache_timeout(expires_at: Optional[datetime]) -> int:
+    timeout = token_cache_timeout()
+    if expires_at is None:
+        return timeout
+
+    return min(timeout, int((expires_at - timezone.now()).total_seconds()))
+
+
+def get_cached_token(key: str):
+    if not is_token_cache_enabled():
+        return None
+
+    token_hash = hash_token(key)
+    if (data := local_token_cache.get(token_hash)) is None:
+        data = cache.get(TOKEN_CACHE_KEY.format(token_hash))
+        if data is None:
+            return None
+
+        local_token_cache.set(token_hash, data)
+
+    return deserialize_token(data)
+
+
+async def aget_cached_token(key: str):
+    if not is_token_cache_enabled():
+        return None
+
+    token_hash = hash_token(key)
+    if (data := local_token_cache.get(token_hash)) is None:
+        data = await cache.aget(TOKEN_CACHE_KEY.format(token_hash))
+        if data is None:
+            return None
+
+        local_token_cache.set(token_hash, data)
+
+    return deserialize_token(data)
+
+
+def _prepare_token_cache(token) -> Optional[tuple[str, dict[str, Any], int]]:
+    if not is_token_cache_enabled() or not token.user.is_active:
+        return None
+
+    timeout = get_token_cache_timeout(token.expires_at)
+    if timeout <= 0:
+        return None
+
+    return hash_token(token.key), serialize_token(token), timeout
+
+
+def set_cached_token(token) -> None:
+    if (prepared := _prepare_token_cache(token)) is None:
+        return
+
+    token_hash, data, timeout = prepared
+    cache.set(TOKEN_CACHE_KEY.format(token_hash), data, timeout)
+    local_token_cache.set(token_hash, data, min(timeout, local_token_cache._timeout))
+
+
+async def aset_cached_token(token) -> None:
+    if (prepared := _prepare_token_cache(token)) is None:
+        return
+
+    token_hash, data, timeout = prepared
+    await cache.aset(TOKEN_CACHE_KEY.format(token_hash), data, timeout)
+    local_token_cache.set(token_hash, data, min(timeout, local_token_cache._timeout))
+
+
+def invalidate_token_cache(*keys: str) -> None:
+    """Remove the tokens from the cache, the other workers would see the change once their local ttl expires."""
+
+    if not keys:
+        return
+
+    hashes = [hash_token(x) for x in keys]
+
+    local_token_cache.delete(*hashes)
+    cache.delete_many([TOKEN_CACHE_KEY.format(x) for x in hashes])
 
 
 def get_authorization_header(request):
@@ -30,10 +164,7 @@ class ExpiringTokenAuthentication(TokenAuthentication):
     and password for new one to be created.
     """
 
-    def authenticate_credentials(self, key, request=None):
-        from .models import Token
-
-        token = Token.objects.select_related('user').filter(key=key).first()
+    def validate_token(self, token):
         if token is None:
             raise AuthenticationFailed({'error': 'Invalid or Inactive Token', 'is_authenticated': False})
 
@@ -48,6 +179,30 @@ class ExpiringTokenAuthentication(TokenAuthentication):
             })
         return token.user, token
 
+    def authenticate_credentials(self, key, request=None):
+        from .models import Token
+
+        if (token := get_cached_token(key)) is not None:
+            return self.validate_token(token)
+
+        token = Token.objects.select_related('user').filter(key=key).first()
+        res = self.validate_token(token)
+
+        set_cached_token(token)
+        return res
+
+    async def aauthenticate_credentials(self, key, request=None):
+        from .models import Token
+
+        if (token := await aget_cached_token(key)) is not None:
+            return self.validate_token(token)
+
+        token = await Token.objects.select_related('user').filter(key=key).afirst()
+        res = self.validate_token(token)
+
+        await aset_cached_token(token)
+        return res
+
 
 class AsyncExpiringTokenAuthentication(ExpiringTokenAuthentication):
     """
@@ -77,4 +232,4 @@ class AsyncExpiringTokenAuthentication(ExpiringTokenAuthentication):
             msg = _('Invalid token header. Token string should not contain invalid characters.')
             raise AuthenticationFailed(msg)
 
-        return await sync_to_async(self.authenticate_credentials)(token)
+        return await self.aauthenticate_credentials(token)
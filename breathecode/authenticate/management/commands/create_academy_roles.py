@@ -1,5 +1,6 @@
 from typing import TypedDict
 from django.core.management.base import BaseCommand
+from breathecode.utils.decorators.capable_of import invalidate_all_capabilities
 from ...models import Capability, Role
 
 CAPABILITIES = [
@@ -843,3 +844,6 @@ class Command(BaseCommand):
             r['caps'] = remove_duplicates(r['caps'])
             for c in r['caps']:
                 _r.capabilities.add(c)
+
+        # the capability matrix is rebuilt on demand from the new roles
+        invalidate_all_capabilities()
@@ -1,16 +1,17 @@
 import logging
-from typing import Type
+from typing import Optional, Type
 
 from django.contrib.auth.models import Group, User
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models.signals import post_delete, post_save, pre_delete
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from task_manager.django.actions import schedule_task
 
-from breathecode.admissions.models import CohortUser
+from breathecode.admissions.models import Academy, CohortUser
 from breathecode.admissions.signals import student_edu_status_updated
 from breathecode.authenticate import tasks
-from breathecode.authenticate.models import ProfileAcademy, UserInvite
+from breathecode.authenticate.authentication import invalidate_token_cache
+from breathecode.authenticate.models import Capability, ProfileAcademy, Role, Token, UserInvite
 from breathecode.authenticate.signals import (
     cohort_user_deleted,
     invite_status_updated,
@@ -18,6 +19,8 @@ from breathecode.authenticate.signals import (
     user_info_updated,
 )
 from breathecode.mentorship.models import MentorProfile
+from breathecode.utils.decorators.capable_of import invalidate_all_capabilities, invalidate_capabilities
+from breathecode.utils.decorators.has_permission import invalidate_user_permissions
 
 from .tasks import async_add_to_organization, async_remove_from_organization
 
@@ -146,3 +149,68 @@ def handle_invite_accepted(sender: Type[UserInvite], instance: UserInvite, **_):
     if instance.status == 'ACCEPTED' and not instance.user and User.objects.filter(
             email=instance.email).exists() is False:
         tasks.create_user_from_invite.apply_async(args=[instance.id], countdown=60)
+
+
+@receiver(user_info_updated, sender=Token)
+@receiver(user_info_deleted, sender=Token)
+def clean_token_cache(sender: Type[Token], instance: Token, **_):
+    invalidate_token_cache(instance.key)
+
+
+@receiver(user_info_updated, sender=User)
+def clean_user_tokens_cache(sender: Type[User], instance: User, **_):
+    # the cached tokens keep a copy of the user, like its is_active flag
+    keys = Token.objects.filter(user=instance).values_list('key', flat=True)
+    invalidate_token_cache(*keys)
+
+
+@receiver(user_info_updated, sender=ProfileAcademy)
+@receiver(user_info_deleted, sender=ProfileAcademy)
+def clean_profile_academy_capabilities(sender: Type[ProfileAcademy], instance: ProfileAcademy, **_):
+    if instance.user_id:
+        invalidate_capabilities(instance.user_id, instance.academy_id)
+
+
+@receiver(user_info_updated, sender=Role)
+@receiver(user_info_deleted, sender=Role)
+@receiver(user_info_updated, sender=Capability)
+@receiver(user_info_deleted, sender=Capability)
+@receiver(user_info_updated, sender=Academy)
+@receiver(user_info_deleted, sender=Academy)
+@receiver(m2m_changed, sender=Role.capabilities.through)
+def clean_all_capabilities(sender, **_):
+    invalidate_all_capabilities()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def clean_user_permissions(sender, instance, action: str, reverse: bool, pk_set: Optional[set[int]], **_):
+    if action not in ['post_add', 'post_remove', 'pre_clear']:
+        return
+
+    # reverse means that the change was made through group.user_set
+    if not reverse:
+        invalidate_user_permissions(instance.id)
+
+    elif action == 'pre_clear':
+        invalidate_user_permissions(*instance.user_set.values_list('id', flat=True))
+
+    else:
+        invalidate_user_permissions(*pk_set)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def clean_group_permissions(sender, instance, action: str, reverse: bool, pk_set: Optional[set[int]], **_):
+    if action not in ['post_add', 'post_remove', 'pre_clear']:
+        return
+
+    # reverse means that the change was made through permission.group_set
+    if not reverse:
+        users = User.objects.filter(groups=instance)
+
+    elif action == 'pre_clear':
+        users = User.objects.filter(groups__permissions=instance)
+
+    else:
+        users = User.objects.filter(groups__id__in=pk_set)
+
+    invalidate_user_permissions(*users.values_list('id', flat=True).distinct())
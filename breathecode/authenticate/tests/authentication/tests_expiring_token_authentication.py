@@ -0,0 +1,103 @@
+"""
+Test ExpiringTokenAuthentication
+"""
+
+from datetime import timedelta
+
+import pytest
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+
+from breathecode.authenticate.authentication import (
+    AsyncExpiringTokenAuthentication,
+    ExpiringTokenAuthentication,
+    local_token_cache,
+)
+from capyc.rest_framework import pytest as capy
+
+
+@pytest.fixture(autouse=True)
+def setup(db):
+    yield
+
+
+def test_token_not_found(database: capy.Database):
+    with pytest.raises(AuthenticationFailed):
+        ExpiringTokenAuthentication().authenticate_credentials('x' * 40)
+
+
+def test_cached_after_the_first_lookup(database: capy.Database, django_assert_num_queries):
+    model = database.create(user=1, token={'token_type': 'permanent'})
+
+    with django_assert_num_queries(1):
+        user, token = ExpiringTokenAuthentication().authenticate_credentials(model.token.key)
+
+    assert user.id == model.user.id
+    assert token.id == model.token.id
+
+    with django_assert_num_queries(0):
+        user, token = ExpiringTokenAuthentication().authenticate_credentials(model.token.key)
+
+    assert user.id == model.user.id
+    assert user.email == model.user.email
+    assert token.id == model.token.id
+
+    # the second tier is used when the local one is empty
+    local_token_cache.clear()
+
+    with django_assert_num_queries(0):
+        user, token = ExpiringTokenAuthentication().authenticate_credentials(model.token.key)
+
+    assert user.id == model.user.id
+
+
+def test_expired_cached_token(database: capy.Database, set_datetime):
+    utc_now = timezone.now()
+    model = database.create(user=1, token={'token_type': 'login', 'expires_at': utc_now + timedelta(minutes=1)})
+
+    ExpiringTokenAuthentication().authenticate_credentials(model.token.key)
+
+    set_datetime(utc_now + timedelta(minutes=2))
+
+    with pytest.raises(AuthenticationFailed):
+        ExpiringTokenAuthentication().authenticate_credentials(model.token.key)
+
+
+def test_invalidated_by_token_delete(database: capy.Database, enable_signals):
+    enable_signals()
+
+    model = database.create(user=1, token={'token_type': 'permanent'})
+    ExpiringTokenAuthentication().authenticate_credentials(model.token.key)
+
+    model.token.delete()
+
+    with pytest.raises(AuthenticationFailed):
+        ExpiringTokenAuthentication().authenticate_credentials(model.token.key)
+
+
+def test_invalidated_by_user_deactivation(database: capy.Database, enable_signals):
+    enable_signals()
+
+    model = database.create(user=1, token={'token_type': 'permanent'})
+    ExpiringTokenAuthentication().authenticate_credentials(model.token.key)
+
+    model.user.is_active = False
+    model.user.save()
+
+    with pytest.raises(AuthenticationFailed):
+        ExpiringTokenAuthentication().authenticate_credentials(model.token.key)
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(reset_sequences=True)
+async def test_async_lookup(database: capy.Database):
+    model = await sync_to_async(database.create)(user=1, token={'token_type': 'permanent'})
+
+    user, token = await AsyncExpiringTokenAuthentication().aauthenticate_credentials(model.token.key)
+    assert user.id == model.user.id
+    assert token.id == model.token.id
+
+    user, token = await AsyncExpiringTokenAuthentication().aauthenticate_credentials(model.token.key)
+    assert user.id == model.user.id
+    assert token.id == model.token.id
@@ -12,9 +12,12 @@ class BucketMock():
     def get_blob(self, blob_name):
         return self.files.get(blob_name)
 
-    def blob(self, blob_name):
-        self.files[blob_name] = BlobMock(blob_name, self)
+    def blob(self, blob_name, chunk_size=None):
+        self.files[blob_name] = BlobMock(blob_name, self, chunk_size=chunk_size)
         return self.files[blob_name]
 
+    def delete_blob(self, blob_name):
+        self.files.pop(blob_name, None)
+
     def delete(self):
         return None
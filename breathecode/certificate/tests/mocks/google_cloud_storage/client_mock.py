@@ -1,7 +1,17 @@
+from contextlib import nullcontext
+
+from requests import Session
+
 from .bucket_mock import BucketMock
 
 
 class ClientMock():
 
+    def __init__(self):
+        self._http = Session()
+
+    def batch(self):
+        return nullcontext()
+
     def bucket(self, bucket_name):
         return BucketMock(bucket_name)
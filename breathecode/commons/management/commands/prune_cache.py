@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from breathecode.utils.cache import CACHE_DESCRIPTORS
+
+
+class Command(BaseCommand):
+    help = 'Remove the expired keys from the cache indexes'
+
+    def handle(self, *args, **options):
+        # make sure all the modules are loaded
+        from breathecode.admissions import caches as _  # noqa: F811, F401
+        from breathecode.assignments import caches as _  # noqa: F811, F401
+        from breathecode.events import caches as _  # noqa: F811, F401
+        from breathecode.feedback import caches as _  # noqa: F811, F401
+        from breathecode.marketing import caches as _  # noqa: F811, F401
+        from breathecode.mentorship import caches as _  # noqa: F811, F401
+        from breathecode.payments import caches as _  # noqa: F811, F401
+        from breathecode.registry import caches as _  # noqa: F811, F401
+
+        removed = 0
+        for descriptor in list(CACHE_DESCRIPTORS.values()):
+            removed += descriptor.prune()
+
+        self.stdout.write(self.style.SUCCESS(f'{removed} expired keys were removed from the cache indexes'))
@@ -3,11 +3,13 @@ import json
 import os
 import random
 import re
+import zlib
 from unittest.mock import MagicMock, call
 
 import brotli
 import django.contrib.auth.models as auth_models
 import pytest
+import zstandard
 from django.core.cache import cache
 
 import breathecode.admissions.models as admissions_models
@@ -283,7 +285,15 @@ def test_set_cache_compressed(monkeypatch, cache_cls: Cache, value, params, key)
     assert sorted(cache.keys()) == sorted([k, keys])
     assert cache_cls.keys() == {k}
 
-    assert cache.get(k) == res
+    assert cache.get(k) == {
+        'content': json.dumps(value).encode('utf-8'),
+        'encodings': {
+            'br': serialized,
+        },
+        'headers': {
+            'Content-Type': 'application/json',
+        },
+    }
 
 
 @pytest.mark.parametrize('cache_cls', [CohortCache, EventCache])
@@ -341,7 +351,15 @@ def test_set_cache_compressed__gzip(monkeypatch, cache_cls: Cache, value, params
     assert sorted(cache.keys()) == sorted([k, keys])
     assert cache_cls.keys() == {k}
 
-    assert cache.get(k) == res
+    assert cache.get(k) == {
+        'content': json.dumps(value).encode('utf-8'),
+        'encodings': {
+            'gzip': serialized,
+        },
+        'headers': {
+            'Content-Type': 'application/json',
+        },
+    }
 
 
 @pytest.mark.parametrize('cache_cls', [CohortCache, EventCache])
@@ -595,3 +613,46 @@ def test_delete_calls(faker, monkeypatch, cache_cls: Cache, calls, value):
     cache_cls.clear()
 
     assert sorted(mock.call_args_list) == [call(set(sorted({c for c in keys})))]
+
+
+@pytest.mark.parametrize('cache_cls', [CohortCache, EventCache])
+def test_prune(cache_cls: Cache):
+    cache_cls.set([{'x': 1}], params={'x': 1})
+    cache_cls.set([{'x': 2}], params={'x': 2})
+
+    cache.delete(f'{cache_cls.model.__name__}__x=1')
+
+    assert cache_cls.prune() == 1
+    assert cache_cls.keys() == {f'{cache_cls.model.__name__}__x=2'}
+    assert cache_cls.prune() == 0
+
+
+@pytest.mark.parametrize('cache_cls', [CohortCache, EventCache])
+@pytest.mark.parametrize('encoding,decompress', [
+    ('br', brotli.decompress),
+    ('gzip', gzip.decompress),
+    ('zstd', zstandard.decompress),
+    ('deflate', zlib.decompress),
+])
+def test_get_cache__adds_the_encoding_lazily(monkeypatch, cache_cls: Cache, encoding, decompress):
+    monkeypatch.setattr('sys.getsizeof', lambda _: (random.randint(10, 1000) * 1024) + 1)
+
+    value = [{'x': 1}, {'y': 2}]
+    serialized = json.dumps(value).encode('utf-8')
+    k = f'{cache_cls.model.__name__}__x=1'
+
+    cache_cls.set(value, params={'x': 1})
+    assert cache.get(k) == {
+        'content': serialized,
+        'headers': {
+            'Content-Type': 'application/json',
+        },
+    }
+
+    content, headers = cache_cls.get({'x': 1}, encoding=encoding)
+
+    assert decompress(content) == serialized
+    assert headers == {'Content-Encoding': encoding, 'Content-Type': 'application/json'}
+    assert cache.get(k)['encodings'] == {encoding: content}
+    assert cache_cls.get({'x': 1}, encoding=encoding) == (content, headers)
+    assert cache_cls.get({'x': 1}) == (serialized, {'Content-Type': 'application/json'})
@@ -0,0 +1,388 @@
+"""
+Cached components of the iCal feeds.
+
+The VEVENTs of each cohort, timeslot and event are serialized once and cached, a feed is the concatenation of the
+components of its items, only the missing ones are built again, in a single query. The receivers of the models
+involved remove the components that changed.
+"""
+
+import hashlib
+import re
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+import pytz
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.http.response import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from icalendar import Calendar as iCalendar
+from icalendar import Event as iEvent
+from icalendar import vCalAddress, vText
+
+from breathecode.admissions.models import Cohort, CohortTimeSlot, CohortUser
+from breathecode.utils import DatetimeInteger
+
+from .actions import fix_datetime_weekday, update_timeslots_out_of_range
+from .models import Event
+
+__all__ = [
+    'get_cohort_components', 'get_timeslot_components', 'get_event_components', 'get_feed_response',
+    'invalidate_cohort', 'invalidate_timeslot', 'invalidate_event'
+]
+
+# the changes that do not send signals, like the bulk updates, and the changes of the users of the teachers and of the
+# academies, which are not tracked, are picked up after this time
+ICAL_CACHE_TTL = 60 * 60
+
+CHANGED_AT_KEY = 'ical:changed_at'
+END_OF_CALENDAR = b'END:VCALENDAR\r\n'
+
+Entry = dict[str, Any]
+Builder = Callable[[list[int], str], dict[int, bytes]]
+
+
+def _get_key(kind: str, id: int) -> str:
+    return f'ical:{kind}:{id}'
+
+
+def _get_components(kind: str, ids: list[int], server_key: str, build: Builder) -> list[Entry]:
+    keys = {id: _get_key(kind, id) for id in ids}
+    cached = cache.get_many(list(keys.values()))
+
+    result = {}
+    missing = []
+
+    for id in ids:
+        entry = cached.get(keys[id])
+
+        # the uids include the server key, so the components of another server cannot be used
+        if entry is None or entry['server'] != server_key:
+            missing.append(id)
+            continue
+
+        result[id] = entry
+
+    if missing:
+        now = timezone.now()
+        built = {
+            id: {
+                'ical': ical,
+                'server': server_key,
+                'updated_at': now,
+            }
+            for id, ical in build(missing, server_key).items()
+        }
+
+        cache.set_many({keys[id]: entry for id, entry in built.items()}, timeout=ICAL_CACHE_TTL)
+        result.update(built)
+
+    return [result[id] for id in ids if id in result]
+
+
+def _get_teachers_prefetch(lookup: str) -> Prefetch:
+    teachers = CohortUser.objects.filter(role='TEACHER').select_related('user').order_by('id')
+    return Prefetch(lookup, queryset=teachers, to_attr='ical_teachers')
+
+
+def _get_organizer(user) -> vCalAddress:
+    organizer = vCalAddress(f'MAILTO:{user.email}')
+
+    if user.first_name and user.last_name:
+        organizer.params['cn'] = vText(f'{user.first_name} '
+                                       f'{user.last_name}')
+    elif user.first_name:
+        organizer.params['cn'] = vText(user.first_name)
+    elif user.last_name:
+        organizer.params['cn'] = vText(user.last_name)
+
+    organizer.params['role'] = vText('OWNER')
+    return organizer
+
+
+def _build_cohorts(ids: list[int], key: str) -> dict[int, bytes]:
+    items = Cohort.objects.filter(id__in=ids).select_related('academy').prefetch_related(
+        Prefetch('cohorttimeslot_set', queryset=CohortTimeSlot.objects.order_by('id'), to_attr='ical_timeslots'),
+        _get_teachers_prefetch('cohortuser_set'))
+
+    result = {}
+
+    for item in items:
+        event = iEvent()
+        event_first_day = iEvent()
+        event_last_day = iEvent()
+        has_last_day = False
+
+        event.add('summary', item.name)
+        event.add('uid', f'breathecode_cohort_{item.id}_{key}')
+        event.add('dtstart', item.kickoff_date)
+
+        timeslots = update_timeslots_out_of_range(item.kickoff_date, item.ending_date, item.ical_timeslots)
+
+        first_timeslot = timeslots[0] if timeslots else None
+        if first_timeslot:
+            recurrent = first_timeslot['recurrent']
+            starting_at = first_timeslot['starting_at'] if not recurrent else fix_datetime_weekday(
+                item.kickoff_date, first_timeslot['starting_at'], next=True)
+            ending_at = first_timeslot['ending_at'] if not recurrent else fix_datetime_weekday(
+                item.kickoff_date, first_timeslot['ending_at'], next=True)
+
+            event_first_day.add('summary', f'{item.name} - First day')
+            event_first_day.add('uid', f'breathecode_cohort_{item.id}_first_{key}')
+            event_first_day.add('dtstart', starting_at)
+            event_first_day.add('dtend', ending_at)
+            event_first_day.add('dtstamp', first_timeslot['created_at'])
+
+        if item.ending_date:
+            event.add('dtend', item.ending_date)
+            timeslots_datetime = []
+
+            # fix the datetime to be use for get the last day
+            for timeslot in timeslots:
+                starting_at = timeslot['starting_at']
+                ending_at = timeslot['ending_at']
+                diff = ending_at - starting_at
+
+                if timeslot['recurrent']:
+                    ending_at = fix_datetime_weekday(item.ending_date, ending_at, prev=True)
+                    starting_at = ending_at - diff
+
+                timeslots_datetime.append((starting_at, ending_at))
+
+            last_timeslot = None
+
+            if timeslots_datetime:
+                timeslots_datetime.sort(key=lambda x: x[1], reverse=True)
+                last_timeslot = timeslots_datetime[0]
+                has_last_day = True
+
+                event_last_day.add('summary', f'{item.name} - Last day')
+
+                event_last_day.add('uid', f'breathecode_cohort_{item.id}_last_{key}')
+                event_last_day.add('dtstart', last_timeslot[0])
+                event_last_day.add('dtend', last_timeslot[1])
+                event_last_day.add('dtstamp', item.created_at)
+
+        event.add('dtstamp', item.created_at)
+
+        teacher = item.ical_teachers[0] if item.ical_teachers else None
+
+        if teacher:
+            organizer = _get_organizer(teacher.user)
+            event['organizer'] = organizer
+
+            if first_timeslot:
+                event_first_day['organizer'] = organizer
+
+            if has_last_day:
+                event_last_day['organizer'] = organizer
+
+        event['location'] = vText(item.online_meeting_url or item.academy.name)
+
+        if first_timeslot:
+            event_first_day['location'] = vText(item.online_meeting_url or item.academy.name)
+
+        if has_last_day:
+            event_last_day['location'] = vText(item.online_meeting_url or item.academy.name)
+
+        ical = event.to_ical()
+
+        if first_timeslot:
+            ical = event_first_day.to_ical() + ical
+
+        if has_last_day:
+            ical = ical + event_last_day.to_ical()
+
+        result[item.id] = ical
+
+    return result
+
+
+def _build_timeslots(ids: list[int], key: str) -> dict[int, bytes]:
+    items = CohortTimeSlot.objects.filter(id__in=ids).select_related('cohort__academy').prefetch_related(
+        _get_teachers_prefetch('cohort__cohortuser_set'))
+
+    result = {}
+
+    for item in items:
+        event = iEvent()
+
+        event.add('summary', item.cohort.name)
+        event.add('uid', f'breathecode_cohort_time_slot_{item.id}_{key}')
+
+        stamp = DatetimeInteger.to_datetime(item.timezone, item.starting_at)
+        starting_at = fix_datetime_weekday(item.cohort.kickoff_date, stamp, next=True)
+        event.add('dtstart', starting_at)
+        event.add('dtstamp', stamp)
+
+        until_date = item.removed_at or item.cohort.ending_date
+
+        if not until_date:
+            until_date = timezone.make_aware(datetime(year=2100, month=12, day=31, hour=12, minute=00, second=00))
+
+        ending_at = DatetimeInteger.to_datetime(item.timezone, item.ending_at)
+        ending_at = fix_datetime_weekday(item.cohort.kickoff_date, ending_at, next=True)
+        event.add('dtend', ending_at)
+
+        if item.recurrent:
+            utc_ending_at = ending_at.astimezone(pytz.UTC)
+
+            # is possible hour of cohort.ending_date are wrong filled, I's assumes the max diff between
+            # summer/winter timezone should have two hours
+            delta = timedelta(hours=utc_ending_at.hour - until_date.hour + 3,
+                              minutes=utc_ending_at.minute - until_date.minute,
+                              seconds=utc_ending_at.second - until_date.second)
+
+            event.add('rrule', {'freq': item.recurrency_type, 'until': until_date + delta})
+
+        teacher = item.cohort.ical_teachers[0] if item.cohort.ical_teachers else None
+
+        if teacher:
+            event['organizer'] = _get_organizer(teacher.user)
+
+        event['location'] = vText(item.cohort.online_meeting_url or item.cohort.academy.name)
+
+        result[item.id] = event.to_ical()
+
+    return result
+
+
+def _build_events(ids: list[int], key: str) -> dict[int, bytes]:
+    items = Event.objects.filter(id__in=ids).select_related('academy', 'venue', 'event_type', 'author')
+
+    result = {}
+
+    for item in items:
+        event = iEvent()
+
+        if item.title:
+            event.add('summary', item.title)
+
+        description = ''
+        description = f'{description}Url: {item.url}\n'
+
+        if item.academy:
+            description = f'{description}Academy: {item.academy.name}\n'
+
+        if item.venue and item.venue.title:
+            description = f'{description}Venue: {item.venue.title}\n'
+
+        if item.event_type:
+            description = f'{description}Event type: {item.event_type.name}\n'
+
+        if item.online_event:
+            description = f'{description}Location: online\n'
+
+        event.add('description', description)
+        event.add('uid', f'breathecode_event_{item.id}_{key}')
+        event.add('dtstart', item.starting_at)
+        event.add('dtend', item.ending_at)
+        event.add('dtstamp', item.created_at)
+
+        if item.author and item.author.email:
+            event['organizer'] = _get_organizer(item.author)
+
+        if item.venue and (item.venue.country or item.venue.state or item.venue.city or item.venue.street_address):
+            value = ''
+
+            if item.venue.street_address:
+                value = f'{value}{item.venue.street_address}, '
+
+            if item.venue.city:
+                value = f'{value}{item.venue.city}, '
+
+            if item.venue.state:
+                value = f'{value}{item.venue.state}, '
+
+            if item.venue.country:
+                value = f'{value}{item.venue.country}'
+
+            value = re.sub(', $', '', value)
+            event['location'] = vText(value)
+
+        result[item.id] = event.to_ical()
+
+    return result
+
+
+def get_cohort_components(ids: list[int], server_key: str) -> list[Entry]:
+    """Get the components of the cohorts, they are sorted like the ids provided."""
+
+    return _get_components('cohort', ids, server_key, _build_cohorts)
+
+
+def get_timeslot_components(ids: list[int], server_key: str) -> list[Entry]:
+    """Get the components of the cohort timeslots, they are sorted like the ids provided."""
+
+    return _get_components('timeslot', ids, server_key, _build_timeslots)
+
+
+def get_event_components(ids: list[int], server_key: str) -> list[Entry]:
+    """Get the components of the events, they are sorted like the ids provided."""
+
+    return _get_components('event', ids, server_key, _build_events)
+
+
+def get_feed_response(request, calendar: iCalendar, components: list[Entry]) -> HttpResponse:
+    """
+    Build the feed from the calendar and its components.
+
+    It returns a 304 response if the feed did not change since the version that the client has.
+    """
+
+    header = calendar.to_ical()
+    body = header[:-len(END_OF_CALENDAR)] + b''.join([x['ical'] for x in components]) + END_OF_CALENDAR
+
+    etag = f'"{hashlib.sha256(body).hexdigest()}"'
+    dates = [x['updated_at'] for x in components]
+
+    # a component removed from the feed does not change the dates of the others
+    if changed_at := cache.get(CHANGED_AT_KEY):
+        dates.append(changed_at)
+
+    last_modified = int(max(dates).timestamp()) if dates else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(body, content_type='text/calendar')
+        response['Content-Disposition'] = 'attachment; filename="calendar.ics"'
+
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+
+    return response
+
+
+def _mark_as_changed() -> None:
+    cache.set(CHANGED_AT_KEY, timezone.now(), timeout=None)
+
+
+def invalidate_cohort(cohort_id: int) -> None:
+    """Remove the components of the cohort and of its timeslots, which include the cohort and its teacher."""
+
+    timeslot_ids = CohortTimeSlot.objects.filter(cohort__id=cohort_id).values_list('id', flat=True)
+
+    cache.delete_many([_get_key('cohort', cohort_id), *[_get_key('timeslot', x) for x in timeslot_ids]])
+    _mark_as_changed()
+
+
+def invalidate_timeslot(timeslot_id: int, cohort_id: Optional[int] = None) -> None:
+    """Remove the component of the timeslot and the one of its cohort, which includes its first and last day."""
+
+    keys = [_get_key('timeslot', timeslot_id)]
+
+    if cohort_id:
+        keys.append(_get_key('cohort', cohort_id))
+
+    cache.delete_many(keys)
+    _mark_as_changed()
+
+
+def invalidate_event(event_id: int) -> None:
+    """Remove the component of the event."""
+
+    cache.delete(_get_key('event', event_id))
+    _mark_as_changed()
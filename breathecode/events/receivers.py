@@ -1,12 +1,14 @@
 import logging
 from typing import Any, Type
 
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 
-from breathecode.admissions.models import CohortTimeSlot
+from breathecode.admissions.models import Cohort, CohortTimeSlot, CohortUser
 from breathecode.admissions.signals import timeslot_saved
-from breathecode.events import tasks
+from breathecode.events import ical, tasks
+from breathecode.events.models import Event
 
 logger = logging.getLogger(__name__)
 
@@ -18,3 +20,38 @@ def post_save_cohort_time_slot(sender: Type[CohortTimeSlot], instance: CohortTim
     if instance.cohort.ending_date and instance.cohort.ending_date > timezone.now(
     ) and instance.cohort.never_ends == False:
         tasks.build_live_classes_from_timeslot.delay(instance.id)
+
+
+@receiver(post_save, sender=Cohort)
+@receiver(post_delete, sender=Cohort)
+def invalidate_cohort_ical(sender: Type[Cohort], instance: Cohort, **kwargs: Any):
+    ical.invalidate_cohort(instance.id)
+
+
+@receiver(post_init, sender=CohortUser)
+def keep_cohort_user_role(sender: Type[CohortUser], instance: CohortUser, **kwargs: Any):
+    # a deferred role is not loaded
+    instance._ical_role = instance.__dict__.get('role')
+
+
+@receiver(post_save, sender=CohortUser)
+@receiver(post_delete, sender=CohortUser)
+def invalidate_cohort_user_ical(sender: Type[CohortUser], instance: CohortUser, **kwargs: Any):
+    # the teacher is the organizer of the cohort and its timeslots, the other members are not in the feeds
+    if 'TEACHER' not in (instance.role, getattr(instance, '_ical_role', None)):
+        return
+
+    ical.invalidate_cohort(instance.cohort_id)
+    instance._ical_role = instance.role
+
+
+@receiver(post_save, sender=CohortTimeSlot)
+@receiver(post_delete, sender=CohortTimeSlot)
+def invalidate_cohort_time_slot_ical(sender: Type[CohortTimeSlot], instance: CohortTimeSlot, **kwargs: Any):
+    ical.invalidate_timeslot(instance.id, instance.cohort_id)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_event_ical(sender: Type[Event], instance: Event, **kwargs: Any):
+    ical.invalidate_event(instance.id)
@@ -0,0 +1,150 @@
+"""
+Test the cache of the iCal feeds
+"""
+from datetime import timedelta
+from unittest.mock import MagicMock, call
+
+import pytest
+from django.urls.base import reverse_lazy
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from breathecode.admissions.models import CohortUser
+from breathecode.events import ical
+from breathecode.tests.mixins.breathecode_mixin.breathecode import Breathecode
+
+
+@pytest.fixture(autouse=True)
+def setup(db, monkeypatch):
+    monkeypatch.setattr('breathecode.events.tasks.build_live_classes_from_timeslot.delay', MagicMock())
+    yield
+
+
+def get_events_feed(client: APIClient, **headers):
+    url = reverse_lazy('events:ical_events') + '?academy=1'
+    return client.get(url, headers=headers)
+
+
+def test_the_feed_is_not_modified(bc: Breathecode, client: APIClient):
+    bc.database.create(academy=1, event={'status': 'ACTIVE', 'title': 'Potato'}, device_id={'name': 'server'})
+
+    response = get_events_feed(client)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response['ETag']
+    assert response['Last-Modified']
+
+    response = get_events_feed(client, **{'If-None-Match': response['ETag']})
+
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b''
+
+
+def test_the_components_are_reused(bc: Breathecode, client: APIClient, monkeypatch):
+    bc.database.create(academy=1, event=(2, {'status': 'ACTIVE'}), device_id={'name': 'server'})
+
+    response = get_events_feed(client)
+    content = response.content
+
+    assert response.status_code == status.HTTP_200_OK
+
+    build_events = MagicMock(wraps=ical._build_events)
+    monkeypatch.setattr('breathecode.events.ical._build_events', build_events)
+
+    response = get_events_feed(client)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.content == content
+    assert build_events.call_args_list == []
+
+
+def test_the_component_changed_is_built_again(bc: Breathecode, client: APIClient, enable_signals, monkeypatch):
+    enable_signals()
+
+    model = bc.database.create(academy=1,
+                               event=(2, {
+                                   'status': 'ACTIVE',
+                                   'title': 'Potato'
+                               }),
+                               device_id={'name': 'server'})
+
+    response = get_events_feed(client)
+    etag = response['ETag']
+
+    assert b'SUMMARY:Potato' in response.content
+
+    build_events = MagicMock(wraps=ical._build_events)
+    monkeypatch.setattr('breathecode.events.ical._build_events', build_events)
+
+    model.event[1].title = 'Tomato'
+    model.event[1].save()
+
+    response = get_events_feed(client, **{'If-None-Match': etag})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert b'SUMMARY:Potato' in response.content
+    assert b'SUMMARY:Tomato' in response.content
+    assert build_events.call_args_list[0][0][0] == [model.event[1].id]
+
+
+def test_the_teacher_changed_builds_the_cohort_again(bc: Breathecode, client: APIClient, enable_signals):
+    enable_signals()
+
+    cohort = {'never_ends': False, 'ending_date': timezone.now() + timedelta(days=90)}
+    model = bc.database.create(cohort=cohort,
+                               cohort_time_slot=1,
+                               user={
+                                   'first_name': 'John',
+                                   'last_name': 'Doe'
+                               },
+                               device_id={'name': 'server'})
+
+    url = reverse_lazy('events:ical_cohorts') + '?academy=1'
+    response = client.get(url)
+
+    assert f'breathecode_cohort_{model.cohort.id}_'.encode() in response.content
+    assert b'CN="John Doe"' not in response.content
+
+    bc.database.create(cohort_user={'role': 'TEACHER', 'cohort': model.cohort, 'user': model.user})
+    response = client.get(url)
+
+    assert b'CN="John Doe"' in response.content
+
+    url = reverse_lazy('events:ical_student_id', kwargs={'user_id': model.user.id})
+    response = client.get(url)
+
+    assert b'CN="John Doe"' in response.content
+
+
+def test_the_students_do_not_invalidate_the_cohort(bc: Breathecode, enable_signals, monkeypatch):
+    enable_signals()
+
+    model = bc.database.create(cohort=1, cohort_user={'role': 'STUDENT'})
+
+    invalidate_cohort = MagicMock()
+    monkeypatch.setattr('breathecode.events.ical.invalidate_cohort', invalidate_cohort)
+
+    model.cohort_user.educational_status = 'GRADUATED'
+    model.cohort_user.save()
+    model.cohort_user.delete()
+
+    assert invalidate_cohort.call_args_list == []
+
+
+def test_the_teacher_that_is_not_a_teacher_anymore_invalidates_the_cohort(bc: Breathecode, enable_signals, monkeypatch):
+    enable_signals()
+
+    model = bc.database.create(cohort=1, cohort_user={'role': 'TEACHER'})
+
+    invalidate_cohort = MagicMock()
+    monkeypatch.setattr('breathecode.events.ical.invalidate_cohort', invalidate_cohort)
+
+    cohort_user = CohortUser.objects.get(id=model.cohort_user.id)
+    cohort_user.role = 'ASSISTANT'
+    cohort_user.save()
+
+    # it is not a teacher anymore
+    cohort_user.save()
+
+    assert invalidate_cohort.call_args_list == [call(model.cohort.id)]
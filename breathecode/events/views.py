@@ -1,17 +1,13 @@
 import logging
 import os
 import re
-from datetime import datetime, timedelta
+from datetime import datetime
 
-import pytz
 from django.contrib.auth.models import User
 from django.db.models.query_utils import Q
-from django.http.response import HttpResponse
 from django.shortcuts import redirect, render
 from django.utils import timezone
 from icalendar import Calendar as iCalendar
-from icalendar import Event as iEvent
-from icalendar import vCalAddress, vText
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.permissions import AllowAny
@@ -23,12 +19,11 @@ from rest_framework.views import APIView
 import breathecode.activity.tasks as tasks_activity
 from breathecode.admissions.models import Academy, Cohort, CohortTimeSlot, CohortUser, Syllabus
 from breathecode.authenticate.actions import get_user_language, server_id
-from breathecode.events import actions
+from breathecode.events import actions, ical
 from breathecode.events.caches import EventCache, LiveClassCache
 from breathecode.renderers import PlainTextRenderer
 from breathecode.services.eventbrite import Eventbrite
 from breathecode.utils import (
-    DatetimeInteger,
     GenerateLookupsMixin,
     HeaderLimitOffsetPagination,
     capable_of,
@@ -41,7 +36,7 @@ from breathecode.utils.multi_status_response import MultiStatusResponse
 from breathecode.utils.views import private_view, render_message
 from capyc.rest_framework.exceptions import ValidationException
 
-from .actions import fix_datetime_weekday, get_my_event_types, update_timeslots_out_of_range
+from .actions import get_my_event_types
 from .models import (
     Event,
     EventbriteWebhook,
@@ -1227,66 +1222,8 @@ class ICalStudentView(APIView):
 
         calendar.add('version', '2.0')
 
-        for item in items:
-            event = iEvent()
-
-            event.add('summary', item.cohort.name)
-            event.add('uid', f'breathecode_cohort_time_slot_{item.id}_{key}')
-
-            stamp = DatetimeInteger.to_datetime(item.timezone, item.starting_at)
-            starting_at = fix_datetime_weekday(item.cohort.kickoff_date, stamp, next=True)
-            event.add('dtstart', starting_at)
-            event.add('dtstamp', stamp)
-
-            until_date = item.removed_at or item.cohort.ending_date
-
-            if not until_date:
-                until_date = timezone.make_aware(datetime(year=2100, month=12, day=31, hour=12, minute=00, second=00))
-
-            ending_at = DatetimeInteger.to_datetime(item.timezone, item.ending_at)
-            ending_at = fix_datetime_weekday(item.cohort.kickoff_date, ending_at, next=True)
-            event.add('dtend', ending_at)
-
-            if item.recurrent:
-                utc_ending_at = ending_at.astimezone(pytz.UTC)
-
-                # is possible hour of cohort.ending_date are wrong filled, I's assumes the max diff between
-                # summer/winter timezone should have two hours
-                delta = timedelta(hours=utc_ending_at.hour - until_date.hour + 3,
-                                  minutes=utc_ending_at.minute - until_date.minute,
-                                  seconds=utc_ending_at.second - until_date.second)
-
-                event.add('rrule', {'freq': item.recurrency_type, 'until': until_date + delta})
-
-            teacher = CohortUser.objects.filter(role='TEACHER', cohort__id=item.cohort.id).first()
-
-            if teacher:
-                organizer = vCalAddress(f'MAILTO:{teacher.user.email}')
-
-                if teacher.user.first_name and teacher.user.last_name:
-                    organizer.params['cn'] = vText(f'{teacher.user.first_name} '
-                                                   f'{teacher.user.last_name}')
-                elif teacher.user.first_name:
-                    organizer.params['cn'] = vText(teacher.user.first_name)
-                elif teacher.user.last_name:
-                    organizer.params['cn'] = vText(teacher.user.last_name)
-
-                organizer.params['role'] = vText('OWNER')
-                event['organizer'] = organizer
-
-            location = item.cohort.academy.name
-
-            if item.cohort.academy.website_url:
-                location = f'{location} ({item.cohort.academy.website_url})'
-            event['location'] = vText(item.cohort.online_meeting_url or item.cohort.academy.name)
-
-            calendar.add_component(event)
-
-        calendar_text = calendar.to_ical()
-
-        response = HttpResponse(calendar_text, content_type='text/calendar')
-        response['Content-Disposition'] = 'attachment; filename="calendar.ics"'
-        return response
+        components = ical.get_timeslot_components(list(items.values_list('id', flat=True)), key)
+        return ical.get_feed_response(request, calendar, components)
 
 
 class ICalCohortsView(APIView):
@@ -1354,112 +1291,8 @@ class ICalCohortsView(APIView):
 
         calendar.add('version', '2.0')
 
-        for item in items:
-            event = iEvent()
-            event_first_day = iEvent()
-            event_last_day = iEvent()
-            has_last_day = False
-
-            event.add('summary', item.name)
-            event.add('uid', f'breathecode_cohort_{item.id}_{key}')
-            event.add('dtstart', item.kickoff_date)
-
-            timeslots = update_timeslots_out_of_range(item.kickoff_date, item.ending_date,
-                                                      CohortTimeSlot.objects.filter(cohort__id=item.id))
-
-            first_timeslot = timeslots[0] if timeslots else None
-            if first_timeslot:
-                recurrent = first_timeslot['recurrent']
-                starting_at = first_timeslot['starting_at'] if not recurrent else fix_datetime_weekday(
-                    item.kickoff_date, first_timeslot['starting_at'], next=True)
-                ending_at = first_timeslot['ending_at'] if not recurrent else fix_datetime_weekday(
-                    item.kickoff_date, first_timeslot['ending_at'], next=True)
-
-                event_first_day.add('summary', f'{item.name} - First day')
-                event_first_day.add('uid', f'breathecode_cohort_{item.id}_first_{key}')
-                event_first_day.add('dtstart', starting_at)
-                event_first_day.add('dtend', ending_at)
-                event_first_day.add('dtstamp', first_timeslot['created_at'])
-
-            if item.ending_date:
-                event.add('dtend', item.ending_date)
-                timeslots_datetime = []
-
-                # fix the datetime to be use for get the last day
-                for timeslot in timeslots:
-                    starting_at = timeslot['starting_at']
-                    ending_at = timeslot['ending_at']
-                    diff = ending_at - starting_at
-
-                    if timeslot['recurrent']:
-                        ending_at = fix_datetime_weekday(item.ending_date, ending_at, prev=True)
-                        starting_at = ending_at - diff
-
-                    timeslots_datetime.append((starting_at, ending_at))
-
-                last_timeslot = None
-
-                if timeslots_datetime:
-                    timeslots_datetime.sort(key=lambda x: x[1], reverse=True)
-                    last_timeslot = timeslots_datetime[0]
-                    has_last_day = True
-
-                    event_last_day.add('summary', f'{item.name} - Last day')
-
-                    event_last_day.add('uid', f'breathecode_cohort_{item.id}_last_{key}')
-                    event_last_day.add('dtstart', last_timeslot[0])
-                    event_last_day.add('dtend', last_timeslot[1])
-                    event_last_day.add('dtstamp', item.created_at)
-
-            event.add('dtstamp', item.created_at)
-
-            teacher = CohortUser.objects.filter(role='TEACHER', cohort__id=item.id).first()
-
-            if teacher:
-                organizer = vCalAddress(f'MAILTO:{teacher.user.email}')
-
-                if teacher.user.first_name and teacher.user.last_name:
-                    organizer.params['cn'] = vText(f'{teacher.user.first_name} '
-                                                   f'{teacher.user.last_name}')
-                elif teacher.user.first_name:
-                    organizer.params['cn'] = vText(teacher.user.first_name)
-                elif teacher.user.last_name:
-                    organizer.params['cn'] = vText(teacher.user.last_name)
-
-                organizer.params['role'] = vText('OWNER')
-                event['organizer'] = organizer
-
-                if first_timeslot:
-                    event_first_day['organizer'] = organizer
-
-                if has_last_day:
-                    event_last_day['organizer'] = organizer
-
-            location = item.academy.name
-
-            if item.academy.website_url:
-                location = f'{location} ({item.academy.website_url})'
-
-            event['location'] = vText(item.online_meeting_url or item.academy.name)
-
-            if first_timeslot:
-                event_first_day['location'] = vText(item.online_meeting_url or item.academy.name)
-
-            if has_last_day:
-                event_last_day['location'] = vText(item.online_meeting_url or item.academy.name)
-
-            if first_timeslot:
-                calendar.add_component(event_first_day)
-            calendar.add_component(event)
-
-            if has_last_day:
-                calendar.add_component(event_last_day)
-
-        calendar_text = calendar.to_ical()
-
-        response = HttpResponse(calendar_text, content_type='text/calendar')
-        response['Content-Disposition'] = 'attachment; filename="calendar.ics"'
-        return response
+        components = ical.get_cohort_components(list(items.values_list('id', flat=True)), key)
+        return ical.get_feed_response(request, calendar, components)
 
 
 class ICalEventView(APIView):
@@ -1525,69 +1358,5 @@ class ICalEventView(APIView):
 
         calendar.add('version', '2.0')
 
-        for item in items:
-            event = iEvent()
-
-            if item.title:
-                event.add('summary', item.title)
-
-            description = ''
-            description = f'{description}Url: {item.url}\n'
-
-            if item.academy:
-                description = f'{description}Academy: {item.academy.name}\n'
-
-            if item.venue and item.venue.title:
-                description = f'{description}Venue: {item.venue.title}\n'
-
-            if item.event_type:
-                description = f'{description}Event type: {item.event_type.name}\n'
-
-            if item.online_event:
-                description = f'{description}Location: online\n'
-
-            event.add('description', description)
-            event.add('uid', f'breathecode_event_{item.id}_{key}')
-            event.add('dtstart', item.starting_at)
-            event.add('dtend', item.ending_at)
-            event.add('dtstamp', item.created_at)
-
-            if item.author and item.author.email:
-                organizer = vCalAddress(f'MAILTO:{item.author.email}')
-
-                if item.author.first_name and item.author.last_name:
-                    organizer.params['cn'] = vText(f'{item.author.first_name} '
-                                                   f'{item.author.last_name}')
-                elif item.author.first_name:
-                    organizer.params['cn'] = vText(item.author.first_name)
-                elif item.author.last_name:
-                    organizer.params['cn'] = vText(item.author.last_name)
-
-                organizer.params['role'] = vText('OWNER')
-                event['organizer'] = organizer
-
-            if item.venue and (item.venue.country or item.venue.state or item.venue.city or item.venue.street_address):
-                value = ''
-
-                if item.venue.street_address:
-                    value = f'{value}{item.venue.street_address}, '
-
-                if item.venue.city:
-                    value = f'{value}{item.venue.city}, '
-
-                if item.venue.state:
-                    value = f'{value}{item.venue.state}, '
-
-                if item.venue.country:
-                    value = f'{value}{item.venue.country}'
-
-                value = re.sub(', $', '', value)
-                event['location'] = vText(value)
-
-            calendar.add_component(event)
-
-        calendar_text = calendar.to_ical()
-
-        response = HttpResponse(calendar_text, content_type='text/calendar')
-        response['Content-Disposition'] = 'attachment; filename="calendar.ics"'
-        return response
+        components = ical.get_event_components(list(items.values_list('id', flat=True)), key)
+        return ical.get_feed_response(request, calendar, components)
@@ -0,0 +1,189 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import UploadedFile
+from django.db.models import Count, Q
+
+from breathecode.utils.buffered_counter import BufferedCounter
+
+from .models import Media, MediaResolution
+
+logger = logging.getLogger(__name__)
+
+MEDIA_CACHE_TIMEOUT = 60 * 60
+MEDIA_FIELDS = ['id', 'slug', 'url', 'mime', 'hash']
+RESOLUTION_FIELDS = ['id', 'width', 'height']
+
+MEDIA_HASH_CHUNK_SIZE = 64 * 1024
+MEDIA_UPLOAD_WORKERS = 4
+
+# the bigger files are sent in a resumable upload of chunks, it must be a multiple of 256KB
+MEDIA_RESUMABLE_UPLOAD_SIZE = 8 * 1024 * 1024
+MEDIA_RESUMABLE_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def _schedule_hits_flush(delay: int) -> None:
+    from .tasks import async_flush_media_hits
+
+    async_flush_media_hits.apply_async(countdown=delay)
+
+
+media_hits = BufferedCounter(Media, 'hits', schedule_flush=_schedule_hits_flush)
+resolution_hits = BufferedCounter(MediaResolution, 'hits', schedule_flush=_schedule_hits_flush)
+
+
+def _get_media_keys(media_id: Optional[int] = None, media_slug: Optional[str] = None) -> list[str]:
+    keys = []
+    if media_id:
+        keys.append(f'media:id:{media_id}')
+
+    if media_slug:
+        keys.append(f'media:slug:{media_slug}')
+
+    return keys
+
+
+def get_cached_media(media_id: Optional[int] = None, media_slug: Optional[str] = None) -> Optional[dict[str, Any]]:
+    """Get the fields required to serve a media, they are read from the cache after the first request."""
+
+    key = _get_media_keys(media_id=media_id, media_slug=media_slug)[0]
+    if (data := cache.get(key)) is not None:
+        return data
+
+    lookup = {'id': media_id} if media_id else {'slug': media_slug}
+    data = Media.objects.filter(**lookup).values(*MEDIA_FIELDS).first()
+    if data is not None:
+        cache.set(key, data, MEDIA_CACHE_TIMEOUT)
+
+    return data
+
+
+def forget_media(media: Media) -> None:
+    keys = _get_media_keys(media_id=media.id, media_slug=media.slug)
+
+    # the media was cached by the slug that it had when it was loaded
+    if (slug := getattr(media, '_cached_slug', None)) and slug != media.slug:
+        keys += _get_media_keys(media_slug=slug)
+
+    cache.delete_many(keys)
+
+
+def _get_resolution_key(hash: str, dimension: str, value: Any) -> str:
+    return f'media-resolution:{hash}:{dimension}:{value}'
+
+
+def get_cached_resolution(hash: str,
+                          width: Optional[str] = None,
+                          height: Optional[str] = None) -> Optional[dict[str, Any]]:
+    """Get the resolution of the media that has the width or height provided."""
+
+    # the dimension is normalized to invalidate the key when the resolution changes
+    dimension, value = ('width', int(width)) if width else ('height', int(height))
+    key = _get_resolution_key(hash, dimension, value)
+
+    if (data := cache.get(key)) is not None:
+        return data
+
+    data = MediaResolution.objects.filter(Q(width=width) | Q(height=height),
+                                          hash=hash).values(*RESOLUTION_FIELDS).first()
+    if data is not None:
+        cache.set(key, data, MEDIA_CACHE_TIMEOUT)
+
+    return data
+
+
+def forget_resolution(resolution: MediaResolution) -> None:
+    cache.delete_many([
+        _get_resolution_key(resolution.hash, 'width', resolution.width),
+        _get_resolution_key(resolution.hash, 'height', resolution.height),
+    ])
+
+
+def get_file_hash(file: UploadedFile) -> str:
+    """Get the sha256 of the file reading it in chunks, the uploaded files over 2.5MB are spooled in the disk."""
+
+    hash = hashlib.sha256()
+    for chunk in file.chunks(MEDIA_HASH_CHUNK_SIZE):
+        hash.update(chunk)
+
+    return hash.hexdigest()
+
+
+def upload_media_files(bucket_name: str, files: dict[str, UploadedFile]) -> dict[str, str]:
+    """Upload the files named by their hash concurrently, it returns the url of each hash."""
+
+    from breathecode.services.google_cloud import Storage
+
+    if not files:
+        return {}
+
+    storage = Storage()
+
+    # the files are created in order, only the transfers run in the workers
+    cloud_files = {hash: storage.file(bucket_name, hash) for hash in files}
+
+    def upload(hash: str) -> tuple[str, str]:
+        file = files[hash]
+        cloud_file = cloud_files[hash]
+
+        if file.size and file.size > MEDIA_RESUMABLE_UPLOAD_SIZE:
+            cloud_file.upload(file, content_type=file.content_type, chunk_size=MEDIA_RESUMABLE_CHUNK_SIZE)
+
+        else:
+            cloud_file.upload(file, content_type=file.content_type)
+
+        return hash, cloud_file.url()
+
+    with ThreadPoolExecutor(max_workers=min(MEDIA_UPLOAD_WORKERS, len(files))) as executor:
+        return dict(executor.map(upload, files))
+
+
+def count_slug_collisions(files: list[tuple[str, str]]) -> dict[tuple[str, str], int]:
+    """
+    Count the media of other files whose slug starts with the slug of each file.
+
+    It receives the slug and the hash of each file and it counts them in a single aggregate query.
+    """
+
+    files = list(dict.fromkeys(files))
+    if not files:
+        return {}
+
+    counts = Media.objects.aggregate(
+        **{
+            f'collisions_{index}': Count('id', filter=Q(slug__startswith=slug) & ~Q(hash=hash))
+            for index, (slug, hash) in enumerate(files)
+        })
+
+    return {file: counts[f'collisions_{index}'] for index, file in enumerate(files)}
+
+
+def get_stored_media(hashes: list[str], academy_id: Optional[int] = None) -> tuple[dict[str, str], dict[str, int]]:
+    """Get the url of the files already stored and the media of the academy that has each hash."""
+
+    urls = {}
+    media = Media.objects.filter(hash__in=hashes).exclude(url=None).order_by('id')
+    for hash, url in media.values_list('hash', 'url'):
+        urls.setdefault(hash, url)
+
+    academy_media = {}
+    media = Media.objects.filter(hash__in=hashes, academy__id=academy_id).order_by('id')
+    for hash, id in media.values_list('hash', 'id'):
+        academy_media.setdefault(hash, id)
+
+    return urls, academy_media
+
+
+def upload_new_media_files(bucket_name: str, files: list[UploadedFile], hashes: list[str],
+                           stored: set[str]) -> dict[str, str]:
+    """Upload the files that are not stored yet, a file repeated in the request is sent once."""
+
+    pending = {}
+    for hash, file in zip(hashes, files):
+        if hash not in stored:
+            pending.setdefault(hash, file)
+
+    return upload_media_files(bucket_name, pending)
@@ -1,5 +1,12 @@
+import logging
 from django.apps import AppConfig
 
+logger = logging.getLogger(__name__)
+
 
 class MediaConfig(AppConfig):
     name = 'breathecode.media'
+
+    def ready(self):
+        logger.debug('Loading media.receivers')
+        from . import receivers  # noqa: F401
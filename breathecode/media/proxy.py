@@ -0,0 +1,288 @@
+"""
+Async streaming proxy that serves the media requested with `mask=true`.
+
+The files are fetched with a pooled aiohttp session that keeps the connections to Google Cloud Storage alive, the
+range and conditional headers are forwarded, and the hot files can be kept in a local disk cache.
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import re
+from typing import Any, AsyncIterator, BinaryIO, Optional
+
+import aiohttp
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
+from django.utils.datastructures import CaseInsensitiveMapping
+
+from capyc.rest_framework.exceptions import ValidationException
+
+__all__ = ['get_session', 'get_disk_cache', 'proxy_media', 'DiskCache']
+
+CHUNK_SIZE = 64 * 1024
+
+FORWARDED_HEADERS = ['Range', 'If-Range', 'If-None-Match', 'If-Modified-Since']
+BANNED_HEADERS = ['transfer-encoding', 'keep-alive', 'connection']
+
+RANGE_REGEX = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+_sessions: dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+
+@functools.lru_cache(maxsize=1)
+def get_disk_cache() -> Optional['DiskCache']:
+    path = os.getenv('MEDIA_PROXY_CACHE_DIR')
+    if not path:
+        return None
+
+    return DiskCache(path,
+                     max_size=int(os.getenv('MEDIA_PROXY_CACHE_SIZE', str(1024 * 1024 * 1024))),
+                     max_object_size=int(os.getenv('MEDIA_PROXY_CACHE_MAX_OBJECT_SIZE', str(20 * 1024 * 1024))))
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Get the session of the running loop, its connections are reused by all the requests served by the loop."""
+
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+
+    if session is None or session.closed:
+        # a session cannot be shared between loops, the ones of the closed loops are dropped
+        for x in [x for x in _sessions if x.is_closed()]:
+            del _sessions[x]
+
+        connector = aiohttp.TCPConnector(limit=int(os.getenv('MEDIA_PROXY_CONNECTIONS', '100')),
+                                         ttl_dns_cache=300,
+                                         keepalive_timeout=30)
+
+        # the content is proxied as it was stored, so it keeps matching its Content-Encoding and Content-Length
+        session = aiohttp.ClientSession(connector=connector,
+                                        auto_decompress=False,
+                                        timeout=aiohttp.ClientTimeout(connect=5, sock_read=30))
+        _sessions[loop] = session
+
+    return session
+
+
+class DiskCache:
+    """
+    LRU cache of the proxied files in the local disk.
+
+    The media files are named by their hash in the bucket, so a cached copy does not get stale, the least recently
+    served files are removed when the cache grows over `max_size`.
+    """
+
+    def __init__(self, path: str, max_size: int, max_object_size: int) -> None:
+        self.path = path
+        self.max_size = max_size
+        self.max_object_size = max_object_size
+
+        os.makedirs(path, exist_ok=True)
+
+    def _get_paths(self, url: str) -> tuple[str, str]:
+        name = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.path, name), os.path.join(self.path, name + '.json')
+
+    def get(self, url: str) -> Optional[tuple[BinaryIO, dict[str, Any]]]:
+        """Open the cached file and get its headers, it marks the file as recently used."""
+
+        path, meta_path = self._get_paths(url)
+
+        try:
+            with open(meta_path) as meta:
+                headers = json.load(meta)
+
+            # the open file can be read even if it is evicted meanwhile
+            f = open(path, 'rb')
+            os.utime(path)
+
+        except (OSError, ValueError):
+            return None
+
+        return f, headers
+
+    def can_store(self, size: Optional[int]) -> bool:
+        return size is not None and size <= self.max_object_size
+
+    def get_temp_path(self, url: str) -> str:
+        path, _ = self._get_paths(url)
+        return f'{path}.{os.getpid()}.{id(asyncio.current_task())}.tmp'
+
+    def store(self, url: str, temp_path: str, headers: dict[str, str]) -> None:
+        """Move the downloaded file to the cache, the metadata is written last because it marks the entry as ready."""
+
+        path, meta_path = self._get_paths(url)
+
+        os.replace(temp_path, path)
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(headers, f)
+
+        os.replace(meta_path + '.tmp', meta_path)
+        self.evict()
+
+    def evict(self) -> None:
+        entries = []
+        total = 0
+
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.name.endswith('.json') or entry.name.endswith('.tmp'):
+                    continue
+
+                try:
+                    stat = entry.stat()
+
+                except OSError:
+                    continue
+
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+
+            for x in [path + '.json', path]:
+                try:
+                    os.remove(x)
+
+                except OSError:
+                    pass
+
+            total -= size
+
+
+def _parse_range(value: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """Get the first and last byte of a single range, multiple ranges are served as the whole file."""
+
+    if not value or not (match := RANGE_REGEX.match(value.strip())):
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+
+    if not start:
+        return max(size - int(end), 0), size - 1
+
+    return int(start), min(int(end), size - 1) if end else size - 1
+
+
+def _etag_matches(value: Optional[str], etag: Optional[str]) -> bool:
+    if not value or not etag:
+        return False
+
+    tags = [x.strip().removeprefix('W/') for x in value.split(',')]
+    return '*' in tags or etag.removeprefix('W/') in tags
+
+
+async def _read_file(f: BinaryIO, start: int, length: int) -> AsyncIterator[bytes]:
+    try:
+        await asyncio.to_thread(f.seek, start)
+
+        while length > 0:
+            chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+
+            length -= len(chunk)
+            yield chunk
+
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+def _serve_cached_file(request: HttpRequest, f: BinaryIO, headers: dict[str, str]) -> HttpResponse:
+    lookup = CaseInsensitiveMapping(headers)
+    size = int(lookup['Content-Length'])
+    etag = lookup.get('ETag')
+    last_modified = lookup.get('Last-Modified')
+
+    if _etag_matches(request.headers.get('If-None-Match'), etag):
+        f.close()
+
+        not_modified = {'ETag': etag}
+        if last_modified:
+            not_modified['Last-Modified'] = last_modified
+
+        return HttpResponse(status=304, headers=not_modified)
+
+    status = 200
+    start, end = 0, size - 1
+    headers = {**headers, 'Accept-Ranges': 'bytes'}
+
+    if_range = request.headers.get('If-Range')
+    byte_range = _parse_range(request.headers.get('Range'), size)
+
+    if byte_range and (not if_range or if_range in [etag, last_modified]):
+        start, end = byte_range
+        if start > end or start >= size:
+            f.close()
+            return HttpResponse(status=416, headers={'Content-Range': f'bytes */{size}'})
+
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        headers['Content-Length'] = str(end - start + 1)
+
+    return StreamingHttpResponse(_read_file(f, start, end - start + 1), status=status, headers=headers)
+
+
+async def _stream(response: aiohttp.ClientResponse,
+                  disk_cache: Optional[DiskCache] = None,
+                  url: Optional[str] = None,
+                  headers: Optional[dict[str, str]] = None) -> AsyncIterator[bytes]:
+    temp_path = disk_cache.get_temp_path(url) if disk_cache else None
+    f = await asyncio.to_thread(open, temp_path, 'wb') if temp_path else None
+    completed = False
+
+    try:
+        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+            if f:
+                await asyncio.to_thread(f.write, chunk)
+
+            yield chunk
+
+        completed = True
+
+    finally:
+        response.release()
+
+        if f:
+            await asyncio.to_thread(f.close)
+
+            # the file is only cached if the client got it whole, otherwise it could be truncated
+            if completed:
+                await asyncio.to_thread(disk_cache.store, url, temp_path, headers)
+
+            else:
+                await asyncio.to_thread(os.remove, temp_path)
+
+
+async def proxy_media(request: HttpRequest, url: str) -> HttpResponse:
+    """Stream the file from the url without blocking a worker during the transfer."""
+
+    disk_cache = get_disk_cache()
+    if disk_cache and (cached := await asyncio.to_thread(disk_cache.get, url)):
+        return _serve_cached_file(request, *cached)
+
+    forwarded = {x: request.headers[x] for x in FORWARDED_HEADERS if x in request.headers}
+
+    try:
+        response = await get_session().get(url, headers=forwarded)
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise ValidationException(f'The media could not be fetched: {e}', code=502, slug='media-unreachable')
+
+    headers = {str(k): v for k, v in response.headers.items() if k.lower() not in BANNED_HEADERS}
+
+    # only the complete files are cached, the partial and conditional responses come from the requested headers
+    if disk_cache and response.status == 200 and not forwarded and disk_cache.can_store(response.content_length):
+        return StreamingHttpResponse(_stream(response, disk_cache, url, headers),
+                                     status=response.status,
+                                     reason=response.reason,
+                                     headers=headers)
+
+    return StreamingHttpResponse(_stream(response), status=response.status, reason=response.reason, headers=headers)
@@ -0,0 +1,29 @@
+import logging
+
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import actions
+from .models import Media, MediaResolution
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_init, sender=Media)
+def keep_media_slug(sender, instance: Media, **kwargs):
+    # a deferred slug is not loaded
+    instance._cached_slug = instance.__dict__.get('slug')
+
+
+@receiver(post_save, sender=Media)
+@receiver(post_delete, sender=Media)
+def post_media_changed(sender, instance: Media, **kwargs):
+    logger.debug(f'Media {instance.slug} changed, removing it from the cache')
+    actions.forget_media(instance)
+    instance._cached_slug = instance.slug
+
+
+@receiver(post_save, sender=MediaResolution)
+@receiver(post_delete, sender=MediaResolution)
+def post_resolution_changed(sender, instance: MediaResolution, **kwargs):
+    actions.forget_resolution(instance)
@@ -0,0 +1,19 @@
+import logging
+
+from task_manager.django.decorators import task
+
+from breathecode.utils.decorators import TaskPriority
+
+from . import actions
+
+logger = logging.getLogger(__name__)
+
+
+@task(priority=TaskPriority.BACKGROUND.value)
+def async_flush_media_hits(**_):
+    logger.info('Saving the buffered media hits')
+
+    media_hits = actions.media_hits.flush()
+    resolution_hits = actions.resolution_hits.flush()
+
+    logger.info(f'{media_hits} media hits and {resolution_hits} resolution hits were saved')
@@ -0,0 +1,53 @@
+"""
+Test count_slug_collisions
+"""
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from breathecode.media import actions
+from breathecode.tests.mixins.breathecode_mixin.breathecode import Breathecode
+
+# enable this file to use the database
+pytestmark = pytest.mark.usefixtures('db')
+
+
+def test_without_files():
+    with CaptureQueriesContext(connection) as context:
+        assert actions.count_slug_collisions([]) == {}
+
+    assert len(context.captured_queries) == 0
+
+
+def test_the_collisions_are_counted_in_one_query(bc: Breathecode):
+    media = [
+        {
+            'slug': 'filename-png',
+            'hash': 'a',
+        },
+        {
+            'slug': 'filename-png-ii',
+            'hash': 'b',
+        },
+        {
+            'slug': 'other-png',
+            'hash': 'c',
+        },
+    ]
+    bc.database.create(media=media)
+
+    files = [('filename-png', 'a'), ('filename-png', 'z'), ('other-png', 'z'), ('', 'z'), ('filename-png', 'a')]
+
+    with CaptureQueriesContext(connection) as context:
+        result = actions.count_slug_collisions(files)
+
+    assert result == {
+        ('filename-png', 'a'): 1,
+        ('filename-png', 'z'): 2,
+        ('other-png', 'z'): 1,
+        # an empty slug is counted too, the rows are not loaded
+        ('', 'z'): 3,
+    }
+
+    assert len(context.captured_queries) == 1
+    assert 'COUNT' in context.captured_queries[0]['sql']
@@ -0,0 +1,52 @@
+"""
+Test forget_media
+"""
+import pytest
+from django.core.cache import cache
+
+from breathecode.media import actions
+from breathecode.media.models import Media
+from breathecode.tests.mixins.breathecode_mixin.breathecode import Breathecode
+
+# enable this file to use the database
+pytestmark = pytest.mark.usefixtures('db')
+
+
+def test_the_media_is_forgotten(bc: Breathecode, enable_signals):
+    enable_signals()
+
+    model = bc.database.create(media={'slug': 'potato'})
+
+    assert actions.get_cached_media(media_id=model.media.id)['slug'] == 'potato'
+    assert actions.get_cached_media(media_slug='potato')['slug'] == 'potato'
+
+    media = Media.objects.get(id=model.media.id)
+    media.url = 'https://potato.io/new'
+    media.save()
+
+    assert cache.get('media:id:1') is None
+    assert cache.get('media:slug:potato') is None
+    assert actions.get_cached_media(media_slug='potato')['url'] == 'https://potato.io/new'
+
+
+def test_the_old_slug_is_forgotten(bc: Breathecode, enable_signals):
+    enable_signals()
+
+    model = bc.database.create(media={'slug': 'potato'})
+
+    assert actions.get_cached_media(media_id=model.media.id)['slug'] == 'potato'
+    assert actions.get_cached_media(media_slug='potato')['slug'] == 'potato'
+
+    media = Media.objects.get(id=model.media.id)
+    media.slug = 'tomato'
+    media.save()
+
+    assert actions.get_cached_media(media_slug='potato') is None
+    assert actions.get_cached_media(media_slug='tomato')['slug'] == 'tomato'
+
+    # the slug saved is the one forgotten by the next change
+    media.slug = 'onion'
+    media.save()
+
+    assert actions.get_cached_media(media_slug='tomato') is None
+    assert actions.get_cached_media(media_id=model.media.id)['slug'] == 'onion'
@@ -1,19 +1,60 @@
 """
 Test /answer
 """
+import os
+import tempfile
+
+from asgiref.sync import async_to_sync
 from breathecode.tests.mocks.requests import apply_requests_request_mock
-from unittest.mock import MagicMock, call, patch
+from unittest.mock import AsyncMock, MagicMock, call, patch
 from django.urls.base import reverse_lazy
 from rest_framework import status
 from breathecode.tests.mocks import (
     REQUESTS_PATH,
     apply_requests_get_mock,
 )
+from breathecode.media.proxy import DiskCache
+from breathecode.media.tasks import async_flush_media_hits
 from ..mixins import MediaTestCase
 
 RESIZE_IMAGE_URL = 'https://us-central1-labor-day-story.cloudfunctions.net/resize-image'
 
 
+class StreamReaderMock:
+
+    def __init__(self, data):
+        self.data = data
+
+    async def iter_chunked(self, size):
+        for i in range(0, len(self.data), size):
+            yield self.data[i:i + size]
+
+
+class ResponseMock:
+
+    def __init__(self, data, status=200, headers={}):
+        self.content = StreamReaderMock(data)
+        self.content_length = len(data)
+        self.status = status
+        self.reason = 'OK'
+        self.headers = headers
+        self.release = MagicMock()
+
+
+def read_streaming_content(response):
+
+    async def read():
+        return b''.join([x async for x in response.streaming_content])
+
+    return async_to_sync(read)()
+
+
+def session_mock(*responses):
+    session = MagicMock()
+    session.get = AsyncMock(side_effect=list(responses))
+    return session
+
+
 def apply_get_env(configuration={}):
 
     def get_env(key, value=None):
@@ -101,6 +142,7 @@ class MediaTestSuite(MediaTestCase):
 
         self.assertEqual(response.url, model['media'].url)
         self.assertEqual(response.status_code, status.HTTP_301_MOVED_PERMANENTLY)
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
@@ -113,23 +155,169 @@ class MediaTestSuite(MediaTestCase):
             'GOOGLE_PROJECT_ID': 'labor-day-story',
             'MEDIA_GALLERY_BUCKET': 'bucket-name',
         })))
-    @patch(REQUESTS_PATH['get'], apply_requests_get_mock([(200, 'https://potato.io', 'ok')]))
+    def test_file_id__hits_are_buffered(self):
+        """Test /answer without auth"""
+        self.headers(academy=1)
+        media_kwargs = {'url': 'https://potato.io/harcoded', 'mime': 'image/png', 'hash': 'harcoded'}
+        media_resolution_kwargs = {'width': 1000, 'height': 1000, 'hash': 'harcoded'}
+        model = self.generate_models(academy=True,
+                                     media=True,
+                                     media_resolution=True,
+                                     media_kwargs=media_kwargs,
+                                     media_resolution_kwargs=media_resolution_kwargs)
+
+        url = reverse_lazy('media:file_id', kwargs={'media_id': 1}) + '?width=1000'
+        self.client.get(url)
+
+        # the media and the resolution are read from the cache
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+
+        self.assertEqual(response.url, 'https://potato.io/harcoded-1000x1000')
+        self.assertEqual(response.status_code, status.HTTP_301_MOVED_PERMANENTLY)
+
+        self.assertEqual(self.all_media_dict(), [self.model_to_dict(model, 'media')])
+        self.assertEqual(self.all_media_resolution_dict(), [self.model_to_dict(model, 'media_resolution')])
+
+        async_flush_media_hits.delay()
+
+        self.assertEqual(self.all_media_dict(), [{
+            **self.model_to_dict(model, 'media'),
+            'hits': model['media'].hits + 2,
+        }])
+        self.assertEqual(self.all_media_resolution_dict(),
+                         [{
+                             **self.model_to_dict(model, 'media_resolution'),
+                             'hits': model['media_resolution'].hits + 2,
+                         }])
+
+    @patch(
+        'os.getenv',
+        MagicMock(side_effect=apply_get_env({
+            'GOOGLE_PROJECT_ID': 'labor-day-story',
+            'MEDIA_GALLERY_BUCKET': 'bucket-name',
+        })))
     def test_file_id_with_mask_true(self):
         """Test /answer without auth"""
         self.headers(academy=1)
         media_kwargs = {'url': 'https://potato.io'}
         model = self.generate_models(academy=True, media=True, media_kwargs=media_kwargs)
         url = reverse_lazy('media:file_id', kwargs={'media_id': 1}) + '?mask=true'
-        response = self.client.get(url)
+        session = session_mock(ResponseMock(b'ok', headers={'Content-Type': 'text/plain', 'Connection': 'keep-alive'}))
 
-        self.assertEqual(response.getvalue().decode('utf-8'), 'ok')
+        with patch('breathecode.media.proxy.get_session', MagicMock(return_value=session)):
+            response = self.client.get(url)
+
+        self.assertEqual(read_streaming_content(response), b'ok')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertFalse(response.has_header('Connection'))
+        self.assertEqual(session.get.call_args_list, [call('https://potato.io', headers={})])
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
         }])
         self.assertEqual(self.all_media_resolution_dict(), [])
 
+    @patch(
+        'os.getenv',
+        MagicMock(side_effect=apply_get_env({
+            'GOOGLE_PROJECT_ID': 'labor-day-story',
+            'MEDIA_GALLERY_BUCKET': 'bucket-name',
+        })))
+    def test_file_id_with_mask_true__with_range(self):
+        """Test /answer without auth"""
+        self.headers(academy=1)
+        media_kwargs = {'url': 'https://potato.io'}
+        self.generate_models(academy=True, media=True, media_kwargs=media_kwargs)
+        url = reverse_lazy('media:file_id', kwargs={'media_id': 1}) + '?mask=true'
+        session = session_mock(ResponseMock(b'o', status=206, headers={'Content-Range': 'bytes 0-0/2'}))
+
+        with patch('breathecode.media.proxy.get_session', MagicMock(return_value=session)):
+            response = self.client.get(url, HTTP_RANGE='bytes=0-0', HTTP_IF_NONE_MATCH='"abc"')
+
+        self.assertEqual(read_streaming_content(response), b'o')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], 'bytes 0-0/2')
+        self.assertEqual(session.get.call_args_list, [
+            call('https://potato.io', headers={
+                'Range': 'bytes=0-0',
+                'If-None-Match': '"abc"',
+            }),
+        ])
+
+    @patch(
+        'os.getenv',
+        MagicMock(side_effect=apply_get_env({
+            'GOOGLE_PROJECT_ID': 'labor-day-story',
+            'MEDIA_GALLERY_BUCKET': 'bucket-name',
+        })))
+    def test_file_id_with_mask_true__with_disk_cache(self):
+        """Test /answer without auth"""
+        self.headers(academy=1)
+        media_kwargs = {'url': 'https://potato.io'}
+        self.generate_models(academy=True, media=True, media_kwargs=media_kwargs)
+        url = reverse_lazy('media:file_id', kwargs={'media_id': 1}) + '?mask=true'
+        headers = {'Content-Type': 'text/plain', 'Content-Length': '2', 'ETag': '"abc"'}
+        session = session_mock(ResponseMock(b'ok', headers=headers))
+
+        with tempfile.TemporaryDirectory() as path, \
+                patch('breathecode.media.proxy.get_session', MagicMock(return_value=session)), \
+                patch('breathecode.media.proxy.get_disk_cache', MagicMock(return_value=DiskCache(path, 1024, 1024))):
+            response1 = self.client.get(url)
+            content1 = read_streaming_content(response1)
+
+            response2 = self.client.get(url)
+            content2 = read_streaming_content(response2)
+
+            response3 = self.client.get(url, HTTP_RANGE='bytes=1-')
+            content3 = read_streaming_content(response3)
+
+            response4 = self.client.get(url, HTTP_IF_NONE_MATCH='"abc"')
+
+        self.assertEqual(content1, b'ok')
+        self.assertEqual(response1.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(content2, b'ok')
+        self.assertEqual(response2.status_code, status.HTTP_200_OK)
+        self.assertEqual(response2['ETag'], '"abc"')
+        self.assertEqual(response2['Accept-Ranges'], 'bytes')
+
+        self.assertEqual(content3, b'k')
+        self.assertEqual(response3.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response3['Content-Range'], 'bytes 1-1/2')
+        self.assertEqual(response3['Content-Length'], '1')
+
+        self.assertEqual(response4.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # only the first request reached the bucket
+        self.assertEqual(session.get.call_args_list, [call('https://potato.io', headers={})])
+
+    def test_disk_cache__evicts_the_least_recently_used(self):
+        """Test /answer without auth"""
+        with tempfile.TemporaryDirectory() as path:
+            disk_cache = DiskCache(path, max_size=4, max_object_size=4)
+
+            for i, url in enumerate(['https://a.io', 'https://b.io', 'https://c.io']):
+                temp_path = os.path.join(path, f'{i}.tmp')
+                with open(temp_path, 'wb') as f:
+                    f.write(b'12')
+
+                disk_cache.store(url, temp_path, {'Content-Length': '2'})
+
+                # the files get consecutive access times
+                os.utime(disk_cache._get_paths(url)[0], (i, i))
+
+            # it was evicted when the third file was stored
+            self.assertEqual(disk_cache.get('https://a.io'), None)
+
+            for url in ['https://b.io', 'https://c.io']:
+                f, headers = disk_cache.get(url)
+                f.close()
+
+                self.assertEqual(headers, {'Content-Length': '2'})
+
     """
     🔽🔽🔽 Width in querystring
     """
@@ -192,6 +380,7 @@ class MediaTestSuite(MediaTestCase):
                  timeout=2)
         ])
 
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
@@ -230,6 +419,7 @@ class MediaTestSuite(MediaTestCase):
         self.assertEqual(response.status_code, status.HTTP_301_MOVED_PERMANENTLY)
 
         self.assertEqual(mock.call_args_list, [])
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
@@ -282,6 +472,7 @@ class MediaTestSuite(MediaTestCase):
                  timeout=2)
         ])
 
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
@@ -330,6 +521,7 @@ class MediaTestSuite(MediaTestCase):
                  timeout=2)
         ])
 
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
@@ -399,6 +591,7 @@ class MediaTestSuite(MediaTestCase):
                  timeout=2)
         ])
 
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
@@ -437,6 +630,7 @@ class MediaTestSuite(MediaTestCase):
         self.assertEqual(response.status_code, status.HTTP_301_MOVED_PERMANENTLY)
 
         self.assertEqual(mock.call_args_list, [])
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
@@ -489,6 +683,7 @@ class MediaTestSuite(MediaTestCase):
                  timeout=2)
         ])
 
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
@@ -537,6 +732,7 @@ class MediaTestSuite(MediaTestCase):
                  timeout=2)
         ])
 
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
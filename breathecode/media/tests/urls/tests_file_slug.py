@@ -1,16 +1,53 @@
 """
 Test /answer
 """
+from asgiref.sync import async_to_sync
 from breathecode.tests.mocks.requests import apply_requests_request_mock
-from unittest.mock import MagicMock, call, patch
+from unittest.mock import AsyncMock, MagicMock, call, patch
 from django.urls.base import reverse_lazy
 from rest_framework import status
 from breathecode.tests.mocks import REQUESTS_PATH, apply_requests_get_mock
+from breathecode.media.tasks import async_flush_media_hits
 from ..mixins import MediaTestCase
 
 RESIZE_IMAGE_URL = 'https://us-central1-labor-day-story.cloudfunctions.net/resize-image'
 
 
+class StreamReaderMock:
+
+    def __init__(self, data):
+        self.data = data
+
+    async def iter_chunked(self, size):
+        for i in range(0, len(self.data), size):
+            yield self.data[i:i + size]
+
+
+class ResponseMock:
+
+    def __init__(self, data, status=200, headers={}):
+        self.content = StreamReaderMock(data)
+        self.content_length = len(data)
+        self.status = status
+        self.reason = 'OK'
+        self.headers = headers
+        self.release = MagicMock()
+
+
+def read_streaming_content(response):
+
+    async def read():
+        return b''.join([x async for x in response.streaming_content])
+
+    return async_to_sync(read)()
+
+
+def session_mock(*responses):
+    session = MagicMock()
+    session.get = AsyncMock(side_effect=list(responses))
+    return session
+
+
 def apply_get_env(configuration={}):
 
     def get_env(key, value=None):
@@ -97,13 +134,13 @@ class MediaTestSuite(MediaTestCase):
 
         self.assertEqual(response.url, model['media'].url)
         self.assertEqual(response.status_code, status.HTTP_301_MOVED_PERMANENTLY)
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
         }])
         self.assertEqual(self.all_media_resolution_dict(), [])
 
-    @patch(REQUESTS_PATH['get'], apply_requests_get_mock([(200, 'https://potato.io', 'ok')]))
     @patch(
         'os.getenv',
         MagicMock(side_effect=apply_get_env({
@@ -116,10 +153,17 @@ class MediaTestSuite(MediaTestCase):
         media_kwargs = {'url': 'https://potato.io'}
         model = self.generate_models(academy=True, media=True, media_kwargs=media_kwargs)
         url = reverse_lazy('media:file_slug', kwargs={'media_slug': model['media'].slug}) + '?mask=true'
-        response = self.client.get(url)
+        session = session_mock(ResponseMock(b'ok', headers={'Content-Type': 'text/plain', 'Connection': 'keep-alive'}))
+
+        with patch('breathecode.media.proxy.get_session', MagicMock(return_value=session)):
+            response = self.client.get(url)
 
-        self.assertEqual(response.getvalue().decode('utf-8'), 'ok')
+        self.assertEqual(read_streaming_content(response), b'ok')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertFalse(response.has_header('Connection'))
+        self.assertEqual(session.get.call_args_list, [call('https://potato.io', headers={})])
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
@@ -188,6 +232,7 @@ class MediaTestSuite(MediaTestCase):
                  timeout=2)
         ])
 
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
@@ -226,6 +271,7 @@ class MediaTestSuite(MediaTestCase):
         self.assertEqual(response.status_code, status.HTTP_301_MOVED_PERMANENTLY)
 
         self.assertEqual(mock.call_args_list, [])
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
@@ -278,6 +324,7 @@ class MediaTestSuite(MediaTestCase):
                  timeout=2)
         ])
 
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
@@ -328,6 +375,7 @@ class MediaTestSuite(MediaTestCase):
                      timeout=2)
             ]))
 
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
@@ -397,6 +445,7 @@ class MediaTestSuite(MediaTestCase):
                  timeout=2)
         ])
 
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
@@ -435,6 +484,7 @@ class MediaTestSuite(MediaTestCase):
         self.assertEqual(response.status_code, status.HTTP_301_MOVED_PERMANENTLY)
 
         self.assertEqual(mock.call_args_list, [])
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
@@ -487,6 +537,7 @@ class MediaTestSuite(MediaTestCase):
                  timeout=2)
         ])
 
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
@@ -535,6 +586,7 @@ class MediaTestSuite(MediaTestCase):
                  timeout=2)
         ])
 
+        async_flush_media_hits.delay()
         self.assertEqual(self.all_media_dict(), [{
             **self.model_to_dict(model, 'media'),
             'hits': model['media'].hits + 1,
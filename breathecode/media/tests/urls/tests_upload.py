@@ -578,14 +578,16 @@ class MediaTestSuite(MediaTestCase):
                              'url': 'https://storage.cloud.google.com/media-breathecode/hardcoded_url'
                          }])
 
-        self.assertEqual(Storage.__init__.call_args_list, [call(), call()])
+        self.assertEqual(Storage.__init__.call_args_list, [call()])
         self.assertEqual(File.__init__.call_args_list, [
             call(Storage().client.bucket('bucket'), hash1),
             call(Storage().client.bucket('bucket'), hash2),
         ])
 
-        args1, kwargs1 = File.upload.call_args_list[0]
-        args2, kwargs2 = File.upload.call_args_list[1]
+        # the files are uploaded concurrently
+        uploads = {x[0][0].name: x for x in File.upload.call_args_list}
+        args1, kwargs1 = uploads[os.path.basename(file1.name)]
+        args2, kwargs2 = uploads[os.path.basename(file2.name)]
 
         self.assertEqual(len(File.upload.call_args_list), 2)
         self.assertEqual(len(args1), 1)
@@ -671,6 +673,91 @@ class MediaTestSuite(MediaTestCase):
 
             self.assertEqual(File.url.call_args_list, [call()])
 
+    @patch.multiple('breathecode.services.google_cloud.Storage',
+                    __init__=MagicMock(return_value=None),
+                    client=PropertyMock(),
+                    create=True)
+    @patch.multiple('breathecode.services.google_cloud.File',
+                    __init__=MagicMock(return_value=None),
+                    bucket=PropertyMock(),
+                    file_name=PropertyMock(),
+                    upload=MagicMock(),
+                    url=MagicMock(return_value='https://storage.cloud.google.com/media-breathecode/hardcoded_url'),
+                    create=True)
+    def test_upload_same_file_twice__is_uploaded_once(self):
+        from breathecode.services.google_cloud import File, Storage
+
+        self.headers(academy=1)
+
+        model = self.generate_models(authenticate=True, profile_academy=True, capability='crud_media', role='potato')
+        url = reverse_lazy('media:upload')
+
+        file = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
+        file.write(os.urandom(1024))
+        file.close()
+
+        with open(file.name, 'rb') as data:
+            hash = hashlib.sha256(data.read()).hexdigest()
+
+        file1 = open(file.name, 'rb')
+        file2 = open(file.name, 'rb')
+
+        data = {'name': ['filename1.png', 'filename2.png'], 'file': [file1, file2]}
+        response = self.client.put(url, data, format='multipart')
+        json = response.json()
+
+        file1.close()
+        file2.close()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(x['hash'], x['slug'], x['url']) for x in json], [
+            (hash, 'filename1-png', 'https://storage.cloud.google.com/media-breathecode/hardcoded_url'),
+            (hash, 'filename2-png', 'https://storage.cloud.google.com/media-breathecode/hardcoded_url'),
+        ])
+
+        self.assertEqual(Storage.__init__.call_args_list, [call()])
+        self.assertEqual(File.__init__.call_args_list, [
+            call(Storage().client.bucket('bucket'), hash),
+        ])
+        self.assertEqual(len(File.upload.call_args_list), 1)
+        self.assertEqual(File.url.call_args_list, [call()])
+
+    @patch.multiple('breathecode.services.google_cloud.Storage',
+                    __init__=MagicMock(return_value=None),
+                    client=PropertyMock(),
+                    create=True)
+    @patch.multiple('breathecode.services.google_cloud.File',
+                    __init__=MagicMock(return_value=None),
+                    bucket=PropertyMock(),
+                    file_name=PropertyMock(),
+                    upload=MagicMock(),
+                    url=MagicMock(return_value='https://storage.cloud.google.com/media-breathecode/hardcoded_url'),
+                    create=True)
+    @patch('breathecode.media.actions.MEDIA_RESUMABLE_UPLOAD_SIZE', 512)
+    def test_upload_big_file__is_resumable(self):
+        from breathecode.media.actions import MEDIA_RESUMABLE_CHUNK_SIZE
+        from breathecode.services.google_cloud import File
+
+        self.headers(academy=1)
+
+        model = self.generate_models(authenticate=True, profile_academy=True, capability='crud_media', role='potato')
+        url = reverse_lazy('media:upload')
+
+        file = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
+        file.write(os.urandom(1024))
+        file.close()
+
+        with open(file.name, 'rb') as data:
+            response = self.client.put(url, {'name': 'filename.png', 'file': data})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        args, kwargs = File.upload.call_args_list[0]
+
+        self.assertEqual(len(File.upload.call_args_list), 1)
+        self.assertEqual(args[0].size, 1024)
+        self.assertEqual(kwargs, {'content_type': 'image/png', 'chunk_size': MEDIA_RESUMABLE_CHUNK_SIZE})
+
     @patch.multiple('breathecode.services.google_cloud.Storage',
                     __init__=MagicMock(return_value=None),
                     client=PropertyMock(),
@@ -1,24 +1,24 @@
 # from breathecode.media.schemas import MediaSchema
 import datetime
-import hashlib
 import logging
 import os
 
-import requests
+from adrf.views import APIView
+from asgiref.sync import sync_to_async
 from circuitbreaker import CircuitBreakerError
 from django.db.models import Q
-from django.http import StreamingHttpResponse
 from django.shortcuts import redirect
 from rest_framework import status
 from rest_framework.parsers import FileUploadParser, MultiPartParser
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from rest_framework.views import APIView
 from rest_framework.viewsets import ViewSet
 from slugify import slugify
 
 from breathecode.authenticate.actions import get_user_language
+from breathecode.media import actions
 from breathecode.media.models import Category, Media, MediaResolution
+from breathecode.media.proxy import proxy_media
 from breathecode.media.schemas import FileSchema, MediaSchema
 from breathecode.media.serializers import (
     CategorySerializer,
@@ -232,37 +232,36 @@ class MediaView(ViewSet, GenerateLookupsMixin):
                 raise ValidationException('You may not delete media that belongs to a different academy',
                                           slug='academy-different-than-media-academy')
 
+            file_names = []
             for item in items:
                 url = item.url
                 hash = item.hash
                 item.delete()
 
                 if not Media.objects.filter(hash=hash).count():
-                    try:
-                        storage = Storage()
-                        file = storage.file(media_gallery_bucket(), url)
-                        file.delete()
-
-                    except CircuitBreakerError:
-                        raise ValidationException(translation(
-                            lang,
-                            en='The circuit breaker is open due to an error, please try again later',
-                            es='El circuit breaker está abierto debido a un error, por favor intente más tarde',
-                            slug='circuit-breaker-open'),
-                                                  slug='circuit-breaker-open',
-                                                  data={'service': 'Google Cloud Storage'},
-                                                  silent=True,
-                                                  code=503)
-
-                    resolution = MediaResolution.objects.filter(hash=hash).first()
-                    if resolution:
-                        resolution_url = f'{url}-{resolution.width}x{resolution.height}'
-                        resolution_file = storage.file(media_gallery_bucket(), resolution_url)
-                        resolution_file.delete()
-
-                        resolutions = MediaResolution.objects.filter(hash=hash)
-                        for resolution in resolutions:
-                            resolution.delete()
+                    file_names.append(url)
+
+                    resolutions = MediaResolution.objects.filter(hash=hash)
+                    for resolution in resolutions:
+                        file_names.append(f'{url}-{resolution.width}x{resolution.height}')
+                        resolution.delete()
+
+            # the files are removed from the bucket together
+            if file_names:
+                try:
+                    storage = Storage()
+                    storage.files(media_gallery_bucket(), file_names).delete()
+
+                except CircuitBreakerError:
+                    raise ValidationException(translation(
+                        lang,
+                        en='The circuit breaker is open due to an error, please try again later',
+                        es='El circuit breaker está abierto debido a un error, por favor intente más tarde',
+                        slug='circuit-breaker-open'),
+                                              slug='circuit-breaker-open',
+                                              data={'service': 'Google Cloud Storage'},
+                                              silent=True,
+                                              code=503)
 
         return Response(None, status=status.HTTP_204_NO_CONTENT)
 
@@ -415,8 +414,6 @@ class UploadView(APIView):
     # upload was separated because in one moment I think that the serializer
     # not should get many create and update operations together
     def upload(self, request, lang, academy_id=None, update=False):
-        from ..services.google_cloud import Storage
-
         files = request.data.getlist('file')
         names = request.data.getlist('name')
         result = {
@@ -448,14 +445,34 @@ class UploadView(APIView):
                     f'You can upload only files on the following formats: {",".join(MIME_ALLOW)}, got {file.content_type}',
                     code=400)
 
+        hashes = [actions.get_file_hash(file) for file in files]
+        base_slugs = [slugify(name) for name in names]
+
+        # the collisions, the duplicates and the media of the academy are resolved once for all the files
+        collisions = actions.count_slug_collisions(list(zip(base_slugs, hashes)))
+        urls, academy_media = actions.get_stored_media(hashes, academy_id)
+
+        try:
+            uploaded = actions.upload_new_media_files(media_gallery_bucket(), files, hashes, {*urls, *academy_media})
+
+        except CircuitBreakerError:
+            raise ValidationException(translation(
+                lang,
+                en='The circuit breaker is open due to an error, please try again later',
+                es='El circuit breaker está abierto debido a un error, por favor intente más tarde',
+                slug='circuit-breaker-open'),
+                                      slug='circuit-breaker-open',
+                                      data={'service': 'Google Cloud Storage'},
+                                      silent=True,
+                                      code=503)
+
         for index in range(0, len(files)):
             file = files[index]
-            name = names[index] if len(names) else file.name
-            file_bytes = file.read()
-            hash = hashlib.sha256(file_bytes).hexdigest()
-            slug = slugify(name)
+            name = names[index]
+            hash = hashes[index]
+            slug = base_slugs[index]
 
-            slug_number = Media.objects.filter(slug__startswith=slug).exclude(hash=hash).count() + 1
+            slug_number = collisions[(slug, hash)] + 1
             if slug_number > 1:
                 while True:
                     roman_number = num_to_roman(slug_number, lower=True)
@@ -480,42 +497,18 @@ class UploadView(APIView):
             elif 'Categories' in request.headers:
                 data['categories'] = request.headers['Categories'].split(',')
 
-            media = Media.objects.filter(hash=hash, academy__id=academy_id).first()
-            if media:
-                data['id'] = media.id
+            if hash in academy_media:
+                data['id'] = academy_media[hash]
 
-                url = Media.objects.filter(hash=hash).values_list('url', flat=True).first()
-                if url:
-                    data['url'] = url
+            if hash in urls:
+                data['url'] = urls[hash]
 
-            else:
-                url = Media.objects.filter(hash=hash).values_list('url', flat=True).first()
-                if url:
-                    data['url'] = url
-
-                else:
-                    # upload file section
-                    try:
-                        storage = Storage()
-                        cloud_file = storage.file(media_gallery_bucket(), hash)
-                        cloud_file.upload(file, content_type=file.content_type)
-                        data['url'] = cloud_file.url()
-                        data['thumbnail'] = data['url'] + '-thumbnail'
-
-                    except CircuitBreakerError:
-                        raise ValidationException(translation(
-                            lang,
-                            en='The circuit breaker is open due to an error, please try again later',
-                            es='El circuit breaker está abierto debido a un error, por favor intente más tarde',
-                            slug='circuit-breaker-open'),
-                                                  slug='circuit-breaker-open',
-                                                  data={'service': 'Google Cloud Storage'},
-                                                  silent=True,
-                                                  code=503)
+            elif hash in uploaded:
+                data['url'] = uploaded[hash]
+                data['thumbnail'] = data['url'] + '-thumbnail'
 
             result['data'].append(data)
 
-        from django.db.models import Q
         query = None
         datas_with_id = [x for x in result['data'] if 'id' in x]
         for x in datas_with_id:
@@ -550,21 +543,19 @@ class MaskingUrlView(APIView):
     permission_classes = [AllowAny]
     schema = FileSchema()
 
-    def get(self, request, media_id=None, media_slug=None):
-        lookups = {}
-        if media_id:
-            lookups['id'] = media_id
-        elif media_slug:
-            lookups['slug'] = media_slug.split('.')[0]  #ignore extension
+    @sync_to_async
+    def aget_url(self, request, media_id=None, media_slug=None):
+        if media_slug:
+            media_slug = media_slug.split('.')[0]  #ignore extension
 
         width = request.GET.get('width')
         height = request.GET.get('height')
 
-        media = Media.objects.filter(**lookups).first()
+        media = actions.get_cached_media(media_id=media_id, media_slug=media_slug)
         if not media:
             raise ValidationException('Resource not found', code=404)
 
-        url = media.url
+        url = media['url']
 
         if width and height:
             raise ValidationException(
@@ -572,67 +563,55 @@ class MaskingUrlView(APIView):
                 code=400,
                 slug='width-and-height-in-querystring')
 
-        if (width or height) and not media.mime.startswith('image/'):
+        if (width or height) and not media['mime'].startswith('image/'):
             raise ValidationException('cannot resize this resource', code=400, slug='cannot-resize-media')
 
-        # register click
-        media.hits = media.hits + 1
-        media.save()
+        # register click, the hits are saved in batch by async_flush_media_hits
+        actions.media_hits.incr(media['id'])
 
-        resolution = MediaResolution.objects.filter(Q(width=width) | Q(height=height), hash=media.hash).first()
+        if width or height:
+            resolution = actions.get_cached_resolution(media['hash'], width=width, height=height)
 
-        if (width or height) and not resolution:
-            func = FunctionV1(region='us-central1', project_id=google_project_id(), name='resize-image')
+            if resolution:
+                actions.resolution_hits.incr(resolution['id'])
 
-            func_request = func.call({
-                'width': width,
-                'height': height,
-                'filename': media.hash,
-                'bucket': media_gallery_bucket(),
-            })
+            else:
+                func = FunctionV1(region='us-central1', project_id=google_project_id(), name='resize-image')
 
-            res = func_request.json()
+                func_request = func.call({
+                    'width': width,
+                    'height': height,
+                    'filename': media['hash'],
+                    'bucket': media_gallery_bucket(),
+                })
 
-            if not res['status_code'] == 200 or not res['message'] == 'Ok':
-                if 'message' in res:
-                    raise ValidationException(res['message'], code=500, slug='cloud-function-bad-input')
+                res = func_request.json()
 
-                raise ValidationException('Unhandled request from cloud functions',
-                                          code=500,
-                                          slug='unhandled-cloud-function')
+                if not res['status_code'] == 200 or not res['message'] == 'Ok':
+                    if 'message' in res:
+                        raise ValidationException(res['message'], code=500, slug='cloud-function-bad-input')
 
-            width = res['width']
-            height = res['height']
-            resolution = MediaResolution(width=width, height=height, hash=media.hash)
-            resolution.save()
+                    raise ValidationException('Unhandled request from cloud functions',
+                                              code=500,
+                                              slug='unhandled-cloud-function')
 
-        if (width or height):
-            width = resolution.width
-            height = resolution.height
+                resolution = MediaResolution(width=res['width'], height=res['height'], hash=media['hash'], hits=1)
+                resolution.save()
 
-            url = f'{url}-{width}x{height}'
-            resolution.hits = resolution.hits + 1
-            resolution.save()
+                resolution = {'id': resolution.id, 'width': resolution.width, 'height': resolution.height}
 
-        if request.GET.get('mask') != 'true':
-            return redirect(url, permanent=True)
+            url = f'{url}-{resolution["width"]}x{resolution["height"]}'
 
-        response = requests.get(url, stream=True)
-        resource = StreamingHttpResponse(
-            response.raw,
-            status=response.status_code,
-            reason=response.reason,
-        )
+        return url
 
-        header_keys = [
-            x for x in response.headers.keys()
-            if x != 'Transfer-Encoding' and x != 'Content-Encoding' and x != 'Keep-Alive' and x != 'Connection'
-        ]
+    async def get(self, request, media_id=None, media_slug=None):
+        url = await self.aget_url(request, media_id=media_id, media_slug=media_slug)
 
-        for header in header_keys:
-            resource[header] = response.headers[header]
+        if request.GET.get('mask') != 'true':
+            return redirect(url, permanent=True)
 
-        return resource
+        # the transfer does not block a worker, and the connections to the bucket are reused
+        return await proxy_media(request, url)
 
 
 class ResolutionView(ViewSet):
@@ -1,13 +1,16 @@
+import asyncio
 import functools
 import gzip
 import os
-import sys
 import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Optional
 
 import brotli
 import zstandard
 from asgiref.sync import iscoroutinefunction
 from django.http import HttpResponseRedirect
+from django.utils.cache import patch_vary_headers
 from django.utils.decorators import sync_and_async_middleware
 from django.utils.deprecation import MiddlewareMixin
 
@@ -27,12 +30,23 @@ def min_compression_size():
     return int(os.getenv('MIN_COMPRESSION_SIZE', '10'))
 
 
-def must_compress(data):
-    size = min_compression_size()
-    if size == 0:
+def must_compress(size: int) -> bool:
+    min_size = min_compression_size()
+    if min_size == 0:
         return True
 
-    return sys.getsizeof(data) / 1024 > size
+    return size / 1024 > min_size
+
+
+@functools.lru_cache(maxsize=1)
+def min_offload_compression_size():
+    return int(os.getenv('MIN_OFFLOAD_COMPRESSION_SIZE', '64'))
+
+
+@functools.lru_cache(maxsize=1)
+def get_compression_executor() -> ThreadPoolExecutor:
+    # zstd, zlib and brotli release the GIL, so the compression runs in parallel with the event loop
+    return ThreadPoolExecutor(max_workers=int(os.getenv('COMPRESSION_THREADS', '4')), thread_name_prefix='compression')
 
 
 @functools.lru_cache(maxsize=1)
@@ -40,55 +54,222 @@ def use_gzip():
     return os.getenv('USE_GZIP', '0').lower() in ENABLE_LIST_OPTIONS
 
 
-class CompressResponseMiddleware(MiddlewareMixin):
+# media types that are already compressed, compress them again just waste cpu
+COMPRESSED_MEDIA_TYPES = {
+    'application/gzip',
+    'application/x-gzip',
+    'application/zip',
+    'application/zstd',
+    'application/x-7z-compressed',
+    'application/x-bzip2',
+    'application/x-rar-compressed',
+    'application/vnd.rar',
+    'application/pdf',
+    'font/woff',
+    'font/woff2',
+}
+
+
+def is_compressed_media_type(content_type: str) -> bool:
+    media_type = content_type.split(';')[0].strip().lower()
+
+    if media_type in COMPRESSED_MEDIA_TYPES:
+        return True
+
+    if media_type.startswith('image/'):
+        return media_type != 'image/svg+xml'
+
+    return media_type.startswith('video/') or media_type.startswith('audio/')
+
+
+class StreamCompressor:
+    """Compress a stream of chunks incrementally, without buffering the whole body."""
 
-    def _compress(self, response, encoding, alg):
-        if self._has_content:
-            compressed_content = alg(response.content)
-            response.content = compressed_content
+    def __init__(self, encoding: str):
+        self._encoding = encoding
+
+        if encoding == 'zstd':
+            self._compressor = zstandard.ZstdCompressor().compressobj()
+
+        elif encoding == 'br':
+            self._compressor = brotli.Compressor()
+
+        elif encoding == 'gzip':
+            self._compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
 
         else:
-            compressed_content = alg(response.streaming_content)
-            response.streaming_content = compressed_content
+            self._compressor = zlib.compressobj()
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self._encoding == 'br':
+            return self._compressor.process(chunk)
+
+        return self._compressor.compress(chunk)
+
+    def flush(self) -> bytes:
+        if self._encoding == 'br':
+            return self._compressor.finish()
+
+        return self._compressor.flush()
+
+    def stream(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+
+            if data := self.compress(chunk):
+                yield data
+
+        if data := self.flush():
+            yield data
+
+    async def astream(self, chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+        async for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+
+            if data := self.compress(chunk):
+                yield data
+
+        if data := self.flush():
+            yield data
+
+
+COMPRESSORS = {
+    'zstd': zstandard.compress,
+    'deflate': zlib.compress,
+    'gzip': gzip.compress,
+    'br': brotli.compress,
+}
+
+
+def get_encoding(request) -> Optional[str]:
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+    dont_force_gzip = not use_gzip()
+
+    # sort by compression ratio and speed
+    if 'zstd' in accept_encoding and dont_force_gzip:
+        return 'zstd'
+
+    if ('deflate' in accept_encoding or '*' in accept_encoding) and dont_force_gzip:
+        return 'deflate'
+
+    if 'gzip' in accept_encoding:
+        return 'gzip'
+
+    if IS_DEV and 'br' in accept_encoding and 'PostmanRuntime' in request.META.get('HTTP_USER_AGENT', ''):
+        return 'br'
+
+    return None
+
+
+def must_compress_response(response) -> bool:
+    # if the response is already compressed, do nothing
+    if IS_TEST or is_compression_enabled() is False or response.has_header('Content-Encoding'):
+        return False
 
-        response['Content-Encoding'] = encoding
-        # response['Content-Length'] = str(len(compressed_content))
+    if is_compressed_media_type(response.get('Content-Type', '')):
+        return False
 
-    def _must_compress(self, response):
-        self._has_content = hasattr(response, 'content')
+    # the ranges are offsets of the original body, they would not match the compressed one
+    if response.status_code == 206 or response.has_header('Content-Range'):
+        return False
 
-        if self._has_content:
-            return must_compress(response.content)
+    if response.streaming:
+        # the size of a stream is unknown unless the view provided it
+        if response.has_header('Content-Length'):
+            return must_compress(int(response['Content-Length']))
+
+        return True
+
+    return len(response.content) > 0 and must_compress(len(response.content))
+
+
+def prepare_compressed_response(response, encoding: str) -> None:
+    patch_vary_headers(response, ('Accept-Encoding', ))
+
+    # the compressed representation is not byte-for-byte equal to the original one
+    if (etag := response.get('ETag')) and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+
+    response['Content-Encoding'] = encoding
+
+
+def compress_response(response, encoding: str) -> None:
+    prepare_compressed_response(response, encoding)
+
+    if response.streaming:
+        compressor = StreamCompressor(encoding)
+
+        if response.is_async:
+            response.streaming_content = compressor.astream(response.streaming_content)
 
         else:
-            return must_compress(response.streaming_content)
+            response.streaming_content = compressor.stream(response.streaming_content)
+
+        # the length of the stream is unknown after the compression
+        del response['Content-Length']
+        return
+
+    set_compressed_content(response, COMPRESSORS[encoding](response.content))
+
+
+def set_compressed_content(response, content: bytes) -> None:
+    response.content = content
+    response['Content-Length'] = str(len(content))
+
+
+async def acompress_response(response, encoding: str) -> None:
+    # small bodies and streams are cheaper to compress inline than to schedule in the pool
+    if response.streaming or len(response.content) / 1024 <= min_offload_compression_size():
+        compress_response(response, encoding)
+        return
+
+    prepare_compressed_response(response, encoding)
+
+    loop = asyncio.get_running_loop()
+    content = await loop.run_in_executor(get_compression_executor(), COMPRESSORS[encoding], response.content)
+    set_compressed_content(response, content)
+
+
+class CompressResponseMiddleware(MiddlewareMixin):
 
     def process_response(self, request, response):
-        # If the response is already compressed, do nothing
-        if 'Content-Encoding' in response.headers or is_compression_enabled() is False or self._must_compress(
-                response) is False or IS_TEST:
+        if must_compress_response(response) is False:
             return response
 
-        # Compress the response if it's large enough
-        if response.content:
-            accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        # compress the response if it's large enough
+        if encoding := get_encoding(request):
+            compress_response(response, encoding)
 
-            dont_force_gzip = not use_gzip()
+        return response
 
-            # sort by compression ratio and speed
-            if 'zstd' in accept_encoding and dont_force_gzip:
-                self._compress(response, 'zstd', zstandard.compress)
 
-            elif ('deflate' in accept_encoding or '*' in accept_encoding) and dont_force_gzip:
-                self._compress(response, 'deflate', zlib.compress)
+@sync_and_async_middleware
+def compress_response_middleware(get_response):
+
+    if iscoroutinefunction(get_response):
 
-            elif 'gzip' in accept_encoding:
-                self._compress(response, 'gzip', gzip.compress)
+        async def middleware(request):
+            response = await get_response(request)
 
-            elif IS_DEV and 'br' in accept_encoding and 'PostmanRuntime' in request.META.get('HTTP_USER_AGENT', ''):
-                self._compress(response, 'br', brotli.compress)
+            if must_compress_response(response) and (encoding := get_encoding(request)):
+                await acompress_response(response, encoding)
 
-        return response
+            return response
+
+    else:
+
+        def middleware(request):
+            response = get_response(request)
+
+            if must_compress_response(response) and (encoding := get_encoding(request)):
+                compress_response(response, encoding)
+
+            return response
+
+    return middleware
 
 
 @sync_and_async_middleware
@@ -1,7 +1,7 @@
 import logging
 from typing import Type
 
-from django.db.models import Q
+from django.db.models import F, Q
 from django.db.models.signals import m2m_changed
 from django.dispatch import receiver
 from django.utils import timezone
@@ -9,6 +9,7 @@ from django.utils import timezone
 from breathecode.mentorship.models import MentorshipSession
 from breathecode.mentorship.signals import mentorship_session_status
 from breathecode.payments import tasks
+from breathecode.utils.decorators.has_permission import invalidate_user_permissions
 
 from .models import Consumable, Plan
 from .signals import (
@@ -24,18 +25,25 @@ logger = logging.getLogger(__name__)
 
 @receiver(consume_service, sender=Consumable)
 def consume_service_receiver(sender: Type[Consumable], instance: Consumable, how_many: float, **kwargs):
-    if instance.how_many == 0:
-        lose_service_permissions.send(instance=instance, sender=sender)
-        return
+    """
+    Discount the units in the database.
+
+    Both updates are conditional, so concurrent consumptions of the same consumable cannot overdraw it and
+    just the one that spends the last units revokes the permissions.
+    """
 
     if instance.how_many == -1:
         return
 
-    instance.how_many -= how_many
-    instance.save()
+    consumables = Consumable.objects.filter(id=instance.id)
 
-    if instance.how_many == 0:
+    if consumables.filter(how_many=how_many).update(how_many=0):
+        instance.how_many = 0
         lose_service_permissions.send(instance=instance, sender=sender)
+        return
+
+    consumables.filter(how_many__gt=how_many).update(how_many=F('how_many') - how_many)
+    instance.refresh_from_db(fields=['how_many'])
 
 
 @receiver(reimburse_service_units, sender=Consumable)
@@ -69,6 +77,8 @@ def lose_service_permissions_receiver(sender: Type[Consumable], instance: Consum
         if how_many == 0:
             instance.user.groups.remove(group)
 
+    invalidate_user_permissions(instance.user.id)
+
 
 @receiver(grant_service_permissions, sender=Consumable)
 def grant_service_permissions_receiver(sender: Type[Consumable], instance: Consumable, **kwargs):
@@ -78,6 +88,8 @@ def grant_service_permissions_receiver(sender: Type[Consumable], instance: Consu
         if not instance.user.groups.filter(name=group.name).exists():
             instance.user.groups.add(group)
 
+    invalidate_user_permissions(instance.user.id)
+
 
 @receiver(mentorship_session_status, sender=MentorshipSession)
 def post_mentoring_session_ended(sender: Type[MentorshipSession], instance: MentorshipSession, **kwargs):
@@ -1,7 +1,13 @@
 import random
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, call, patch
 
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 from breathecode.payments import signals
+from breathecode.payments.models import Consumable
 from breathecode.tests.mixins.legacy import LegacyAPITestCase
 
 
@@ -49,6 +55,49 @@ class TestSignal(LegacyAPITestCase):
                 'how_many': how_many,
             },
         ])
+        self.assertEqual(signals.lose_service_permissions.send.call_args_list, [])
+
+    @patch('breathecode.payments.signals.lose_service_permissions.send', MagicMock())
+    def test__consumable_how_many_lt_consume(self, enable_signals):
+        enable_signals()
+
+        how_many_consume = random.randint(2, 100)
+        how_many = how_many_consume - 1
+        consumable = {'how_many': how_many}
+        model = self.bc.database.create(consumable=consumable)
+        consumable_db = self.bc.format.to_dict(model.consumable)
+
+        signals.consume_service.send(sender=model.consumable.__class__,
+                                     instance=model.consumable,
+                                     how_many=how_many_consume)
+
+        self.assertEqual(self.bc.database.list_of('payments.Consumable'), [
+            {
+                **consumable_db,
+                'how_many': how_many,
+            },
+        ])
+        self.assertEqual(signals.lose_service_permissions.send.call_args_list, [])
+
+    @patch('breathecode.payments.signals.lose_service_permissions.send', MagicMock())
+    def test__consumable_how_many_eq_consume(self, enable_signals):
+        enable_signals()
+
+        how_many_consume = random.randint(1, 100)
+        consumable = {'how_many': how_many_consume}
+        model = self.bc.database.create(consumable=consumable)
+        consumable_db = self.bc.format.to_dict(model.consumable)
+
+        signals.consume_service.send(sender=model.consumable.__class__,
+                                     instance=model.consumable,
+                                     how_many=how_many_consume)
+
+        self.assertEqual(self.bc.database.list_of('payments.Consumable'), [
+            {
+                **consumable_db,
+                'how_many': 0,
+            },
+        ])
         self.assertEqual(signals.lose_service_permissions.send.call_args_list, [
             call(sender=model.consumable.__class__, instance=model.consumable),
         ])
@@ -67,6 +116,7 @@ class TestSignal(LegacyAPITestCase):
                                      instance=model.consumable,
                                      how_many=how_many_consume)
 
+        self.assertEqual(model.consumable.how_many, how_many)
         self.assertEqual(self.bc.database.list_of('payments.Consumable'), [
             {
                 **consumable_db,
@@ -74,3 +124,74 @@ class TestSignal(LegacyAPITestCase):
             },
         ])
         self.assertEqual(signals.lose_service_permissions.send.call_args_list, [])
+
+    @patch('breathecode.payments.signals.lose_service_permissions.send', MagicMock())
+    def test__stale_instances(self, enable_signals):
+        enable_signals()
+
+        units = 20
+        model = self.bc.database.create(consumable={'how_many': units})
+
+        # the requests read the consumable before any of them consumed it
+        instances = [Consumable.objects.get(id=model.consumable.id) for _ in range(units * 2)]
+        for instance in instances:
+            signals.consume_service.send(sender=Consumable, instance=instance, how_many=1)
+
+        self.assertEqual([x.how_many for x in instances], [*range(units - 1, -1, -1)] + [0] * units)
+        self.assertEqual(Consumable.objects.get(id=model.consumable.id).how_many, 0)
+        self.assertEqual(signals.lose_service_permissions.send.call_args_list, [
+            call(sender=Consumable, instance=instances[units - 1]),
+        ])
+
+    @patch('breathecode.payments.signals.lose_service_permissions.send', MagicMock())
+    def test__stale_instance__the_update_does_not_match_the_balance(self, enable_signals):
+        enable_signals()
+
+        model = self.bc.database.create(consumable={'how_many': 5})
+        instance = Consumable.objects.get(id=model.consumable.id)
+
+        # other request consumed the units after this instance was read
+        Consumable.objects.filter(id=model.consumable.id).update(how_many=1)
+
+        with CaptureQueriesContext(connection) as context:
+            signals.consume_service.send(sender=Consumable, instance=instance, how_many=2)
+
+        updates = [x['sql'] for x in context.captured_queries if x['sql'].startswith('UPDATE')]
+
+        self.assertEqual(len(updates), 2)
+        assert '"how_many" = 2' in updates[0]
+        assert '"how_many" > 2' in updates[1]
+        self.assertEqual(instance.how_many, 1)
+        self.assertEqual(Consumable.objects.get(id=model.consumable.id).how_many, 1)
+        self.assertEqual(signals.lose_service_permissions.send.call_args_list, [])
+
+
+# the threads need their own connections, so the consumable is committed by a TransactionTestCase
+@pytest.mark.django_db(transaction=True)
+def test__concurrent_consumptions(database, enable_signals, monkeypatch):
+    if connection.vendor == 'sqlite':
+        pytest.skip('SQLite locks the whole table, the concurrent writers fail with "database table is locked"')
+
+    enable_signals()
+    monkeypatch.setattr('breathecode.payments.signals.lose_service_permissions.send', MagicMock())
+
+    units = 20
+    model = database.create(consumable={'how_many': units})
+
+    def consume(_):
+        # every thread has its own copy of the consumable, like every request does
+        instance = Consumable.objects.get(id=model.consumable.id)
+
+        try:
+            signals.consume_service.send(sender=Consumable, instance=instance, how_many=1)
+            return instance.how_many
+
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        balances = list(executor.map(consume, range(units * 2)))
+
+    assert min(balances) == 0
+    assert Consumable.objects.get(id=model.consumable.id).how_many == 0
+    assert len(signals.lose_service_permissions.send.call_args_list) == 1
@@ -1,11 +1,12 @@
 import random
 import re
 from datetime import datetime
-from typing import TypedDict
+from typing import Any, Optional, TypedDict
 
 import pytz
 from dateutil.relativedelta import relativedelta
-from django.db.models import Q, QuerySet
+from django.db.models import F, FloatField, OuterRef, Q, QuerySet, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from breathecode.admissions.models import Academy, CohortUser
@@ -156,12 +157,16 @@ class GithubAcademyUserObject(TypedDict):
     ended_at: datetime
 
 
-def get_github_academy_user_logs(academy: Academy, username: str, limit: datetime) -> list[GithubAcademyUserObject]:
+def get_github_academy_user_logs(academy: Academy,
+                                 username: str,
+                                 limit: datetime,
+                                 logs: Optional[list[GithubAcademyUserLog]] = None) -> list[GithubAcademyUserObject]:
     ret = []
-    logs = GithubAcademyUserLog.objects.filter(Q(valid_until__isnull=True)
-                                               | Q(valid_until__gte=limit - relativedelta(months=1, weeks=1)),
-                                               academy_user__username=username,
-                                               academy_user__academy=academy).order_by('created_at')
+    if logs is None:
+        logs = GithubAcademyUserLog.objects.filter(Q(valid_until__isnull=True)
+                                                   | Q(valid_until__gte=limit - relativedelta(months=1, weeks=1)),
+                                                   academy_user__username=username,
+                                                   academy_user__academy=academy).order_by('created_at')
 
     for n in range(len(logs)):
         log = logs[n]
@@ -199,10 +204,102 @@ class ActivityContext(TypedDict):
     provisioning_bills: dict[str, ProvisioningBill]
     provisioning_vendors: dict[str, ProvisioningVendor]
     github_academy_user_logs: dict[str, QuerySet[GithubAcademyUserLog]]
+    github_academy_user_log_history: dict[str, list[GithubAcademyUserLog]]
+    github_academy_users: dict[str, QuerySet[GithubAcademyUser]]
     hash: str
     limit: datetime
     logs: dict[str, list[GithubAcademyUserObject]]
     profile_academies: dict[str, QuerySet[ProfileAcademy]]
+    cohort_users: dict[str, list[CohortUser]]
+    provisioning_user_consumptions: dict[tuple[str, int], ProvisioningUserConsumption]
+    pending_consumption_events: list[tuple[ProvisioningUserConsumption, ProvisioningConsumptionEvent]]
+    pending_user_consumption_bills: dict[tuple[int, int], tuple[ProvisioningUserConsumption, ProvisioningBill]]
+
+
+def get_provisioning_user_consumption(context: ActivityContext, username: str,
+                                      kind: ProvisioningConsumptionKind) -> ProvisioningUserConsumption:
+    """
+    Get the consumption of the user, the new ones are saved by `save_activities`.
+
+    `provisioning_user_consumptions` must be preloaded with the consumptions of the hash.
+    """
+
+    key = (username, kind.id)
+    if pa := context['provisioning_user_consumptions'].get(key):
+        return pa
+
+    pa = ProvisioningUserConsumption(username=username, hash=context['hash'], kind=kind, processed_at=timezone.now())
+
+    context['provisioning_user_consumptions'][key] = pa
+    return pa
+
+
+def add_consumption_event(context: ActivityContext, pa: ProvisioningUserConsumption, item: ProvisioningConsumptionEvent,
+                          provisioning_bills: list[ProvisioningBill]) -> None:
+    context['pending_consumption_events'].append((pa, item))
+
+    # the unsaved consumptions are not hashable
+    for provisioning_bill in provisioning_bills:
+        context['pending_user_consumption_bills'][(id(pa), provisioning_bill.id)] = (pa, provisioning_bill)
+
+
+def save_activities(context: ActivityContext) -> None:
+    """Save the consumptions and events collected by the activity handlers with a few bulk queries."""
+
+    pending_events = context['pending_consumption_events']
+    consumptions = list({id(pa): pa for pa, _ in pending_events}.values())
+
+    created = [x for x in consumptions if x.id is None]
+    updated = [x for x in consumptions if x.id is not None]
+
+    ProvisioningUserConsumption.objects.bulk_create(created)
+
+    now = timezone.now()
+    for pa in updated:
+        pa.updated_at = now
+
+    ProvisioningUserConsumption.objects.bulk_update(updated, ['status', 'status_text', 'updated_at'])
+    ProvisioningConsumptionEvent.objects.bulk_create([item for _, item in pending_events])
+
+    events_through = ProvisioningUserConsumption.events.through
+    events = [
+        events_through(provisioninguserconsumption_id=pa.id, provisioningconsumptionevent_id=item.id)
+        for pa, item in pending_events
+    ]
+    events_through.objects.bulk_create(events)
+
+    bills_through = ProvisioningUserConsumption.bills.through
+    bills = [
+        bills_through(provisioninguserconsumption_id=pa.id, provisioningbill_id=bill.id)
+        for pa, bill in context['pending_user_consumption_bills'].values()
+    ]
+    bills_through.objects.bulk_create(bills, ignore_conflicts=True)
+
+    context['pending_consumption_events'] = []
+    context['pending_user_consumption_bills'] = {}
+
+
+def _sum_consumption_events(expression) -> Coalesce:
+    events = ProvisioningConsumptionEvent.objects.filter(provisioninguserconsumption=OuterRef('pk')).order_by()
+    total = events.values('provisioninguserconsumption').annotate(total=Sum(expression)).values('total')
+
+    return Coalesce(Subquery(total, output_field=FloatField()), 0.0)
+
+
+def calculate_consumption_amounts(bill: ProvisioningBill) -> float:
+    """
+    Update the amount and quantity of the persisted consumptions of a bill, it returns the amount of the bill.
+
+    The events are aggregated by the database, so it runs two queries whatever the size of the bill is.
+    """
+
+    consumptions = ProvisioningUserConsumption.objects.filter(bills=bill, status='PERSISTED')
+    amount = _sum_consumption_events(F('price__price_per_unit') * F('price__multiplier') * F('quantity'))
+    quantity = _sum_consumption_events(F('quantity'))
+
+    consumptions.update(amount=amount, quantity=quantity, updated_at=timezone.now())
+
+    return consumptions.aggregate(total=Sum('amount'))['total'] or 0
 
 
 def handle_pending_github_user(organization: str, username: str) -> list[Academy]:
@@ -242,6 +339,154 @@ def handle_pending_github_user(organization: str, username: str) -> list[Academy
     return [org.academy for org in orgs]
 
 
+def _prefetch_kinds(context: ActivityContext, keys: dict[Any, tuple[str, str]]) -> None:
+    keys = {k: v for k, v in keys.items() if k not in context['provisioning_activity_kinds']}
+    if not keys:
+        return
+
+    product_names = {str(x[0]) for x in keys.values()}
+    skus = {str(x[1]) for x in keys.values()}
+
+    kinds = {}
+    for kind in ProvisioningConsumptionKind.objects.filter(product_name__in=product_names, sku__in=skus).order_by('id'):
+        kinds.setdefault((kind.product_name, kind.sku), kind)
+
+    missing = {}
+    for key, (product_name, sku) in keys.items():
+        if kind := kinds.get((str(product_name), str(sku))):
+            context['provisioning_activity_kinds'][key] = kind
+
+        else:
+            missing.setdefault((product_name, sku), []).append(key)
+
+    created = ProvisioningConsumptionKind.objects.bulk_create(
+        [ProvisioningConsumptionKind(product_name=product_name, sku=sku) for product_name, sku in missing])
+
+    for kind, keys in zip(created, missing.values()):
+        for key in keys:
+            context['provisioning_activity_kinds'][key] = kind
+
+
+def _get_currency(context: ActivityContext) -> Currency:
+    if not (currency := context['currencies'].get('USD', None)):
+        currency, _ = Currency.objects.get_or_create(code='USD', name='US Dollar', decimals=2)
+        context['currencies']['USD'] = currency
+
+    return currency
+
+
+def prefetch_codespaces_activities(context: ActivityContext, fields: list[dict]) -> None:
+    """Resolve the users, kinds and prices of a chunk of Codespaces rows with a few queries."""
+
+    usernames = {'' if isinstance(x['Username'], float) else x['Username'] for x in fields}
+    usernames -= context['github_academy_user_logs'].keys()
+
+    if usernames:
+        for username in usernames:
+            context['github_academy_user_logs'][username] = []
+            context['github_academy_user_log_history'][username] = []
+            context['github_academy_users'][username] = []
+
+        logs = GithubAcademyUserLog.objects.filter(
+            Q(valid_until__isnull=True)
+            | Q(valid_until__gte=context['limit'] - relativedelta(months=1, weeks=1)),
+            academy_user__username__in=usernames).select_related('academy_user__academy').order_by('created_at')
+
+        for log in logs:
+            username = log.academy_user.username
+            context['github_academy_user_log_history'][username].append(log)
+
+            if log.created_at <= context['limit'] and log.storage_status == 'SYNCHED' and log.storage_action == 'ADD':
+                context['github_academy_user_logs'][username].insert(0, log)
+
+        for github_academy_user in GithubAcademyUser.objects.filter(username__in=usernames).select_related('academy'):
+            context['github_academy_users'][github_academy_user.username].append(github_academy_user)
+
+    _prefetch_kinds(context, {(x['Product'], x['SKU']): (x['Product'], x['SKU']) for x in fields})
+
+    currency = _get_currency(context)
+    # the prices are created in the same order that they appear
+    keys = [
+        key for key in dict.fromkeys((x['Unit Type'], x['Price Per Unit ($)'], x['Multiplier']) for x in fields)
+        if key not in context['provisioning_activity_prices']
+    ]
+
+    if keys:
+        unit_types = {x[0] for x in keys}
+
+        prices = {}
+        for price in ProvisioningPrice.objects.filter(currency=currency, unit_type__in=unit_types).order_by('id'):
+            prices.setdefault((price.unit_type, price.price_per_unit, price.multiplier), price)
+
+        missing = []
+        for key in keys:
+            if price := prices.get(key):
+                context['provisioning_activity_prices'][key] = price
+
+            else:
+                missing.append(key)
+
+        created = ProvisioningPrice.objects.bulk_create([
+            ProvisioningPrice(currency=currency,
+                              unit_type=unit_type,
+                              price_per_unit=price_per_unit,
+                              multiplier=multiplier) for unit_type, price_per_unit, multiplier in missing
+        ])
+
+        for key, price in zip(missing, created):
+            context['provisioning_activity_prices'][key] = price
+
+
+def prefetch_gitpod_activities(context: ActivityContext, fields: list[dict]) -> None:
+    """Resolve the users and kinds of a chunk of Gitpod rows with a few queries."""
+
+    usernames = {x['userName'] for x in fields} - context['profile_academies'].keys()
+
+    if usernames:
+        for username in usernames:
+            context['profile_academies'][username] = []
+
+        profile_academies = ProfileAcademy.objects.filter(
+            user__credentialsgithub__username__in=usernames,
+            status='ACTIVE').select_related('academy').annotate(github_username=F('user__credentialsgithub__username'))
+
+        for profile_academy in profile_academies:
+            context['profile_academies'][profile_academy.github_username].append(profile_academy)
+
+    # the users of many academies are assigned to the academies of the cohorts that they took in the activity dates
+    usernames = set()
+    for username in {x['userName'] for x in fields} - context['cohort_users'].keys():
+        if len({x.academy_id for x in context['profile_academies'][username]}) > 1:
+            usernames.add(username)
+
+    if usernames:
+        for username in usernames:
+            context['cohort_users'][username] = []
+
+        cohort_users = CohortUser.objects.filter(user__credentialsgithub__username__in=usernames)
+        cohort_users = cohort_users.select_related('cohort__academy').annotate(
+            github_username=F('user__credentialsgithub__username')).order_by('-created_at')
+
+        for cohort_user in cohort_users:
+            context['cohort_users'][cohort_user.github_username].append(cohort_user)
+
+    _prefetch_kinds(context, {x['kind']: (x['kind'], x['kind']) for x in fields})
+
+
+def _get_cohort_users(context: ActivityContext, username: str, start: datetime, end: datetime) -> list[CohortUser]:
+    cohort_users = context.get('cohort_users', {}).get(username, None)
+    if cohort_users is None:
+        return CohortUser.objects.filter(Q(cohort__ending_date__lte=end) | Q(cohort__never_ends=True),
+                                         cohort__kickoff_date__gte=start,
+                                         user__credentialsgithub__username=username).order_by('-created_at')
+
+    return [
+        x for x in cohort_users
+        if ((x.cohort.ending_date is not None and x.cohort.ending_date <= end) or x.cohort.never_ends)
+        and x.cohort.kickoff_date is not None and x.cohort.kickoff_date >= start
+    ]
+
+
 def add_codespaces_activity(context: ActivityContext, field: dict, position: int) -> None:
     if isinstance(field['Username'], float):
         field['Username'] = ''
@@ -265,17 +510,24 @@ def add_codespaces_activity(context: ActivityContext, field: dict, position: int
     if github_academy_user_log:
         academies = [x.academy_user.academy for x in github_academy_user_log]
 
+    github_academy_users = context['github_academy_users'].get(field['Username'], None)
     if not academies:
         not_found = True
-        github_academy_users = GithubAcademyUser.objects.filter(username=field['Username'],
-                                                                storage_status='PAYMENT_CONFLICT',
-                                                                storage_action='IGNORE')
+        if github_academy_users is None:
+            github_academy_users = GithubAcademyUser.objects.filter(
+                username=field['Username']).select_related('academy')
 
-        academies = [x.academy for x in github_academy_users]
+        academies = [
+            x.academy for x in github_academy_users
+            if x.storage_status == 'PAYMENT_CONFLICT' and x.storage_action == 'IGNORE'
+        ]
 
-    if not academies and not GithubAcademyUser.objects.filter(username=field['Username']).count():
+    if not academies and not github_academy_users:
         academies = handle_pending_github_user(field['Owner'], field['Username'])
 
+        # the pending users were created, so they are fetched again
+        context['github_academy_users'].pop(field['Username'], None)
+
     if not not_found:
         academies = random.choices(academies, k=1)
 
@@ -296,7 +548,11 @@ def add_codespaces_activity(context: ActivityContext, field: dict, position: int
     for academy in academies:
         ls = context['logs'].get((field['Username'], academy.id), None)
         if ls is None:
-            ls = get_github_academy_user_logs(academy, field['Username'], context['limit'])
+            history = context['github_academy_user_log_history'].get(field['Username'], None)
+            if history is not None:
+                history = [x for x in history if x.academy_user.academy_id == academy.id]
+
+            ls = get_github_academy_user_logs(academy, field['Username'], context['limit'], logs=history)
             context['logs'][(field['Username'], academy.id)] = ls
             logs[academy.id] = ls
 
@@ -348,9 +604,7 @@ def add_codespaces_activity(context: ActivityContext, field: dict, position: int
         )
         context['provisioning_activity_kinds'][(field['Product'], field['SKU'])] = kind
 
-    if not (currency := context['currencies'].get('USD', None)):
-        currency, _ = Currency.objects.get_or_create(code='USD', name='US Dollar', decimals=2)
-        context['currencies']['USD'] = currency
+    currency = _get_currency(context)
 
     if not (price := context['provisioning_activity_prices'].get(
         (field['Unit Type'], field['Price Per Unit ($)'], field['Multiplier']), None)):
@@ -364,12 +618,9 @@ def add_codespaces_activity(context: ActivityContext, field: dict, position: int
         context['provisioning_activity_prices'][(field['Unit Type'], field['Price Per Unit ($)'],
                                                  field['Multiplier'])] = price
 
-    pa, _ = ProvisioningUserConsumption.objects.get_or_create(username=field['Username'],
-                                                              hash=context['hash'],
-                                                              kind=kind,
-                                                              defaults={'processed_at': timezone.now()})
+    pa = get_provisioning_user_consumption(context, field['Username'], kind)
 
-    item, _ = ProvisioningConsumptionEvent.objects.get_or_create(
+    item = ProvisioningConsumptionEvent(
         vendor=provisioning_vendor,
         price=price,
         registered_at=date,
@@ -393,14 +644,8 @@ def add_codespaces_activity(context: ActivityContext, field: dict, position: int
 
     pa.status_text = ', '.join(sorted(set(pa.status_text.split(', '))))
     pa.status_text = pa.status_text[:255]
-    pa.save()
 
-    current_bills = pa.bills.all()
-    for provisioning_bill in provisioning_bills.values():
-        if provisioning_bill not in current_bills:
-            pa.bills.add(provisioning_bill)
-
-    pa.events.add(item)
+    add_consumption_event(context, pa, item, provisioning_bills.values())
 
 
 def add_gitpod_activity(context: ActivityContext, field: dict, position: int):
@@ -419,10 +664,7 @@ def add_gitpod_activity(context: ActivityContext, field: dict, position: int):
     end = iso_to_datetime(field['endTime'])
 
     if len(academies) > 1:
-        cohort_users = CohortUser.objects.filter(
-            Q(cohort__ending_date__lte=end) | Q(cohort__never_ends=True),
-            cohort__kickoff_date__gte=date,
-            user__credentialsgithub__username=field['userName']).order_by('-created_at')
+        cohort_users = _get_cohort_users(context, field['userName'], date, end)
 
         if cohort_users:
             academies = sorted(list({cohort_user.cohort.academy for cohort_user in cohort_users}), key=lambda x: x.id)
@@ -487,9 +729,7 @@ def add_gitpod_activity(context: ActivityContext, field: dict, position: int):
         )
         context['provisioning_activity_kinds'][field['kind']] = kind
 
-    if not (currency := context['currencies'].get('USD', None)):
-        currency, _ = Currency.objects.get_or_create(code='USD', name='US Dollar', decimals=2)
-        context['currencies']['USD'] = currency
+    currency = _get_currency(context)
 
     if not (price := context['provisioning_activity_prices'].get(currency.id, None)):
         price, _ = ProvisioningPrice.objects.get_or_create(
@@ -501,12 +741,9 @@ def add_gitpod_activity(context: ActivityContext, field: dict, position: int):
 
         context['provisioning_activity_prices'][currency.id] = price
 
-    pa, _ = ProvisioningUserConsumption.objects.get_or_create(username=field['userName'],
-                                                              hash=context['hash'],
-                                                              kind=kind,
-                                                              defaults={'processed_at': timezone.now()})
+    pa = get_provisioning_user_consumption(context, field['userName'], kind)
 
-    item, _ = ProvisioningConsumptionEvent.objects.get_or_create(
+    item = ProvisioningConsumptionEvent(
         external_pk=field['id'],
         vendor=provisioning_vendor,
         price=price,
@@ -524,11 +761,5 @@ def add_gitpod_activity(context: ActivityContext, field: dict, position: int):
 
     pa.status_text = ', '.join(sorted(set(pa.status_text.split(', '))))
     pa.status_text = pa.status_text[:255]
-    pa.save()
-
-    current_bills = pa.bills.all()
-    for provisioning_bill in provisioning_bills:
-        if provisioning_bill not in current_bills:
-            pa.bills.add(provisioning_bill)
 
-    pa.events.add(item)
+    add_consumption_event(context, pa, item, provisioning_bills)
@@ -1,6 +1,7 @@
 import logging
 import math
 import os
+import tempfile
 from datetime import datetime
 from io import BytesIO
 from typing import Any
@@ -8,6 +9,8 @@ from typing import Any
 import pandas as pd
 import pytz
 from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import Max
 from django.utils import timezone
 from task_manager.core.exceptions import AbortTask, RetryTask
 from task_manager.django.decorators import task
@@ -40,6 +43,7 @@ MONTHS = [
 ]
 
 PANDAS_ROWS_LIMIT = 100
+SPOOL_MAX_SIZE = int(os.getenv('PROVISIONING_SPOOL_MAX_SIZE', 32 * 1024 * 1024))
 DELETE_LIMIT = 10000
 
 
@@ -71,19 +75,12 @@ def calculate_bill_amounts(hash: str, *, force: bool = False, **_: Any):
     if not cloud_file.exists():
         raise AbortTask(f'File {hash} not found')
 
+    # the first and the last rows are read from the same download
     csv_string_io = BytesIO()
     cloud_file.download(csv_string_io)
-    csv_string_io = cut_csv(csv_string_io, first=1)
-    csv_string_io.seek(0)
 
-    df1 = pd.read_csv(csv_string_io, sep=',', usecols=fields)
-
-    csv_string_io = BytesIO()
-    cloud_file.download(csv_string_io)
-    csv_string_io = cut_csv(csv_string_io, last=1)
-    csv_string_io.seek(0)
-
-    df2 = pd.read_csv(csv_string_io, sep=',', usecols=fields)
+    df1 = pd.read_csv(cut_csv(csv_string_io, first=1, key=hash), sep=',', usecols=fields)
+    df2 = pd.read_csv(cut_csv(csv_string_io, last=1, key=hash), sep=',', usecols=fields)
 
     if bills[0].vendor.name == 'Gitpod':
         first = df2['startTime'][0].split('-')
@@ -102,19 +99,7 @@ def calculate_bill_amounts(hash: str, *, force: bool = False, **_: Any):
     last = datetime(int(last[0]), int(last[1]), int(last[2]))
 
     for bill in bills:
-        amount = 0
-        for activity in ProvisioningUserConsumption.objects.filter(bills=bill, status='PERSISTED'):
-            consumption_amount = 0
-            consumption_quantity = 0
-            for item in activity.events.all():
-                consumption_amount += item.price.get_price(item.quantity)
-                consumption_quantity += item.quantity
-
-            activity.amount = consumption_amount
-            activity.quantity = consumption_quantity
-            activity.save()
-
-            amount += consumption_amount
+        amount = actions.calculate_consumption_amounts(bill)
 
         bill.status = 'DUE' if amount else 'PAID'
 
@@ -145,21 +130,34 @@ def reverse_upload(hash: str, **_: Any):
     ProvisioningBill.objects.filter(hash=hash).delete()
 
 
-@task(reverse=reverse_upload, priority=TaskPriority.BILL.value)
-def upload(hash: str, *, page: int = 0, force: bool = False, task_manager_id: int = 0, **_: Any):
+def get_next_csv_row(hash: str) -> int:
+    """Get the first row that was not saved yet, the rows of each chunk are saved within a transaction."""
+
+    last = ProvisioningConsumptionEvent.objects.filter(provisioninguserconsumption__hash=hash).aggregate(
+        Max('csv_row'))['csv_row__max']
+
+    return 0 if last is None else last + 1
+
+
+@task(bind=True, reverse=reverse_upload, priority=TaskPriority.BILL.value)
+def upload(self, hash: str, *, page: int = 0, force: bool = False, task_manager_id: int = 0, **_: Any):
     logger.info(f'Starting upload for hash {hash}')
 
     limit = PANDAS_ROWS_LIMIT
-    start = page * limit
-    end = start + limit
     context = {
         'provisioning_bills': {},
         'provisioning_vendors': {},
         'github_academy_user_logs': {},
+        'github_academy_user_log_history': {},
+        'github_academy_users': {},
         'provisioning_activity_prices': {},
         'provisioning_activity_kinds': {},
+        'provisioning_user_consumptions': {},
+        'pending_consumption_events': [],
+        'pending_user_consumption_bills': {},
         'currencies': {},
         'profile_academies': {},
+        'cohort_users': {},
         'hash': hash,
         'limit': timezone.now(),
         'logs': {},
@@ -180,59 +178,84 @@ def upload(hash: str, *, page: int = 0, force: bool = False, task_manager_id: in
         raise AbortTask('Cannot force upload because there are bills with status DISPUTED, IGNORED or PAID')
 
     if force:
-        for bill in pending_bills:
-            ProvisioningUserConsumption.objects.filter(bills=bill).delete()
-
+        ProvisioningConsumptionEvent.objects.filter(provisioninguserconsumption__hash=hash).delete()
+        ProvisioningUserConsumption.objects.filter(hash=hash).delete()
         pending_bills.delete()
 
-    csv_string_io = BytesIO()
-    cloud_file.download(csv_string_io)
-    csv_string_io = cut_csv(csv_string_io, start=start, end=end)
-    csv_string_io.seek(0)
+    # the file is downloaded once, it is kept in memory until it is too big, then it is moved to the disk
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as f:
+        cloud_file.download(f)
+        f.seek(0)
+
+        columns = pd.read_csv(f, sep=',', nrows=0).keys()
+        f.seek(0)
+
+        handler = None
+
+        # edit it
+        fields = ['id', 'credits', 'startTime', 'endTime', 'kind', 'userName', 'contextURL']
+        if len(columns.intersection(fields)) == len(fields):
+            handler = actions.add_gitpod_activity
+            prefetch = actions.prefetch_gitpod_activities
 
-    df = pd.read_csv(csv_string_io, sep=',')
+        if not handler:
+            fields = ['Username', 'Date', 'Product', 'SKU', 'Quantity', 'Unit Type', 'Price Per Unit ($)', 'Multiplier']
 
-    handler = None
+        if not handler and len(columns.intersection(fields)) == len(fields):
+            handler = actions.add_codespaces_activity
+            prefetch = actions.prefetch_codespaces_activities
 
-    # edit it
-    fields = ['id', 'credits', 'startTime', 'endTime', 'kind', 'userName', 'contextURL']
-    if len(df.keys().intersection(fields)) == len(fields):
-        handler = actions.add_gitpod_activity
+        if not handler:
+            raise AbortTask(f'File {hash} has an unsupported origin or the provider had changed the file format')
 
-    if not handler:
-        fields = ['Username', 'Date', 'Product', 'SKU', 'Quantity', 'Unit Type', 'Price Per Unit ($)', 'Multiplier']
+        prev_bill = ProvisioningBill.objects.filter(hash=hash).first()
+        if prev_bill:
+            context['limit'] = prev_bill.created_at
 
-    if not handler and len(df.keys().intersection(fields)) == len(fields):
-        handler = actions.add_codespaces_activity
+        # a previous run could be interrupted, it continues after the last chunk it saved, the page is not used because
+        # the task manager resumes the task after the last page it saved
+        start = get_next_csv_row(hash)
+        context['provisioning_user_consumptions'] = {
+            (x.username, x.kind_id): x
+            for x in ProvisioningUserConsumption.objects.filter(hash=hash)
+        }
 
-    if not handler:
-        raise AbortTask(f'File {hash} has an unsupported origin or the provider had changed the file format')
+        chunks = 0
+        for chunk in pd.read_csv(f, sep=',', chunksize=limit):
+            chunks += 1
+            chunk = chunk[chunk.index >= start]
+            if chunk.empty:
+                continue
 
-    prev_bill = ProvisioningBill.objects.filter(hash=hash).first()
-    if prev_bill:
-        context['limit'] = prev_bill.created_at
+            rows = [(position, row.to_dict()) for position, row in chunk.iterrows()]
 
-    try:
-        i = 0
-        for position in range(start, end):
             try:
-                handler(context, df.iloc[i].to_dict(), position)
-                i += 1
+                with transaction.atomic():
+                    # the users, kinds and prices of the chunk are resolved at once
+                    prefetch(context, [field for _, field in rows])
+
+                    for position, field in rows:
+                        handler(context, field, position)
+
+                    actions.save_activities(context)
 
-            except IndexError:
-                break
+            except Exception as e:
+                raise AbortTask(f'File {hash} cannot be processed due to: {str(e)}')
 
-    except Exception as e:
-        raise AbortTask(f'File {hash} cannot be processed due to: {str(e)}')
+            self.task_manager.current_page = chunks
+            self.task_manager.total_pages = max(self.task_manager.total_pages or 0, chunks)
+            self.task_manager.save(update_fields=['current_page', 'total_pages'])
+
+    # the task manager marks the task as done when both values match, the whole file is processed in one run, there is
+    # not a time limit for the tasks, and an interrupted run is resumed from the last chunk saved
+    self.task_manager.current_page = self.task_manager.total_pages
+    self.task_manager.save(update_fields=['current_page'])
 
     for bill in context['provisioning_bills'].values():
         if not ProvisioningUserConsumption.objects.filter(bills=bill).exists():
             bill.delete()
 
-    if len(df) == limit:
-        upload.delay(hash, page=page + 1, task_manager_id=task_manager_id)
-
-    elif not ProvisioningUserConsumption.objects.filter(hash=hash, status='ERROR').exists():
+    if not ProvisioningUserConsumption.objects.filter(hash=hash, status='ERROR').exists():
         calculate_bill_amounts.delay(hash)
 
 
@@ -9,15 +9,17 @@ import re
 import string
 from datetime import datetime, timedelta
 from random import choices
-from unittest.mock import MagicMock, PropertyMock, call, patch
+from unittest.mock import ANY, MagicMock, PropertyMock, call, patch
 
 import pandas as pd
 import pytz
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from faker import Faker
 from pytz import UTC
 
-from breathecode.provisioning import tasks
+from breathecode.provisioning import actions, tasks
 from breathecode.provisioning.tasks import upload
 
 from ..mixins import ProvisioningTestCase
@@ -233,16 +235,6 @@ def github_academy_user_data(data={}):
     }
 
 
-def get_last_task_manager_id(bc):
-    task_manager_cls = bc.database.get_model('task_manager.TaskManager')
-    task_manager = task_manager_cls.objects.order_by('-id').first()
-
-    if task_manager is None:
-        return 0
-
-    return task_manager.id
-
-
 class RandomFileTestSuite(ProvisioningTestCase):
     # When: random csv is uploaded and the file does not exists
     # Then: the task should not create any bill or activity
@@ -988,10 +980,9 @@ class CodespacesTestSuite(ProvisioningTestCase):
         logging.Logger.info.call_args_list = []
         logging.Logger.error.call_args_list = []
 
-        task_manager_id = get_last_task_manager_id(self.bc) + 1
-
         slug = self.bc.fake.slug()
-        with patch('breathecode.services.google_cloud.File.download', MagicMock(side_effect=csv_file_mock(csv))):
+        download = MagicMock(side_effect=csv_file_mock(csv))
+        with patch('breathecode.services.google_cloud.File.download', download):
 
             upload(slug)
 
@@ -1047,16 +1038,86 @@ class CodespacesTestSuite(ProvisioningTestCase):
             self.bc.format.to_dict(model.github_academy_user),
         )
 
-        self.bc.check.calls(logging.Logger.info.call_args_list,
-                            [call(f'Starting upload for hash {slug}') for _ in range(4)])
+        # the file is downloaded once and processed in chunks within the same run
+        self.bc.check.calls(logging.Logger.info.call_args_list, [call(f'Starting upload for hash {slug}')])
         self.bc.check.calls(logging.Logger.error.call_args_list, [])
+        self.bc.check.calls(download.call_args_list, [call(ANY)])
 
-        self.bc.check.calls(tasks.upload.delay.call_args_list, [
-            call(slug, page=1, task_manager_id=task_manager_id),
-            call(slug, page=2, task_manager_id=task_manager_id),
-            call(slug, page=3, task_manager_id=task_manager_id),
-        ])
+        self.bc.check.calls(tasks.upload.delay.call_args_list, [])
+
+        self.bc.check.calls(tasks.calculate_bill_amounts.delay.call_args_list, [call(slug)])
+
+        tasks.PANDAS_ROWS_LIMIT = limit
+
+    # Given: a csv with codespaces data and 10 User, 10 GithubAcademyUser, 10 GithubAcademyUserLog,
+    #     -> and 1 ProvisioningVendor of type codespaces
+    # When: the first run was interrupted after the first chunk, and the task manager resumes it in the next page
+    # Then: the task should continue after the last row saved
+    @patch.multiple('breathecode.services.google_cloud.Storage',
+                    __init__=MagicMock(return_value=None),
+                    client=PropertyMock(),
+                    create=True)
+    @patch.multiple('breathecode.services.google_cloud.File',
+                    __init__=MagicMock(return_value=None),
+                    bucket=PropertyMock(),
+                    file_name=PropertyMock(),
+                    upload=MagicMock(),
+                    exists=MagicMock(return_value=True),
+                    url=MagicMock(return_value='https://storage.cloud.google.com/media-breathecode/hardcoded_url'),
+                    create=True)
+    @patch('breathecode.provisioning.tasks.upload.delay', MagicMock(wraps=upload.delay))
+    @patch('breathecode.provisioning.tasks.calculate_bill_amounts.delay', MagicMock())
+    @patch('django.utils.timezone.now', MagicMock(return_value=UTC_NOW))
+    @patch('logging.Logger.info', MagicMock())
+    @patch('logging.Logger.error', MagicMock())
+    @patch('breathecode.admissions.signals.student_edu_status_updated.send', MagicMock())
+    @patch('breathecode.notify.utils.hook_manager.HookManagerClass.process_model_event', MagicMock())
+    def test_pagination__resumed(self):
+        csv = codespaces_csv(10)
+
+        limit = tasks.PANDAS_ROWS_LIMIT
+        tasks.PANDAS_ROWS_LIMIT = 3
+
+        github_academy_users = [{
+            'username': x,
+        } for x in csv['Username']]
+        github_academy_user_logs = [{
+            'storage_status': 'SYNCHED',
+            'storage_action': 'ADD',
+            'academy_user_id': n + 1,
+        } for n in range(10)]
+        provisioning_vendor = {'name': 'Codespaces'}
+        self.bc.database.create(user=10,
+                                github_academy_user=github_academy_users,
+                                github_academy_user_log=github_academy_user_logs,
+                                provisioning_vendor=provisioning_vendor)
+
+        slug = self.bc.fake.slug()
+        original_save_activities = actions.save_activities
 
+        def save_activities(context):
+            # the worker stops while the second chunk is being saved
+            if save_activities.calls == 1:
+                raise Exception('The worker was stopped')
+
+            save_activities.calls += 1
+            return original_save_activities(context)
+
+        save_activities.calls = 0
+
+        with patch('breathecode.services.google_cloud.File.download', MagicMock(side_effect=csv_file_mock(csv))):
+            with patch('breathecode.provisioning.actions.save_activities', save_activities):
+                upload(slug)
+
+        self.assertEqual([x['csv_row'] for x in self.bc.database.list_of('provisioning.ProvisioningConsumptionEvent')],
+                         [0, 1, 2])
+
+        # the task manager resumes the task in the page after the last one it saved
+        with patch('breathecode.services.google_cloud.File.download', MagicMock(side_effect=csv_file_mock(csv))):
+            upload(slug, page=2)
+
+        self.assertEqual([x['csv_row'] for x in self.bc.database.list_of('provisioning.ProvisioningConsumptionEvent')],
+                         list(range(10)))
         self.bc.check.calls(tasks.calculate_bill_amounts.delay.call_args_list, [call(slug)])
 
         tasks.PANDAS_ROWS_LIMIT = limit
@@ -1627,10 +1688,9 @@ class GitpodTestSuite(ProvisioningTestCase):
         logging.Logger.info.call_args_list = []
         logging.Logger.error.call_args_list = []
 
-        task_manager_id = get_last_task_manager_id(self.bc) + 1
-
         slug = self.bc.fake.slug()
-        with patch('breathecode.services.google_cloud.File.download', MagicMock(side_effect=csv_file_mock(csv))):
+        download = MagicMock(side_effect=csv_file_mock(csv))
+        with patch('breathecode.services.google_cloud.File.download', download):
 
             upload(slug)
 
@@ -1684,15 +1744,12 @@ class GitpodTestSuite(ProvisioningTestCase):
         self.assertEqual(self.bc.database.list_of('authenticate.GithubAcademyUser'),
                          self.bc.format.to_dict(model.github_academy_user))
 
-        self.bc.check.calls(logging.Logger.info.call_args_list,
-                            [call(f'Starting upload for hash {slug}') for _ in range(4)])
+        # the file is downloaded once and processed in chunks within the same run
+        self.bc.check.calls(logging.Logger.info.call_args_list, [call(f'Starting upload for hash {slug}')])
         self.bc.check.calls(logging.Logger.error.call_args_list, [])
+        self.bc.check.calls(download.call_args_list, [call(ANY)])
 
-        self.bc.check.calls(tasks.upload.delay.call_args_list, [
-            call(slug, page=1, task_manager_id=task_manager_id),
-            call(slug, page=2, task_manager_id=task_manager_id),
-            call(slug, page=3, task_manager_id=task_manager_id),
-        ])
+        self.bc.check.calls(tasks.upload.delay.call_args_list, [])
 
         self.bc.check.calls(tasks.calculate_bill_amounts.delay.call_args_list, [call(slug)])
 
@@ -1818,6 +1875,89 @@ class GitpodTestSuite(ProvisioningTestCase):
         self.bc.check.calls(tasks.upload.delay.call_args_list, [])
         self.bc.check.calls(tasks.calculate_bill_amounts.delay.call_args_list, [call(slug)])
 
+    # Given: a csv with gitpod data and 10 User in 3 academies, with a CohortUser in the second one
+    # When: the users belong to many academies
+    # Then: the task should create the bill of the academy of their cohort, with one query of CohortUser
+    @patch.multiple('breathecode.services.google_cloud.Storage',
+                    __init__=MagicMock(return_value=None),
+                    client=PropertyMock(),
+                    create=True)
+    @patch.multiple('breathecode.services.google_cloud.File',
+                    __init__=MagicMock(return_value=None),
+                    bucket=PropertyMock(),
+                    file_name=PropertyMock(),
+                    upload=MagicMock(),
+                    exists=MagicMock(return_value=True),
+                    url=MagicMock(return_value='https://storage.cloud.google.com/media-breathecode/hardcoded_url'),
+                    create=True)
+    @patch('breathecode.provisioning.tasks.upload.delay', MagicMock(wraps=upload.delay))
+    @patch('breathecode.provisioning.tasks.calculate_bill_amounts.delay', MagicMock())
+    @patch('django.utils.timezone.now', MagicMock(return_value=UTC_NOW))
+    @patch('logging.Logger.info', MagicMock())
+    @patch('logging.Logger.error', MagicMock())
+    @patch('breathecode.admissions.signals.student_edu_status_updated.send', MagicMock())
+    @patch('breathecode.notify.utils.hook_manager.HookManagerClass.process_model_event', MagicMock())
+    @patch('breathecode.authenticate.signals.academy_invite_accepted.send', MagicMock())
+    def test_from_github_credentials__many_academies__with_cohort_users(self):
+        csv = gitpod_csv(10)
+
+        provisioning_vendor = {'name': 'Gitpod'}
+        profile_academies = []
+
+        for user_n in range(10):
+            for academy_n in range(3):
+                profile_academies.append({
+                    'academy_id': academy_n + 1,
+                    'user_id': user_n + 1,
+                    'status': 'ACTIVE',
+                })
+
+        credentials_github = [{
+            'username': csv['userName'][n],
+            'user_id': n + 1,
+        } for n in range(10)]
+
+        cohort = {
+            'academy_id': 2,
+            'kickoff_date': UTC_NOW + timedelta(days=1),
+            'ending_date': None,
+            'never_ends': True,
+        }
+        cohort_users = [{'user_id': n + 1, 'cohort_id': 1} for n in range(10)]
+
+        model = self.bc.database.create(user=10,
+                                        credentials_github=credentials_github,
+                                        academy=3,
+                                        cohort=cohort,
+                                        cohort_user=cohort_users,
+                                        profile_academy=profile_academies,
+                                        provisioning_vendor=provisioning_vendor)
+
+        logging.Logger.info.call_args_list = []
+        logging.Logger.error.call_args_list = []
+
+        slug = self.bc.fake.slug()
+
+        with patch('breathecode.services.google_cloud.File.download', MagicMock(side_effect=csv_file_mock(csv))):
+            with CaptureQueriesContext(connection) as context:
+                upload(slug)
+
+        self.assertEqual(self.bc.database.list_of('provisioning.ProvisioningBill'), [
+            provisioning_bill_data({
+                'id': 1,
+                'academy_id': 2,
+                'hash': slug,
+                'vendor_id': 1,
+            }),
+        ])
+        self.assertEqual(len(self.bc.database.list_of('provisioning.ProvisioningConsumptionEvent')), 10)
+
+        queries = [x['sql'] for x in context.captured_queries if 'FROM "admissions_cohortuser"' in x['sql']]
+        self.assertEqual(len(queries), 1)
+
+        self.bc.check.calls(logging.Logger.error.call_args_list, [])
+        self.bc.check.calls(tasks.calculate_bill_amounts.delay.call_args_list, [call(slug)])
+
     # Given: a csv with codespaces data and 10 User, 10 GithubAcademyUser, 10 GithubAcademyUserLog
     #     -> and 1 ProvisioningVendor of type codespaces
     # When: all the data is correct, with ProfileAcademy
@@ -228,7 +228,7 @@ class UploadView(APIView):
         hash = hashlib.sha256(content_bytes).hexdigest()
 
         file.seek(0)
-        csv_first_line = cut_csv(file, first=1)
+        csv_first_line = cut_csv(file, first=1, key=hash)
         df = pd.read_csv(csv_first_line, sep=',')
         df.reset_index()
 
@@ -239,7 +239,7 @@ class UploadView(APIView):
         if len(df.keys().intersection(fields)) == len(fields):
             format_error = False
 
-            csv_last_line = cut_csv(file, last=1)
+            csv_last_line = cut_csv(file, last=1, key=hash)
             df2 = pd.read_csv(csv_last_line, sep=',', usecols=fields)
             df2.reset_index()
 
@@ -280,7 +280,7 @@ class UploadView(APIView):
         if format_error and len(df.keys().intersection(fields)) == len(fields):
             format_error = False
 
-            csv_last_line = cut_csv(file, last=1)
+            csv_last_line = cut_csv(file, last=1, key=hash)
             df2 = pd.read_csv(csv_last_line, sep=',', usecols=fields)
             df2.reset_index()
 
@@ -336,7 +336,7 @@ class UploadView(APIView):
                                       silent=True,
                                       code=503)
 
-        tasks.upload.delay(hash, total_pages=math.ceil(count_csv_rows(file) / tasks.PANDAS_ROWS_LIMIT))
+        tasks.upload.delay(hash, total_pages=math.ceil(count_csv_rows(file, key=hash) / tasks.PANDAS_ROWS_LIMIT))
 
         data = {'file_name': hash, 'status': 'PENDING', 'created': created}
 
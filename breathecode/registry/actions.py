@@ -1,15 +1,20 @@
-import logging, json, os, re, pathlib, base64, hashlib, requests
-from typing import Optional
+import logging, json, os, re, pathlib, base64, hashlib, operator, requests
+from functools import reduce
+from typing import NamedTuple, Optional
 from breathecode.media.models import Media, MediaResolution
 from breathecode.utils.views import set_query_parameter
 from breathecode.services.google_cloud.storage import Storage
-from django.db.models import Q
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, QuerySet, Value, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.template.loader import get_template
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlparse
 from breathecode.assessment.actions import create_from_asset
 from breathecode.authenticate.models import CredentialsGithub
-from .models import Asset, AssetImage, AssetTechnology, AssetErrorLog, ASSET_STATUS, OriginalityScan, ContentVariable
+from .models import Asset, AssetAlias, AssetImage, AssetTechnology, AssetErrorLog, ASSET_STATUS, OriginalityScan, ContentVariable
 from .serializers import AssetBigSerializer
 from .utils import (LessonValidator, ExerciseValidator, QuizValidator, AssetException, ProjectValidator,
                     ArticleValidator, OriginalityWrapper)
@@ -138,6 +143,7 @@ def pull_from_github(asset_slug, author_id=None, override_meta=False):
         asset.sync_status = 'OK'
         asset.last_synch_at = timezone.now()
         asset.save()
+        cache_asset_readme(asset)
         logger.debug(f'Successfully re-synched asset {asset_slug} with github')
 
         return asset
@@ -201,6 +207,7 @@ def push_to_github(asset_slug, author=None):
         asset.sync_status = 'OK'
         asset.last_synch_at = timezone.now()
         asset.save()
+        cache_asset_readme(asset)
         logger.debug(f'Successfully re-synched asset {asset_slug} with github')
 
         return asset
@@ -398,6 +405,8 @@ def clean_asset_readme(asset: Asset):
 
         asset.cleaning_status = 'OK'
         asset.save()
+
+        cache_asset_readme(asset)
     except Exception as e:
         asset.cleaning_status = 'ERROR'
         asset.cleaning_status_details = str(e)
@@ -406,6 +415,224 @@ def clean_asset_readme(asset: Asset):
     return asset
 
 
+README_CACHE_VERSION = 1
+README_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+README_CONTENT_TYPES = {
+    'raw': 'text/markdown',
+    'html': 'text/html',
+    'md': 'text/markdown',
+    'mdx': 'text/markdown',
+    'txt': 'text/markdown',
+    'ipynb': 'application/json',
+}
+
+
+class RenderedReadme(NamedTuple):
+    content: str
+    content_type: str
+    etag: str
+
+
+def _get_readme_format(asset: Asset) -> Optional[str]:
+    readme_url = asset.readme_url
+    if readme_url is None and asset.asset_type == 'LESSON':
+        readme_url = asset.url
+
+    # external assets will have a default markdown readme generated internally
+    extension = '.md'
+    if readme_url and readme_url != '':
+        u = urlparse(readme_url)
+        extension = pathlib.Path(u[2]).suffix if not asset.external else '.md'
+
+    if extension in ['.md', '.mdx', '.txt']:
+        return 'markdown'
+
+    if extension in ['.ipynb']:
+        return 'notebook'
+
+    return None
+
+
+def _get_readme_source(asset: Asset) -> str:
+    readme = asset.readme if asset.readme is not None else asset.readme_raw
+    if readme is None or readme == '':
+        readme = Asset.encode(get_template('empty.md').render({
+            'title': asset.title,
+            'lang': asset.lang,
+            'asset_type': asset.asset_type,
+        }))
+
+    return readme
+
+
+def _render_readme(asset: Asset, source: str, extension: str, format: Optional[str], remove_frontmatter: bool) -> str:
+    readme = {'decoded': Asset.decode(source)}
+    if format:
+        readme = asset.parse(readme, format=format, remove_frontmatter=remove_frontmatter)
+
+    if extension == 'html':
+        return readme.get('html', '')
+
+    return readme['decoded']
+
+
+def get_rendered_readme(asset: Asset, extension: str, remove_frontmatter: bool = True) -> RenderedReadme:
+    """
+    Get the readme of the asset in the requested extension, it never writes in the database.
+
+    The parsed readmes are cached by the hash of their content, so they are rendered once per version of the
+    readme, the same hash is used as strong ETag.
+    """
+
+    content_type = README_CONTENT_TYPES[extension]
+
+    if extension == 'raw':
+        content = Asset.decode(asset.readme_raw) or ''
+        return RenderedReadme(content, content_type, hashlib.sha256(content.encode('utf-8')).hexdigest())
+
+    if extension == 'html' and asset.html:
+        return RenderedReadme(asset.html, content_type, hashlib.sha256(asset.html.encode('utf-8')).hexdigest())
+
+    source = _get_readme_source(asset)
+    if extension == 'ipynb':
+        content = Asset.decode(source)
+        return RenderedReadme(content, content_type, hashlib.sha256(content.encode('utf-8')).hexdigest())
+
+    format = _get_readme_format(asset)
+    output = 'html' if extension == 'html' else 'md'
+    digest = hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+    etag = hashlib.sha256(
+        f'{README_CACHE_VERSION}:{output}:{format}:{int(remove_frontmatter)}:{digest}'.encode('utf-8')).hexdigest()
+    key = f'readme:{etag}'
+
+    content = cache.get(key)
+    if content is None:
+        content = _render_readme(asset, source, extension, format, remove_frontmatter)
+        cache.set(key, content, README_CACHE_TIMEOUT)
+
+    return RenderedReadme(content, content_type, etag)
+
+
+def cache_asset_readme(asset: Asset) -> None:
+    """Render the readme of the asset ahead of the requests, it is called after the asset was synched."""
+
+    try:
+        for remove_frontmatter in [True, False]:
+            get_rendered_readme(asset, 'md', remove_frontmatter)
+
+            if not asset.html:
+                get_rendered_readme(asset, 'html', remove_frontmatter)
+
+    except Exception:
+        logger.exception(f'Error rendering the readme of the asset {asset.slug}')
+
+
+ASSET_SEARCH_CONFIGS = {
+    'us': 'english',
+    'en': 'english',
+    'es': 'spanish',
+    'it': 'italian',
+    'pt': 'portuguese',
+    'fr': 'french',
+    'de': 'german',
+}
+
+# weights of the fields in the fallback ranking, they mirror the A and B weights of the search vector
+ASSET_SEARCH_WEIGHTS = {'slug': 1.0, 'title': 1.0, 'aliases': 1.0, 'description': 0.4}
+
+
+def get_search_config(lang: Optional[str]) -> str:
+    """Get the text search configuration used to stem the content written in `lang`."""
+
+    return ASSET_SEARCH_CONFIGS.get(lang or '', 'simple')
+
+
+def _is_postgres(db: str = 'default') -> bool:
+    return connections[db].vendor == 'postgresql'
+
+
+def update_asset_search_vector(asset: Asset) -> None:
+    """Index the slug, aliases, title and description of the asset, the words get stemmed in the asset lang."""
+
+    if not _is_postgres():
+        return
+
+    config = get_search_config(asset.lang)
+    aliases = ' '.join(AssetAlias.objects.filter(asset__id=asset.id).values_list('slug', flat=True))
+
+    vector = SearchVector('slug', config='simple', weight='A')
+    vector += SearchVector(Value(aliases), config='simple', weight='A')
+    vector += SearchVector('title', config=config, weight='A')
+    vector += SearchVector('description', config=config, weight='B')
+
+    # update does not emit post_save, so it cannot trigger this function again
+    Asset.objects.filter(id=asset.id).update(search_vector=vector)
+
+
+def _get_search_words(search: str) -> list[str]:
+    return list(dict.fromkeys(x for x in re.split(r'\W+', search.lower()) if x))
+
+
+def _search_assets_in_memory(queryset: QuerySet[Asset], words: list[str]) -> QuerySet[Asset]:
+    # every word must match, like in the websearch query of postgres
+    lookup = Q()
+    for word in words:
+        lookup &= (Q(slug__icontains=word) | Q(title__icontains=word) | Q(description__icontains=word)
+                   | Q(id__in=AssetAlias.objects.filter(slug__icontains=word).values('asset__id')))
+
+    candidates = {
+        id: {
+            'slug': slug,
+            'title': title or '',
+            'description': description or '',
+            'aliases': '',
+        }
+        for id, slug, title, description in queryset.filter(lookup).values_list('id', 'slug', 'title', 'description')
+    }
+
+    for asset_id, slug in AssetAlias.objects.filter(asset__id__in=candidates).values_list('asset__id', 'slug'):
+        candidates[asset_id]['aliases'] += f' {slug}'
+
+    whens = []
+    for id, fields in candidates.items():
+        rank = 0.0
+        for field, weight in ASSET_SEARCH_WEIGHTS.items():
+            value = fields[field].lower()
+            rank += weight * sum(1 for word in words if word in value)
+
+        whens.append(When(id=id, then=Value(rank / len(words))))
+
+    return queryset.filter(id__in=candidates).annotate(
+        search_rank=Case(*whens, default=Value(0.0), output_field=FloatField()))
+
+
+def search_assets(queryset: QuerySet[Asset], search: str, lang: Optional[str] = None) -> QuerySet[Asset]:
+    """
+    Filter the assets that match `search` and annotate how well they match as `search_rank`.
+
+    Postgres answers it with the search vector and the trigram indexes in one query, other databases rank the
+    candidates in memory.
+    """
+
+    words = _get_search_words(search)
+    if not words:
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    if not _is_postgres(queryset.db):
+        return _search_assets_in_memory(queryset, words)
+
+    search = ' '.join(search.split())
+    configs = dict.fromkeys([get_search_config(lang), 'simple'])
+    query = reduce(operator.or_, [SearchQuery(search, config=x, search_type='websearch') for x in configs])
+
+    lookup = Q(search_vector=query) | Q(title__trigram_word_similar=search) | Q(slug__trigram_word_similar=search)
+    # the assets that were not indexed yet have a null vector, they still could match by the trigrams
+    rank = Coalesce(SearchRank(F('search_vector'), query), Value(0.0)) + TrigramWordSimilarity(search, 'title')
+
+    return queryset.filter(lookup).annotate(search_rank=rank)
+
+
 def clean_content_variables(asset: Asset):
     logger.debug(f'Clearning content variables for readme for asset {asset.slug}')
     readme = asset.get_readme()
@@ -0,0 +1,214 @@
+"""
+Write-behind log of the asset errors found while serving requests.
+
+The errors are counted in Redis by (slug, path, asset_type) and `flush_asset_errors` saves them as rows with the
+amount of occurrences, this way a crawler asking for missing slugs does not write in the database on every request.
+"""
+
+import hashlib
+import json
+import pickle
+from typing import Any, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from breathecode.utils.redis import Lock
+
+__all__ = ['add_asset_error', 'flush_asset_errors', 'is_missing_slug', 'set_missing_slug', 'forget_missing_slugs']
+
+IS_DJANGO_REDIS = hasattr(cache, 'delete_pattern')
+
+ASSET_ERRORS_KEY = 'asset-errors'
+ASSET_ERRORS_META_KEY = 'asset-errors:meta'
+ASSET_ERRORS_SCHEDULED_KEY = 'asset-errors:scheduled'
+
+# seconds between two flushes while there are errors being buffered
+ASSET_ERRORS_FLUSH_DELAY = 60
+ASSET_ERRORS_BATCH_SIZE = 500
+
+# it bounds how long a slug can keep being reported as missing if the invalidation was skipped by a bulk update
+MISSING_SLUG_TIMEOUT = 60 * 5
+
+ErrorKey = tuple[str, str, Optional[str]]
+
+
+def _get_redis():
+    from django_redis import get_redis_connection
+
+    return get_redis_connection('default')
+
+
+def _get_missing_slug_key(slug: str) -> str:
+    # the slug comes from the url, so it is hashed to get a valid key whatever it contains
+    return 'asset-slug-miss:' + hashlib.sha1(slug.encode('utf-8')).hexdigest()
+
+
+def is_missing_slug(slug: str) -> bool:
+    """Check if the slug was recently looked up without finding an asset or an alias."""
+
+    return cache.get(_get_missing_slug_key(slug)) is not None
+
+
+def set_missing_slug(slug: str) -> None:
+    cache.set(_get_missing_slug_key(slug), True, MISSING_SLUG_TIMEOUT)
+
+
+def forget_missing_slugs(*slugs: str) -> None:
+    """Remove the slugs from the negative lookup cache, it must be called when an asset or alias takes them."""
+
+    cache.delete_many([_get_missing_slug_key(slug) for slug in slugs if slug])
+
+
+def _schedule_flush(client) -> None:
+    from .tasks import async_flush_asset_errors
+
+    if client.set(ASSET_ERRORS_SCHEDULED_KEY, 1, nx=True, ex=ASSET_ERRORS_FLUSH_DELAY):
+        async_flush_asset_errors.apply_async(countdown=ASSET_ERRORS_FLUSH_DELAY)
+
+
+def add_asset_error(slug: str,
+                    path: str,
+                    asset_type: Optional[str] = None,
+                    asset_id: Optional[int] = None,
+                    user_id: Optional[int] = None,
+                    status_text: Optional[str] = None,
+                    occurrences: int = 1) -> None:
+    """Count an occurrence of the error, the metadata of the last occurrence is kept."""
+
+    # the path comes from the url and it could be longer than the column
+    field = json.dumps([slug, path[:200], asset_type])
+    meta = {'asset_id': asset_id, 'user_id': user_id, 'status_text': status_text}
+
+    if IS_DJANGO_REDIS:
+        client = _get_redis()
+
+        pipeline = client.pipeline()
+        pipeline.hincrby(ASSET_ERRORS_KEY, field, occurrences)
+        pipeline.hset(ASSET_ERRORS_META_KEY, field, json.dumps(meta))
+        pipeline.execute()
+
+        _schedule_flush(client)
+        return
+
+    with Lock(None, f'lock:{ASSET_ERRORS_KEY}', timeout=30, blocking_timeout=30):
+        errors = cache.get(ASSET_ERRORS_KEY)
+        errors = pickle.loads(errors) if errors else {}
+
+        if field in errors:
+            occurrences += errors[field]['occurrences']
+
+        errors[field] = {**meta, 'occurrences': occurrences}
+
+        cache.set(ASSET_ERRORS_KEY, pickle.dumps(errors), timeout=None)
+
+
+def _pop_asset_errors() -> dict[str, dict[str, Any]]:
+    if IS_DJANGO_REDIS:
+        client = _get_redis()
+
+        pipeline = client.pipeline(transaction=True)
+        pipeline.hgetall(ASSET_ERRORS_KEY)
+        pipeline.hgetall(ASSET_ERRORS_META_KEY)
+        pipeline.delete(ASSET_ERRORS_KEY, ASSET_ERRORS_META_KEY)
+        counts, metas, _ = pipeline.execute()
+
+        errors = {}
+        for field, occurrences in counts.items():
+            meta = metas.get(field)
+            meta = json.loads(meta) if meta else {}
+            errors[field.decode('utf-8')] = {**meta, 'occurrences': int(occurrences)}
+
+        return errors
+
+    with Lock(None, f'lock:{ASSET_ERRORS_KEY}', timeout=30, blocking_timeout=30):
+        errors = cache.get(ASSET_ERRORS_KEY)
+        cache.delete(ASSET_ERRORS_KEY)
+
+    return pickle.loads(errors) if errors else {}
+
+
+def _restore_asset_errors(errors: dict[str, dict[str, Any]]) -> None:
+    for field, error in errors.items():
+        slug, path, asset_type = json.loads(field)
+        add_asset_error(slug, path, asset_type, error.get('asset_id'), error.get('user_id'), error.get('status_text'),
+                        error['occurrences'])
+
+
+def _save_asset_errors(errors: dict[ErrorKey, dict[str, Any]]) -> None:
+    from django.contrib.auth.models import User
+
+    from .models import Asset, AssetErrorLog
+
+    utc_now = timezone.now()
+
+    # the assets and users could have been deleted since the error was buffered
+    asset_ids = {x['asset_id'] for x in errors.values() if x.get('asset_id')}
+    asset_ids = set(Asset.objects.filter(id__in=asset_ids).values_list('id', flat=True))
+
+    user_ids = {x['user_id'] for x in errors.values() if x.get('user_id')}
+    user_ids = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+
+    lookup = Q(pk__in=[])
+    for slug, path, asset_type in errors:
+        lookup |= Q(slug=slug, path=path, asset_type=asset_type)
+
+    # the last open error of each key accumulates the new occurrences
+    found: dict[ErrorKey, AssetErrorLog] = {}
+    for row in AssetErrorLog.objects.filter(lookup, status='ERROR').order_by('id'):
+        found[(row.slug, row.path, row.asset_type)] = row
+
+    to_create = []
+    to_update = []
+    for key, error in errors.items():
+        asset_id = error.get('asset_id') if error.get('asset_id') in asset_ids else None
+        user_id = error.get('user_id') if error.get('user_id') in user_ids else None
+
+        if key in found:
+            row = found[key]
+            row.occurrences += error['occurrences']
+            row.last_seen_at = utc_now
+            row.asset_id = asset_id or row.asset_id
+            row.user_id = user_id or row.user_id
+            row.status_text = error.get('status_text') or row.status_text
+            to_update.append(row)
+
+        else:
+            slug, path, asset_type = key
+            to_create.append(
+                AssetErrorLog(slug=slug,
+                              path=path,
+                              asset_type=asset_type,
+                              asset_id=asset_id,
+                              user_id=user_id,
+                              status_text=error.get('status_text'),
+                              occurrences=error['occurrences'],
+                              last_seen_at=utc_now))
+
+    AssetErrorLog.objects.bulk_update(to_update, ['occurrences', 'last_seen_at', 'asset', 'user', 'status_text'],
+                                      batch_size=ASSET_ERRORS_BATCH_SIZE)
+    AssetErrorLog.objects.bulk_create(to_create, batch_size=ASSET_ERRORS_BATCH_SIZE)
+
+
+def flush_asset_errors() -> int:
+    """Save the buffered errors, it returns the amount of occurrences that were saved."""
+
+    errors = _pop_asset_errors()
+    if not errors:
+        return 0
+
+    try:
+        items = [(tuple(json.loads(field)), error) for field, error in errors.items()]
+
+        with transaction.atomic():
+            for i in range(0, len(items), ASSET_ERRORS_BATCH_SIZE):
+                _save_asset_errors(dict(items[i:i + ASSET_ERRORS_BATCH_SIZE]))
+
+    except Exception:
+        # the errors are buffered again to not lose them, they will be saved in the next flush
+        _restore_asset_errors(errors)
+        raise
+
+    return sum(x['occurrences'] for x in errors.values())
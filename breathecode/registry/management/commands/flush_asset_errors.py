@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from ...tasks import async_flush_asset_errors
+
+
+class Command(BaseCommand):
+    help = 'Save the asset errors buffered while serving requests'
+
+    def handle(self, *args, **options):
+        async_flush_asset_errors.delay()
+        self.stdout.write(self.style.SUCCESS('Done!'))
@@ -0,0 +1,82 @@
+# Generated by Django 5.0.5 on 2026-10-18 20:51
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# the configs are copied here because a migration must not depend on the current state of the code
+SEARCH_CONFIGS = {
+    'us': 'english',
+    'en': 'english',
+    'es': 'spanish',
+    'it': 'italian',
+    'pt': 'portuguese',
+    'fr': 'french',
+    'de': 'german',
+}
+
+CREATE_INDEXES = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS registry_asset_search_vector_gin ON registry_asset USING gin (search_vector)',
+    'CREATE INDEX IF NOT EXISTS registry_asset_title_trgm ON registry_asset USING gin (title gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS registry_asset_slug_trgm ON registry_asset USING gin (slug gin_trgm_ops)',
+]
+
+DROP_INDEXES = [
+    'DROP INDEX IF EXISTS registry_asset_search_vector_gin',
+    'DROP INDEX IF EXISTS registry_asset_title_trgm',
+    'DROP INDEX IF EXISTS registry_asset_slug_trgm',
+]
+
+
+def get_backfill_sql():
+    whens = ' '.join(f"WHEN '{lang}' THEN '{config}'" for lang, config in SEARCH_CONFIGS.items())
+    config = f"(CASE a.lang {whens} ELSE 'simple' END)::regconfig"
+
+    return f"""
+        UPDATE registry_asset a SET search_vector =
+            setweight(to_tsvector('simple', coalesce(a.slug, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(
+                (SELECT string_agg(x.slug, ' ') FROM registry_assetalias x WHERE x.asset_id = a.id), '')), 'A') ||
+            setweight(to_tsvector({config}, coalesce(a.title, '')), 'A') ||
+            setweight(to_tsvector({config}, coalesce(a.description, '')), 'B')
+    """
+
+
+def create_search_indexes(apps, schema_editor):
+    # the search vector and the trigram indexes only exist in postgres, the other databases search in memory
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for sql in CREATE_INDEXES:
+        schema_editor.execute(sql)
+
+    schema_editor.execute(get_backfill_sql())
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    for sql in DROP_INDEXES:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registry', '0042_asset_enable_table_of_content_alter_asset_gitpod_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asset',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(
+                blank=True,
+                default=None,
+                editable=False,
+                help_text='Weighted lexemes of the slug, aliases, title and description',
+                null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.5 on 2026-10-18 20:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('registry', '0043_asset_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asseterrorlog',
+            name='last_seen_at',
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='asseterrorlog',
+            name='occurrences',
+            field=models.PositiveIntegerField(default=1, help_text='Times this error was found since it was logged'),
+        ),
+    ]
@@ -1,12 +1,14 @@
 import base64, frontmatter, markdown, pathlib, logging, re, hashlib
 from urllib.parse import urlparse
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import User
 from django.contrib.auth.models import AnonymousUser
 from django.template.loader import get_template
 from breathecode.admissions.models import Academy, SyllabusVersion
 from django.utils import timezone
 from django.db.models import Q
+from . import error_log
 from .signals import (asset_slug_modified, asset_readme_modified, asset_title_modified, asset_status_updated)
 from slugify import slugify
 from breathecode.assessment.models import Assessment
@@ -326,6 +328,11 @@ class Asset(models.Model):
     readme_updated_at = models.DateTimeField(null=True, blank=True, default=None, db_index=True)
 
     html = models.TextField(null=True, blank=True, default=None)
+    search_vector = SearchVectorField(null=True,
+                                      blank=True,
+                                      default=None,
+                                      editable=False,
+                                      help_text='Weighted lexemes of the slug, aliases, title and description')
 
     academy = models.ForeignKey(Academy, on_delete=models.SET_NULL, null=True, default=None, blank=True)
 
@@ -537,11 +544,11 @@ class Asset(models.Model):
 
         if self.readme is None or self.readme == '':
             if self.asset_type != 'QUIZ':
-                AssetErrorLog(slug=AssetErrorLog.EMPTY_README,
-                              path=self.slug,
-                              asset_type=self.asset_type,
-                              asset=self,
-                              status_text='Readme file was not found').save()
+                error_log.add_asset_error(AssetErrorLog.EMPTY_README,
+                                          self.slug,
+                                          self.asset_type,
+                                          asset_id=self.id,
+                                          status_text='Readme file was not found')
             self.set_readme(
                 get_template('empty.md').render({
                     'title': self.title,
@@ -572,11 +579,11 @@ class Asset(models.Model):
             elif extension in ['.ipynb']:
                 readme = self.parse(readme, format='notebook')
             else:
-                AssetErrorLog(slug=AssetErrorLog.INVALID_README_URL,
-                              path=self.slug,
-                              asset_type=self.asset_type,
-                              asset=self,
-                              status_text='Invalid Readme URL').save()
+                error_log.add_asset_error(AssetErrorLog.INVALID_README_URL,
+                                          self.slug,
+                                          self.asset_type,
+                                          asset_id=self.id,
+                                          status_text='Invalid Readme URL')
         return readme
 
     def parse(self, readme, format='markdown', remove_frontmatter=False):
@@ -671,20 +678,28 @@ class Asset(models.Model):
         if request is not None and not isinstance(request.user, AnonymousUser):
             user = request.user
 
+        user_id = user.id if user is not None else None
+
+        # the slugs that were not found recently skip the lookups, a crawler asks for the same ones many times
+        if error_log.is_missing_slug(asset_slug):
+            error_log.add_asset_error(AssetErrorLog.SLUG_NOT_FOUND, asset_slug, asset_type, user_id=user_id)
+            return None
+
         alias = AssetAlias.objects.filter(Q(slug=asset_slug) | Q(asset__slug=asset_slug)).first()
         if not alias:
             alias = Asset.objects.filter(slug=asset_slug).first()
             is_alias = False
 
         if alias is None:
-            AssetErrorLog(slug=AssetErrorLog.SLUG_NOT_FOUND, path=asset_slug, asset_type=asset_type, user=user).save()
+            error_log.set_missing_slug(asset_slug)
+            error_log.add_asset_error(AssetErrorLog.SLUG_NOT_FOUND, asset_slug, asset_type, user_id=user_id)
             return None
         elif asset_type is not None and alias.asset.asset_type.lower() == asset_type.lower():
-            AssetErrorLog(slug=AssetErrorLog.DIFFERENT_TYPE,
-                          path=asset_slug,
-                          asset=alias.asset,
-                          asset_type=asset_type,
-                          user=user).save()
+            error_log.add_asset_error(AssetErrorLog.DIFFERENT_TYPE,
+                                      asset_slug,
+                                      asset_type,
+                                      asset_id=alias.asset.id,
+                                      user_id=user_id)
 
         elif is_alias:
             return alias.asset
@@ -772,6 +787,9 @@ class AssetErrorLog(models.Model):
         'Assign an asset to this error and you will be able to create an alias for it from the django admin bulk actions "create alias"'
     )
 
+    occurrences = models.PositiveIntegerField(default=1, help_text='Times this error was found since it was logged')
+    last_seen_at = models.DateTimeField(default=None, null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
 
     def __str__(self):
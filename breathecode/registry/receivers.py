@@ -12,6 +12,8 @@ from breathecode.assignments.signals import assignment_created
 from breathecode.monitoring.models import RepositoryWebhook
 from breathecode.monitoring.signals import github_webhook
 
+from . import error_log
+from .actions import update_asset_search_vector
 from .models import Asset, AssetAlias, AssetImage
 from .signals import asset_readme_modified, asset_slug_modified, asset_title_modified
 from .tasks import (
@@ -86,6 +88,22 @@ def post_asset_deleted(sender, instance: Asset, **kwargs):
     async_delete_asset_images.delay(instance.slug)
 
 
+@receiver(post_save, sender=Asset)
+def post_asset_saved(sender, instance: Asset, **kwargs):
+    error_log.forget_missing_slugs(instance.slug)
+    update_asset_search_vector(instance)
+
+
+@receiver(post_save, sender=AssetAlias)
+@receiver(post_delete, sender=AssetAlias)
+def post_assetalias_changed(sender, instance: AssetAlias, **kwargs):
+    error_log.forget_missing_slugs(instance.slug)
+
+    asset = Asset.objects.filter(id=instance.asset_id).first()
+    if asset is not None:
+        update_asset_search_vector(asset)
+
+
 @receiver(post_delete, sender=AssetImage)
 def post_assetimage_deleted(sender, instance: Asset, **kwargs):
     logger.debug('AssetImage deleted, removing image from buckets')
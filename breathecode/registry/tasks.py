@@ -25,6 +25,7 @@ from breathecode.services.seo import SEOAnalyzer
 from breathecode.utils.decorators import TaskPriority
 from breathecode.utils.views import set_query_parameter
 
+from . import error_log
 from .actions import (
     add_syllabus_translations,
     asset_images_bucket,
@@ -296,16 +297,22 @@ def async_delete_asset_images(asset_slug, **_):
     if asset is None:
         raise RetryTask(f'Asset with slug {asset_slug} not found')
 
-    storage = Storage()
+    to_delete = []
     for img in asset.images.all():
-        if img.assets.count() == 1 and img.asset.filter(slug=asset_slug).exists():
-            extension = pathlib.Path(img.name).suffix
-            cloud_file = storage.file(asset_images_bucket(), img.hash + extension)
-            cloud_file.delete()
-            img.delete()
+        if img.assets.count() == 1 and img.assets.filter(slug=asset_slug).exists():
+            to_delete.append(img)
         else:
             img.assets.remove(asset)
+            logger.info(f'Image {img.name} was deleted')
+
+    # the images are removed from the bucket together before removing their rows
+    if to_delete:
+        storage = Storage()
+        file_names = [img.hash + pathlib.Path(img.name).suffix for img in to_delete]
+        storage.files(asset_images_bucket(), file_names).delete()
 
+    for img in to_delete:
+        img.delete()
         logger.info(f'Image {img.name} was deleted')
 
     return True
@@ -509,3 +516,11 @@ def async_generate_quiz_config(assessment_id):
         a.save()
 
     return True
+
+
+@task(priority=TaskPriority.BACKGROUND.value)
+def async_flush_asset_errors(**_):
+    logger.info('Saving the buffered asset errors')
+
+    occurrences = error_log.flush_asset_errors()
+    logger.info(f'{occurrences} asset error occurrences were saved')
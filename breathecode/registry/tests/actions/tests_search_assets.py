@@ -0,0 +1,60 @@
+"""
+Test search_assets
+"""
+from unittest.mock import MagicMock
+
+import pytest
+from django.db import connections
+from django.db.backends.postgresql.base import DatabaseWrapper
+
+from breathecode.registry import actions
+from breathecode.registry.models import Asset
+
+# enable this file to use the database
+pytestmark = pytest.mark.usefixtures('db')
+
+
+def get_postgres_sql(queryset) -> tuple[str, tuple]:
+    # the query is compiled for postgres without connecting to it
+    settings_dict = {**connections['default'].settings_dict, 'ENGINE': 'django.db.backends.postgresql'}
+    connection = DatabaseWrapper(settings_dict, 'postgres')
+
+    return queryset.query.get_compiler(connection=connection).as_sql()
+
+
+def test_empty_search(monkeypatch):
+    monkeypatch.setattr('breathecode.registry.actions._is_postgres', MagicMock(return_value=True))
+
+    queryset = actions.search_assets(Asset.objects.all(), ' - ')
+    sql, _ = get_postgres_sql(queryset)
+
+    assert 'WHERE' not in sql
+    assert 'search_rank' in sql
+
+
+def test_ranked_search(monkeypatch):
+    monkeypatch.setattr('breathecode.registry.actions._is_postgres', MagicMock(return_value=True))
+
+    queryset = actions.search_assets(Asset.objects.all(), 'python   loops', 'es')
+    sql, params = get_postgres_sql(queryset)
+
+    # the words are stemmed in the lang of the assets and without stemming, and every word must match
+    query = '(websearch_to_tsquery(%s::regconfig, %s) || websearch_to_tsquery(%s::regconfig, %s))'
+
+    assert f'ts_rank("registry_asset"."search_vector", {query})' in sql
+    assert 'WORD_SIMILARITY(%s, "registry_asset"."title")' in sql
+    assert f'"registry_asset"."search_vector" @@ {query}' in sql
+    assert '"registry_asset"."title" %%> %s OR "registry_asset"."slug" %%> %s' in sql
+
+    assert params == ('spanish', 'python loops', 'simple', 'python loops', 0.0, 'python loops', 'spanish',
+                      'python loops', 'simple', 'python loops', 'python loops', 'python loops')
+
+
+def test_ranked_search__without_lang(monkeypatch):
+    monkeypatch.setattr('breathecode.registry.actions._is_postgres', MagicMock(return_value=True))
+
+    queryset = actions.search_assets(Asset.objects.all(), 'python')
+    sql, params = get_postgres_sql(queryset)
+
+    assert sql.count('websearch_to_tsquery') == 2
+    assert params == ('simple', 'python', 0.0, 'python', 'simple', 'python', 'python', 'python')
@@ -0,0 +1,117 @@
+"""
+Test async_flush_asset_errors
+"""
+import pytest
+from django.utils import timezone
+
+from breathecode.registry import error_log
+from breathecode.registry.models import Asset, AssetErrorLog
+from breathecode.registry.tasks import async_flush_asset_errors
+from breathecode.tests.mixins.breathecode_mixin.breathecode import Breathecode
+
+UTC_NOW = timezone.now()
+
+
+@pytest.fixture(autouse=True)
+def setup(db, monkeypatch):
+    monkeypatch.setattr('django.utils.timezone.now', lambda: UTC_NOW)
+    yield
+
+
+def error_log_item(data={}):
+    return {
+        'id': 1,
+        'asset_id': None,
+        'asset_type': None,
+        'slug': AssetErrorLog.SLUG_NOT_FOUND,
+        'status': 'ERROR',
+        'path': 'missing-slug',
+        'status_text': None,
+        'user_id': None,
+        'occurrences': 1,
+        'last_seen_at': UTC_NOW,
+        **data,
+    }
+
+
+def test_nothing_buffered(bc: Breathecode):
+    async_flush_asset_errors.delay()
+
+    assert bc.database.list_of('registry.AssetErrorLog') == []
+
+
+def test_missing_slug__is_aggregated(bc: Breathecode, django_assert_num_queries):
+    assert Asset.get_by_slug('missing-slug') is None
+
+    # the negative lookup cache skips the queries of the next misses
+    with django_assert_num_queries(0):
+        assert Asset.get_by_slug('missing-slug') is None
+        assert Asset.get_by_slug('missing-slug') is None
+
+    assert bc.database.list_of('registry.AssetErrorLog') == []
+
+    async_flush_asset_errors.delay()
+
+    assert bc.database.list_of('registry.AssetErrorLog') == [error_log_item({'occurrences': 3})]
+
+
+def test_open_error__accumulates_the_occurrences(bc: Breathecode):
+    model = bc.database.create(asset_error_log=[
+        {
+            'slug': AssetErrorLog.SLUG_NOT_FOUND,
+            'path': 'missing-slug',
+            'status': 'FIXED',
+        },
+        {
+            'slug': AssetErrorLog.SLUG_NOT_FOUND,
+            'path': 'missing-slug',
+            'status': 'ERROR',
+            'occurrences': 4,
+        },
+    ])
+
+    error_log.add_asset_error(AssetErrorLog.SLUG_NOT_FOUND, 'missing-slug')
+    error_log.add_asset_error(AssetErrorLog.SLUG_NOT_FOUND, 'missing-slug')
+    error_log.add_asset_error(AssetErrorLog.EMPTY_README, 'missing-slug', 'LESSON', status_text='Readme not found')
+
+    async_flush_asset_errors.delay()
+
+    assert bc.database.list_of('registry.AssetErrorLog') == [
+        bc.format.to_dict(model.asset_error_log[0]),
+        {
+            **bc.format.to_dict(model.asset_error_log[1]),
+            'occurrences': 6,
+            'last_seen_at': UTC_NOW,
+        },
+        error_log_item({
+            'id': 3,
+            'slug': AssetErrorLog.EMPTY_README,
+            'asset_type': 'LESSON',
+            'status_text': 'Readme not found',
+        }),
+    ]
+
+
+def test_deleted_asset__is_not_linked(bc: Breathecode):
+    model = bc.database.create(asset=1, user=1)
+
+    error_log.add_asset_error(AssetErrorLog.INVALID_URL, 'slug', 'LESSON', asset_id=2, user_id=model.user.id)
+    error_log.add_asset_error(AssetErrorLog.EMPTY_HTML, 'slug', 'LESSON', asset_id=model.asset.id, user_id=2)
+
+    async_flush_asset_errors.delay()
+
+    assert bc.database.list_of('registry.AssetErrorLog') == [
+        error_log_item({
+            'slug': AssetErrorLog.INVALID_URL,
+            'path': 'slug',
+            'asset_type': 'LESSON',
+            'user_id': 1,
+        }),
+        error_log_item({
+            'id': 2,
+            'slug': AssetErrorLog.EMPTY_HTML,
+            'path': 'slug',
+            'asset_type': 'LESSON',
+            'asset_id': 1,
+        }),
+    ]
@@ -355,3 +355,144 @@ def test_lookup_extension(bc: Breathecode, client):
 
     assert json == expected
     assert bc.database.list_of('registry.Asset') == bc.format.to_dict(model.asset)
+
+
+def test_assets_with_search__no_matches(bc: Breathecode, client):
+
+    assets = [
+        {
+            'title': 'Learn Python',
+            'status': 'PUBLISHED',
+        },
+        {
+            'title': 'Learn React',
+            'status': 'PUBLISHED',
+        },
+    ]
+    model = bc.database.create(asset=assets)
+
+    url = reverse_lazy('registry:asset') + '?search=django'
+    response = client.get(url)
+    json = response.json()
+
+    assert json == []
+    assert bc.database.list_of('registry.Asset') == bc.format.to_dict(model.asset)
+
+
+def test_assets_with_search__ranked(bc: Breathecode, client):
+
+    assets = [
+        {
+            'slug': 'intro-to-flask',
+            'title': 'Intro to Flask',
+            'description': 'A python web framework',
+            'status': 'PUBLISHED',
+        },
+        {
+            'slug': 'learn-react',
+            'title': 'Learn React',
+            'description': 'A javascript library',
+            'status': 'PUBLISHED',
+        },
+        {
+            'slug': 'python-loops',
+            'title': 'Python Loops',
+            'description': 'Iterate in python',
+            'status': 'PUBLISHED',
+        },
+    ]
+    model = bc.database.create(asset=assets)
+
+    url = reverse_lazy('registry:asset') + '?search=python'
+    response = client.get(url)
+    json = response.json()
+
+    expected = [get_serializer(model.asset[2]), get_serializer(model.asset[0])]
+
+    assert json == expected
+    assert bc.database.list_of('registry.Asset') == bc.format.to_dict(model.asset)
+
+
+def test_assets_with_search__by_alias(bc: Breathecode, client):
+
+    assets = [
+        {
+            'slug': 'python-loops',
+            'title': 'Python Loops',
+            'status': 'PUBLISHED',
+        },
+        {
+            'slug': 'learn-react',
+            'title': 'Learn React',
+            'status': 'PUBLISHED',
+        },
+    ]
+    model = bc.database.create(asset=assets, asset_alias={'slug': 'old-for-loops', 'asset_id': 1})
+
+    url = reverse_lazy('registry:asset') + '?search=for'
+    response = client.get(url)
+    json = response.json()
+
+    expected = [get_serializer(model.asset[0])]
+
+    assert json == expected
+    assert bc.database.list_of('registry.Asset') == bc.format.to_dict(model.asset)
+
+
+def test_assets_with_like__by_alias(bc: Breathecode, client):
+
+    assets = [
+        {
+            'slug': 'python-loops',
+            'status': 'PUBLISHED',
+        },
+        {
+            'slug': 'learn-react',
+            'status': 'PUBLISHED',
+        },
+    ]
+    model = bc.database.create(asset=assets,
+                               asset_alias=[{
+                                   'slug': 'old-for-loops',
+                                   'asset_id': 1,
+                               }, {
+                                   'slug': 'for-loops',
+                                   'asset_id': 1,
+                               }])
+
+    url = reverse_lazy('registry:asset') + '?like=for-loops'
+    response = client.get(url)
+    json = response.json()
+
+    expected = [get_serializer(model.asset[0])]
+
+    assert json == expected
+    assert bc.database.list_of('registry.Asset') == bc.format.to_dict(model.asset)
+
+
+def test_assets_with_search__every_word_must_match(bc: Breathecode, client):
+
+    assets = [
+        {
+            'slug': 'intro-to-flask',
+            'title': 'Intro to Flask',
+            'description': 'A python web framework',
+            'status': 'PUBLISHED',
+        },
+        {
+            'slug': 'python-loops',
+            'title': 'Python Loops',
+            'description': 'Iterate in python',
+            'status': 'PUBLISHED',
+        },
+    ]
+    model = bc.database.create(asset=assets)
+
+    url = reverse_lazy('registry:asset') + '?search=python+web'
+    response = client.get(url)
+    json = response.json()
+
+    expected = [get_serializer(model.asset[0])]
+
+    assert json == expected
+    assert bc.database.list_of('registry.Asset') == bc.format.to_dict(model.asset)
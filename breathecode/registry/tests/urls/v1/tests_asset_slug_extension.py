@@ -0,0 +1,157 @@
+import base64
+import hashlib
+from unittest.mock import MagicMock
+
+import pytest
+
+from breathecode.registry import actions
+from breathecode.tests.mixins.breathecode_mixin import Breathecode
+
+# enable this file to use the database
+pytestmark = pytest.mark.usefixtures('db')
+
+README = '---\ntitle: Hello\n---\n# Hello\n\nWorld\n'
+
+
+def encode(content: str) -> str:
+    return base64.b64encode(content.encode('utf-8')).decode('utf-8')
+
+
+@pytest.fixture(autouse=True)
+def setup(monkeypatch):
+    monkeypatch.setattr('breathecode.registry.signals.asset_readme_modified.send', MagicMock())
+    yield
+
+
+def test_not_found(bc: Breathecode, client):
+    response = client.get('/v1/registry/asset/slug.md')
+    json = response.json()
+
+    assert json == {'detail': 'Asset slug not found', 'status_code': 404}
+    assert response.status_code == 404
+
+
+def test_invalid_extension(bc: Breathecode, client):
+    model = bc.database.create(asset={'readme': encode(README), 'readme_raw': encode(README)})
+
+    response = client.get(f'/v1/registry/asset/{model.asset.slug}.pdf')
+
+    assert response.content == b'Invalid extension format'
+    assert response.status_code == 200
+
+
+def test_raw(bc: Breathecode, client):
+    model = bc.database.create(asset={'readme': encode(README), 'readme_raw': encode(README)})
+
+    response = client.get(f'/v1/registry/asset/{model.asset.slug}.raw')
+
+    assert response.content.decode('utf-8') == README
+    assert response['Content-Type'] == 'text/markdown'
+    assert response['ETag'] == f'"{hashlib.sha256(README.encode("utf-8")).hexdigest()}"'
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('extension', ['md', 'mdx', 'txt'])
+def test_markdown(bc: Breathecode, client, monkeypatch, extension):
+    model = bc.database.create(asset={'readme': encode(README), 'readme_raw': encode(README), 'readme_url': None})
+
+    render = MagicMock(wraps=actions._render_readme)
+    monkeypatch.setattr('breathecode.registry.actions._render_readme', render)
+
+    response = client.get(f'/v1/registry/asset/{model.asset.slug}.{extension}')
+
+    assert response.content.decode('utf-8') == '# Hello\n\nWorld'
+    assert response['Content-Type'] == 'text/markdown'
+    assert response.status_code == 200
+
+    etag = response['ETag']
+
+    # the rendered readme is served from the cache
+    response = client.get(f'/v1/registry/asset/{model.asset.slug}.{extension}')
+
+    assert response.content.decode('utf-8') == '# Hello\n\nWorld'
+    assert response['ETag'] == etag
+    assert response.status_code == 200
+    assert len(render.call_args_list) == 1
+
+    # the client already has this version
+    response = client.get(f'/v1/registry/asset/{model.asset.slug}.{extension}', HTTP_IF_NONE_MATCH=etag)
+
+    assert response.content == b''
+    assert response.status_code == 304
+    assert len(render.call_args_list) == 1
+
+    assert bc.database.list_of('registry.Asset') == [bc.format.to_dict(model.asset)]
+    assert bc.database.list_of('registry.AssetErrorLog') == []
+
+
+def test_html(bc: Breathecode, client):
+    model = bc.database.create(asset={'readme': encode(README), 'readme_raw': encode(README), 'html': '<h1>Hi</h1>'})
+
+    response = client.get(f'/v1/registry/asset/{model.asset.slug}.html')
+
+    assert response.content == b'<h1>Hi</h1>'
+    assert response['Content-Type'] == 'text/html'
+    assert response['ETag'] == f'"{hashlib.sha256(b"<h1>Hi</h1>").hexdigest()}"'
+    assert response.status_code == 200
+
+
+def test_html__empty(bc: Breathecode, client):
+    model = bc.database.create(asset={
+        'readme': encode(README),
+        'readme_raw': encode(README),
+        'readme_url': None,
+        'html': None,
+    })
+
+    response = client.get(f'/v1/registry/asset/{model.asset.slug}.html')
+
+    assert response.content == b'<h1>Hello</h1>\n<p>World</p>'
+    assert response.status_code == 200
+
+    # the GET requests do not write in the database
+    assert bc.database.list_of('registry.Asset') == [bc.format.to_dict(model.asset)]
+    assert bc.database.list_of('registry.AssetErrorLog') == []
+
+
+def test_cache_asset_readme(bc: Breathecode, client, monkeypatch):
+    model = bc.database.create(asset={'readme': encode(README), 'readme_raw': encode(README), 'readme_url': None})
+    actions.cache_asset_readme(model.asset)
+
+    render = MagicMock()
+    monkeypatch.setattr('breathecode.registry.actions._render_readme', render)
+
+    response = client.get(f'/v1/registry/asset/{model.asset.slug}.md')
+
+    assert response.content.decode('utf-8') == '# Hello\n\nWorld'
+    assert response.status_code == 200
+    assert render.call_args_list == []
+
+
+def test_readme_changed(bc: Breathecode, client):
+    model = bc.database.create(asset={'readme': encode(README), 'readme_raw': encode(README), 'readme_url': None})
+
+    response = client.get(f'/v1/registry/asset/{model.asset.slug}.md')
+    etag = response['ETag']
+
+    model.asset.readme = encode('# Bye\n')
+    model.asset.save()
+
+    response = client.get(f'/v1/registry/asset/{model.asset.slug}.md', HTTP_IF_NONE_MATCH=etag)
+
+    assert response.content.decode('utf-8') == '# Bye'
+    assert response['ETag'] != etag
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('asset_type, format', [('LESSON', 'notebook'), ('EXERCISE', 'markdown')])
+def test_readme_format_from_the_url(bc: Breathecode, asset_type, format):
+    model = bc.database.create(asset={
+        'asset_type': asset_type,
+        'readme_url': None,
+        'url': 'https://github.com/4GeeksAcademy/lesson/blob/main/README.ipynb',
+        'external': False,
+    })
+
+    # the lessons without readme_url are read from their url
+    assert actions._get_readme_format(model.asset) == format
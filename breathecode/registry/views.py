@@ -9,6 +9,7 @@ from django.core.validators import URLValidator
 from django.db.models import Count, Q
 from django.http import HttpResponse, HttpResponseRedirect
 from django.shortcuts import redirect, render
+from django.utils.cache import get_conditional_response
 from django.views.decorators.clickjacking import xframe_options_exempt
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
@@ -29,12 +30,16 @@ from breathecode.utils.i18n import translation
 from breathecode.utils.views import render_message
 from capyc.rest_framework.exceptions import ValidationException
 
+from . import error_log
 from .actions import (
+    README_CONTENT_TYPES,
     AssetThumbnailGenerator,
     clean_asset_readme,
+    get_rendered_readme,
     pull_from_github,
     push_to_github,
     scan_asset_originality,
+    search_assets,
     test_asset,
 )
 from .caches import AssetCache, AssetCommentCache, CategoryCache, ContentVariableCache, KeywordCache, TechnologyCache
@@ -120,11 +125,11 @@ def forward_asset_url(request, asset_slug=None):
     except Exception as e:
         logger.error(e)
         msg = f'The url for the {asset.asset_type.lower()} your are trying to open ({asset_slug}) was not found, this error has been reported and will be fixed soon.'
-        AssetErrorLog(slug=AssetErrorLog.INVALID_URL,
-                      path=asset_slug,
-                      asset=asset,
-                      asset_type=asset.asset_type,
-                      status_text=msg).save()
+        error_log.add_asset_error(AssetErrorLog.INVALID_URL,
+                                  asset_slug,
+                                  asset.asset_type,
+                                  asset_id=asset.id,
+                                  status_text=msg)
 
         return render_message(request, msg, academy=asset.academy)
 
@@ -359,29 +364,21 @@ def render_readme(request, asset_slug, extension='raw'):
     if asset is None:
         raise ValidationException(f'Asset {asset_slug} not found', status.HTTP_404_NOT_FOUND)
 
-    response = HttpResponse('Invalid extension format', content_type='text/html')
-    if extension == 'raw':
-        readme = asset.get_readme()
-        response = HttpResponse(readme['decoded_raw'], content_type='text/markdown')
+    if extension not in README_CONTENT_TYPES:
+        return HttpResponse('Invalid extension format', content_type='text/html')
 
-    if extension == 'html':
-        if asset.html is not None and asset.html != '':
-            response = HttpResponse(asset.html, content_type='text/html')
-        else:
-            asset.log_error(AssetErrorLog.EMPTY_HTML,
-                            status_text='Someone requested the asset HTML via API and it was empty')
-            readme = asset.get_readme(parse=True, remove_frontmatter=request.GET.get('frontmatter', 'true') != 'false')
-            asset.html = readme['html']
-            asset.save()
-            response = HttpResponse(readme['html'], content_type='text/html')
+    if extension == 'html' and not asset.html:
+        logger.warning(f'Someone requested the HTML of the asset {asset.slug} via API and it was empty')
+
+    readme = get_rendered_readme(asset, extension, remove_frontmatter=request.GET.get('frontmatter', 'true') != 'false')
+    etag = f'"{readme.etag}"'
 
-    elif extension in ['md', 'mdx', 'txt']:
-        readme = asset.get_readme(parse=True, remove_frontmatter=request.GET.get('frontmatter', 'true') != 'false')
-        response = HttpResponse(readme['decoded'], content_type='text/markdown')
+    # the content is addressed by its hash, so the clients can revalidate it
+    if response := get_conditional_response(request, etag=etag):
+        return response
 
-    elif extension == 'ipynb':
-        readme = asset.get_readme()
-        response = HttpResponse(readme['decoded'], content_type='application/json')
+    response = HttpResponse(readme.content, content_type=readme.content_type)
+    response['ETag'] = etag
 
     return response
 
@@ -568,9 +565,24 @@ class AssetView(APIView, GenerateLookupsMixin):
     """
     permission_classes = [AllowAny]
     extensions = APIViewExtensions(cache=AssetCache, sort='-published_at', paginate=True)
+    search_extensions = APIViewExtensions(cache=AssetCache, sort='-search_rank', paginate=True)
+
+    def get_handler(self, request):
+        # the searches are sorted by how well the assets match
+        if request.GET.get('search', None):
+            return self.search_extensions(request)
+
+        return self.extensions(request)
+
+    def filter_by_search(self, request, items, lang):
+        search = request.GET.get('search', None)
+        if not search:
+            return items
+
+        return search_assets(items, search, lang)
 
     def get(self, request, asset_slug=None):
-        handler = self.extensions(request)
+        handler = self.get_handler(request)
 
         cache = handler.cache.get()
         if cache is not None:
@@ -612,7 +624,7 @@ class AssetView(APIView, GenerateLookupsMixin):
         if like is not None:
             items = items.filter(
                 Q(slug__icontains=like) | Q(title__icontains=like)
-                | Q(assetalias__slug__icontains=like))
+                | Q(id__in=AssetAlias.objects.filter(slug__icontains=like).values('asset__id')))
 
         if 'slug' in self.request.GET:
             asset_type = self.request.GET.get('asset_type', None)
@@ -665,6 +677,7 @@ class AssetView(APIView, GenerateLookupsMixin):
             items = items.exclude(category__slug__in=[p for p in param.split(',') if p])
 
         items = items.filter(query, **lookup, visibility='PUBLIC').distinct()
+        items = self.filter_by_search(request, items, lookup.get('lang', lang))
         items = handler.queryset(items)
 
         if 'big' in self.request.GET:
@@ -1,6 +1,8 @@
 import datetime
+import io
+import json
 import os
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 
 from django.db.models import Avg, Count, Sum
 from google.api_core.client_options import ClientOptions
@@ -18,13 +20,55 @@ from breathecode.utils.sqlalchemy import BigQueryBase
 client = None
 engine = None
 
-__all__ = ['BigQuery']
+__all__ = ['BigQuery', 'LoadJobError']
+
+# the size of each load job sent by `BigQuerySet.bulk_insert`
+LOAD_JOB_CHUNK_SIZE = int(os.getenv('BIGQUERY_LOAD_JOB_CHUNK_SIZE', str(8 * 1024 * 1024)))
 
 
 def is_test_env():
     return os.getenv('ENV') == 'test'
 
 
+def _serialize(value: Any) -> str:
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+
+    return str(value)
+
+
+class LoadJobError(Exception):
+    """Some load jobs failed, `failed_rows` has the indexes of the rows that were not loaded."""
+
+    def __init__(self, errors: list[Any], failed_rows: list[int]):
+        super().__init__(errors)
+        self.errors = errors
+        self.failed_rows = failed_rows
+
+
+def _get_ndjson_chunks(rows: list[dict[str, Any]], max_chunk_size: int) -> Iterator[tuple[range, bytes]]:
+    """Encode the rows as newline delimited JSON, split in chunks of up to `max_chunk_size` bytes."""
+
+    chunk = []
+    size = 0
+    start = 0
+
+    for i, row in enumerate(rows):
+        line = json.dumps(row, default=_serialize, separators=(',', ':')).encode('utf-8') + b'\n'
+
+        if chunk and size + len(line) > max_chunk_size:
+            yield range(start, i), b''.join(chunk)
+            chunk = []
+            size = 0
+            start = i
+
+        chunk.append(line)
+        size += len(line)
+
+    if chunk:
+        yield range(start, len(rows)), b''.join(chunk)
+
+
 class BigQueryModel:
 
     def __init__(self, client: bigquery.Client, _project_id: str, _dataset: str, _table: str, **kwargs):
@@ -101,7 +145,17 @@ class BigQuerySet():
     def new(self, **kwargs) -> BigQueryModel:
         return BigQueryModel(client, self.project_id, self.dataset, self.table, **kwargs)
 
-    def bulk_insert(self, rows: list[dict[str, Any]]) -> None:
+    def bulk_insert(self,
+                    rows: list[dict[str, Any]],
+                    load_job: bool = False,
+                    max_chunk_size: Optional[int] = None) -> None:
+        """
+        Insert the rows in the table.
+
+        By default they are streamed, with `load_job` they are sent as newline delimited JSON load jobs of up to
+        `max_chunk_size` bytes, which are not billed and do not go through the streaming buffer.
+        """
+
         if len(rows) == 0:
             return None
 
@@ -109,11 +163,47 @@ class BigQuerySet():
             rows = [x.__dict__ for x in rows]
 
         table = self._get_table()
+
+        if load_job:
+            self._load_rows(table, rows, max_chunk_size or LOAD_JOB_CHUNK_SIZE)
+            return
+
         errors = self.client.insert_rows(table, rows)
 
         if errors:
             raise Exception(errors)
 
+    def _load_rows(self, table: Table, rows: list[dict[str, Any]], max_chunk_size: int) -> None:
+        job_config = bigquery.LoadJobConfig(source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+                                            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+                                            schema=table.schema)
+
+        errors = []
+        failed_rows = []
+        jobs = []
+
+        # the jobs run concurrently in BigQuery, they are awaited after all of them were started
+        for indexes, chunk in _get_ndjson_chunks(rows, max_chunk_size):
+            try:
+                job = self.client.load_table_from_file(io.BytesIO(chunk), table, job_config=job_config)
+                jobs.append((indexes, job))
+
+            except Exception as e:
+                errors.append(str(e))
+                failed_rows.extend(indexes)
+
+        for indexes, job in jobs:
+            try:
+                job.result()
+
+            # the job has no errors when the request failed, like a timeout or a 403
+            except Exception as e:
+                errors.extend(job.errors or [str(e)])
+                failed_rows.extend(indexes)
+
+        if errors:
+            raise LoadJobError(errors, sorted(failed_rows))
+
     def schema(self) -> list[SchemaField]:
         table = self._get_table()
         return table.schema
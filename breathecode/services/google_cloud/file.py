@@ -1,41 +1,100 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from io import BufferedReader, BytesIO, StringIO, TextIOWrapper
-from typing import Optional, overload
+from typing import Iterator, Optional, overload
 
 from circuitbreaker import circuit
-from google.cloud.storage import Blob, Bucket
+from google.api_core.exceptions import NotFound
+from google.cloud.storage import Blob, Bucket, Client
+
+from breathecode.utils.local_cache import LocalCache
 
 logger = logging.getLogger(__name__)
 
-__all__ = ['File']
+__all__ = ['File', 'Files']
+
+# a batch of the json api accepts up to 100 calls
+BATCH_SIZE = 100
+MAX_WORKERS = 8
+
+NOT_LOADED = object()
+
+# the metadata of the blobs is reused for a few seconds by the files of the process, the missing blobs are not kept
+# because other process could upload them in the meantime
+blobs = LocalCache(maxsize=1024, timeout=30)
 
 
 class File:
     """Google Cloud Storage"""
     bucket: Bucket
-    blob: Blob
     file_name: str
 
     def __init__(self, bucket: Bucket, file_name: str):
         self.file_name = file_name
         self.bucket = bucket
-        self.blob = self._get_blob()
+        self._blob = NOT_LOADED
+
+    def _get_key(self) -> tuple[str, str]:
+        return (self.bucket.name, self.file_name)
+
+    @property
+    def blob(self) -> Optional[Blob]:
+        """Blob of the file, its metadata is fetched the first time that it is used"""
+
+        if self._blob is NOT_LOADED:
+            self._blob = self._get_blob()
+
+        return self._blob
+
+    @blob.setter
+    def blob(self, value: Optional[Blob]) -> None:
+        self._blob = value
+
+        if value is None:
+            blobs.delete(self._get_key())
+
+        else:
+            blobs.set(self._get_key(), value)
 
     @circuit
-    def _get_blob(self) -> Blob:
+    def _get_blob(self) -> Optional[Blob]:
         """Get Blob from Bucket"""
-        return self.bucket.get_blob(self.file_name)
+
+        key = self._get_key()
+        blob = blobs.get(key, NOT_LOADED)
+        if blob is NOT_LOADED:
+            blob = self.bucket.get_blob(self.file_name)
+
+            if blob is not None:
+                blobs.set(key, blob)
+
+        return blob
 
     @circuit
     def delete(self):
         """Delete Blob from Bucket"""
-        if self.blob:
-            self.blob.delete()
+
+        # the metadata is not fetched just to delete the blob
+        if self._blob is NOT_LOADED:
+            try:
+                self.bucket.delete_blob(self.file_name)
+
+            except NotFound:
+                pass
+
+        elif self._blob:
+            self._blob.delete()
+
+        self.blob = None
 
     @circuit
-    def upload(self, content, public: bool = False, content_type: str = 'text/plain') -> None:
-        """Upload Blob from Bucket"""
-        self.blob = self.bucket.blob(self.file_name)
+    def upload(self,
+               content,
+               public: bool = False,
+               content_type: str = 'text/plain',
+               chunk_size: Optional[int] = None) -> None:
+        """Upload Blob from Bucket, a `chunk_size` sends the file in a resumable upload of chunks of that size"""
+        self.blob = self.bucket.blob(self.file_name, chunk_size=chunk_size)
 
         if content_type is None:
             content_type = 'application/octet-stream'
@@ -51,9 +110,10 @@ class File:
 
     @circuit
     def exists(self) -> bool:
-        """Check if Blob exists in Bucket"""
+        """Check if Blob exists in Bucket, it skips the cache, the metadata fetched is kept for the next operations"""
 
-        return self.bucket.blob(self.file_name).exists()
+        self.blob = self.bucket.get_blob(self.file_name)
+        return self.blob is not None
 
     @circuit
     def url(self) -> str:
@@ -116,3 +176,49 @@ class File:
 
         blob = self.bucket.blob(self.file_name)
         self.bucket.rename_blob(blob, file_name)
+
+        blobs.delete(self._get_key(), (self.bucket.name, file_name))
+        self._blob = NOT_LOADED
+
+
+class Files:
+    """Group of files of a bucket that are checked or deleted together"""
+    client: Client
+    bucket: Bucket
+    files: list[File]
+
+    def __init__(self, client: Client, bucket: Bucket, file_names: list[str]):
+        self.client = client
+        self.bucket = bucket
+        self.files = [File(bucket, file_name) for file_name in file_names]
+
+    def __iter__(self) -> Iterator[File]:
+        return iter(self.files)
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def exists(self) -> dict[str, bool]:
+        """Check which files exist, the metadata of the files is fetched concurrently"""
+
+        if not self.files:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(self.files))) as executor:
+            return dict(executor.map(lambda x: (x.file_name, x.exists()), self.files))
+
+    @circuit
+    def delete(self) -> None:
+        """Delete the files sending a batch request per 100 files, the missing files are ignored"""
+
+        for i in range(0, len(self.files), BATCH_SIZE):
+            try:
+                with self.client.batch():
+                    for file in self.files[i:i + BATCH_SIZE]:
+                        self.bucket.delete_blob(file.file_name)
+
+            except NotFound:
+                pass
+
+        for file in self.files:
+            file.blob = None
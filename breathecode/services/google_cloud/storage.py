@@ -1,30 +1,60 @@
 import logging
+import os
+import threading
+
 import google.cloud.storage as storage
-import breathecode.services.google_cloud.credentials as credentials
-from .file import File
 from circuitbreaker import circuit
+from requests.adapters import HTTPAdapter
+
+import breathecode.services.google_cloud.credentials as credentials
+from breathecode.utils.local_cache import LocalCache
+
+from .file import File, Files
 
 logger = logging.getLogger(__name__)
 
 __all__ = ['Storage']
 
+# the connections are shared by the threads of the process, the pool must fit the concurrent requests
+POOL_SIZE = int(os.getenv('GOOGLE_CLOUD_STORAGE_POOL_SIZE', '32'))
+
+_clients = LocalCache(maxsize=4, timeout=60 * 60)
+_clients_lock = threading.Lock()
+
 
 class Storage:
     """Google Cloud Storage"""
     client: storage.Client
 
     def __init__(self) -> None:
-        credentials.resolve_credentials()
         self.client = self._get_client()
 
     @circuit
     def _get_client(self) -> storage.Client:
-        """Get Google Cloud Storage client
+        """Get Google Cloud Storage client, it is reused by all the instances of the process
 
         Returns:
             storage.Client: Google Cloud Storage client
         """
-        return storage.Client()
+
+        # a forked worker must not share the sockets of its parent
+        key = os.getpid()
+        if (client := _clients.get(key)) is not None:
+            return client
+
+        with _clients_lock:
+            if (client := _clients.get(key)) is not None:
+                return client
+
+            credentials.resolve_credentials()
+            client = storage.Client()
+
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            client._http.mount('https://', adapter)
+
+            _clients.set(key, client)
+
+        return client
 
     def file(self, bucket_name: str, file_name: str) -> File:
         """Get File object
@@ -38,3 +68,16 @@ class Storage:
         """
         bucket = self.client.bucket(bucket_name)
         return File(bucket, file_name)
+
+    def files(self, bucket_name: str, file_names: list[str]) -> Files:
+        """Get a group of File objects to check or delete them together
+
+        Args:
+            bucket_name (str): Name of bucket in Google Cloud Storage
+            file_names (list[str]): Names of blobs in Google Cloud Bucket
+
+        Returns:
+            Files: group of File objects
+        """
+        bucket = self.client.bucket(bucket_name)
+        return Files(self.client, bucket, file_names)
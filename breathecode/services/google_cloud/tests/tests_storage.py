@@ -0,0 +1,124 @@
+"""
+Test Storage and File
+"""
+from unittest.mock import MagicMock, call
+
+import pytest
+from google.api_core.exceptions import NotFound
+
+from breathecode.services.google_cloud import File, Storage
+from breathecode.tests.mocks.google_cloud_storage import ClientMock
+
+
+@pytest.fixture(autouse=True)
+def setup(monkeypatch):
+    monkeypatch.setattr('breathecode.services.google_cloud.credentials.resolve_credentials', MagicMock())
+    monkeypatch.setattr('google.cloud.storage.Client', MagicMock(side_effect=ClientMock))
+    yield
+
+
+def get_bucket(blobs={}):
+    bucket = MagicMock()
+    bucket.name = 'bucket'
+    bucket.get_blob.side_effect = lambda name: blobs.get(name)
+    return bucket
+
+
+def test_client__is_reused():
+    import google.cloud.storage as storage
+
+    from breathecode.services.google_cloud import credentials
+
+    storage1 = Storage()
+    storage2 = Storage()
+
+    assert storage1.client is storage2.client
+    assert storage.Client.call_args_list == [call()]
+    assert credentials.resolve_credentials.call_args_list == [call()]
+
+
+def test_file__metadata_is_lazy_and_shared():
+    blob = MagicMock()
+    bucket = get_bucket({'file.png': blob})
+
+    file = File(bucket, 'file.png')
+
+    assert bucket.get_blob.call_args_list == []
+
+    assert file.exists() is True
+    assert file.blob is blob
+    assert File(bucket, 'file.png').blob is blob
+    assert File(bucket, 'other.png').exists() is False
+
+    assert bucket.get_blob.call_args_list == [call('file.png'), call('other.png')]
+
+
+def test_file__upload_and_delete__refresh_the_metadata():
+    blob = MagicMock()
+    bucket = get_bucket()
+    bucket.blob.return_value = blob
+
+    File(bucket, 'file.png').upload(b'content', content_type='image/png')
+
+    assert File(bucket, 'file.png').blob is blob
+
+    # the metadata is not fetched to delete a blob
+    File(bucket, 'other.png').delete()
+
+    assert bucket.delete_blob.call_args_list == [call('other.png')]
+    assert bucket.get_blob.call_args_list == []
+
+    # the missing blobs are not cached
+    assert File(bucket, 'other.png').blob is None
+    assert bucket.get_blob.call_args_list == [call('other.png')]
+
+
+def test_file__exists__skips_the_cache():
+    blob = MagicMock()
+    other_blob = MagicMock()
+    stored = {'file.png': blob}
+    bucket = get_bucket(stored)
+
+    assert File(bucket, 'file.png').blob is blob
+    assert File(bucket, 'other.png').blob is None
+
+    # other process deleted and uploaded the blobs
+    del stored['file.png']
+    stored['other.png'] = other_blob
+
+    assert File(bucket, 'file.png').exists() is False
+    assert File(bucket, 'other.png').exists() is True
+    assert File(bucket, 'file.png').blob is None
+    assert File(bucket, 'other.png').blob is other_blob
+
+
+def test_files__exists():
+    bucket = get_bucket({'file1.png': MagicMock(), 'file3.png': MagicMock()})
+
+    storage = Storage()
+    storage.client = MagicMock()
+    storage.client.bucket.return_value = bucket
+
+    files = storage.files('bucket', ['file1.png', 'file2.png', 'file3.png'])
+
+    assert files.exists() == {'file1.png': True, 'file2.png': False, 'file3.png': True}
+
+
+def test_files__delete__in_batches(monkeypatch):
+    monkeypatch.setattr('breathecode.services.google_cloud.file.BATCH_SIZE', 2)
+
+    bucket = get_bucket()
+    bucket.delete_blob.side_effect = [None, NotFound('missing'), None]
+
+    storage = Storage()
+    storage.client = MagicMock()
+    storage.client.bucket.return_value = bucket
+
+    files = storage.files('bucket', ['file1.png', 'file2.png', 'file3.png'])
+    files.delete()
+
+    assert len(files) == 3
+    assert storage.client.batch.call_count == 2
+    assert bucket.delete_blob.call_args_list == [call('file1.png'), call('file2.png'), call('file3.png')]
+    assert [x.blob for x in files] == [None, None, None]
+    assert bucket.get_blob.call_args_list == []
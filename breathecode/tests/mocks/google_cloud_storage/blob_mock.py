@@ -4,7 +4,7 @@ class BlobMock():
     content = None
     bucket = None
 
-    def __init__(self, name, bucket):
+    def __init__(self, name, bucket, chunk_size=None):
         self.name = name
         self.bucket = bucket
 
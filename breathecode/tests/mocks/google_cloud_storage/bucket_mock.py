@@ -9,10 +9,13 @@ class BucketMock():
     def get_blob(self, blob_name):
         return self.files.get(blob_name)
 
-    def blob(self, blob_name):
+    def blob(self, blob_name, chunk_size=None):
         from google.cloud.storage import Blob
-        self.files[blob_name] = Blob(blob_name, self)
+        self.files[blob_name] = Blob(blob_name, self, chunk_size=chunk_size)
         return self.files[blob_name]
 
+    def delete_blob(self, blob_name):
+        self.files.pop(blob_name, None)
+
     def delete(self):
         return None
@@ -1,5 +1,16 @@
+from contextlib import nullcontext
+
+from requests import Session
+
+
 class ClientMock():
 
+    def __init__(self):
+        self._http = Session()
+
+    def batch(self):
+        return nullcontext()
+
     def bucket(self, bucket_name):
         from google.cloud.storage import Bucket
         return Bucket(bucket_name)
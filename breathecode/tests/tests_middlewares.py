@@ -0,0 +1,119 @@
+"""
+Test the compression of the responses
+"""
+import gzip
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import brotli
+import pytest
+import zstandard
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+
+from breathecode.middlewares import compress_response_middleware
+
+DECOMPRESSORS = {
+    'gzip': gzip.decompress,
+    'br': brotli.decompress,
+    'zstd': lambda x: zstandard.ZstdDecompressor().decompressobj().decompress(x),
+}
+
+CHUNKS = [f'{"x" * 1024}-{n}\n'.encode('utf-8') for n in range(20)]
+
+
+@pytest.fixture(autouse=True)
+def setup(monkeypatch):
+    monkeypatch.setattr('breathecode.middlewares.IS_TEST', False)
+    monkeypatch.setattr('breathecode.middlewares.use_gzip', lambda: False)
+    monkeypatch.setattr('breathecode.middlewares.is_compression_enabled', lambda: True)
+    monkeypatch.setattr('breathecode.middlewares.min_compression_size', lambda: 10)
+
+    yield
+
+
+def get_request(encoding):
+    return RequestFactory().get('/', HTTP_ACCEPT_ENCODING=encoding, HTTP_USER_AGENT='PostmanRuntime/7.0')
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'br', 'zstd'])
+def test_the_stream_is_compressed(encoding):
+    middleware = compress_response_middleware(lambda request: StreamingHttpResponse(iter(CHUNKS)))
+    response = middleware(get_request(encoding))
+
+    assert response['Content-Encoding'] == encoding
+    assert response.has_header('Content-Length') is False
+    assert DECOMPRESSORS[encoding](b''.join(response.streaming_content)) == b''.join(CHUNKS)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('encoding', ['gzip', 'br', 'zstd'])
+async def test_the_async_stream_is_compressed(encoding):
+
+    async def chunks():
+        for chunk in CHUNKS:
+            yield chunk
+
+    async def get_response(request):
+        return StreamingHttpResponse(chunks())
+
+    middleware = compress_response_middleware(get_response)
+    response = await middleware(get_request(encoding))
+
+    assert response['Content-Encoding'] == encoding
+    assert DECOMPRESSORS[encoding](b''.join([x async for x in response.streaming_content])) == b''.join(CHUNKS)
+
+
+def test_the_partial_content_is_not_compressed():
+    content = b''.join(CHUNKS)
+
+    def get_response(request):
+        response = HttpResponse(content, status=206)
+        response['Content-Range'] = f'bytes 0-{len(content) - 1}/{len(content) * 2}'
+        return response
+
+    middleware = compress_response_middleware(get_response)
+    response = middleware(get_request('gzip'))
+
+    assert response.has_header('Content-Encoding') is False
+    assert response.content == content
+
+
+def test_the_stream_with_a_content_range_is_not_compressed():
+
+    def get_response(request):
+        response = StreamingHttpResponse(iter(CHUNKS))
+        response['Content-Range'] = 'bytes 0-9/100'
+        return response
+
+    middleware = compress_response_middleware(get_response)
+    response = middleware(get_request('zstd'))
+
+    assert response.has_header('Content-Encoding') is False
+    assert b''.join(response.streaming_content) == b''.join(CHUNKS)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('encoding', ['gzip', 'zstd'])
+async def test_the_large_body_is_compressed_in_the_executor(monkeypatch, encoding):
+    content = b''.join(CHUNKS) * 4
+    executor = ThreadPoolExecutor(max_workers=1)
+    submit = MagicMock(wraps=executor.submit)
+
+    monkeypatch.setattr(executor, 'submit', submit)
+    monkeypatch.setattr('breathecode.middlewares.get_compression_executor', lambda: executor)
+
+    async def get_response(request):
+        return HttpResponse(content)
+
+    middleware = compress_response_middleware(get_response)
+    response = await middleware(get_request(encoding))
+    executor.shutdown()
+
+    # the body is bigger than 64KB
+    assert len(content) > 64 * 1024
+    assert len(submit.call_args_list) == 1
+
+    assert response['Content-Encoding'] == encoding
+    assert response['Content-Length'] == str(len(response.content))
+    assert DECOMPRESSORS[encoding](response.content) == content
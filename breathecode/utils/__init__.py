@@ -3,6 +3,7 @@
 from .admin_export_csv_mixin import *  # noqa: F401
 from .api_view_extensions import *  # noqa: F401
 from .attr_dict import *  # noqa: F401
+from .buffered_counter import *  # noqa: F401
 from .cache import *  # noqa: F401
 from .datetime_integer import *  # noqa: F401
 from .decorators import *  # noqa: F401
@@ -13,6 +14,7 @@ from .header_limit_offset_pagination import *  # noqa: F401
 # from .validators import *
 from .i18n import *  # noqa: F401
 from .io import *  # noqa: F401
+from .local_cache import *  # noqa: F401
 from .localize_query import *  # noqa: F401
 from .multi_status_response import *  # noqa: F401
 from .ndb import *  # noqa: F401
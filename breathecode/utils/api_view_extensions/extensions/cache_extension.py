@@ -50,7 +50,7 @@ class CacheExtension(ExtensionBase):
 
     def _get_encoding(self) -> Optional[str]:
         # zstd should be the standard if we require more processing power in the future
-        # including the encoding in the params allow to support compression encoding
+        # the encoding is not part of the params, all the encodings are stored within the same entry
         encoding = self._request.META.get('HTTP_ACCEPT_ENCODING', '')
         if 'gzip' in encoding and use_gzip():
             return 'gzip'
@@ -79,9 +79,7 @@ class CacheExtension(ExtensionBase):
         if lang := self._request.META.get('HTTP_ACCEPT_LANGUAGE'):
             extends['request.headers.accept-language'] = lang
 
-        if encoding := self._get_encoding():
-            extends['request.headers.accept-encoding'] = encoding
-            self._encoding = encoding
+        self._encoding = self._get_encoding()
 
         if accept := self._request.META.get('HTTP_ACCEPT'):
             extends['request.headers.accept'] = accept
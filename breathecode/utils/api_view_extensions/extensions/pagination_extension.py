@@ -4,6 +4,8 @@ from typing import Any, Optional
 from breathecode.utils.api_view_extensions.extension_base import ExtensionBase
 from breathecode.utils.api_view_extensions.priorities.mutator_order import MutatorOrder
 from breathecode.utils.api_view_extensions.priorities.response_order import ResponseOrder
+from breathecode.utils.keyset_pagination import (COUNT_MODES, CURSOR_QUERY_PARAM, get_keyset_ordering,
+                                                 get_total_count, paginate_by_cursor)
 from django.db.models import QuerySet
 from rest_framework.utils.urls import replace_query_param, remove_query_param
 
@@ -12,6 +14,7 @@ __all__ = ['PaginationExtension']
 REQUIREMENTS = ['cache']
 OFFSET_QUERY_PARAM = 'offset'
 LIMIT_QUERY_PARAM = 'limit'
+COUNT_QUERY_PARAM = 'count'
 MAX_LIMIT = None
 
 if os.getenv('ENABLE_DEFAULT_PAGINATION', 'y') in ['t', 'true', 'True', 'TRUE', '1', 'yes', 'y']:
@@ -34,15 +37,24 @@ def _positive_int(integer_string, strict=False, cutoff=None):
 
 class PaginationExtension(ExtensionBase):
 
-    _count: int
+    _count: Optional[int]
     _offset: int
     _use_envelope: bool
     _paginate: bool
+    _cursor_pagination: bool
+    _total_count: str
+    _use_cursor: bool
+    _next_cursor: Optional[str]
+    _previous_cursor: Optional[str]
 
     def __init__(self, paginate: bool, **kwargs) -> None:
         self._paginate = paginate
         self._is_list = False
 
+    def _optional_dependencies(self, cursor_pagination: bool = False, total_count: str = 'exact', **kwargs):
+        self._cursor_pagination = cursor_pagination
+        self._total_count = total_count
+
     def _can_modify_queryset(self) -> bool:
         return self._paginate
 
@@ -56,11 +68,14 @@ class PaginationExtension(ExtensionBase):
         return int(ResponseOrder.PAGINATION)
 
     def _is_paginate(self):
-        return bool(self._request.GET.get(LIMIT_QUERY_PARAM) or self._request.GET.get(OFFSET_QUERY_PARAM))
+        return bool(
+            self._request.GET.get(LIMIT_QUERY_PARAM) or self._request.GET.get(OFFSET_QUERY_PARAM)
+            or self._request.GET.get(CURSOR_QUERY_PARAM))
 
     def _apply_queryset_mutation(self, queryset: QuerySet[Any]):
         self._use_envelope = False
         self._is_list = True
+        self._use_cursor = False
         self._count = self._get_count(queryset)
         self._offset = self._get_offset()
         self._limit = self._get_limit()
@@ -69,6 +84,14 @@ class PaginationExtension(ExtensionBase):
                                                          '').lower() in ['false', 'f', '0', 'no', 'n', 'off', '']:
             self._use_envelope = True
 
+        # the offset keeps working for the clients that still use it
+        ordering = get_keyset_ordering(queryset) if self._cursor_pagination else None
+        if ordering and OFFSET_QUERY_PARAM not in self._request.GET:
+            self._use_cursor = True
+            self._queryset, self._next_cursor, self._previous_cursor = paginate_by_cursor(
+                queryset, ordering, self._request.GET.get(CURSOR_QUERY_PARAM), self._limit)
+            return self._queryset
+
         self._queryset = queryset[self._offset:self._offset + self._limit]
         return self._queryset
 
@@ -82,6 +105,11 @@ class PaginationExtension(ExtensionBase):
         if not self._is_list:
             return (data, headers)
 
+        if self._use_cursor:
+            return self._apply_cursor_response_mutation(data, headers)
+
+        self._page_size = len(data) if isinstance(data, list) else 0
+
         next_url = self._parse_comma(self._get_next_link())
         previous_url = self._parse_comma(self._get_previous_link())
         first_url = self._parse_comma(self._get_first_link())
@@ -98,7 +126,9 @@ class PaginationExtension(ExtensionBase):
                 links.append('<{}>; rel="{}"'.format(url, label))
 
         headers = {**headers, 'Link': ', '.join(links)} if links else {**headers}
-        headers['X-Total-Count'] = self._count
+        if self._count is not None:
+            headers['X-Total-Count'] = self._count
+
         headers['X-Per-Page'] = self._limit
         headers['X-Page'] = int(self._offset / self._limit) + 1
 
@@ -109,6 +139,37 @@ class PaginationExtension(ExtensionBase):
 
         return (data, headers)
 
+    def _apply_cursor_response_mutation(self, data: list[dict], headers: dict):
+        url = remove_query_param(self._request.build_absolute_uri(), CURSOR_QUERY_PARAM)
+        url = replace_query_param(url, LIMIT_QUERY_PARAM, self._limit)
+
+        first_url = self._parse_comma(url) if self._previous_cursor else None
+        next_url = self._parse_comma(replace_query_param(url, CURSOR_QUERY_PARAM, self._next_cursor)
+                                     if self._next_cursor else None)
+        previous_url = self._parse_comma(
+            replace_query_param(url, CURSOR_QUERY_PARAM, self._previous_cursor) if self._previous_cursor else None)
+
+        links = []
+        for label, link in (
+            ('first', first_url),
+            ('next', next_url),
+            ('previous', previous_url),
+        ):
+            if link is not None:
+                links.append('<{}>; rel="{}"'.format(link, label))
+
+        headers = {**headers, 'Link': ', '.join(links)} if links else {**headers}
+        if self._count is not None:
+            headers['X-Total-Count'] = self._count
+
+        headers['X-Per-Page'] = self._limit
+
+        if self._use_envelope:
+            data = OrderedDict([('count', self._count), ('first', first_url), ('next', next_url),
+                                ('previous', previous_url), ('last', None), ('results', data)])
+
+        return (data, headers)
+
     def _parse_comma(self, string: str):
         if not string:
             return None
@@ -118,8 +179,12 @@ class PaginationExtension(ExtensionBase):
     def _get_count(self, queryset: QuerySet[Any] | list):
         """Determine an object count, supporting either querysets or regular lists."""
 
+        mode = self._request.GET.get(COUNT_QUERY_PARAM)
+        if mode not in COUNT_MODES:
+            mode = self._total_count
+
         try:
-            return queryset.count()
+            return get_total_count(queryset, mode)
         except (AttributeError, TypeError):
             return len(queryset)
 
@@ -145,8 +210,15 @@ class PaginationExtension(ExtensionBase):
         url = self._request.build_absolute_uri()
         return remove_query_param(url, OFFSET_QUERY_PARAM)
 
+    def _has_next_page(self) -> bool:
+        # without the count, a full page is the only hint that there are more items
+        if self._count is None:
+            return self._page_size >= self._limit
+
+        return self._offset + self._limit < self._count
+
     def _get_last_link(self):
-        if self._offset + self._limit >= self._count:
+        if self._count is None or self._offset + self._limit >= self._count:
             return None
 
         url = self._request.build_absolute_uri()
@@ -155,7 +227,7 @@ class PaginationExtension(ExtensionBase):
         return replace_query_param(url, OFFSET_QUERY_PARAM, offset)
 
     def _get_next_link(self):
-        if self._offset + self._limit >= self._count:
+        if not self._has_next_page():
             return None
 
         url = self._request.build_absolute_uri()
@@ -5,6 +5,7 @@ import brotli
 import sys
 import functools
 import os
+import threading
 from typing import Optional
 import urllib.parse, json
 from django.core.cache import cache
@@ -16,6 +17,7 @@ from django.db.models.fields.related_descriptors import (ReverseManyToOneDescrip
                                                          ForwardManyToOneDescriptor, ReverseOneToOneDescriptor,
                                                          ForwardOneToOneDescriptor)
 import zstandard
+from django_redis import get_redis_connection
 
 __all__ = ['Cache', 'CACHE_DESCRIPTORS', 'CACHE_DEPENDENCIES']
 CACHE_DESCRIPTORS: dict[models.Model, Cache] = {}
@@ -40,6 +42,15 @@ def use_gzip():
     return os.getenv('USE_GZIP', '0').lower() in ENABLE_LIST_OPTIONS
 
 
+# faster options first, zstd should be the standard in the future
+COMPRESSORS = {
+    'zstd': zstandard.compress,
+    'br': brotli.compress,
+    'deflate': zlib.compress,
+    'gzip': gzip.compress,
+}
+
+
 def must_compress(data):
     size = min_compression_size()
     if size == 0:
@@ -107,6 +118,192 @@ def serializer(obj):
     raise TypeError('Type not serializable')
 
 
+# atomically register a key in a tag set, the set lives at least as long as its longest-lived member
+REGISTER_KEY_SCRIPT = """
+local created = redis.call('EXISTS', KEYS[1]) == 0
+redis.call('SADD', KEYS[1], ARGV[1])
+
+local timeout = tonumber(ARGV[2])
+if timeout < 0 then
+    redis.call('PERSIST', KEYS[1])
+    return 1
+end
+
+local current = redis.call('TTL', KEYS[1])
+if created or (current >= 0 and current < timeout) then
+    redis.call('EXPIRE', KEYS[1], timeout)
+end
+
+return 1
+"""
+
+
+class RedisTagIndex:
+    """Index of the keys written by each model, stored as native Redis sets."""
+
+    _script = None
+
+    def _client(self):
+        return get_redis_connection('default')
+
+    def _register(self, client):
+        if self._script is None:
+            RedisTagIndex._script = client.register_script(REGISTER_KEY_SCRIPT)
+
+        return self._script
+
+    def _is_wrong_type(self, error: Exception) -> bool:
+        from redis.exceptions import ResponseError
+
+        return isinstance(error, ResponseError) and 'WRONGTYPE' in str(error)
+
+    # DEPRECATED: the tags were stored as pickled sets before, remove this when those keys have expired
+    def _clear_legacy(self, client, tags: list[str]) -> None:
+        """Delete the keys listed by the tags stored as pickled sets, and the tags, so they can be used as sets."""
+
+        sets = [x or set() for x in cache.get_many(tags).values()]
+        to_delete = set().union(*sets)
+
+        if to_delete:
+            cache.delete_many(to_delete)
+
+        client.unlink(*[cache.make_key(x) for x in tags])
+
+    def add(self, tag: str, key: str, timeout: Optional[int]) -> None:
+        # a zero timeout means the value was not cached at all
+        if timeout is not None and timeout <= 0:
+            return
+
+        client = self._client()
+        script = self._register(client)
+        args = [key, -1 if timeout is None else int(timeout)]
+
+        try:
+            script(keys=[cache.make_key(tag)], args=args, client=client)
+
+        except Exception as e:
+            if not self._is_wrong_type(e):
+                raise
+
+            self._clear_legacy(client, [tag])
+            script(keys=[cache.make_key(tag)], args=args, client=client)
+
+    def keys(self, tag: str) -> set[str]:
+        client = self._client()
+
+        try:
+            return {x.decode('utf-8') for x in client.smembers(cache.make_key(tag))}
+
+        except Exception as e:
+            if not self._is_wrong_type(e):
+                raise
+
+            return cache.get(tag) or set()
+
+    def clear(self, tags: set[str]) -> None:
+        if not tags:
+            return
+
+        client = self._client()
+        tags = list(tags)
+        raw_tags = [cache.make_key(x) for x in tags]
+
+        # a tag stored as a string would make the transaction below drop it before reading it
+        with client.pipeline(transaction=False) as pipe:
+            for tag in raw_tags:
+                pipe.type(tag)
+
+            types = pipe.execute()
+
+        if legacy := [tag for tag, t in zip(tags, types) if t in (b'string', 'string')]:
+            self._clear_legacy(client, legacy)
+
+        # read and drop the tag sets in a single transaction, so keys registered meanwhile are not lost
+        with client.pipeline(transaction=True) as pipe:
+            for tag in raw_tags:
+                pipe.smembers(tag)
+
+            pipe.unlink(*raw_tags)
+            sets = pipe.execute()[:-1]
+
+        to_delete = [cache.make_key(x.decode('utf-8')) for members in sets for x in members]
+        for i in range(0, len(to_delete), 1000):
+            client.unlink(*to_delete[i:i + 1000])
+
+    def prune(self, tag: str) -> int:
+        client = self._client()
+        raw_tag = cache.make_key(tag)
+
+        try:
+            members = list(client.smembers(raw_tag))
+
+        except Exception as e:
+            if not self._is_wrong_type(e):
+                raise
+
+            self._clear_legacy(client, [tag])
+            return 0
+
+        if not members:
+            return 0
+
+        with client.pipeline(transaction=False) as pipe:
+            for member in members:
+                pipe.exists(cache.make_key(member.decode('utf-8')))
+
+            exists = pipe.execute()
+
+        expired = [member for member, found in zip(members, exists) if not found]
+        if expired:
+            client.srem(raw_tag, *expired)
+
+        return len(expired)
+
+
+class LocMemTagIndex:
+    """Index of the keys written by each model, stored as Python sets, for non Redis backends."""
+
+    _lock = threading.Lock()
+
+    def add(self, tag: str, key: str, timeout: Optional[int]) -> None:
+        with self._lock:
+            keys = cache.get(tag) or set()
+            keys.add(key)
+            cache.set(tag, keys)
+
+    def keys(self, tag: str) -> set[str]:
+        return cache.get(tag) or set()
+
+    def clear(self, tags: set[str]) -> None:
+        if not tags:
+            return
+
+        with self._lock:
+            sets = [x or set() for x in cache.get_many(tags).values()]
+
+            to_delete = set(tags)
+            for keys in sets:
+                to_delete |= keys
+
+            cache.delete_many(to_delete)
+
+    def prune(self, tag: str) -> int:
+        with self._lock:
+            keys = cache.get(tag) or set()
+            expired = {x for x in keys if cache.get(x) is None}
+            if expired:
+                cache.set(tag, keys - expired)
+
+        return len(expired)
+
+
+def get_tag_index() -> RedisTagIndex | LocMemTagIndex:
+    if IS_DJANGO_REDIS:
+        return RedisTagIndex()
+
+    return LocMemTagIndex()
+
+
 class Cache(metaclass=CacheMeta):
     _version_prefix: str = ''
     model: models.Model
@@ -118,6 +315,11 @@ class Cache(metaclass=CacheMeta):
     max_deep: int = 2
     is_dependency: bool = False
 
+    @classmethod
+    def _tag(cls, model: Optional[models.Model] = None) -> str:
+        model = model or cls.model
+        return f'{cls._version_prefix}{model.__name__}__keys'
+
     @classmethod
     def _generate_key(cls, **kwargs):
         key = cls.model.__name__
@@ -153,24 +355,20 @@ class Cache(metaclass=CacheMeta):
         if deep != 0:
             return resolved
 
-        keys = {f'{cls._version_prefix}{descriptor.model.__name__}__keys' for descriptor in resolved}
-        sets = [x or set() for x in cache.get_many(keys).values()]
-
-        to_delete = set()
-        for key in sets:
-            if not key:
-                continue
-
-            to_delete |= key
-
-        to_delete |= keys
-
-        cache.delete_many(to_delete)
+        tags = {cls._tag(descriptor.model) for descriptor in resolved}
+        get_tag_index().clear(tags)
 
     @classmethod
     @circuit
     def keys(cls):
-        return cache.get(f'{cls._version_prefix}{cls.model.__name__}__keys') or set()
+        return get_tag_index().keys(cls._tag())
+
+    @classmethod
+    @circuit
+    def prune(cls) -> int:
+        """Remove the expired keys from the index, it returns how many were removed."""
+
+        return get_tag_index().prune(cls._tag())
 
     # DEPRECATED: 11/10/2021, remove this in december 2023, it was here to handle the old cache values
     @classmethod
@@ -232,20 +430,60 @@ class Cache(metaclass=CacheMeta):
 
         return data[starts:], headers
 
+    @classmethod
+    def _resolve_encoding(cls, data: bytes, encoding: Optional[str] = None) -> Optional[str]:
+        if not must_compress(data) or not is_compression_enabled():
+            return None
+
+        if encoding is not None and use_gzip():
+            return 'gzip'
+
+        if encoding in COMPRESSORS:
+            return encoding
+
+        return None
+
+    @classmethod
+    def _add_encoding(cls, key: str, value: dict, encoding: str) -> bytes:
+        """Compress the canonical payload and store it as a new variant of the same entry."""
+
+        encodings = value.setdefault('encodings', {})
+        encodings[encoding] = COMPRESSORS[encoding](value['content'])
+
+        if IS_DJANGO_REDIS:
+            # keep the remaining ttl, 0 means that the key has expired meanwhile
+            timeout = cache.ttl(key)
+            if timeout != 0:
+                cache.set(key, value, timeout)
+
+        else:
+            cache.set(key, value)
+
+        return encodings[encoding]
+
     @classmethod
     @circuit
     def get(cls, data, encoding: Optional[str] = None) -> dict:
         key = cls._generate_key(**data)
-        data = cache.get(key)
+        value = cache.get(key)
 
-        if data is None:
+        if value is None:
             return None
 
-        if isinstance(data, str) or isinstance(data, bytes):
-            return cls._legacy_get(data, encoding)
+        if isinstance(value, str) or isinstance(value, bytes):
+            return cls._legacy_get(value, encoding)
+
+        headers = {**value.get('headers', {})}
+        content = value.get('content', None)
+
+        # entries written before the multi-encoding storage were already compressed
+        if 'Content-Encoding' in headers or content is None:
+            return content, headers
 
-        headers = data.get('headers', {})
-        content = data.get('content', None)
+        if resolved := cls._resolve_encoding(content, encoding):
+            encodings = value.get('encodings', {})
+            content = encodings[resolved] if resolved in encodings else cls._add_encoding(key, value, resolved)
+            headers['Content-Encoding'] = resolved
 
         return content, headers
 
@@ -257,13 +495,18 @@ class Cache(metaclass=CacheMeta):
             timeout: int = -1,
             encoding: Optional[str] = None,
             params: Optional[dict] = None) -> str:
-        """Set a key value pair on the cache in bytes, it reminds the format and compress the data if needed."""
+        """
+        Set a key value pair on the cache in bytes, it reminds the format and compress the data if needed.
+
+        The entry keeps the serialized payload and each compressed variant requested, so a single entry is shared by
+        all the encodings accepted by the clients.
+        """
 
         if params is None:
             params = {}
 
         key = cls._generate_key(**params)
-        res = {
+        value = {
             'headers': {
                 'Content-Type': format,
             },
@@ -280,41 +523,28 @@ class Cache(metaclass=CacheMeta):
         else:
             data = data
 
-        # in kilobytes
-        if (compress := (must_compress(data) and is_compression_enabled())) and use_gzip():
-            res['content'] = gzip.compress(data)
-            res['headers']['Content-Encoding'] = 'gzip'
-
-        elif compress and encoding == 'br':
-            res['content'] = brotli.compress(data)
-            res['headers']['Content-Encoding'] = 'br'
-
-        # faster option, it should be the standard in the future
-        elif compress and encoding == 'zstd':
-            res['content'] = zstandard.compress(data)
-            res['headers']['Content-Encoding'] = 'zstd'
-
-        elif compress and encoding == 'deflate':
-            res['content'] = zlib.compress(data)
-            res['headers']['Content-Encoding'] = 'deflate'
-
-        elif compress and encoding == 'gzip':
-            res['content'] = gzip.compress(data)
-            res['headers']['Content-Encoding'] = 'gzip'
+        value['content'] = data
+        res = {
+            'headers': {
+                **value['headers']
+            },
+            'content': data,
+        }
 
-        else:
-            res['content'] = data
+        if resolved := cls._resolve_encoding(data, encoding):
+            compressed = COMPRESSORS[resolved](data)
+            value['encodings'] = {resolved: compressed}
+            res['content'] = compressed
+            res['headers']['Content-Encoding'] = resolved
 
         # encode the response to avoid serialization on get requests
         if timeout == -1:
-            cache.set(key, res)
+            cache.set(key, value)
+            timeout = cache.default_timeout
 
         # encode the response to avoid serialization on get requests
         else:
-            cache.set(key, res, timeout)
-
-        keys = cache.get(f'{cls._version_prefix}{cls.model.__name__}__keys') or set()
-        keys.add(key)
+            cache.set(key, value, timeout)
 
-        cache.set(f'{cls._version_prefix}{cls.model.__name__}__keys', keys)
+        get_tag_index().add(cls._tag(), key, timeout)
         return res
@@ -1,12 +1,120 @@
-from asgiref.sync import sync_to_async
+import os
+import uuid
+from typing import Optional, TypedDict
+
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.views import APIView
 
 from breathecode.utils.exceptions import ProgrammingError
+from breathecode.utils.local_cache import LocalCache
 from capyc.rest_framework.exceptions import ValidationException
 
-__all__ = ['capable_of', 'acapable_of']
+__all__ = ['capable_of', 'acapable_of', 'invalidate_capabilities', 'invalidate_all_capabilities']
+
+CAPABILITIES_VERSION_KEY = 'capabilities:version'
+CAPABILITIES_KEY = 'capabilities:user-{}:academy-{}'
+CAPABILITIES_TIMEOUT = int(os.getenv('CAPABILITIES_CACHE_SECONDS', '3600'))
+
+local_capabilities_cache = LocalCache(maxsize=int(os.getenv('LOCAL_CAPABILITIES_CACHE_SIZE', '4096')),
+                                      timeout=int(os.getenv('LOCAL_CAPABILITIES_CACHE_SECONDS', '10')))
+
+
+class CapabilityMatrix(TypedDict):
+    version: Optional[str]
+    # None means that the user is not a member of the academy
+    academy_status: Optional[str]
+    capabilities: set[str]
+
+
+def invalidate_capabilities(user_id: int, academy_id: int) -> None:
+    """Remove the capabilities of an user within an academy, it is used when a ProfileAcademy changes."""
+
+    local_capabilities_cache.delete((user_id, int(academy_id)))
+    cache.delete(CAPABILITIES_KEY.format(user_id, academy_id))
+
+
+def invalidate_all_capabilities() -> None:
+    """Invalidate all the capabilities at once, it is used when the roles or the academies change."""
+
+    local_capabilities_cache.clear()
+
+    # any new value works as version, the matrices with other version are rebuilt on demand
+    cache.set(CAPABILITIES_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def build_capabilities(user_id: int, academy_id: int, version: Optional[str]) -> CapabilityMatrix:
+    from breathecode.authenticate.models import ProfileAcademy
+
+    rows = ProfileAcademy.objects.filter(user=user_id,
+                                         academy__id=academy_id).values_list('role__capabilities__slug',
+                                                                             'academy__status')
+
+    return {
+        'version': version,
+        'academy_status': rows[0][1] if rows else None,
+        'capabilities': {slug for slug, _ in rows if slug},
+    }
+
+
+async def abuild_capabilities(user_id: int, academy_id: int, version: Optional[str]) -> CapabilityMatrix:
+    from breathecode.authenticate.models import ProfileAcademy
+
+    rows = [
+        x async for x in ProfileAcademy.objects.filter(user=user_id, academy__id=academy_id).values_list(
+            'role__capabilities__slug', 'academy__status')
+    ]
+
+    return {
+        'version': version,
+        'academy_status': rows[0][1] if rows else None,
+        'capabilities': {slug for slug, _ in rows if slug},
+    }
+
+
+def _get_cached_capabilities(values: dict, user_id: int, academy_id: int) -> Optional[CapabilityMatrix]:
+    version = values.get(CAPABILITIES_VERSION_KEY)
+    matrix = values.get(CAPABILITIES_KEY.format(user_id, academy_id))
+
+    if matrix is None or matrix['version'] != version:
+        return None
+
+    return matrix
+
+
+def get_capabilities(user_id: int, academy_id: int) -> CapabilityMatrix:
+    academy_id = int(academy_id)
+
+    if (matrix := local_capabilities_cache.get((user_id, academy_id))) is not None:
+        return matrix
+
+    key = CAPABILITIES_KEY.format(user_id, academy_id)
+    values = cache.get_many([CAPABILITIES_VERSION_KEY, key])
+
+    if (matrix := _get_cached_capabilities(values, user_id, academy_id)) is None:
+        matrix = build_capabilities(user_id, academy_id, values.get(CAPABILITIES_VERSION_KEY))
+        cache.set(key, matrix, CAPABILITIES_TIMEOUT)
+
+    local_capabilities_cache.set((user_id, academy_id), matrix)
+    return matrix
+
+
+async def aget_capabilities(user_id: int, academy_id: int) -> CapabilityMatrix:
+    academy_id = int(academy_id)
+
+    if (matrix := local_capabilities_cache.get((user_id, academy_id))) is not None:
+        return matrix
+
+    key = CAPABILITIES_KEY.format(user_id, academy_id)
+    values = await cache.aget_many([CAPABILITIES_VERSION_KEY, key])
+
+    if (matrix := _get_cached_capabilities(values, user_id, academy_id)) is None:
+        matrix = await abuild_capabilities(user_id, academy_id, values.get(CAPABILITIES_VERSION_KEY))
+        await cache.aset(key, matrix, CAPABILITIES_TIMEOUT)
+
+    local_capabilities_cache.set((user_id, academy_id), matrix)
+    return matrix
 
 
 def capable_of(capability=None):
@@ -71,7 +179,7 @@ def acapable_of(capability=None):
             except IndexError:
                 raise ProgrammingError('Missing request information, use this decorator with DRF View')
 
-            academy_id = await sync_to_async(get_academy_from_capability)(kwargs, request, capability)
+            academy_id = await aget_academy_from_capability(kwargs, request, capability)
             if academy_id:
                 kwargs['academy_id'] = academy_id
                 # add the new kwargs argument to the context to be used by APIViewExtensions
@@ -83,9 +191,7 @@ def acapable_of(capability=None):
     return decorator
 
 
-def get_academy_from_capability(kwargs, request, capability):
-    from breathecode.authenticate.models import ProfileAcademy
-
+def get_academy_id(kwargs, request) -> str:
     academy_id = None
 
     if ('academy_id' not in kwargs and 'Academy' not in request.headers and 'academy' not in request.headers
@@ -110,18 +216,33 @@ def get_academy_from_capability(kwargs, request, capability):
     if isinstance(request.user, AnonymousUser):
         raise PermissionDenied('Invalid user')
 
-    capable = ProfileAcademy.objects.filter(user=request.user.id,
-                                            academy__id=academy_id,
-                                            role__capabilities__slug=capability)
+    return academy_id
+
 
-    if capable.count() == 0:
+def check_capability(matrix: CapabilityMatrix, request, academy_id, capability) -> None:
+    if capability not in matrix['capabilities']:
         raise PermissionDenied(
             f"You (user: {request.user.id}) don't have this capability: {capability} for academy {academy_id}")
 
-    academy = capable.first().academy
-    if academy.status == 'DELETED':
+    if matrix['academy_status'] == 'DELETED':
         raise PermissionDenied('This academy is deleted')
-    if request.get_full_path() != '/v1/admissions/academy/activate' and academy.status == 'INACTIVE':
+    if request.get_full_path() != '/v1/admissions/academy/activate' and matrix['academy_status'] == 'INACTIVE':
         raise PermissionDenied('This academy is not active')
 
+
+def get_academy_from_capability(kwargs, request, capability):
+    academy_id = get_academy_id(kwargs, request)
+
+    matrix = get_capabilities(request.user.id, academy_id)
+    check_capability(matrix, request, academy_id, capability)
+
+    return academy_id
+
+
+async def aget_academy_from_capability(kwargs, request, capability):
+    academy_id = get_academy_id(kwargs, request)
+
+    matrix = await aget_capabilities(request.user.id, academy_id)
+    check_capability(matrix, request, academy_id, capability)
+
     return academy_id
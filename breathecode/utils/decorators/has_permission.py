@@ -5,8 +5,10 @@ from datetime import datetime, timedelta
 from typing import Callable, Optional, TypedDict
 
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from django.core.handlers.wsgi import WSGIRequest
-from django.db.models import QuerySet, Sum
+from django.db.models import F, FloatField, OuterRef, QuerySet, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.http import JsonResponse
 from django.shortcuts import render
 from django.utils import timezone
@@ -15,14 +17,24 @@ from rest_framework.views import APIView
 
 from breathecode.authenticate.models import Permission, User
 from breathecode.payments.signals import consume_service
+from breathecode.utils.local_cache import LocalCache
 from capyc.rest_framework.exceptions import PaymentException, ValidationException
 
 from ..exceptions import ProgrammingError
 
-__all__ = ['has_permission', 'validate_permission', 'HasPermissionCallback', 'PermissionContextType']
+__all__ = [
+    'has_permission', 'validate_permission', 'HasPermissionCallback', 'PermissionContextType',
+    'invalidate_user_permissions'
+]
 
 logger = logging.getLogger(__name__)
 
+PERMISSIONS_KEY = 'permissions:user-{}'
+PERMISSIONS_TIMEOUT = int(os.getenv('PERMISSIONS_CACHE_SECONDS', '3600'))
+
+local_permissions_cache = LocalCache(maxsize=int(os.getenv('LOCAL_PERMISSIONS_CACHE_SIZE', '4096')),
+                                     timeout=int(os.getenv('LOCAL_PERMISSIONS_CACHE_SECONDS', '10')))
+
 
 class PermissionContextType(TypedDict):
     utc_now: datetime
@@ -39,9 +51,52 @@ HasPermissionCallback = Callable[[PermissionContextType, tuple, dict], tuple[Per
                                                                              Optional[timedelta]]]
 
 
+def get_group_permissions(user_id: Optional[int]) -> set[str]:
+    """Get the codenames of the permissions that the user got through its groups."""
+
+    if not user_id:
+        return set()
+
+    if (codenames := local_permissions_cache.get(user_id)) is not None:
+        return codenames
+
+    key = PERMISSIONS_KEY.format(user_id)
+    if (codenames := cache.get(key)) is None:
+        permissions = Permission.objects.filter(group__user__id=user_id).order_by()
+        codenames = set(permissions.values_list('codename', flat=True).distinct())
+        cache.set(key, codenames, PERMISSIONS_TIMEOUT)
+
+    local_permissions_cache.set(user_id, codenames)
+    return codenames
+
+
+def invalidate_user_permissions(*user_ids: int) -> None:
+    """Remove the cached permissions, it is used when the groups of the users change."""
+
+    local_permissions_cache.delete(*user_ids)
+    cache.delete_many([PERMISSIONS_KEY.format(x) for x in user_ids])
+
+
+def exclude_used_consumables(consumables: QuerySet) -> QuerySet:
+    """Exclude the consumables whose units are all reserved by pending consumption sessions."""
+
+    from breathecode.payments.models import ConsumptionSession
+
+    pending = ConsumptionSession.objects.filter(
+        consumable=OuterRef('pk'), status='PENDING').order_by().values('consumable').annotate(
+            total=Sum('how_many')).values('total')
+
+    return consumables.annotate(
+        pending_how_many=Coalesce(Subquery(pending), 0.0, output_field=FloatField())).exclude(
+            how_many=F('pending_how_many'))
+
+
 def validate_permission(user: User, permission: str, consumer: bool | HasPermissionCallback = False) -> bool:
+    if permission in get_group_permissions(user.id):
+        return True
+
     if consumer:
-        return User.objects.filter(id=user.id, groups__permissions__codename=permission).exists()
+        return False
 
     found = Permission.objects.filter(codename=permission).first()
     if not found:
@@ -144,20 +199,17 @@ def has_permission(permission: str, consumer: bool | HasPermissionCallback = Fal
                         context, args, kwargs = consumer(context, args, kwargs)
 
                     if consumer and context['time_of_life']:
-                        consumables = context['consumables']
-                        for item in consumables.filter(consumptionsession__status='PENDING').exclude(how_many=0):
-
-                            sum = item.consumptionsession_set.filter(status='PENDING').aggregate(Sum('how_many'))
+                        context['consumables'] = exclude_used_consumables(context['consumables'])
 
-                            if item.how_many - sum['how_many__sum'] == 0:
-                                context['consumables'] = context['consumables'].exclude(id=item.id)
+                    consumable = None
+                    if consumer and context['will_consume']:
+                        consumable = context['consumables'].first()
 
-                    if consumer and context['will_consume'] and not context['consumables']:
+                    if consumer and context['will_consume'] and consumable is None:
                         raise PaymentException(f'You do not have enough credits to access this service: {permission}',
                                                slug='with-consumer-not-enough-consumables')
 
-                    if consumer and context['will_consume'] and context['time_of_life'] and (
-                            consumable := context['consumables'].first()):
+                    if consumer and context['will_consume'] and context['time_of_life']:
                         session = ConsumptionSession.build_session(request, consumable, context['time_of_life'])
 
                     response = function(*args, **kwargs)
@@ -167,8 +219,7 @@ def has_permission(permission: str, consumer: bool | HasPermissionCallback = Fal
                         session.will_consume(1)
 
                     elif it_will_consume:
-                        item = context['consumables'].first()
-                        consume_service.send(instance=item, sender=item.__class__, how_many=1)
+                        consume_service.send(instance=consumable, sender=consumable.__class__, how_many=1)
 
                     return response
 
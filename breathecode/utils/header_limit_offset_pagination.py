@@ -3,10 +3,19 @@ from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.response import Response
 from rest_framework.utils.urls import replace_query_param, remove_query_param
 
+from .keyset_pagination import COUNT_MODES, CURSOR_QUERY_PARAM, get_keyset_ordering, get_total_count, paginate_by_cursor
+
 __all__ = ['HeaderLimitOffsetPagination']
 
 
 class HeaderLimitOffsetPagination(LimitOffsetPagination):
+    # opt-in, the views paginated by cursor seek the sort key instead of using OFFSET if the offset is not provided
+    cursor_pagination = False
+    cursor_query_param = CURSOR_QUERY_PARAM
+
+    # exact, estimate or none, the client can choose other mode with the count query param
+    total_count = 'exact'
+    count_query_param = 'count'
 
     def paginate_queryset(self, queryset, request, view=None):
         self.use_envelope = True
@@ -18,16 +27,24 @@ class HeaderLimitOffsetPagination(LimitOffsetPagination):
         return queryset
 
     def _paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = False
         self.limit = self.get_limit(request)
         if self.limit is None:
             return None
 
+        self.request = request
         self.count = self.get_count(queryset)
         self.offset = self.get_offset(request)
-        self.request = request
-        if self.count > self.limit and self.template is not None:
+        if self.count is not None and self.count > self.limit and self.template is not None:
             self.display_page_controls = True
 
+        ordering = get_keyset_ordering(queryset) if self.cursor_pagination else None
+        if ordering and self.offset_query_param not in request.GET:
+            self.use_cursor = True
+            result, self.next_cursor, self.previous_cursor = paginate_by_cursor(
+                queryset, ordering, request.GET.get(self.cursor_query_param), self.limit)
+            return result
+
         # if self.count == 0 or self.offset > self.count:
         #     return []
         return queryset[self.offset:self.offset + self.limit]
@@ -45,6 +62,8 @@ class HeaderLimitOffsetPagination(LimitOffsetPagination):
         if count:
             self.count = count
 
+        self.page_length = len(data) if isinstance(data, list) else 0
+
         next_url = self.__parse_comma__(self.get_next_link())
         previous_url = self.__parse_comma__(self.get_previous_link())
         first_url = self.__parse_comma__(self.get_first_link())
@@ -61,7 +80,8 @@ class HeaderLimitOffsetPagination(LimitOffsetPagination):
                 links.append('<{}>; rel="{}"'.format(url, label))
 
         headers = {'Link': ', '.join(links)} if links else {}
-        headers['x-total-count'] = self.count
+        if self.count is not None:
+            headers['x-total-count'] = self.count
 
         if self.use_envelope:
             data = OrderedDict([('count', self.count), ('first', first_url), ('next', next_url),
@@ -72,7 +92,52 @@ class HeaderLimitOffsetPagination(LimitOffsetPagination):
 
         return Response(data, headers=headers)
 
+    def get_count(self, queryset):
+        mode = self.request.GET.get(self.count_query_param)
+        if mode not in COUNT_MODES:
+            mode = self.total_count
+
+        try:
+            return get_total_count(queryset, mode)
+        except (AttributeError, TypeError):
+            return len(queryset)
+
+    def _get_cursor_link(self, cursor):
+        url = remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+
+        if cursor is None:
+            return url
+
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        if self.use_cursor:
+            return self._get_cursor_link(self.next_cursor) if self.next_cursor else None
+
+        # without the count, a full page is the only hint that there are more items
+        if self.count is None and self.page_length < self.limit:
+            return None
+
+        if self.count is not None and self.offset + self.limit >= self.count:
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+
+        offset = self.offset + self.limit
+        return replace_query_param(url, self.offset_query_param, offset)
+
+    def get_previous_link(self):
+        if self.use_cursor:
+            return self._get_cursor_link(self.previous_cursor) if self.previous_cursor else None
+
+        return super().get_previous_link()
+
     def get_first_link(self):
+        if self.use_cursor:
+            return self._get_cursor_link(None) if self.previous_cursor else None
+
         if self.offset <= 0:
             return None
 
@@ -80,6 +145,9 @@ class HeaderLimitOffsetPagination(LimitOffsetPagination):
         return remove_query_param(url, self.offset_query_param)
 
     def get_last_link(self):
+        if self.use_cursor or self.count is None:
+            return None
+
         if self.offset + self.limit >= self.count:
             return None
 
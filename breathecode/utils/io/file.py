@@ -1,207 +1,302 @@
+from array import array
+from collections import deque
 from io import StringIO, BytesIO, BufferedReader, TextIOWrapper
 import logging
 import os
+from django.core.cache import cache
 from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
-from typing import Optional, overload
+from typing import Iterable, Iterator, Optional, overload
 
-__all__ = ['cut_csv', 'count_csv_rows', 'count_file_lines']
+__all__ = ['cut_csv', 'count_csv_rows', 'count_file_lines', 'get_csv_index']
 
 logger = logging.getLogger(__name__)
 
+CSV_BLOCK_SIZE = 64 * 1024
+CSV_INDEX_TIMEOUT = 60 * 60 * 24
 
-@overload
-def _cut_csv(f: StringIO | TextIOWrapper, *, start: int, end: int) -> StringIO:
-    ...
+CsvFile = StringIO | BytesIO | BufferedReader | TextIOWrapper | InMemoryUploadedFile | TemporaryUploadedFile
 
 
-@overload
-def _cut_csv(f: BytesIO | BufferedReader | InMemoryUploadedFile, *, start: int, end: int) -> BytesIO:
-    ...
+def _get_stream(f: CsvFile) -> StringIO | BytesIO | BufferedReader:
+    """Get the underlying stream, the text wrappers are read through their buffer to seek by bytes."""
 
+    if isinstance(f, InMemoryUploadedFile):
+        f = f.file
 
-def _cut_csv(f: StringIO | BytesIO | BufferedReader | TextIOWrapper | InMemoryUploadedFile, *, start: int,
-             end: int) -> StringIO | BytesIO:
-    """Cut a csv file from start to end line ignoring the header in the row count."""
+    if isinstance(f, TemporaryUploadedFile):
+        f = f.file.file
 
-    f.seek(0)
+    if isinstance(f, TextIOWrapper):
+        f = f.buffer
 
-    if isinstance(f, StringIO) or isinstance(f, TextIOWrapper):
-        res = StringIO()
+    return f
 
-    elif isinstance(f, BytesIO) or isinstance(f, BufferedReader) or isinstance(f, InMemoryUploadedFile) or isinstance(
-            f, TemporaryUploadedFile):
-        res = BytesIO()
 
-    if isinstance(f, InMemoryUploadedFile):
-        f = f.file
+def _newline(stream: StringIO | BytesIO | BufferedReader) -> str | bytes:
+    return '\n' if isinstance(stream, StringIO) else b'\n'
 
-    if isinstance(f, TemporaryUploadedFile):
-        f = f.file.file
 
-    header = f.readline()
+def _quote(stream: StringIO | BytesIO | BufferedReader) -> str | bytes:
+    return '"' if isinstance(stream, StringIO) else b'"'
 
-    res.write(header)
 
-    for _ in range(start):
-        next(f)
+def _iter_records(lines: Iterable[str | bytes], quote: str | bytes) -> Iterator[tuple[int, str | bytes]]:
+    """Group the lines in records with their offset, a quoted field can contain line breaks."""
 
-    try:
-        for _ in range(end - start):
-            res.write(next(f))
+    position = 0
+    start = 0
+    record = []
+    quoted = False
 
-    except StopIteration:
-        pass
+    for line in lines:
+        if not record:
+            start = position
 
-    res.seek(0)
+        record.append(line)
+        position += len(line)
 
-    return res
+        # an escaped quote is written twice, so only an odd number of quotes opens or closes a quoted field
+        quoted ^= line.count(quote) % 2 == 1
+        if not quoted:
+            yield start, line[:0].join(record)
+            record = []
 
+    # the last quoted field was not closed
+    if record:
+        yield start, record[0][:0].join(record)
 
-@overload
-def _first_lines_of_csv(f: StringIO | TextIOWrapper, *, last: int) -> StringIO:
-    ...
 
+def _records(content: str | bytes, quote: str | bytes) -> list[str | bytes]:
+    return [x for _, x in _iter_records(content.splitlines(keepends=True), quote) if x.strip()]
 
-@overload
-def _first_lines_of_csv(f: BytesIO | BufferedReader | InMemoryUploadedFile, *, last: int) -> BytesIO:
-    ...
 
+def _get_size(stream: StringIO | BytesIO | BufferedReader) -> int:
+    stream.seek(0, os.SEEK_END)
+    return stream.tell()
 
-def _first_lines_of_csv(f: StringIO | BytesIO | BufferedReader | TextIOWrapper, *, first: int) -> StringIO | BytesIO:
 
-    f.seek(0)
+def _build_csv_index(stream: StringIO | BytesIO | BufferedReader) -> array:
+    stream.seek(0)
 
-    if isinstance(f, StringIO) or isinstance(f, TextIOWrapper):
-        res = StringIO()
+    offsets = array('q')
 
-    elif isinstance(f, BytesIO) or isinstance(f, BufferedReader) or isinstance(f, InMemoryUploadedFile) or isinstance(
-            f, TemporaryUploadedFile):
-        res = BytesIO()
+    # the lines are iterated by the buffered reader of the stream, the blank lines are not rows, so they are kept
+    # inside the previous record
+    for position, record in _iter_records(stream, _quote(stream)):
+        if not offsets or record.strip():
+            offsets.append(position)
 
-    if isinstance(f, InMemoryUploadedFile):
-        f = f.file
+    offsets.append(_get_size(stream))
+    return offsets
 
-    if isinstance(f, TemporaryUploadedFile):
-        f = f.file.file
 
-    header = f.readline()
+def get_csv_index(f: CsvFile, key: Optional[str] = None) -> array:
+    """
+    Get the offset where the header and each row of the file start, the last item is the size of the file.
+
+    If a key is provided, like the hash of the file, the index is saved in the cache and it is reused by the next
+    reads of the same file, even if they happen in other process.
+    """
+
+    stream = _get_stream(f)
+    cache_key = f'csv-index:{key}'
 
-    res.write(header)
+    if key and (data := cache.get(cache_key)):
+        offsets = array('q')
+        offsets.frombytes(data)
 
-    try:
-        for _ in range(first):
-            res.write(next(f))
+        # the size tells apart other file saved with the same key
+        if offsets and offsets[-1] == _get_size(stream):
+            return offsets
 
-    except StopIteration:
-        pass
+    offsets = _build_csv_index(stream)
 
-    res.seek(0)
+    if key:
+        cache.set(cache_key, offsets.tobytes(), CSV_INDEX_TIMEOUT)
 
-    return res
+    return offsets
+
+
+def _read(stream: StringIO | BytesIO | BufferedReader, start: int, end: int) -> str | bytes:
+    stream.seek(start)
+    return stream.read(end - start)
+
+
+def _to_csv(f: CsvFile, content: str | bytes) -> StringIO | BytesIO:
+    if isinstance(f, TextIOWrapper):
+        content = content.decode(f.encoding)
+
+    # leave the file ready to be read again
+    f.seek(0)
+
+    return StringIO(content) if isinstance(content, str) else BytesIO(content)
 
 
 @overload
-def _last_lines_of_csv(f: StringIO | TextIOWrapper, *, last: int) -> StringIO:
+def _cut_csv(f: StringIO | TextIOWrapper, *, start: int, end: int, key: Optional[str] = None) -> StringIO:
     ...
 
 
 @overload
-def _last_lines_of_csv(f: BytesIO | BufferedReader | InMemoryUploadedFile, *, last: int) -> BytesIO:
+def _cut_csv(f: BytesIO | BufferedReader | InMemoryUploadedFile,
+             *,
+             start: int,
+             end: int,
+             key: Optional[str] = None) -> BytesIO:
     ...
 
 
-def _last_lines_of_csv(f: StringIO | BytesIO | BufferedReader | TextIOWrapper, *, last: int) -> StringIO | BytesIO:
+def _cut_csv(f: CsvFile, *, start: int, end: int, key: Optional[str] = None) -> StringIO | BytesIO:
+    """Cut a csv file from start to end line ignoring the header in the row count."""
 
-    if isinstance(f, StringIO) or isinstance(f, TextIOWrapper):
-        res = StringIO()
-        line = ''
+    stream = _get_stream(f)
+    offsets = get_csv_index(f, key)
+    lines = len(offsets) - 1
 
-    elif isinstance(f, BytesIO) or isinstance(f, BufferedReader) or isinstance(f, InMemoryUploadedFile) or isinstance(
-            f, TemporaryUploadedFile):
-        res = BytesIO()
-        line = b''
+    # the blank lines after the header are kept inside of it
+    quote = _quote(stream)
+    header = _read(stream, offsets[0], offsets[min(1, lines)])
+    header = next(_iter_records(header.splitlines(keepends=True), quote), (0, header))[1]
 
-    if isinstance(f, InMemoryUploadedFile):
-        f = f.file
+    # the rows are contiguous, so they are read with a single seek
+    start = min(start + 1, lines)
+    end = max(min(end + 1, lines), start)
+    rows = _read(stream, offsets[start], offsets[end])
 
-    if isinstance(f, TemporaryUploadedFile):
-        f = f.file.file
+    newline = _newline(stream)
+    rows = newline[:0].join(_records(rows, quote))
 
-    f.seek(0)
-    header = f.readline()
-    res.write(header)
+    if rows and not rows.endswith(newline):
+        rows += newline
 
-    f.seek(0, os.SEEK_END)
+    return _to_csv(f, header + rows)
 
-    position = f.tell()
-    lines = []
 
-    n = 0
-    while position >= 0:
-        f.seek(position)
-        next_char = f.read(1)
-        if next_char == '\n':
-            if line != '':
-                lines.append(line[::-1])
+def _tail(stream: StringIO | BytesIO | BufferedReader, *, last: int, header_end: int) -> str | bytes:
+    """Read the last rows of the file by blocks from the end, it ignores the blank lines."""
 
-            line = ''
+    newline = _newline(stream)
+    quote = _quote(stream)
+    position = _get_size(stream)
+    content = newline[:0]
+    block_size = 1024
 
-        if next_char == b'\n':
-            if line != b'':
-                lines.append(line[::-1])
+    while True:
+        lines = content.splitlines(keepends=True)
 
-            line = b''
+        # the first line is incomplete until the block reaches the header
+        if position > header_end:
+            lines = lines[1:]
 
-        else:
-            line += next_char
+        rows = [x for x in lines if x.strip()]
+        if len(rows) >= last or position <= header_end:
+            break
 
-        position -= 1
-        n += 1
+        start = max(header_end, position - block_size)
+        content = _read(stream, start, position) + content
+        position = start
+        block_size = min(block_size * 2, CSV_BLOCK_SIZE)
 
-        if last and len(lines) == last:
-            break
+    # a line break inside of a quoted field cannot be told apart reading backwards, so the rows are read forwards
+    if quote in content:
+        stream.seek(header_end)
+        rows = list(deque((x for _, x in _iter_records(stream, quote) if x.strip()), maxlen=last))
+
+    rows = rows[-last:]
+    if rows and not rows[-1].endswith(newline):
+        rows[-1] += newline
+
+    return newline[:0].join(rows)
+
+
+@overload
+def _first_lines_of_csv(f: StringIO | TextIOWrapper, *, first: int, key: Optional[str] = None) -> StringIO:
+    ...
+
+
+@overload
+def _first_lines_of_csv(f: BytesIO | BufferedReader | InMemoryUploadedFile,
+                        *,
+                        first: int,
+                        key: Optional[str] = None) -> BytesIO:
+    ...
+
+
+def _first_lines_of_csv(f: CsvFile, *, first: int, key: Optional[str] = None) -> StringIO | BytesIO:
+    if key:
+        return _cut_csv(f, start=0, end=first, key=key)
+
+    stream = _get_stream(f)
+    stream.seek(0)
+
+    records = (x for _, x in _iter_records(stream, _quote(stream)))
+    header = next(records, _newline(stream)[:0])
+    rows = [line for _, line in zip(range(first), (x for x in records if x.strip()))]
+
+    return _to_csv(f, header + header[:0].join(rows))
+
+
+@overload
+def _last_lines_of_csv(f: StringIO | TextIOWrapper, *, last: int, key: Optional[str] = None) -> StringIO:
+    ...
+
+
+@overload
+def _last_lines_of_csv(f: BytesIO | BufferedReader | InMemoryUploadedFile,
+                       *,
+                       last: int,
+                       key: Optional[str] = None) -> BytesIO:
+    ...
 
-    for line in reversed(lines):
-        res.write(line)
 
-        if isinstance(line, bytes):
-            res.write(b'\r\n')
+def _last_lines_of_csv(f: CsvFile, *, last: int, key: Optional[str] = None) -> StringIO | BytesIO:
+    stream = _get_stream(f)
 
-        else:
-            res.write('\r\n')
+    if key and last > 0:
+        offsets = get_csv_index(f, key)
+        lines = len(offsets) - 1
+        return _cut_csv(f, start=max(lines - 1 - last, 0), end=lines - 1, key=key)
 
-    res.seek(0)
+    stream.seek(0)
+    header = next(_iter_records(stream, _quote(stream)), (0, _newline(stream)[:0]))[1]
 
-    return res
+    if last <= 0:
+        return _to_csv(f, header)
+
+    return _to_csv(f, header + _tail(stream, last=last, header_end=len(header)))
 
 
 @overload
-def cut_csv(f: StringIO | TextIOWrapper, *, start: int, end: int) -> StringIO:
+def cut_csv(f: StringIO | TextIOWrapper, *, start: int, end: int, key: Optional[str] = None) -> StringIO:
     ...
 
 
 @overload
-def cut_csv(f: BytesIO | BufferedReader | InMemoryUploadedFile, *, start: int, end: int) -> BytesIO:
+def cut_csv(f: BytesIO | BufferedReader | InMemoryUploadedFile,
+            *,
+            start: int,
+            end: int,
+            key: Optional[str] = None) -> BytesIO:
     ...
 
 
 @overload
-def cut_csv(f: StringIO | TextIOWrapper, *, first: int) -> StringIO:
+def cut_csv(f: StringIO | TextIOWrapper, *, first: int, key: Optional[str] = None) -> StringIO:
     ...
 
 
 @overload
-def cut_csv(f: BytesIO | BufferedReader | InMemoryUploadedFile, *, first: int) -> BytesIO:
+def cut_csv(f: BytesIO | BufferedReader | InMemoryUploadedFile, *, first: int, key: Optional[str] = None) -> BytesIO:
     ...
 
 
 @overload
-def cut_csv(f: StringIO | TextIOWrapper, *, last: int) -> StringIO:
+def cut_csv(f: StringIO | TextIOWrapper, *, last: int, key: Optional[str] = None) -> StringIO:
     ...
 
 
 @overload
-def cut_csv(f: BytesIO | BufferedReader | InMemoryUploadedFile, *, last: int) -> BytesIO:
+def cut_csv(f: BytesIO | BufferedReader | InMemoryUploadedFile, *, last: int, key: Optional[str] = None) -> BytesIO:
     ...
 
 
@@ -210,8 +305,14 @@ def cut_csv(f: StringIO | BytesIO | BufferedReader | TextIOWrapper | InMemoryUpl
             start: Optional[int] = None,
             end: Optional[int] = None,
             first: Optional[int] = None,
-            last: Optional[int] = None) -> StringIO | BytesIO:
-    """Cut a csv file."""
+            last: Optional[int] = None,
+            key: Optional[str] = None) -> StringIO | BytesIO:
+    """
+    Cut a csv file.
+
+    If a key is provided, like the hash of the file, the slices are served from an index of the rows that is built
+    once and shared through the cache, otherwise the first and last rows are read without scanning the whole file.
+    """
 
     if isinstance(start, int) and isinstance(end, int) and isinstance(last, int):
         raise Exception('You cannot use start/end and last at the same time')
@@ -223,38 +324,21 @@ def cut_csv(f: StringIO | BytesIO | BufferedReader | TextIOWrapper | InMemoryUpl
         raise Exception('You cannot use first and last at the same time')
 
     if isinstance(start, int) and isinstance(end, int):
-        return _cut_csv(f, start=start, end=end)
+        return _cut_csv(f, start=start, end=end, key=key)
 
     elif isinstance(last, int):
-        return _last_lines_of_csv(f, last=last)
+        return _last_lines_of_csv(f, last=last, key=key)
 
     else:
-        return _first_lines_of_csv(f, first=first)
-
-
-def count_file_lines(f: StringIO | BytesIO | BufferedReader | TextIOWrapper | InMemoryUploadedFile) -> int:
-    if isinstance(f, InMemoryUploadedFile):
-        f = f.file
-
-    if isinstance(f, TemporaryUploadedFile):
-        f = f.file.file
-
-    f.seek(0)
-
-    n = 0
-
-    try:
-        while True:
-            next(f)
-            n += 1
+        return _first_lines_of_csv(f, first=first, key=key)
 
-    except StopIteration:
-        pass
 
+def count_file_lines(f: CsvFile, key: Optional[str] = None) -> int:
+    lines = len(get_csv_index(f, key)) - 1
     f.seek(0)
 
-    return n
+    return lines
 
 
-def count_csv_rows(f: StringIO | BytesIO | BufferedReader | TextIOWrapper | InMemoryUploadedFile) -> int:
-    return count_file_lines(f) - 1
+def count_csv_rows(f: CsvFile, key: Optional[str] = None) -> int:
+    return count_file_lines(f, key) - 1
@@ -0,0 +1,197 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q, QuerySet
+
+from capyc.rest_framework.exceptions import ValidationException
+
+__all__ = [
+    'COUNT_MODES', 'CURSOR_QUERY_PARAM', 'get_keyset_ordering', 'encode_cursor', 'decode_cursor', 'paginate_by_cursor',
+    'get_total_count'
+]
+
+CURSOR_QUERY_PARAM = 'cursor'
+COUNT_MODES = ['exact', 'estimate', 'none']
+
+
+def get_keyset_ordering(queryset: QuerySet[Any] | list) -> Optional[list[str]]:
+    """
+    Get the sort key of the queryset with the primary key as tiebreaker.
+
+    It returns None when the queryset cannot be paginated by a cursor, like lists, random or expression orderings.
+    """
+
+    if not isinstance(queryset, QuerySet):
+        return None
+
+    query = queryset.query
+    ordering = list(query.order_by or query.extra_order_by)
+    if not ordering and query.default_ordering:
+        ordering = list(queryset.model._meta.ordering)
+
+    if any(not isinstance(x, str) or x == '?' or '.' in x for x in ordering):
+        return None
+
+    fields = [x.lstrip('-') for x in ordering]
+    if 'pk' not in fields and 'id' not in fields:
+        desc = bool(ordering) and ordering[-1].startswith('-')
+        ordering.append('-pk' if desc else 'pk')
+
+    return ordering
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Keep the microseconds of the datetimes, seeking a rounded value would skip or repeat rows."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+
+        return super().default(o)
+
+
+def _reverse(ordering: list[str]) -> list[str]:
+    return [x[1:] if x.startswith('-') else f'-{x}' for x in ordering]
+
+
+def _get_value(obj: Any, field: str) -> Any:
+    if isinstance(obj, dict):
+        return obj.get(field)
+
+    for attr in field.split('__'):
+        if obj is None:
+            return None
+
+        obj = getattr(obj, attr)
+
+    return obj
+
+
+def encode_cursor(ordering: list[str], obj: Any, direction: str) -> str:
+    """Encode the sort key of the object, the sources that are not a queryset can seek it by themselves."""
+
+    values = [_get_value(obj, x.lstrip('-')) for x in ordering]
+    data = json.dumps({'o': ordering, 'v': values, 'd': direction}, cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode('utf-8').rstrip('=')
+
+
+def decode_cursor(token: str, ordering: list[str]) -> tuple[list[Any], str]:
+    """Get the sort key and the direction of the cursor, it must be built for the same ordering."""
+
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        values, direction = data['v'], data['d']
+
+    except (ValueError, TypeError, KeyError):
+        raise ValidationException('Invalid cursor', slug='invalid-cursor')
+
+    # the cursor was built for other sort, it cannot be used to seek this one
+    if data.get('o') != ordering or len(values) != len(ordering) or direction not in ['next', 'previous']:
+        raise ValidationException('Invalid cursor', slug='invalid-cursor')
+
+    return values, direction
+
+
+def _seek(queryset: QuerySet[Any], ordering: list[str], values: list[Any]) -> QuerySet[Any]:
+    """Filter the rows placed after `values` in `ordering`, it is `(a, b) > (x, y)` expanded to lookups."""
+
+    nulls_largest = connections[queryset.db].features.nulls_order_largest
+    predicate = Q(pk__in=[])
+    equals = Q()
+
+    for field, value in zip(ordering, values):
+        desc = field.startswith('-')
+        name = field.lstrip('-')
+
+        # the null values are placed at the end of the ascending order when the database sees them as largest
+        nulls_after = nulls_largest != desc
+
+        if value is None:
+            after = Q(**{f'{name}__isnull': False}) if not nulls_after else Q(pk__in=[])
+            equal = Q(**{f'{name}__isnull': True})
+
+        else:
+            after = Q(**{f'{name}__lt' if desc else f'{name}__gt': value})
+            if nulls_after:
+                after |= Q(**{f'{name}__isnull': True})
+
+            equal = Q(**{name: value})
+
+        predicate |= equals & after
+        equals &= equal
+
+    return queryset.filter(predicate)
+
+
+def paginate_by_cursor(queryset: QuerySet[Any], ordering: list[str], token: Optional[str],
+                       limit: int) -> tuple[list[Any], Optional[str], Optional[str]]:
+    """
+    Get a page seeking the sort key instead of skipping rows with OFFSET.
+
+    It returns the items of the page and the cursors of the next and previous pages.
+    """
+
+    queryset = queryset.order_by(*ordering)
+    values, direction = decode_cursor(token, ordering) if token else (None, 'next')
+
+    if direction == 'previous':
+        reverse = _reverse(ordering)
+        items = list(_seek(queryset.order_by(*reverse), reverse, values)[:limit + 1])
+
+        has_previous = len(items) > limit
+        has_next = True
+        items = items[:limit][::-1]
+
+    else:
+        if values is not None:
+            queryset = _seek(queryset, ordering, values)
+
+        items = list(queryset[:limit + 1])
+
+        has_previous = values is not None
+        has_next = len(items) > limit
+        items = items[:limit]
+
+    if not items:
+        return items, None, None
+
+    next_cursor = encode_cursor(ordering, items[-1], 'next') if has_next else None
+    previous_cursor = encode_cursor(ordering, items[0], 'previous') if has_previous else None
+
+    return items, next_cursor, previous_cursor
+
+
+def _estimate_count(queryset: QuerySet[Any]) -> Optional[int]:
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+
+    try:
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    except (ValueError, TypeError, KeyError, IndexError):
+        return None
+
+
+def get_total_count(queryset: QuerySet[Any] | list, mode: str = 'exact') -> Optional[int]:
+    """
+    Count the items of the queryset.
+
+    The estimate mode uses the row estimate of the planner and it falls back to the exact count when the
+    database cannot provide it, the none mode skips the count.
+    """
+
+    if mode == 'none':
+        return None
+
+    if not isinstance(queryset, QuerySet):
+        return len(queryset)
+
+    if mode == 'estimate' and (count := _estimate_count(queryset)) is not None:
+        return count
+
+    return queryset.count()
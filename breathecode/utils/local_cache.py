@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+__all__ = ['LocalCache', 'clear_local_caches']
+
+LOCAL_CACHES: list['LocalCache'] = []
+
+
+class LocalCache:
+    """
+    Per process LRU cache whose entries expire after a small amount of seconds.
+
+    It is meant to sit in front of Redis for values read on every request, the short ttl bounds how long a
+    worker can serve a value that was invalidated by other process.
+    """
+
+    def __init__(self, maxsize: int = 1024, timeout: float = 10) -> None:
+        self._maxsize = maxsize
+        self._timeout = timeout
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        LOCAL_CACHES.append(self)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, timeout: Optional[float] = None) -> None:
+        if timeout is None:
+            timeout = self._timeout
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys: Hashable) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+def clear_local_caches() -> None:
+    for local_cache in LOCAL_CACHES:
+        local_cache.clear()
@@ -1,10 +1,14 @@
 import json
 import urllib.parse
+from datetime import timedelta
 from unittest.mock import MagicMock, call, patch
 
 import brotli
 import serpy
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 from rest_framework.test import APIRequestFactory, force_authenticate
@@ -141,6 +145,14 @@ class PaginateFalseTestView(CustomTestView):
     extensions = APIViewExtensions(cache=CohortCache, sort='name', paginate=False)
 
 
+class CursorTestView(CustomTestView):
+    extensions = APIViewExtensions(cache=CohortCache, sort='name', paginate=True, cursor_pagination=True)
+
+
+class CursorByDateTestView(CustomTestView):
+    extensions = APIViewExtensions(cache=CohortCache, sort='-kickoff_date', paginate=True, cursor_pagination=True)
+
+
 class CachePerUserTestView(CustomTestView):
     extensions = APIViewExtensions(cache=CohortCache, cache_per_user=True, sort='name', paginate=False)
 
@@ -991,6 +1003,156 @@ class ApiViewExtensionsGetTestSuite(UtilsTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         assert_no_pagination(response.headers, limit=20, offset=0, lenght=25)
 
+    """
+    🔽🔽🔽 Pagination by cursor
+    """
+
+    def test_pagination__get__cursor__with_10_cohorts__walk_the_pages(self):
+        cache.clear()
+
+        model = self.bc.database.create(cohort=10)
+        cohorts = sorted(model.cohort, key=lambda x: x.name)
+
+        view = CursorTestView.as_view()
+
+        request = APIRequestFactory()
+        request = request.get('/the-beans-should-not-have-sugar?limit=4')
+
+        response = view(request)
+        json_response = json.loads(response.content.decode('utf-8'))
+
+        self.assertEqual(json_response['results'], GetCohortSerializer(cohorts[:4], many=True).data)
+        self.assertEqual(json_response['count'], 10)
+        self.assertEqual(json_response['first'], None)
+        self.assertEqual(json_response['previous'], None)
+        self.assertEqual(json_response['last'], None)
+        self.assertEqual(response.headers['X-Total-Count'], '10')
+        self.assertEqual(response.headers['Link'], f'<{json_response["next"]}>; rel="next"')
+
+        pages = [cohorts[4:8], cohorts[8:]]
+        for page in pages:
+            request = APIRequestFactory()
+            request = request.get(json_response['next'])
+
+            response = view(request)
+            json_response = json.loads(response.content.decode('utf-8'))
+
+            self.assertEqual(json_response['results'], GetCohortSerializer(page, many=True).data)
+            self.assertEqual(json_response['first'], 'http://testserver/the-beans-should-not-have-sugar?limit=4')
+            self.assertNotIn('offset=', json_response['previous'])
+
+        self.assertEqual(json_response['next'], None)
+
+        request = APIRequestFactory()
+        request = request.get(json_response['previous'])
+
+        response = view(request)
+        json_response = json.loads(response.content.decode('utf-8'))
+
+        self.assertEqual(json_response['results'], GetCohortSerializer(cohorts[4:8], many=True).data)
+
+        request = APIRequestFactory()
+        request = request.get(json_response['previous'])
+
+        response = view(request)
+        json_response = json.loads(response.content.decode('utf-8'))
+
+        self.assertEqual(json_response['results'], GetCohortSerializer(cohorts[:4], many=True).data)
+        self.assertEqual(json_response['previous'], None)
+
+    def test_pagination__get__cursor__sorted_by_microseconds(self):
+        cache.clear()
+
+        # the kickoff dates only differ in their microseconds
+        kickoff_date = timezone.now().replace(microsecond=123000)
+        cohorts = [{'kickoff_date': kickoff_date + timedelta(microseconds=n % 3)} for n in range(7)]
+        model = self.bc.database.create(cohort=cohorts)
+
+        expected = sorted(model.cohort, key=lambda x: (x.kickoff_date, x.id), reverse=True)
+        view = CursorByDateTestView.as_view()
+        url = '/the-beans-should-not-have-sugar?limit=2'
+        results = []
+
+        while url:
+            request = APIRequestFactory()
+            request = request.get(url)
+
+            response = view(request)
+            json_response = json.loads(response.content.decode('utf-8'))
+
+            results += json_response['results']
+            url = json_response['next']
+
+        self.assertEqual(results, GetCohortSerializer(expected, many=True).data)
+
+    def test_pagination__get__cursor__with_offset(self):
+        cache.clear()
+
+        model = self.bc.database.create(cohort=10)
+
+        request = APIRequestFactory()
+        request = request.get('/the-beans-should-not-have-sugar?limit=5&offset=5')
+
+        view = CursorTestView.as_view()
+
+        response = view(request)
+        expected = {
+            'count': 10,
+            'first': 'http://testserver/the-beans-should-not-have-sugar?limit=5',
+            'last': None,
+            'next': None,
+            'previous': 'http://testserver/the-beans-should-not-have-sugar?limit=5',
+            'results': GetCohortSerializer(sorted(model.cohort, key=lambda x: x.name)[5:], many=True).data
+        }
+
+        self.assertEqual(json.loads(response.content.decode('utf-8')), expected)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        assert_pagination(response.headers, limit=5, offset=5, lenght=10)
+
+    def test_pagination__get__cursor__bad_cursor(self):
+        cache.clear()
+
+        self.bc.database.create(cohort=10)
+
+        request = APIRequestFactory()
+        request = request.get('/the-beans-should-not-have-sugar?limit=5&cursor=they-killed-kenny')
+
+        view = CursorTestView.as_view()
+
+        response = view(request).render()
+        expected = {'detail': 'invalid-cursor', 'status_code': 400}
+
+        self.assertEqual(json.loads(response.content.decode('utf-8')), expected)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_pagination__get__without_count(self):
+        cache.clear()
+
+        model = self.bc.database.create(cohort=10)
+
+        request = APIRequestFactory()
+        request = request.get('/the-beans-should-not-have-sugar?limit=5&offset=0&count=none')
+
+        view = CustomTestView.as_view()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request)
+
+        self.assertFalse([x for x in queries.captured_queries if 'COUNT(' in x['sql']])
+
+        expected = {
+            'count': None,
+            'first': None,
+            'last': None,
+            'next': 'http://testserver/the-beans-should-not-have-sugar?count=none&limit=5&offset=5',
+            'previous': None,
+            'results': GetCohortSerializer(sorted(model.cohort, key=lambda x: x.name)[:5], many=True).data
+        }
+
+        self.assertEqual(json.loads(response.content.decode('utf-8')), expected)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Total-Count', response.headers)
+
 
 class ApiViewExtensionsGetIdTestSuite(UtilsTestCase):
     """
@@ -0,0 +1,108 @@
+"""
+Test RedisTagIndex against a fake Redis
+"""
+import fakeredis
+import pytest
+from django.core.cache import cache
+
+from breathecode.utils.cache import RedisTagIndex
+
+TAG = 'Cohort__keys'
+
+
+@pytest.fixture(autouse=True)
+def client(monkeypatch):
+    client = fakeredis.FakeRedis()
+
+    monkeypatch.setattr(RedisTagIndex, '_client', lambda self: client)
+    monkeypatch.setattr(RedisTagIndex, '_script', None)
+
+    yield client
+
+    cache.clear()
+
+
+def test_add(client):
+    index = RedisTagIndex()
+
+    index.add(TAG, 'Cohort__x=1', 60)
+    index.add(TAG, 'Cohort__x=2', 60)
+
+    assert client.type(cache.make_key(TAG)) == b'set'
+    assert index.keys(TAG) == {'Cohort__x=1', 'Cohort__x=2'}
+
+
+def test_add__not_cached(client):
+    index = RedisTagIndex()
+
+    index.add(TAG, 'Cohort__x=1', 0)
+
+    assert client.exists(cache.make_key(TAG)) == 0
+
+
+def test_add__the_ttl_is_the_longest_of_its_keys(client):
+    index = RedisTagIndex()
+    raw_tag = cache.make_key(TAG)
+
+    index.add(TAG, 'Cohort__x=1', 60)
+    assert client.ttl(raw_tag) == 60
+
+    index.add(TAG, 'Cohort__x=2', 600)
+    assert client.ttl(raw_tag) == 600
+
+    # a shorter key does not shorten the life of the tag
+    index.add(TAG, 'Cohort__x=3', 60)
+    assert client.ttl(raw_tag) == 600
+
+    # a key without timeout makes the tag persistent
+    index.add(TAG, 'Cohort__x=4', None)
+    assert client.ttl(raw_tag) == -1
+
+    index.add(TAG, 'Cohort__x=5', 60)
+    assert client.ttl(raw_tag) == -1
+
+
+def test_clear(client):
+    index = RedisTagIndex()
+
+    for n in range(3):
+        client.set(cache.make_key(f'Cohort__x={n}'), b'1')
+        index.add(TAG, f'Cohort__x={n}', 60)
+
+    client.set(cache.make_key('Event__x=1'), b'1')
+    index.add('Event__keys', 'Event__x=1', 60)
+
+    index.clear({TAG})
+
+    assert [client.exists(cache.make_key(f'Cohort__x={n}')) for n in range(3)] == [0, 0, 0]
+    assert client.exists(cache.make_key(TAG)) == 0
+
+    assert client.exists(cache.make_key('Event__x=1')) == 1
+    assert index.keys('Event__keys') == {'Event__x=1'}
+
+
+def test_add__legacy_tag(client):
+    index = RedisTagIndex()
+
+    # the previous index stored the tags as pickled sets
+    client.set(cache.make_key(TAG), b'pickled set')
+    cache.set(TAG, {'Cohort__x=1'})
+    cache.set('Cohort__x=1', b'1')
+
+    index.add(TAG, 'Cohort__x=2', 60)
+
+    assert cache.get('Cohort__x=1') is None
+    assert index.keys(TAG) == {'Cohort__x=2'}
+
+
+def test_clear__legacy_tag(client):
+    index = RedisTagIndex()
+
+    client.set(cache.make_key(TAG), b'pickled set')
+    cache.set(TAG, {'Cohort__x=1'})
+    cache.set('Cohort__x=1', b'1')
+
+    index.clear({TAG})
+
+    assert cache.get('Cohort__x=1') is None
+    assert client.exists(cache.make_key(TAG)) == 0
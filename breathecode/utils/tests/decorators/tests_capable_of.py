@@ -305,3 +305,53 @@ class ViewTestSuite(UtilsTestCase):
 
         self.assertEqual(json.loads(response.content.decode('utf-8')), expected)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    """
+    🔽🔽🔽 Capability matrix cache
+    """
+
+    def test_capable_of__view__get_id__with_user__with_capability__cached(self):
+        model = self.bc.database.create(user=1, academy=1, profile_academy=1, role=1, capability='can_kill_kenny')
+
+        view = CustomTestView.as_view()
+        expected = {'academy_id': 1, 'id': 1}
+
+        for n in [1, 0]:
+            request = APIRequestFactory()
+            request = request.get('/they-killed-kenny', headers={'academy': 1})
+            force_authenticate(request, user=model.user)
+
+            with self.assertNumQueries(n):
+                response = view(request, id=1).render()
+
+            self.assertEqual(json.loads(response.content.decode('utf-8')), expected)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_capable_of__view__get_id__with_user__role_changed(self):
+        model = self.bc.database.create(user=1, academy=1, profile_academy=1, role=1, capability='can_kill_kenny')
+
+        view = CustomTestView.as_view()
+
+        request = APIRequestFactory()
+        request = request.get('/they-killed-kenny', headers={'academy': 1})
+        force_authenticate(request, user=model.user)
+
+        response = view(request, id=1).render()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # the signals are disabled, call what the m2m_changed receiver does
+        model.role.capabilities.clear()
+        decorators.invalidate_all_capabilities()
+
+        request = APIRequestFactory()
+        request = request.get('/they-killed-kenny', headers={'academy': 1})
+        force_authenticate(request, user=model.user)
+
+        response = view(request, id=1).render()
+        expected = {
+            'detail': "You (user: 1) don't have this capability: can_kill_kenny for academy 1",
+            'status_code': 403
+        }
+
+        self.assertEqual(json.loads(response.content.decode('utf-8')), expected)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
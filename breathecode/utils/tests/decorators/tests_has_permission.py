@@ -4676,6 +4676,59 @@ class ViewTestSuite(UtilsTestCase):
 
         self.assertEqual(payments_signals.consume_service.send.call_args_list, [])
 
+    """
+    🔽🔽🔽 Group permissions cache
+    """
+
+    def test__view__get__with_user__with_group_related_to_permission__cached(self):
+        user = {'user_permissions': []}
+        permissions = [{}, {'codename': PERMISSION}]
+        group = {'permission_id': 2}
+        model = self.bc.database.create(user=user, permission=permissions, group=group)
+
+        view = TestView.as_view()
+
+        # the first query looks for a consumption session
+        for n in [2, 1]:
+            request = APIRequestFactory()
+            request = request.get('/they-killed-kenny')
+            force_authenticate(request, user=model.user)
+
+            with self.assertNumQueries(n):
+                response = view(request).render()
+
+            self.assertEqual(json.loads(response.content.decode('utf-8')), GET_RESPONSE)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test__view__get__with_user__group_removed(self):
+        user = {'user_permissions': []}
+        permissions = [{}, {'codename': PERMISSION}]
+        group = {'permission_id': 2}
+        model = self.bc.database.create(user=user, permission=permissions, group=group)
+
+        view = TestView.as_view()
+
+        request = APIRequestFactory()
+        request = request.get('/they-killed-kenny')
+        force_authenticate(request, user=model.user)
+
+        response = view(request).render()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # the signals are disabled, call what the m2m_changed receiver does
+        model.user.groups.clear()
+        decorators.invalidate_user_permissions(model.user.id)
+
+        request = APIRequestFactory()
+        request = request.get('/they-killed-kenny')
+        force_authenticate(request, user=model.user)
+
+        response = view(request).render()
+        expected = {'detail': 'without-permission', 'status_code': 403}
+
+        self.assertEqual(json.loads(response.content.decode('utf-8')), expected)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
     """
     🔽🔽🔽 View get id
     """
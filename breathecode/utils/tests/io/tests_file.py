@@ -0,0 +1,113 @@
+from io import BytesIO, StringIO, TextIOWrapper
+
+import pytest
+from django.core.cache import cache
+
+from breathecode.utils.io.file import count_csv_rows, cut_csv, get_csv_index
+
+HEADER = 'id,name\n'
+ROWS = [f'{n},name-{n}\n' for n in range(10)]
+
+
+@pytest.fixture(params=['bytes', 'str', 'text-wrapper'])
+def make_file(request):
+
+    def wrapper(content: str):
+        if request.param == 'bytes':
+            return BytesIO(content.encode())
+
+        if request.param == 'str':
+            return StringIO(content)
+
+        return TextIOWrapper(BytesIO(content.encode()), encoding='utf-8')
+
+    yield wrapper
+
+
+def value(f):
+    return f.getvalue().decode() if isinstance(f, BytesIO) else f.getvalue()
+
+
+@pytest.mark.parametrize('key', [None, 'hash'])
+def test_cut_csv(make_file, key):
+    f = make_file(HEADER + ''.join(ROWS))
+
+    assert value(cut_csv(f, first=2, key=key)) == HEADER + ''.join(ROWS[:2])
+    assert value(cut_csv(f, last=2, key=key)) == HEADER + ''.join(ROWS[-2:])
+    assert value(cut_csv(f, start=3, end=6, key=key)) == HEADER + ''.join(ROWS[3:6])
+    assert value(cut_csv(f, start=8, end=20, key=key)) == HEADER + ''.join(ROWS[8:])
+    assert value(cut_csv(f, start=20, end=30, key=key)) == HEADER
+    assert count_csv_rows(f, key=key) == 10
+
+
+@pytest.mark.parametrize('key', [None, 'hash'])
+def test_cut_csv__without_the_last_line_break(make_file, key):
+    f = make_file(HEADER + ''.join(ROWS).rstrip('\n'))
+
+    assert value(cut_csv(f, last=1, key=key)) == HEADER + ROWS[-1]
+    assert count_csv_rows(f, key=key) == 10
+
+
+def test_cut_csv__last__ignore_blank_lines(make_file):
+    f = make_file(HEADER + ''.join(ROWS) + '\n\n')
+
+    assert value(cut_csv(f, last=1)) == HEADER + ROWS[-1]
+
+
+def test_get_csv_index__is_cached():
+    f = BytesIO((HEADER + ''.join(ROWS)).encode())
+
+    offsets = get_csv_index(f, 'hash')
+
+    assert offsets.tolist() == [0, *[len(HEADER) + sum(len(x) for x in ROWS[:n]) for n in range(11)]]
+    assert cache.get('csv-index:hash') == offsets.tobytes()
+
+
+def test_get_csv_index__outdated():
+    f = BytesIO((HEADER + ''.join(ROWS)).encode())
+    get_csv_index(f, 'hash')
+
+    # other file was saved with the same key
+    f = BytesIO((HEADER + ''.join(ROWS[:5])).encode())
+
+    assert len(get_csv_index(f, 'hash')) == 7
+    assert count_csv_rows(f, key='hash') == 5
+
+
+@pytest.mark.parametrize('content', [
+    HEADER + ''.join(ROWS) + '\n\n',
+    HEADER + '\n' + ''.join(ROWS[:5]) + '\n\n' + ''.join(ROWS[5:]) + '\n',
+])
+def test_cut_csv__blank_lines__with_and_without_key(make_file, content):
+    f = make_file(content)
+
+    for kwargs in [{'first': 2}, {'last': 1}, {'last': 3}, {'start': 4, 'end': 7}]:
+        expected = value(cut_csv(f, **kwargs))
+
+        assert value(cut_csv(f, **kwargs, key='hash')) == expected
+
+    assert value(cut_csv(f, last=1, key='hash')) == HEADER + ROWS[-1]
+    assert value(cut_csv(f, last=3, key='hash')) == HEADER + ''.join(ROWS[-3:])
+    assert value(cut_csv(f, start=4, end=7, key='hash')) == HEADER + ''.join(ROWS[4:7])
+    assert count_csv_rows(f, key='hash') == 10
+
+
+@pytest.mark.parametrize('key', [None, 'hash'])
+def test_cut_csv__quoted_line_breaks(make_file, key):
+    rows = [f'{n},"name\n\n""{n}"""\n' if n % 3 == 0 else f'{n},name-{n}\n' for n in range(10)]
+    f = make_file(HEADER + ''.join(rows))
+
+    assert value(cut_csv(f, first=2, key=key)) == HEADER + ''.join(rows[:2])
+    assert value(cut_csv(f, last=4, key=key)) == HEADER + ''.join(rows[-4:])
+    assert value(cut_csv(f, last=1, key=key)) == HEADER + rows[-1]
+    assert value(cut_csv(f, start=3, end=6, key=key)) == HEADER + ''.join(rows[3:6])
+    assert value(cut_csv(f, start=8, end=20, key=key)) == HEADER + ''.join(rows[8:])
+    assert count_csv_rows(f, key=key) == 10
+
+
+@pytest.mark.parametrize('key', [None, 'hash'])
+@pytest.mark.parametrize('last', [0, -1])
+def test_cut_csv__without_last_lines(make_file, key, last):
+    f = make_file(HEADER + ''.join(ROWS))
+
+    assert value(cut_csv(f, last=last, key=key)) == HEADER
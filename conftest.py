@@ -8,6 +8,7 @@ from django.utils import timezone
 
 from breathecode.notify.utils.hook_manager import HookManagerClass
 from breathecode.utils.exceptions import TestError
+from breathecode.utils.local_cache import clear_local_caches
 from capyc.core.pytest.fixtures import Random
 from capyc.django.pytest.fixtures.signals import Signals
 
@@ -65,6 +66,7 @@ def clear_cache():
 
     def wrapper():
         cache.clear()
+        clear_local_caches()
 
     wrapper()
     yield wrapper